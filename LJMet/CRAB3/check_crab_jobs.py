@@ -1,11 +1,16 @@
-import os, argparse, imp
+import os, re, argparse, imp, json, time, subprocess
+from multiprocessing.pool import ThreadPool
 
 parser = argparse.ArgumentParser()
 parser.add_argument( "-l", "--logs", action = "store", required = True )
 parser.add_argument( "-g", "--groups", nargs = "+", required = True )
-parser.add_argument( "--resubmit", action ="store_true", default=False)
-parser.add_argument( "--report", action ="store_true", default=False)
-parser.add_argument( "--kill", action ="store_true", default=False)
+parser.add_argument( "--resubmit", action ="store_true", default=False, help = "Resubmit the failed jobs of the selected tasks (default: tasks with failed jobs)" )
+parser.add_argument( "--report", action ="store_true", default=False, help = "Print the status of every task" )
+parser.add_argument( "--kill", action ="store_true", default=False, help = "Kill the selected tasks (default: tasks that did not finish)" )
+parser.add_argument( "--state", nargs = "+", default = None, help = "Restrict --resubmit/--kill to tasks in these states, e.g. FAILED SUBMITTED" )
+parser.add_argument( "--refresh", action = "store_true", help = "Query all tasks again, also the finished ones" )
+parser.add_argument( "-j", "--jobs", type = int, default = 8, help = "Number of concurrent crab status calls" )
+parser.add_argument( "--crab", default = "crab", help = "CRAB client executable" )
 parser.add_argument( "--verbose", action = "store_true" )
 option = parser.parse_args()
 
@@ -14,30 +19,143 @@ postfix = option.logs.split( "_" )[1].strip("/")
 sampleListPath = "sample_list_{}.py".format( postfix )
 samples = imp.load_source( "Sample", sampleListPath, open(sampleListPath,"r") )
 
-def check_crab_job( group, process ):
-  if option.resubmit:
-    print( "   + Resubmitting {}: {}".format( process, samples.groups[ group ][ process ] ) )
-    os.system( "crab resubmit {}".format( os.path.join( option.logs, "crab_{}".format( process ) ) ) )
-  elif option.kill:
-    print( "   + Killing {}: {} ".format( process, samples.groups[ group ][ process ] ) )
-    os.system( "crab kill {}".format( os.path.join( option.logs, "crab_{}".format( process ) ) ) )
-  else:
-    print( "   + Checking status {}: {}".format( process, samples.groups[ group ][ process ] ) )
-    if option.verbose:
-      os.system( "crab status --verboseErrors {}".format( os.path.join( option.logs, "crab_{}".format( process ) ) ) )
-    else:
-      os.system( "crab status {}".format( os.path.join( option.logs, "crab_{}".format( process ) ) ) )
+CACHE = os.path.join( option.logs, "status.json" )
+LEDGER = os.path.join( option.logs, "submitted.json" )
+
+# a task in one of these states only changes with --resubmit/--kill or a new submission
+TERMINAL_STATES = [ "COMPLETED", "FAILED", "KILLED", "SUBMITFAILED", "MISSING" ]
+JOB_STATES = [ "idle", "running", "transferring", "finished", "failed" ]
+
+def load_json( path ):
+  if not os.path.exists( path ): return {}
+  with open( path ) as f:
+    return json.load( f )
+
+def save_json( path, content ):
+  if not os.path.exists( os.path.dirname( path ) ): os.makedirs( os.path.dirname( path ) )
+  with open( path + ".tmp", "w" ) as f:
+    json.dump( content, f, indent = 2, sort_keys = True )
+  os.rename( path + ".tmp", path )
+
+def run_crab( args ):
+  try:
+    proc = subprocess.Popen( [ option.crab ] + args, stdout = subprocess.PIPE, stderr = subprocess.STDOUT, universal_newlines = True )
+  except OSError as e:
+    return 127, str( e )
+  output = proc.communicate()[0]
+  return proc.returncode, output
+
+def parse_status( output ):
+  record = { "server": None, "scheduler": None, "jobs": {}, "total": 0 }
+  in_jobs = False
+  for line in output.splitlines():
+    match = re.match( r"\s*Status on the CRAB server:\s+(\S+)", line )
+    if match: record[ "server" ] = match.group(1)
+    match = re.match( r"\s*Status on the scheduler:\s+(\S+)", line )
+    if match: record[ "scheduler" ] = match.group(1)
+    # Jobs status:   finished   50.0% ( 5/10)
+    #                running    50.0% ( 5/10)
+    if line.strip().startswith( "Jobs status:" ):
+      in_jobs = True
+      line = line.split( ":", 1 )[1]
+    if in_jobs:
+      match = re.match( r"\s*(\w+)\s+[\d.]+%\s+\(\s*(\d+)/(\d+)\)", line )
+      if not match:
+        in_jobs = False
+        continue
+      record[ "jobs" ][ match.group(1) ] = int( match.group(2) )
+      record[ "total" ] = int( match.group(3) )
+  return record
+
+def task_state( record ):
+  if record[ "server" ] is None: return "UNKNOWN"
+  if record[ "server" ] != "SUBMITTED" or record[ "scheduler" ] is None: return record[ "server" ]
+  return record[ "scheduler" ]
+
+def check_crab_job( task ):
+  process, task_dir = task
+  if not os.path.exists( task_dir ):
+    return process, { "state": "MISSING", "jobs": {}, "total": 0 }, ""
+  args = [ "status", task_dir ]
+  if option.verbose: args.insert( 1, "--verboseErrors" )
+  code, output = run_crab( args )
+  record = parse_status( output )
+  record[ "state" ] = task_state( record ) if code == 0 else "ERROR"
+  return process, record, output
+
+def selected( record ):
+  if option.state is not None: return record[ "state" ] in option.state
+  if option.resubmit: return record[ "jobs" ].get( "failed", 0 ) > 0
+  return record[ "state" ] not in TERMINAL_STATES
+
+def print_table( group, processes, status ):
+  print( ">> {}".format( group ) )
+  print( "   {:<28} {:<14}".format( "process", "state" ) + "".join( " {:>12}".format( state ) for state in JOB_STATES ) + " {:>7}".format( "done" ) )
+  totals = dict( ( state, 0 ) for state in JOB_STATES )
+  total = 0
+  for process in processes:
+    record = status[ process ]
+    counts = [ record[ "jobs" ].get( state, 0 ) for state in JOB_STATES ]
+    for state, count in zip( JOB_STATES, counts ): totals[ state ] += count
+    total += record[ "total" ]
+    done = "{:.0f}%".format( 100. * record[ "jobs" ].get( "finished", 0 ) / record[ "total" ] ) if record[ "total" ] > 0 else "-"
+    print( "   {:<28} {:<14}".format( process, record[ "state" ] ) + "".join( " {:>12}".format( count ) for count in counts ) + " {:>7}".format( done ) )
+  done = "{:.0f}%".format( 100. * totals[ "finished" ] / total ) if total > 0 else "-"
+  print( "   {:<28} {:<14}".format( "total", "" ) + "".join( " {:>12}".format( totals[ state ] ) for state in JOB_STATES ) + " {:>7}".format( done ) )
 
 if __name__ == '__main__':
   print( "[START] Checking CRAB3 jobs" )
-  count = 0
+  cache = load_json( CACHE )
+  ledger = load_json( LEDGER )
+
+  groups = []
+  tasks = []
+  queued = set()
   for group in option.groups:
-    print( ">> Checking jobs for {}".format( group ) )
     if group not in list( samples.groups.keys() ):
-      print( "[WARN] {} is not a valid group listed in 'sample_list_{}{}UL.py'. Skipping.".format( group, option.finalState, option.year ) )
-    else:
-      for process in samples.groups[ group ]:
-        check_crab_job( group, process )
-        count += 1
-  print( "[DONE] Checked {} CRAB jobs.".format( count ) )
+      print( "[WARN] {} is not a valid group listed in '{}'. Skipping.".format( group, sampleListPath ) )
+      continue
+    groups.append( group )
+    for process in samples.groups[ group ]:
+      if process in queued: continue
+      queued.add( process )
+      record = cache.get( process )
+      submitted = ledger.get( "crab_{}".format( process ), {} ).get( "time" )
+      # finished tasks keep their cached status until they are submitted again
+      if not option.refresh and record is not None and record[ "state" ] in TERMINAL_STATES and record.get( "submitted" ) == submitted and record[ "state" ] != "MISSING":
+        continue
+      tasks.append( ( process, os.path.join( option.logs, "crab_{}".format( process ) ) ) )
+
+  print( ">> Querying {} of {} tasks, {} at a time".format( len( tasks ), len( queued ), option.jobs ) )
+  pool = ThreadPool( max( option.jobs, 1 ) )
+  for process, record, output in pool.imap_unordered( check_crab_job, tasks ):
+    record[ "submitted" ] = ledger.get( "crab_{}".format( process ), {} ).get( "time" )
+    record[ "checked" ] = time.strftime( "%Y-%m-%d %H:%M:%S" )
+    cache[ process ] = record
+    if option.verbose and ( record[ "state" ] == "ERROR" or record[ "jobs" ].get( "failed", 0 ) > 0 ):
+      print( output.rstrip() )
+  pool.close()
+  pool.join()
+  save_json( CACHE, cache )
+
+  if option.report or not ( option.resubmit or option.kill ):
+    for group in groups:
+      print_table( group, list( samples.groups[ group ] ), cache )
+
+  if option.resubmit or option.kill:
+    action = "resubmit" if option.resubmit else "kill"
+    targets = sorted( process for process in queued if cache[ process ][ "state" ] != "MISSING" and selected( cache[ process ] ) )
+    print( ">> {} {} tasks".format( "Resubmitting" if option.resubmit else "Killing", len( targets ) ) )
+    def act( process ):
+      return process, run_crab( [ action, os.path.join( option.logs, "crab_{}".format( process ) ) ] )
+    pool = ThreadPool( max( option.jobs, 1 ) )
+    for process, ( code, output ) in pool.imap_unordered( act, targets ):
+      print( "   {} {}{}".format( "+" if code == 0 else "-", process, "" if code == 0 else ": crab {} failed with exit code {}".format( action, code ) ) )
+      if option.verbose or code != 0: print( output.rstrip() )
+      # the state changes, query the task again next time
+      cache.pop( process, None )
+    pool.close()
+    pool.join()
+    save_json( CACHE, cache )
 
+  print( "[DONE] Checked {} CRAB jobs.".format( len( queued ) ) )
@@ -44,7 +44,7 @@ if isVLQsignal:
 # runtime, memory, cores
 if isMC:
 	config.JobType.maxJobRuntimeMin = 2750 #minutes
-config.JobType.maxMemoryMB = 4000 #MB, believed to be per core based on CRAB3FAQ TWiki, evidently not based on tests
+config.JobType.maxMemoryMB = MAXMEMORY #MB, believed to be per core based on CRAB3FAQ TWiki, evidently not based on tests
 config.JobType.numCores = 4 #use wisely if turned on.
 
 ##############
@@ -53,21 +53,12 @@ config.JobType.numCores = 4 #use wisely if turned on.
 config.section_("Data")
 config.Data.inputDataset = inputDataset
 config.Data.allowNonValidInputDataset = True
-if isMC:
-	#config.Data.splitting = 'Automatic'
-	#config.Data.unitsPerJob = 1440 # 24 hours
-	if isVLQsignal:
-		config.Data.splitting = 'LumiBased'
-		config.Data.unitsPerJob = 2
-        elif isTTbar:
-                config.Data.splitting = "LumiBased"
-                config.Data.unitsPerJob = UNITSPERJOB
-	else:
-		config.Data.splitting = 'FileBased'
-		config.Data.unitsPerJob = UNITSPERJOB
-else:
-	config.Data.splitting = 'LumiBased'
-	config.Data.unitsPerJob = UNITSPERJOB
+#config.Data.splitting = 'Automatic'
+#config.Data.unitsPerJob = 1440 # 24 hours
+# set by create_configs.py, from the measured job costs with --plan
+config.Data.splitting = 'SPLITTING'
+config.Data.unitsPerJob = UNITSPERJOB
+if not isMC:
 	config.Data.lumiMask = Json_for_data
 
 config.Data.inputDBS = 'global'
@@ -1,4 +1,5 @@
-import os, sys, argparse, imp
+import os, sys, argparse, imp, hashlib, multiprocessing
+import plan_splitting
 import datetime
 cTime=datetime.datetime.now()
 date_str='%i_%i_%i'%(cTime.year,cTime.month,cTime.day)
@@ -14,6 +15,10 @@ parser.add_argument("-g","--groups",nargs="+",required=True,help="See sample_lis
 parser.add_argument("--shifts",action="store_true",help="JER/JEC shifts")
 parser.add_argument("--brux",action="store_true",help="Store CRAB output on BRUX")
 parser.add_argument("-o","--outfolder",action="store",default="default")
+parser.add_argument("-j","--jobs",action="store",type=int,default=multiprocessing.cpu_count(),help="Number of groups processed in parallel")
+parser.add_argument("--plan",action="store_true",help="Split the jobs by the measured costs in {}".format( plan_splitting.COSTS_FILE ))
+parser.add_argument("--targetTime",action="store",type=float,default=480.,help="Target wall time per job in minutes (--plan)")
+parser.add_argument("--targetMemory",action="store",type=int,default=4000,help="Maximum memory per job in MB (--plan)")
 option = parser.parse_args()
 
 if option.finalState not in [ "singleLep", "doubleLep", "multiLep" ]: quit( "[ERR] Invalid -f (--finalState) argument passed." )
@@ -49,18 +54,37 @@ else:
 	OUTPATH = '/store/group/lpcljm/'
 	STORESITE = 'T3_US_FNALLPC'
 
-def create_crab_config( group, process, shifts ):
-        print( "   + {} > {}".format( group, process ) ) 
-
-	CMSRUNCONFIG        = '../runFWLJMet_{}{}UL.py'.format( option.finalState, option.year )
+#the crab cfg template and the cmsRun config, read once and filled in memory for every process
+CRABCONFIG_TEMPLATE = 'crab_config_template.py'
+CMSRUNCONFIG        = '../runFWLJMet_{}{}UL.py'.format( option.finalState, option.year )
+TEMPLATES = {
+	CRABCONFIG_TEMPLATE: open( CRABCONFIG_TEMPLATE ).read(),
+	CMSRUNCONFIG: open( CMSRUNCONFIG ).read()
+}
 
+#measured job costs of the samples, see plan_splitting.py
+COSTS = plan_splitting.load_costs().get( plan_splitting.cost_key( "{}{}UL".format( option.finalState, option.year ), option.shifts ), {} ) if option.plan else {}
+
+def render( text, replacements ):
+	# same as the sed calls this replaces: plain strings, applied one after the other
+	for key, value in replacements:
+		text = text.replace( key, value )
+	return text
+
+def write_config( path, text ):
+	# only write configs whose content changed, compared by hash
+	digest = hashlib.md5( text.encode( "utf-8" ) ).hexdigest()
+	if os.path.exists( path ):
+		with open( path, "rb" ) as f:
+			if hashlib.md5( f.read() ).hexdigest() == digest: return False
+	with open( path, "w" ) as f:
+		f.write( text )
+	return True
 
+def create_crab_config( group, process, shifts ):
 	#folder to store submit logs
 	CRABSUBMIT_DIR      = "crab_submit_{}{}UL".format( option.finalState, option.year )
 
-	#the crab cfg template to copy from
-	CRABCONFIG_TEMPLATE = 'crab_config_template.py'
-
 	#crab request name
 	REQNAME             = option.finalState+option.year + "UL"
 
@@ -68,8 +92,10 @@ def create_crab_config( group, process, shifts ):
 	#eos out folder
 	OUTFOLDER           = "FWLJMET106XUL_{}{}UL_RunIISummer20".format( option.finalState, option.year ) if option.outfolder == "default" else option.outfolder
 	
-	ISMC = "True" if ( ( process not in samples.groups[ "DATAE" ].keys() ) and ( process not in samples.groups[ "DATAM" ].keys() ) and ( process not in samples.groups[ "DATAJ" ].keys() ) ) else "False"
-	UNITSPERJOB = "1" if ISMC == "True" else "25"
+	ISMC = "True" if plan_splitting.is_mc( samples, process ) else "False"
+	SPLITTING, UNITSPERJOB = plan_splitting.default_splitting( samples, group, process )
+	UNITSPERJOB = str( UNITSPERJOB )
+	MAXMEMORY = "4000"
  
 	SHIFTS = "True" if shifts else "False"
 	try: 
@@ -87,55 +113,83 @@ def create_crab_config( group, process, shifts ):
 	if group == "TEST":
 		OUTFOLDER += "_test"
 		MAXEVENTS = "10"
-		UNITSPERJOB = "1000"
 
-	if ISMC == "True" and ISTTBAR == "True":
-		UNITSPERJOB = "40"
+	#splitting from the measured job costs, plan_splitting.default_splitting() for samples without measurements
+	PLAN = plan_splitting.plan_job( COSTS[ process ], SPLITTING, option.targetTime, option.targetMemory ) if ( process in COSTS and group != "TEST" ) else None
+	if PLAN is not None:
+		SPLITTING, UNITSPERJOB, MAXMEMORY = PLAN[0], str( PLAN[1] ), str( PLAN[2] )
 	
 	filename = 'crab_config_shifts_{}.py'.format( process ) if ( shifts and ISMC == "True" ) else "crab_config_{}.py".format( process )
 	cmsRunname = 'runFWLJMet_shifts_{}.py'.format( process ) if ( shifts and ISMC == "True" )  else "runFWLJMet_{}.py".format( process )
 
-	#copy template file to new directory
-	os.system( 'cp -v {} {}/{}'.format( CRABCONFIG_TEMPLATE, CRABCONFIG_DIR, filename ) )
-	os.system( 'cp -v {} {}/{}'.format( CMSRUNCONFIG, CRABCONFIG_DIR, cmsRunname ) )
-
 	#replace strings in new crab file
-	os.system( "sed -i 's|CMSRUNCONFIG|{}/{}|g' {}/{}".format( CRABCONFIG_DIR, cmsRunname, CRABCONFIG_DIR, filename ) )
-	os.system( "sed -i 's|INPUT|{}|g' {}/{}".format( samples.groups[ group ][ process ], CRABCONFIG_DIR, filename ) )
-	os.system( "sed -i 's|REQNAME|{}|g' {}/{}".format( REQNAME, CRABCONFIG_DIR, filename ) )
-	os.system( "sed -i 's|OUTFOLDER|{}|g' {}/{}".format( OUTFOLDER, CRABCONFIG_DIR, filename ) )
-	os.system( "sed -i 's|LOGFOLDER|{}|g' {}/{}".format( process, CRABCONFIG_DIR, filename ) )
-	os.system( "sed -i 's|JSONFORDATA|{}|g' {}/{}".format( JSONDATA[option.year], CRABCONFIG_DIR, filename ) )
-	os.system( "sed -i 's|ISMC|{}|g' {}/{}".format( ISMC, CRABCONFIG_DIR, filename ) )
-	os.system( "sed -i 's|ISVLQSIGNAL|{}|g' {}/{}".format( ISVLQSIGNAL, CRABCONFIG_DIR, filename ) )
-	os.system( "sed -i 's|CRABSUBMITLOG|{}|g' {}/{}".format( CRABSUBMIT_DIR, CRABCONFIG_DIR, filename ) )
-	os.system( "sed -i 's|ISTTBAR|{}|g' {}/{}".format( ISTTBAR, CRABCONFIG_DIR, filename ) )
-	os.system( "sed -i 's|OUTPATH|{}|g' {}/{}".format( OUTPATH, CRABCONFIG_DIR, filename ) )
-	os.system( "sed -i 's|STORESITE|{}|g' {}/{}".format( STORESITE, CRABCONFIG_DIR, filename ) )
-	os.system( "sed -i 's|UNITSPERJOB|{}|g' {}/{}".format( UNITSPERJOB, CRABCONFIG_DIR, filename ) )
+	crabConfig = render( TEMPLATES[ CRABCONFIG_TEMPLATE ], [
+		( "CMSRUNCONFIG", "{}/{}".format( CRABCONFIG_DIR, cmsRunname ) ),
+		( "INPUT", samples.groups[ group ][ process ] ),
+		( "REQNAME", REQNAME ),
+		( "OUTFOLDER", OUTFOLDER ),
+		( "LOGFOLDER", process ),
+		( "JSONFORDATA", JSONDATA[option.year] ),
+		( "ISMC", ISMC ),
+		( "ISVLQSIGNAL", ISVLQSIGNAL ),
+		( "CRABSUBMITLOG", CRABSUBMIT_DIR ),
+		( "ISTTBAR", ISTTBAR ),
+		( "OUTPATH", OUTPATH ),
+		( "STORESITE", STORESITE ),
+		( "SPLITTING", SPLITTING ),
+		( "MAXMEMORY", MAXMEMORY ),
+		( "UNITSPERJOB", UNITSPERJOB )
+	] )
 
 	#replace strings in new cmsRun file
 	if ( ( "EGamma" in process ) or ( "Single" in process ) or ( "JetHT" in process ) ):
-		os.system( "sed -i 's|DATASET|{}|g' {}/{}".format( process, CRABCONFIG_DIR, cmsRunname ) )
+		DATASET = process
 	elif 'ext' in process:
 		extcode = process[ process.find("ext"): ]
-		os.system( "sed -i 's|DATASET|{}-{}|g' {}/{}".format( samples.groups[ group ][ process ].split("/")[1], extcode, CRABCONFIG_DIR, cmsRunname ) )
+		DATASET = "{}-{}".format( samples.groups[ group ][ process ].split("/")[1], extcode )
 	else:
-		os.system( "sed -i 's|DATASET|{}|g' {}/{}".format( samples.groups[ group ][ process ].split("/")[1], CRABCONFIG_DIR, cmsRunname ) )
-	os.system( "sed -i 's|ISMC|{}|g' {}/{}".format( ISMC, CRABCONFIG_DIR, cmsRunname ) )
-	os.system( "sed -i 's|ISVLQSIGNAL|{}|g' {}/{}".format( ISVLQSIGNAL, CRABCONFIG_DIR, cmsRunname ) )		
-	os.system( "sed -i 's|ISTTBAR|{}|g' {}/{}".format( ISTTBAR, CRABCONFIG_DIR, cmsRunname ) )
-	os.system( "sed -i 's|DOGENHT|{}|g' {}/{}".format( DOGENHT, CRABCONFIG_DIR, cmsRunname ) )
-	os.system( "sed -i 's|SHIFTS|{}|g' {}/{}".format( SHIFTS, CRABCONFIG_DIR, cmsRunname ) )
-        os.system( "sed -i 's|MAXEVENTS|{}|g' {}/{}".format( MAXEVENTS, CRABCONFIG_DIR, cmsRunname ) )
+		DATASET = samples.groups[ group ][ process ].split("/")[1]
+	cmsRunConfig = render( TEMPLATES[ CMSRUNCONFIG ], [
+		( "DATASET", DATASET ),
+		( "ISMC", ISMC ),
+		( "ISVLQSIGNAL", ISVLQSIGNAL ),
+		( "ISTTBAR", ISTTBAR ),
+		( "DOGENHT", DOGENHT ),
+		( "SHIFTS", SHIFTS ),
+		( "MAXEVENTS", MAXEVENTS )
+	] )
+
+	messages = [ "   + {} > {}".format( group, process ) ]
+	if PLAN is not None: messages.append( "     - {} {} per job, {} MB, about {:.0f} minutes".format( UNITSPERJOB, SPLITTING, MAXMEMORY, PLAN[3] ) )
+	for name, text in [ ( filename, crabConfig ), ( cmsRunname, cmsRunConfig ) ]:
+		if write_config( os.path.join( CRABCONFIG_DIR, name ), text ): messages.append( "     - wrote {}/{}".format( CRABCONFIG_DIR, name ) )
+		else: messages.append( "     - {}/{} unchanged".format( CRABCONFIG_DIR, name ) )
+	return messages
+
+def create_group_configs( group ):
+	messages = []
+	for process in samples.groups[ group ]:
+		messages += create_crab_config( group, process, option.shifts )
+	return messages
 
 if __name__=='__main__':
 	
-	os.system('mkdir -vp '+CRABCONFIG_DIR)
-        print( "[START] Creating CRAB configurations" )
+	if not os.path.exists( CRABCONFIG_DIR ): os.makedirs( CRABCONFIG_DIR )
+	print( "[START] Creating CRAB configurations" )
+	groups = []
 	for group in option.groups:
 		if group not in list( samples.groups.keys() ):
 			print( "[WARN] {} is not a valid group listed in 'sample_list_{}{}UL.py'. Skipping.".format( group, option.finalState, option.year ) )
 		else:
-			for process in samples.groups[ group ]:
-				create_crab_config( group, process, option.shifts )
+			groups.append( group )
+	# one worker per group, the configs of a group are written by the same process
+	if option.jobs > 1 and len( groups ) > 1:
+		pool = multiprocessing.Pool( min( option.jobs, len( groups ) ) )
+		results = pool.map( create_group_configs, groups )
+		pool.close()
+		pool.join()
+	else:
+		results = [ create_group_configs( group ) for group in groups ]
+	for messages in results:
+		for message in messages: print( message )
+	print( "[DONE] Created CRAB configurations in {}".format( CRABCONFIG_DIR ) )
@@ -0,0 +1,195 @@
+import os, re, glob, json, math, time, tarfile, argparse, imp
+import xml.etree.ElementTree as ET
+
+# per-sample job costs, measured in earlier campaigns
+COSTS_FILE = "job_costs.json"
+
+# crab splitting modes and the job report counter of their units
+UNITS = { "LumiBased": "lumis", "FileBased": "files", "EventAwareLumiBased": "events" }
+
+def in_groups( samples, process, groups ):
+  # groups missing from a sample list count as empty
+  return any( process in samples.groups.get( group, {} ) for group in groups )
+
+def is_mc( samples, process ):
+  return not in_groups( samples, process, [ "DATAE", "DATAM", "DATAJ" ] )
+
+def default_splitting( samples, group, process ):
+  # splitting and unitsPerJob of a sample without measured job costs
+  ismc = is_mc( samples, process )
+  if ismc and in_groups( samples, process, [ "VLQ" ] ): return "LumiBased", 2
+  if ismc and in_groups( samples, process, [ "TTBAR", "TTMT", "TTBAR_SHIFTS" ] ): return "LumiBased", 40
+  if group == "TEST": return ( "FileBased" if ismc else "LumiBased" ), 1000
+  return ( "FileBased", 1 ) if ismc else ( "LumiBased", 25 )
+
+def cost_key( postfix, shifts ):
+  # postfix of the sample list, e.g. singleLep2017UL
+  return "{}{}".format( postfix, "_shifts" if shifts else "" )
+
+def load_costs( path = COSTS_FILE ):
+  if not os.path.exists( path ): return {}
+  with open( path ) as f:
+    return json.load( f )
+
+def save_costs( costs, path = COSTS_FILE ):
+  with open( path + ".tmp", "w" ) as f:
+    json.dump( costs, f, indent = 2, sort_keys = True )
+  os.rename( path + ".tmp", path )
+
+def read_fjr( text ):
+  # events, lumis, files and timing of one cmsRun framework job report
+  root = ET.fromstring( text )
+  report = { "jobs": 1, "events": 0, "lumis": 0, "files": 0, "time": 0., "init": 0., "rss": 0., "read_mb": 0. }
+  for input_file in root.findall( "InputFile" ):
+    report[ "files" ] += 1
+    report[ "events" ] += int( input_file.findtext( "EventsRead", "0" ) )
+    report[ "lumis" ] += len( input_file.findall( "Runs/Run/LumiSection" ) )
+  metrics = {}
+  for metric in root.findall( "PerformanceReport/PerformanceSummary/Metric" ):
+    try: metrics[ metric.get( "Name" ) ] = float( metric.get( "Value" ) )
+    except ( TypeError, ValueError ): pass
+  report[ "init" ] = metrics.get( "TotalInitTime", 0. )
+  report[ "time" ] = metrics.get( "TotalJobTime", 0. ) - report[ "init" ]
+  report[ "rss" ] = metrics.get( "PeakValueRss", 0. )
+  report[ "read_mb" ] = sum( value for name, value in metrics.items() if name.endswith( "-read-totalMegabytes" ) )
+  return report
+
+def read_dryrun( text ):
+  # estimate printed by crab submit --dryrun, the last one if the log has several
+  splittings = re.findall( r"Using (\w+) splitting", text )
+  tasks = re.findall( r"Task consists of (\d+) jobs to process (\d+) (\w+)", text )
+  averages = re.findall( r"The average job will process (\d+) (\w+), with an estimated processing time of (\d+) minutes", text )
+  memories = re.findall( r"The estimated memory requirement is (\d+) MB", text )
+  if not splittings or not averages: return None
+  units, unit_name, minutes = averages[-1]
+  if int( units ) == 0: return None
+  return {
+    "splitting": splittings[-1],
+    "units": int( units ),
+    "seconds": 60. * int( minutes ),
+    "memory": float( memories[-1] ) if memories else 0.,
+    "jobs": int( tasks[-1][0] ) if tasks else 0,
+    "total_units": int( tasks[-1][1] ) if tasks else 0,
+    "time": time.strftime( "%Y-%m-%d %H:%M:%S" )
+  }
+
+def sample_cost( record ):
+  # what is known about a sample: events/s, peak RSS (MB), output MB/event and seconds per splitting unit,
+  # None where nothing was measured; the job reports take precedence over the dry run estimate
+  cost = { "events_per_s": None, "rss": None, "output_mb_per_event": None, "seconds_per_unit": {}, "task_hours": None }
+  dryrun = record.get( "dryrun" )
+  if dryrun is not None:
+    cost[ "rss" ] = dryrun[ "memory" ]
+    cost[ "seconds_per_unit" ][ dryrun[ "splitting" ] ] = dryrun[ "seconds" ] / dryrun[ "units" ]
+    if dryrun.get( "total_units" ): cost[ "task_hours" ] = dryrun[ "seconds" ] / dryrun[ "units" ] * dryrun[ "total_units" ] / 3600.
+  fjr = record.get( "fjr" )
+  if fjr is not None:
+    rate = fjr[ "events" ] / fjr[ "time" ]
+    cost[ "events_per_s" ] = rate
+    cost[ "rss" ] = fjr[ "rss" ]
+    for mode, counter in UNITS.items():
+      if fjr[ counter ] > 0: cost[ "seconds_per_unit" ][ mode ] = float( fjr[ "events" ] ) / fjr[ counter ] / rate
+    if fjr.get( "output_events", 0 ) > 0: cost[ "output_mb_per_event" ] = fjr[ "output_mb" ] / fjr[ "output_events" ]
+  return cost
+
+def job_number( path ):
+  # FrameworkJobReport-N.xml, cmsRun_N.log.tar.gz, <output>_N.root
+  match = re.search( r"[-_](\d+)(\.log\.tar\.gz|\.xml|\.root)$", os.path.basename( path ) )
+  return int( match.group(1) ) if match else None
+
+def harvest_task( task_dir ):
+  # job reports from crab getlog (results/cmsRun_N.log.tar.gz), the output files from crab getoutput
+  # (results/*_N.root) and the dry run estimate in crab.log
+  record = {}
+  reports = []
+  for path in glob.glob( os.path.join( task_dir, "results", "*.xml" ) ):
+    with open( path ) as f:
+      reports.append( ( job_number( path ), f.read() ) )
+  for path in glob.glob( os.path.join( task_dir, "results", "*.tar.gz" ) ):
+    try:
+      with tarfile.open( path ) as archive:
+        for member in archive.getmembers():
+          if os.path.basename( member.name ).startswith( "FrameworkJobReport" ): reports.append( ( job_number( path ), archive.extractfile( member ).read() ) )
+    except ( tarfile.TarError, IOError ):
+      print( "[WARN] Can not read {}".format( path ) )
+  outputs = {}
+  for path in glob.glob( os.path.join( task_dir, "results", "*.root" ) ):
+    number = job_number( path )
+    if number is not None: outputs[ number ] = outputs.get( number, 0. ) + os.path.getsize( path ) / 1024. / 1024.
+  fjr = None
+  for number, text in reports:
+    try: report = read_fjr( text )
+    except ET.ParseError: continue
+    if report[ "events" ] == 0 or report[ "time" ] <= 0: continue
+    # output size only for the jobs whose output was retrieved
+    report[ "output_mb" ] = outputs.get( number, 0. )
+    report[ "output_events" ] = report[ "events" ] if number in outputs else 0
+    if fjr is None: fjr = report
+    else:
+      for name in report:
+        fjr[ name ] = max( fjr[ name ], report[ name ] ) if name == "rss" else fjr[ name ] + report[ name ]
+  if fjr is not None: record[ "fjr" ] = fjr
+  if os.path.exists( os.path.join( task_dir, "crab.log" ) ):
+    with open( os.path.join( task_dir, "crab.log" ) ) as f:
+      dryrun = read_dryrun( f.read() )
+    if dryrun is not None: record[ "dryrun" ] = dryrun
+  return record
+
+def plan_job( record, splitting, targetTime, targetMemory ):
+  # splitting, units per job, memory (MB) and expected minutes per job for a target wall time (minutes),
+  # None without usable measurements
+  cost = sample_cost( record )
+  per_unit = cost[ "seconds_per_unit" ]
+  if not per_unit: return None
+  init = record[ "fjr" ][ "init" ] / record[ "fjr" ][ "jobs" ] if "fjr" in record else 0.
+  # files too large for one job, go by lumi sections
+  if splitting == "FileBased" and per_unit.get( "FileBased", 0 ) > 60. * targetTime - init and "LumiBased" in per_unit: splitting = "LumiBased"
+  # a dry run only knows the splitting it ran with
+  if splitting not in per_unit: splitting = list( per_unit.keys() )[0]
+  seconds = per_unit[ splitting ]
+  rss = cost[ "rss" ]
+  units = max( 1, int( ( 60. * targetTime - init ) // seconds ) )
+  memory = min( targetMemory, max( 2000, 100 * int( math.ceil( 1.2 * rss / 100. ) ) ) )
+  return splitting, units, memory, ( init + units * seconds ) / 60.
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser( description = "Measure the job costs of finished or dry-run CRAB tasks and plan the splitting" )
+  parser.add_argument( "-f", "--finalState", required = True, help = "singleLep" )
+  parser.add_argument( "-y", "--year", required = True, help = "2016APV,2016,2017,2018" )
+  parser.add_argument( "-g", "--groups", nargs = "+", required = True, help = "See sample_list_*UL.py" )
+  parser.add_argument( "-l", "--logs", default = None, help = "CRAB log directory, default logs_[FINALSTATE][YEAR]UL" )
+  parser.add_argument( "--shifts", action = "store_true", help = "The tasks ran the JEC/JER shifts" )
+  parser.add_argument( "--targetTime", type = float, default = 480., help = "Target wall time per job in minutes" )
+  parser.add_argument( "--targetMemory", type = int, default = 4000, help = "Maximum memory per job in MB" )
+  option = parser.parse_args()
+
+  sampleListPath = "sample_list_{}{}UL.py".format( option.finalState, option.year )
+  samples = imp.load_source( "Sample", sampleListPath, open( sampleListPath, "r" ) )
+  logs = option.logs if option.logs is not None else "logs_{}{}UL".format( option.finalState, option.year )
+
+  print( "[START] Harvesting job costs from {}".format( logs ) )
+  costs = load_costs()
+  key = cost_key( "{}{}UL".format( option.finalState, option.year ), option.shifts )
+  costs.setdefault( key, {} )
+  for group in option.groups:
+    if group not in list( samples.groups.keys() ):
+      print( "[WARN] {} is not a valid group listed in '{}'. Skipping.".format( group, sampleListPath ) )
+      continue
+    print( ">> {}".format( group ) )
+    print( "   {:<28} {:>9} {:>10} {:>8}   {:<12} {:>6} {:>8} {:>8}".format( "process", "events/s", "out MB/ev", "RSS MB", "splitting", "units", "minutes", "memory" ) )
+    for process in samples.groups[ group ]:
+      record = harvest_task( os.path.join( logs, "crab_{}".format( process ) ) )
+      if record: costs[ key ].setdefault( process, {} ).update( record )
+      record = costs[ key ].get( process, {} )
+      plan = plan_job( record, default_splitting( samples, group, process )[0], option.targetTime, option.targetMemory )
+      if plan is None:
+        print( "   {:<28} no measurement".format( process ) )
+        continue
+      cost = sample_cost( record )
+      rate = "{:.2f}".format( cost[ "events_per_s" ] ) if cost[ "events_per_s" ] is not None else "-"
+      output = "{:.4f}".format( cost[ "output_mb_per_event" ] ) if cost[ "output_mb_per_event" ] is not None else "-"
+      rss = cost[ "rss" ]
+      print( "   {:<28} {:>9} {:>10} {:>8.0f}   {:<12} {:>6} {:>8.0f} {:>8}".format( process, rate, output, rss, plan[0], plan[1], plan[3], plan[2] ) )
+      if 1.2 * rss > option.targetMemory: print( "   [WARN] {} needs more than {} MB".format( process, option.targetMemory ) )
+  save_costs( costs )
+  print( "[DONE] Saved the job costs in {}, use create_configs.py --plan to apply them".format( COSTS_FILE ) )
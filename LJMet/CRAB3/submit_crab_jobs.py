@@ -1,11 +1,19 @@
-import os, argparse, imp
+import os, argparse, imp, json, time, shutil, subprocess, threading
+from multiprocessing.pool import ThreadPool
+import plan_splitting
 
 parser = argparse.ArgumentParser()
 parser.add_argument( "-f", "--folder", required = True, help = "singleLep,doubleLep,multiLep" )
 parser.add_argument( "-g", "--groups", nargs = "+", required = True )
 parser.add_argument( "--shifts", action = "store_true", help = "Run the JEC/JER shifts" )
-parser.add_argument( "--dryrun", action = "store_true", help = "Obtain job time estimate" )
+parser.add_argument( "--dryrun", action = "store_true", help = "Obtain job time estimate, stored in {}".format( plan_splitting.COSTS_FILE ) )
 parser.add_argument( "--override", action = "store_true", help = "Override existing CRAB logs." )
+parser.add_argument( "-j", "--jobs", type = int, default = 4, help = "Number of concurrent submissions" )
+parser.add_argument( "--interval", type = float, default = 2., help = "Minimum time in seconds between two submissions" )
+parser.add_argument( "--retries", type = int, default = 3, help = "Retries of a failed submission" )
+parser.add_argument( "--backoff", type = float, default = 30., help = "Delay in seconds before the first retry, doubled for each following one" )
+parser.add_argument( "--crab", default = "crab", help = "CRAB client executable" )
+parser.add_argument( "--verbose", action = "store_true", help = "Print the CRAB output of every submission" )
 option = parser.parse_args()
 
 #Sample list file
@@ -15,48 +23,134 @@ samples = imp.load_source( "Sample", sampleListPath, open(sampleListPath,"r") )
 
 home = os.environ['HOME']
 CRABCONFIG_DIR = option.folder
+LOG_DIR = "logs_{}".format( postfix )
+LEDGER = os.path.join( LOG_DIR, "submitted.json" )
+COST_KEY = plan_splitting.cost_key( postfix, option.shifts )
 
-def submit_crab_job( group, process, shifts, failed_submissions ):
-  if shifts and ( process not in samples.groups[ "DATAE" ].keys() and process not in samples.groups[ "DATAM" ].keys() and process not in samples.groups[ "DATAJ" ].keys() ):
-    crab_cfg = os.path.join( CRABCONFIG_DIR, "crab_config_shifts_{}.py".format( process ) )
-    print( "   + {}: {} (shifts)".format( process, samples.groups[ group ][ process ].split("/")[1] ) )
-  else:
-    crab_cfg = os.path.join( CRABCONFIG_DIR, "crab_config_{}.py".format( process ) )
-    print( "   + {}: {}".format( process, samples.groups[ group ][ process ].split("/")[1] ) )
-  if option.dryrun:
-    if option.override:
-      try: os.system( "crab kill {}".format( crab_cfg ) )
-      except: pass
-      os.system( "rm -vrf logs_{}/crab_{}".format( postfix, process ) )
-    try: 
-      os.system( "crab submit --dryrun {}".format( crab_cfg ) )
-    except:
-      pass
-  else:
-    if option.override:
-      try: os.system( "crab kill {}".format( crab_cfg ) )
-      except: pass
-      os.system( "rm -vrf logs_{}/crab_{}".format( postfix, process ) )
-    try: 
-      os.system( "crab submit {}".format( crab_cfg ) )
-    except:
-      failed_submissions.append( process )
+# crab errors that a retry does not fix
+PERMANENT_ERRORS = [ "already exists", "Invalid CRAB configuration", "Syntax error", "SyntaxError" ]
+
+lock = threading.Lock()
+next_submission = [ 0. ]
+
+def load_ledger():
+  if not os.path.exists( LEDGER ): return {}
+  with open( LEDGER ) as f:
+    return json.load( f )
+
+def save_ledger( ledger ):
+  # write and rename, an interrupted run does not leave a broken ledger
+  if not os.path.exists( LOG_DIR ): os.makedirs( LOG_DIR )
+  with open( LEDGER + ".tmp", "w" ) as f:
+    json.dump( ledger, f, indent = 2, sort_keys = True )
+  os.rename( LEDGER + ".tmp", LEDGER )
+
+def wait_turn():
+  # submissions start at least option.interval apart, whatever the number of workers
+  with lock:
+    now = time.time()
+    start = max( now, next_submission[0] )
+    next_submission[0] = start + option.interval
+  if start > now: time.sleep( start - now )
+
+def run_crab( args ):
+  try:
+    proc = subprocess.Popen( [ option.crab ] + args, stdout = subprocess.PIPE, stderr = subprocess.STDOUT, universal_newlines = True )
+  except OSError as e:
+    return 127, str( e )
+  output = proc.communicate()[0]
+  return proc.returncode, output
+
+def save_estimate( process, output, messages ):
+  # the dry run estimate goes to the job cost database, for create_configs.py --plan
+  estimate = plan_splitting.read_dryrun( output )
+  if estimate is None:
+    messages.append( "     [WARN] no estimate found in the crab output" )
+    return
+  messages.append( "     - {} {} per job in about {:.0f} minutes, {:.0f} MB, {} jobs".format( estimate[ "units" ], estimate[ "splitting" ], estimate[ "seconds" ] / 60., estimate[ "memory" ], estimate[ "jobs" ] ) )
+  with lock:
+    costs = plan_splitting.load_costs()
+    costs.setdefault( COST_KEY, {} ).setdefault( process, {} )[ "dryrun" ] = estimate
+    plan_splitting.save_costs( costs )
+
+def submit_crab_job( task ):
+  process, crab_cfg, label, ledger = task
+  task_dir = os.path.join( LOG_DIR, "crab_{}".format( process ) )
+  messages = []
+  if not os.path.exists( crab_cfg ):
+    return process, False, [ "   - {}: {} does not exist".format( process, crab_cfg ) ]
+  if option.override:
+    wait_turn()
+    run_crab( [ "kill", task_dir ] )
+    if os.path.exists( task_dir ):
+      shutil.rmtree( task_dir )
+      messages.append( "   + {}: removed {}".format( process, task_dir ) )
+    with lock:
+      if ledger.pop( "crab_{}".format( process ), None ) is not None: save_ledger( ledger )
+  args = [ "submit", "--dryrun", crab_cfg ] if option.dryrun else [ "submit", crab_cfg ]
+  delay = option.backoff
+  for attempt in range( option.retries + 1 ):
+    wait_turn()
+    code, output = run_crab( args )
+    if option.verbose: messages.append( output.rstrip() )
+    if code == 0:
+      messages.append( "   + {}: {}{}".format( process, label, " (dry run)" if option.dryrun else "" ) )
+      if option.dryrun:
+        save_estimate( process, output, messages )
+      else:
+        with lock:
+          ledger[ "crab_{}".format( process ) ] = { "config": crab_cfg, "time": time.strftime( "%Y-%m-%d %H:%M:%S" ) }
+          save_ledger( ledger )
+      return process, True, messages
+    permanent = code == 127 or any( error in output for error in PERMANENT_ERRORS )
+    if permanent or attempt == option.retries:
+      if not option.verbose: messages.append( output.rstrip() )
+      messages.append( "   - {}: {} failed with exit code {}".format( process, label, code ) )
+      return process, False, messages
+    with lock:
+      print( "   ~ {}: submission failed with exit code {}, retrying in {:.0f} s".format( process, code, delay ) )
+    time.sleep( delay )
+    delay *= 2
 
 if __name__ == '__main__':
   print( "[START] Submitting CRAB3 jobs" )
-  count = 0
-  failed_submissions = []
+  ledger = load_ledger()
+  tasks = []
+  queued = set()
+  skipped = 0
   for group in option.groups:
-    print( ">> Submitting jobs for {}".format( group ) )
     if group not in list( samples.groups.keys() ):
-      print( "[WARN] {} is not a valid group listed in 'sample_list_{}{}UL.py'. Skipping.".format( group, option.finalState, option.year ) )
-    else:
-      for process in samples.groups[ group ]:
-        submit_crab_job( group, process, option.shifts, failed_submissions )
-        count += 1
+      print( "[WARN] {} is not a valid group listed in '{}'. Skipping.".format( group, sampleListPath ) )
+      continue
+    for process in samples.groups[ group ]:
+      if process in queued: continue
+      queued.add( process )
+      if option.shifts and ( process not in samples.groups[ "DATAE" ].keys() and process not in samples.groups[ "DATAM" ].keys() and process not in samples.groups[ "DATAJ" ].keys() ):
+        crab_cfg = os.path.join( CRABCONFIG_DIR, "crab_config_shifts_{}.py".format( process ) )
+        label = "{} (shifts)".format( samples.groups[ group ][ process ].split("/")[1] )
+      else:
+        crab_cfg = os.path.join( CRABCONFIG_DIR, "crab_config_{}.py".format( process ) )
+        label = samples.groups[ group ][ process ].split("/")[1]
+      if not option.dryrun and not option.override and "crab_{}".format( process ) in ledger:
+        print( "   = {}: already submitted on {}, skipping (use --override to resubmit)".format( process, ledger[ "crab_{}".format( process ) ][ "time" ] ) )
+        skipped += 1
+        continue
+      tasks.append( ( process, crab_cfg, label, ledger ) )
+
+  print( ">> Submitting {} jobs, {} at a time".format( len( tasks ), option.jobs ) )
+  count = 0
+  failed_submissions = []
+  pool = ThreadPool( max( option.jobs, 1 ) )
+  for process, success, messages in pool.imap_unordered( submit_crab_job, tasks ):
+    with lock:
+      for message in messages: print( message )
+    if success: count += 1
+    else: failed_submissions.append( process )
+  pool.close()
+  pool.join()
+
   if len( failed_submissions ) > 0:
     print( "[WARN] {} submissions failed, please check the naming or availability on GrASP or DAS:".format( len( failed_submissions ) ) )
     for submission in failed_submissions:
       print( "   - {}".format( submission ) )
-  print( "[DONE] Submitted {} CRAB jobs.".format( count ) )
-
+  print( "[DONE] Submitted {} CRAB jobs, skipped {} already submitted.".format( count, skipped ) )
@@ -9,6 +9,7 @@
 
 #include <iostream>
 #include <vector>
+#include <mutex>
 
 #include "FWCore/ParameterSet/interface/ProcessDesc.h"
 #include "FWCore/PythonParameterSet/interface/PyBind11ProcessDesc.h"
@@ -16,9 +17,10 @@
 #include "FWCore/Framework/interface/Event.h"
 #include "FWCore/Framework/interface/ConsumesCollector.h"
 
+#include "FWLJMET/LJMet/interface/LjmetEventContent.h"
+
 
 class BaseEventSelector;
-class LjmetEventContent;
 
 namespace edm {
     class EventBase;
@@ -41,6 +43,11 @@ public:
     virtual int AnalyzeEvent(edm::Event const & event, BaseEventSelector * selector) { return 0; }
     virtual int EndJob() { return 0; }
     
+    /// Jet/MET systematic of the current pass in the single-pass shift mode
+    /// (1 JECup, 2 JECdown, 3 JERup, 4 JERdown), -1 for the nominal pass
+    int GetShift() { return mShift; }
+    bool IsShiftPass() { return mShift >= 0; }
+    
     std::string mName;
     std::string mLegend;
     
@@ -56,6 +63,52 @@ public:
     void SetValue(std::string name, std::vector<int> value);
     void SetValue(std::string name, std::vector<double> value);
     void SetValue(std::string name, std::vector<std::string> value);
+    
+    /// Per-file information, written once next to the tree (see LjmetEventContent::SetMetadata)
+    void SetMetadata(std::string name, std::vector<std::string> value) { mpEc->SetMetadata(name + "_" + mName, std::move(value)); }
+    bool HasMetadata(std::string name) { return mpEc->HasMetadata(name + "_" + mName); }
+    
+    /// False if the branch is dropped from the output (drop_branches), so computing it can be skipped
+    bool IsBranchKept(std::string name) { return mpEc->IsBranchKept(name + "_" + mName); }
+    
+    /// Parallel mode (parallelCalcs): calling this in BeginJob lets the factory run the calculator concurrently
+    /// with the others it does not conflict with. Reading the event and the selector's products and writing
+    /// the calculator's own branches are implied; reads lists what else it uses (another calculator's name for
+    /// its branches, or a shared resource), writes the shared resources it modifies. Calculators that declare
+    /// nothing always run alone, in the include_calcs order. Only branch values and metadata are merged back,
+    /// a calculator filling histograms must not declare.
+    void DeclareDependencies(std::vector<std::string> reads, std::vector<std::string> writes)
+    {
+        mbDeclared = true;
+        mvReads = reads;
+        mvWrites = writes;
+    }
+    bool IsDeclared() const { return mbDeclared; }
+    /// True if this and other can not run at the same time
+    bool ConflictsWith(BaseCalc const & other) const;
+    
+    /// edm::Event::getByToken for calculators that run concurrently, the event records the gets
+    /// in a container that is not thread safe
+    template <typename T>
+    bool GetByToken(edm::Event const & event, edm::EDGetTokenT<T> const & token, edm::Handle<T> & handle)
+    {
+        std::lock_guard<std::mutex> _lock(eventMutex());
+        return event.getByToken(token, handle);
+    }
+    
+    /// Register a branch once (in BeginJob), the handle then replaces the name in SetValue:
+    ///     hNJets = RegisterBranch<int>("nJets");   ...   SetValue(hNJets, n);
+    /// Vectors can be moved (SetValue(h, std::move(v))), swapped or filled in place (GetBuffer(h))
+    template <typename T>
+    LjmetBranchHandle<T> RegisterBranch(std::string name) { return LjmetEventContent::RegisterBranch<T>(name + "_" + mName); }
+    template <typename T>
+    void SetValue(LjmetBranchHandle<T> handle, typename LjmetBranchHandle<T>::value_type const & value) { mpEc->SetValue(handle, value); }
+    template <typename T>
+    void SetValue(LjmetBranchHandle<T> handle, typename LjmetBranchHandle<T>::value_type && value) { mpEc->SetValue(handle, std::move(value)); }
+    template <typename T>
+    void SwapValue(LjmetBranchHandle<T> handle, T & value) { mpEc->SwapValue(handle, value); }
+    template <typename T>
+    T & GetBuffer(LjmetBranchHandle<T> handle) { return mpEc->GetBuffer(handle); }
 
 protected:
     edm::ParameterSet mPset;
@@ -66,7 +119,17 @@ private:
     void setName(std::string name) { mName = name; }
     void SetEventContent(LjmetEventContent * pEc) { mpEc = pEc; }
     void SetPSet(edm::ParameterSet pset) { mPset = pset; }
+    void SetShift(int syst) { mShift = syst; }
     LjmetEventContent * mpEc;
+    int mShift;
+    bool mbDeclared;
+    std::vector<std::string> mvReads;
+    std::vector<std::string> mvWrites;
+    static std::mutex & eventMutex()
+    {
+        static std::mutex _mutex;
+        return _mutex;
+    }
 };
 
 #endif
@@ -51,6 +51,15 @@ public:
     virtual void AnalyzeEvent( edm::EventBase const & event, LjmetEventContent & ec ) { }
     std::string GetName() { return mName; }
 
+    /// Single-pass shift mode: jet/MET systematic to apply in SelectShift()
+    /// (1 JECup, 2 JECdown, 3 JERup, 4 JERdown), -1 to use the JEC/JER bools from the config
+    void SetShift(int syst) { mShift = syst; }
+    int GetShift() { return mShift; }
+
+    /// Single-pass shift mode: redo only the jet/MET dependent part of the last operator() call
+    /// for the systematic set with SetShift(). Selectors that do not support it exit.
+    virtual bool SelectShift( edm::Event const & event, pat::strbitset & ret );
+
     // -----------------------------------------------------------------------------------------------------------------------------------------
     // Note: below probably needs to be recoded so it can be written in individual Selectors, but still accessible to different calculators -start
     // -----------------------------------------------------------------------------------------------------------------------------------------
@@ -100,10 +109,17 @@ public:
     void Init( void );
     void SetEventContent(LjmetEventContent * pEc) { mpEc = pEc; }
 
-    /// Declare a new histogram to be created for the module
-    void SetHistogram(std::string name, int nbins, double low, double high) { mpEc->SetHistogram(mName, name, nbins, low, high); }
+    /// Declare a new histogram to be created for the module, keep the handle to fill it without a lookup
+    LjmetHistHandle SetHistogram(std::string name, int nbins, double low, double high) { return mpEc->SetHistogram(mName, name, nbins, low, high); }
     void SetHistValue(std::string name, double value) { mpEc->SetHistValue(mName, name, value); }
     void FillHist(std::string name, double value) { mpEc->FillHist(mName, name, value); }
+    void FillHist(LjmetHistHandle handle, double value) { mpEc->FillHist(handle, value); }
+
+    /// Cut flow recorded from the selection result in one go: declares a cut flow histogram histname
+    /// that FillCutFlow() fills when all of the given cuts passed. Steps are checked in the order they
+    /// are added and filling stops at the first step that failed.
+    void AddCutFlowStep(std::string histname, std::vector<std::string> const & cuts);
+    void FillCutFlow(pat::strbitset const & ret, double value = 1);
 
 
 protected:
@@ -152,6 +168,13 @@ protected:
     std::string mName;
     std::string mLegend;
     bool mbIsMc;
+    int mShift;
+
+    /// Events before any selection, declared in Init()
+    LjmetHistHandle mhNEvents;
+
+    /// Cut flow steps: histogram and the cuts it requires
+    std::vector<std::pair<LjmetHistHandle, std::vector<index_type>>> mvCutFlowSteps;
 
 private:
     LjmetEventContent * mpEc;
@@ -57,6 +57,7 @@ Requires MiniAOD inputs to access proper set of information
 // lwtnn
 #include "lwtnn/lwtnn/interface/LightweightNeuralNetwork.hh"
 #include "lwtnn/lwtnn/interface/parse_json.hh"
+#include "lwtnn/lwtnn/interface/Stack.hh"
 
 
 #include "FWCore/ParameterSet/interface/FileInPath.h"
@@ -85,11 +86,11 @@ public:
 
     void getJetValues( const pat::Jet& jet );
 
-    void pboost( TVector3 pbeam, TVector3 plab, TLorentzVector &pboo );
+    void pboost( TVector3 pbeam, TVector3 plab, TLorentzVector &pboo ) const;
 
-    void FWMoments( std::vector<TLorentzVector> particles, double (&outputs)[5] );
+    void FWMoments( const fastjet::PseudoJet * particles, size_t numParticles, double (&outputs)[5] ) const;
 
-    float LegP(float x, int order);
+    float LegP(float x, int order) const;
 
     unsigned int getParticleID();
 
@@ -108,6 +109,31 @@ public:
     std::map<std::string,double> m_BESTvars;
     std::map<std::string,double> m_NNresults;
 
+    // batched evaluation: the BEST inputs of all jets of the event are kept in flat buffers,
+    // one row of kNBESTVars values per jet, instead of a string map per jet
+    enum BESTFrame { fTop, fW, fZ, fH, fJet, fLab, kNFrames };  // rest frames, jet rest frame, lab frame
+    enum BESTVar { vbDisc, vbDisc1, vbDisc2, vet, veta, vmass, vSDmass, vtau32, vtau21, vq, vNjets_orig, kNJetVars };
+    enum BESTFrameVar { vm1234, vm12, vm23, vm13, vsumPz, vsumP, vpzOverp, vNjets,
+                        vFWmoment1, vFWmoment2, vFWmoment3, vFWmoment4,
+                        visotropy, vsphericity, vaplanarity, vthrust, kNFrameVars };
+    static const unsigned int kNBESTVars = kNJetVars + fLab * kNFrameVars;  // the lab frame only has Njets_orig
+    static unsigned int varIndex( unsigned int var, unsigned int frame ) { return kNJetVars + frame * kNFrameVars + var; }
+
+    std::vector<std::string> m_varNames;       // name of each row entry, empty if it is not computed
+    std::vector<unsigned int> m_inputIndex;    // row entry of each network input
+    std::vector<double> m_inputOffsets;        // network input preprocessing
+    std::vector<double> m_inputScales;
+    std::unique_ptr<lwt::Stack> m_stack;       // network of m_lwtnn, evaluated on the preprocessed input vector
+
+    std::vector<fastjet::PseudoJet> m_FJparticles[kNFrames];  // constituents of all jets, per frame
+    std::vector<size_t> m_jetOffsets;                         // jet i has the constituents [m_jetOffsets[i], m_jetOffsets[i+1])
+    std::vector<double> m_values;                             // BEST inputs, jet i at i*kNBESTVars
+    std::vector<double> m_NNoutputs;                          // network outputs, jet i at i*m_lwtnn outputs
+
+    void fillConstituents( const pat::Jet& jet, double * values );
+    void fillFrameValues( unsigned int ijet, unsigned int frame, double * values ) const;
+    void computeJetValues( const std::vector<const pat::Jet *> & jets );
+
     std::string m_dnnFile;
 
     std::map<std::string,std::string> m_configurations; // map of configurations
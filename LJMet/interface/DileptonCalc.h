@@ -43,6 +43,7 @@
 #include "LHAPDF/PDFInfo.h"
 #include "LHAPDF/PDFSet.h"
 #include "LHAPDF/Factories.h"
+#include "FWLJMET/LJMet/interface/LHAPDFCache.h"
 
 using std::cout;
 using std::endl;
@@ -108,6 +109,8 @@ private:
     bool orlhew;
     std::string basePDFname;
     std::string newPDFname;
+    LHAPDFCache * pdfCache;
+    LHAPDFCache localPdfCache;
 
 
     edm::EDGetTokenT<edm::TriggerResults>                    triggersToken;
@@ -38,6 +38,7 @@
 #include "FWCore/Common/interface/TriggerNames.h"
 
 #include "FWLJMET/LJMet/interface/MiniIsolation.h"
+#include "FWLJMET/LJMet/interface/TriggerPathMatcher.h"
 
 #include "PhysicsTools/SelectorUtils/interface/PFJetIDSelectionFunctor.h"
 #include "PhysicsTools/SelectorUtils/interface/PFMuonSelector.h"
@@ -95,6 +96,9 @@ private:
     std::vector<std::string> trigger_path_ee;
     std::vector<std::string> trigger_path_em;
     std::vector<std::string> trigger_path_mm;
+    TriggerPathMatcher       trigMatch_ee;
+    TriggerPathMatcher       trigMatch_em;
+    TriggerPathMatcher       trigMatch_mm;
 
     //PV
     bool pv_cut;
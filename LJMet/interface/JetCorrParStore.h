@@ -0,0 +1,62 @@
+#ifndef FWLJMET_LJMet_interface_JetCorrParStore_h
+#define FWLJMET_LJMet_interface_JetCorrParStore_h
+
+/*
+ Process-wide store of parsed JEC/JER parameter files.
+
+ Every JetMETCorrHelper (selector and calculators, in every LJMet module) used to parse all L1/L2/L3/residual
+ files of every era, plus the JER and uncertainty files, on its own. The store parses each file once per process
+ and hands out the shared, read-only result. Objects with per-call state (FactorizedJetCorrector,
+ JetCorrectionUncertainty) are still built per helper, from the shared parameters.
+
+ Optionally the parsed JetCorrectorParameters are also written as binary snapshots (CondFormats serialization,
+ the format used for conditions payloads) to a cache directory, and later jobs load the snapshot instead of
+ parsing the text file. A snapshot older than its text file is rewritten. Enable it with the helper parameter
+
+     JECParCacheDir = cms.string('jecparcache')
+
+*/
+
+#include <iostream>
+#include <map>
+#include <memory>
+#include <mutex>
+#include <string>
+
+#include "CondFormats/JetMETObjects/interface/JetCorrectorParameters.h"
+#include "JetMETCorrections/Modules/interface/JetResolution.h"
+
+
+class JetCorrParStore {
+
+public:
+
+    static JetCorrParStore & Instance();
+
+    /// Directory for the binary snapshots, empty to disable them
+    void SetCacheDir(std::string const & dir);
+
+    std::shared_ptr<JetCorrectorParameters const> GetParameters(std::string const & txtfile);
+    JME::JetResolution GetResolution(std::string const & txtfile);
+    JME::JetResolutionScaleFactor GetResolutionScaleFactor(std::string const & txtfile);
+
+private:
+
+    JetCorrParStore();
+    JetCorrParStore(const JetCorrParStore &); // stop default
+
+    std::string snapshotName(std::string const & txtfile);
+    bool readSnapshot(std::string const & txtfile, JetCorrectorParameters & par);
+    void writeSnapshot(std::string const & txtfile, JetCorrectorParameters const & par);
+
+    std::string mLegend;
+    std::string mCacheDir;
+    std::mutex mMutex;
+
+    std::map<std::string, std::shared_ptr<JetCorrectorParameters const>> mParameters;
+    std::map<std::string, JME::JetResolution> mResolutions;
+    std::map<std::string, JME::JetResolutionScaleFactor> mScaleFactors;
+
+};
+
+#endif
@@ -20,6 +20,10 @@
 
 #include <TRandom3.h>
 #include <regex>
+#include <map>
+#include <tuple>
+#include <algorithm>
+#include <mutex>
 
 
 class JetMETCorrHelper{
@@ -47,10 +51,18 @@ class JetMETCorrHelper{
                                         bool reCorrectJet=false,
                                         unsigned int syst=0);
 
+        /// Same with rho already read, for callers that do their event reads themselves (calculators running concurrently)
+        pat::Jet correctJetReturnPatJet(const pat::Jet & jet,
+                                        edm::Event const & event,
+                                        double rho,
+                                        bool doAK8Corr=false,
+                                        bool reCorrectJet=false,
+                                        unsigned int syst=0);
+
         TLorentzVector correctMet(const pat::MET & met,
                                   edm::Event const & event,
                                   edm::EDGetTokenT<double> rhoJetsToken,
-                                  std::vector<edm::Ptr<pat::Jet>> vAllJets,
+                                  std::vector<edm::Ptr<pat::Jet>> const & vAllJets,
                                   bool reCorrectjet = false,
                                   unsigned int syst = 0,
                                   bool useHF = true);
@@ -61,8 +73,93 @@ class JetMETCorrHelper{
                                         edm::EDGetTokenT<double> rhoJetsToken,
                                         unsigned int syst = 0);
 
+        /*
+         Batch interface: the inputs of all jets of a collection as structure of arrays, one call
+         evaluates the JEC and the JER/JES factors of all jets. The JER resolution and scale factor bins
+         are looked up for the whole batch at once (one pass over the bins of the resolution files, the
+         comparisons run over the jet arrays). The per-jet methods above use the same code.
+        */
+        struct JetBatch {
+            std::vector<double> pt;      // pt the JEC is evaluated at (raw pt when re-correcting)
+            std::vector<double> eta;
+            std::vector<double> phi;
+            std::vector<double> area;
+            std::vector<double> genPt;   // matched gen jet, -1 without
+            std::vector<double> genEta;
+            std::vector<double> genPhi;
+            double rho = 0.0;
+
+            void clear();
+            void push_back(const pat::Jet & jet, bool reCorrectJet);
+            size_t size() const { return pt.size(); }
+        };
+
+        struct JetBatchFactors {
+            std::vector<double> jec;     // JEC factor, 1 without re-correction
+            std::vector<double> jer;     // JER factors on top of the JEC: nominal, up, down
+            std::vector<double> jerUp;
+            std::vector<double> jerDown;
+            std::vector<double> jesUp;   // JES uncertainty factors on top of the JEC and the nominal JER
+            std::vector<double> jesDown;
+
+            /// JER/JES factor of jet i for syst (0 nominal, 1/2 JES up/down, 3/4 JER up/down)
+            double SystFactor(size_t i, unsigned int syst) const;
+        };
+
+        /// Factors of all jets of the batch, for syst only (0-4) or all variations (-1). Variations that are not computed are 1.
+        void CorrectJetBatch(JetBatch const & batch,
+                             JetBatchFactors & factors,
+                             bool doAK8Corr=false,
+                             bool reCorrectJet=false,
+                             int syst=-1);
+
+        /// Correct a collection in one batch, the per-jet methods then find the jets in the event cache
+        void CorrectJets(std::vector<const pat::Jet *> const & jets,
+                         edm::Event const & event,
+                         edm::EDGetTokenT<double> rhoJetsToken,
+                         bool doAK8Corr=false,
+                         bool reCorrectJet=false,
+                         unsigned int syst=0);
+        void CorrectJets(std::vector<const pat::Jet *> const & jets,
+                         edm::Event const & event,
+                         double rho,
+                         bool doAK8Corr=false,
+                         bool reCorrectJet=false,
+                         unsigned int syst=0);
+
     private:
 
+        /*
+         Per-event cache of corrected jets, shared by all helpers with the same JEC/JER configuration
+         (the selector and the calculators each own a helper, and correctMet() re-corrects every jet of
+         the event for every MET flavour and systematic). Jets are keyed by their four-momentum and JEC
+         level rather than by address, since the selector corrects lepton-cleaned copies. The JER smearing
+         is seeded by the jet phi, so a cached jet is identical to a recomputed one. The cache is per thread:
+         a calculator running on a TBB task (parallelCalcs) gets its own cache and recomputes its jets.
+        */
+        typedef std::tuple<int, int, unsigned int, double, double, double, double, double, double> CacheKey;
+        struct EventCache {
+            edm::EventID eventID;
+            std::map<CacheKey, pat::Jet> jets;
+            std::map<CacheKey, TLorentzVector> metJets;
+        };
+        static EventCache & eventCache(edm::Event const & event);
+        CacheKey cacheKey(const pat::Jet & jet, int kind, unsigned int syst, double rho) const;
+        double getRho(edm::Event const & event, edm::EDGetTokenT<double> const & rhoJetsToken) const;
+
+        pat::Jet computeCorrectedJet(const pat::Jet & jet, double rho, bool doAK8Corr, bool reCorrectJet, unsigned int syst);
+        pat::Jet applyFactors(const pat::Jet & jet, JetBatchFactors const & factors, size_t i, bool reCorrectJet, unsigned int syst) const;
+
+        /// First bin record of object containing each jet (nullptr if none), pt already JEC corrected
+        void findRecords(JME::JetResolutionObject const & object,
+                         std::vector<double> const & pt,
+                         JetBatch const & batch,
+                         std::vector<const JME::JetResolutionObject::Record *> & records) const;
+        TLorentzVector computeCorrectedJetForMet(const pat::Jet & jet, double rho, unsigned int syst);
+
+        /// Helpers with the same configuration share the cached jets
+        int mConfigID = -1;
+
         bool debug;
 
         bool isMc;
@@ -86,9 +183,9 @@ class JetMETCorrHelper{
 
         std::map<std::string, std::vector<JetCorrectorParameters> > mEraVPar;
         std::map<std::string, std::vector<JetCorrectorParameters> > mEraVParAK8;
-        std::map<std::string, std::shared_ptr<JetCorrectorParameters>> mStrJetCorPar;
+        std::map<std::string, std::shared_ptr<JetCorrectorParameters const>> mStrJetCorPar;
 
-        std::map<std::string, std::map<std::string, std::shared_ptr<JetCorrectorParameters> > > mEra_mStrJetCorPar;
+        std::map<std::string, std::map<std::string, std::shared_ptr<JetCorrectorParameters const> > > mEra_mStrJetCorPar;
         std::map<std::string, std::map<std::string, std::string>>              mEraJetParStr;
         std::map<std::string, std::string> mEraReplaceStr;
 
@@ -70,6 +70,101 @@ private:
 
   BTagSFUtil btagSfUtil;
 
+  // output branches, registered in BeginJob
+  // AK4 jets
+  LjmetBranchHandle<std::vector<double>> h_theJetPt;
+  LjmetBranchHandle<std::vector<double>> h_theJetEta;
+  LjmetBranchHandle<std::vector<double>> h_theJetPhi;
+  LjmetBranchHandle<std::vector<double>> h_theJetEnergy;
+  LjmetBranchHandle<std::vector<double>> h_theJetDeepFlavB;
+  LjmetBranchHandle<std::vector<int>> h_theJetPFlav;
+  LjmetBranchHandle<std::vector<int>> h_theJetHFlav;
+  LjmetBranchHandle<std::vector<int>> h_theJetBTag;
+  LjmetBranchHandle<std::vector<int>> h_theJetBTag_bSFup;
+  LjmetBranchHandle<std::vector<int>> h_theJetBTag_bSFdn;
+  LjmetBranchHandle<std::vector<int>> h_theJetBTag_lSFup;
+  LjmetBranchHandle<std::vector<int>> h_theJetBTag_lSFdn;
+  LjmetBranchHandle<double> h_theJetHT;
+  LjmetBranchHandle<double> h_theJetLeadPt;
+  LjmetBranchHandle<double> h_theJetSubLeadPt;
+  LjmetBranchHandle<std::vector<double>> h_theJetPileupJetId;
+  LjmetBranchHandle<std::vector<bool>> h_theJetPileupJetLoose;
+  LjmetBranchHandle<std::vector<bool>> h_theJetPileupJetMedium;
+  LjmetBranchHandle<std::vector<bool>> h_theJetPileupJetTight;
+  LjmetBranchHandle<std::vector<int>> h_theJetnDaughters;
+  // AK8 jets and subjets
+  LjmetBranchHandle<std::vector<int>> h_maxProb;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8Pt;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8Eta;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8Phi;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8Energy;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8CSV;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8DoubleB;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8JetCharge;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8GenPt;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8GenDR;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8GenMass;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8CHSPt;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8CHSEta;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8CHSPhi;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8CHSMass;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8SoftDropRaw;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8SoftDropCorr;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8SoftDrop;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8SoftDrop_JMSup;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8SoftDrop_JMSdn;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8SoftDrop_JMRup;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8SoftDrop_JMRdn;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8CHSPrunedMass;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8CHSSoftDropMass;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8NjettinessTau1;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8NjettinessTau2;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8NjettinessTau3;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8CHSTau1;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8CHSTau2;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8CHSTau3;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8SoftDropn2b1;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8SoftDropn2b2;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8SoftDropn3b1;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8SoftDropn3b2;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8Mass;
+  LjmetBranchHandle<std::vector<int>> h_theJetAK8nDaughters;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8SDSubjetPt;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8SDSubjetEta;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8SDSubjetPhi;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8SDSubjetMass;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8SDSubjetDeepCSVb;
+  LjmetBranchHandle<std::vector<int>> h_theJetAK8SDSubjetHFlav;
+  LjmetBranchHandle<std::vector<int>> h_theJetAK8SDSubjetBTag;
+  LjmetBranchHandle<std::vector<double>> h_theJetAK8SDSubjetDR;
+  LjmetBranchHandle<std::vector<int>> h_theJetAK8SDSubjetIndex;
+  LjmetBranchHandle<std::vector<int>> h_theJetAK8SDSubjetSize;
+  LjmetBranchHandle<std::vector<int>> h_theJetAK8SDSubjetNDeepCSVL;
+  LjmetBranchHandle<std::vector<int>> h_theJetAK8SDSubjetNDeepCSVMSF;
+  LjmetBranchHandle<std::vector<int>> h_theJetAK8SDSubjetNDeepCSVM_bSFup;
+  LjmetBranchHandle<std::vector<int>> h_theJetAK8SDSubjetNDeepCSVM_bSFdn;
+  LjmetBranchHandle<std::vector<int>> h_theJetAK8SDSubjetNDeepCSVM_lSFup;
+  LjmetBranchHandle<std::vector<int>> h_theJetAK8SDSubjetNDeepCSVM_lSFdn;
+  // hadronic V/H/t truth
+  LjmetBranchHandle<std::vector<int>> h_HadronicVHtStatus;
+  LjmetBranchHandle<std::vector<int>> h_HadronicVHtID;
+  LjmetBranchHandle<std::vector<double>> h_HadronicVHtPt;
+  LjmetBranchHandle<std::vector<double>> h_HadronicVHtEta;
+  LjmetBranchHandle<std::vector<double>> h_HadronicVHtPhi;
+  LjmetBranchHandle<std::vector<double>> h_HadronicVHtEnergy;
+  LjmetBranchHandle<std::vector<double>> h_HadronicVHtD0Pt;
+  LjmetBranchHandle<std::vector<double>> h_HadronicVHtD0Eta;
+  LjmetBranchHandle<std::vector<double>> h_HadronicVHtD0Phi;
+  LjmetBranchHandle<std::vector<double>> h_HadronicVHtD0E;
+  LjmetBranchHandle<std::vector<double>> h_HadronicVHtD1Pt;
+  LjmetBranchHandle<std::vector<double>> h_HadronicVHtD1Eta;
+  LjmetBranchHandle<std::vector<double>> h_HadronicVHtD1Phi;
+  LjmetBranchHandle<std::vector<double>> h_HadronicVHtD1E;
+  LjmetBranchHandle<std::vector<double>> h_HadronicVHtD2Pt;
+  LjmetBranchHandle<std::vector<double>> h_HadronicVHtD2Eta;
+  LjmetBranchHandle<std::vector<double>> h_HadronicVHtD2Phi;
+  LjmetBranchHandle<std::vector<double>> h_HadronicVHtD2E;
+
 };
 
 
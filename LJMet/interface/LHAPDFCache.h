@@ -0,0 +1,113 @@
+#ifndef FWLJMET_LJMet_interface_LHAPDFCache_h
+#define FWLJMET_LJMet_interface_LHAPDFCache_h
+
+/*
+ Process-wide cache of LHAPDF sets used for the LHE weight override (VLQ signals).
+
+ Building a PDF reads its grid files from disk, so every set is loaded once at beginJob and
+ all members are evaluated from the cached grids afterwards. The cache is an edm Service so
+ WeightAnalyzer and the LJMet calculators share the same grids:
+
+     process.LHAPDFCache = cms.Service("LHAPDFCache")
+
+ If the service is not configured, a module can own a private LHAPDFCache instead (Get() does that).
+
+ Usage:
+     pdfCache = LHAPDFCache::Get(localPdfCache);          // beginJob
+     pdfCache->Load(basePDFname);
+     pdfCache->Load(newPDFname);
+     pdfCache->MemberWeights(basePDFname, newPDFname, id1, x1, id2, x2, Q, weights);   // per event
+
+ Everything is inline so that both plugin libraries can use the header without linking each other,
+ the service itself is declared in LJMet/plugins/LHAPDFCache.cc.
+*/
+
+#include <iostream>
+#include <map>
+#include <mutex>
+#include <string>
+#include <vector>
+
+#include "FWCore/ParameterSet/interface/ParameterSet.h"
+#include "FWCore/ServiceRegistry/interface/ActivityRegistry.h"
+#include "FWCore/ServiceRegistry/interface/Service.h"
+
+#include "LHAPDF/LHAPDF.h"
+#include "LHAPDF/PDFSet.h"
+
+
+class LHAPDFCache {
+
+public:
+
+    LHAPDFCache() {}
+    LHAPDFCache(edm::ParameterSet const &, edm::ActivityRegistry &) {}
+
+    ~LHAPDFCache()
+    {
+        for (auto & set : mSets){
+            for (LHAPDF::PDF * pdf : set.second) delete pdf;
+        }
+    }
+
+    /// The shared cache if the service is configured, the given private one otherwise
+    static LHAPDFCache * Get(LHAPDFCache & fallback)
+    {
+        edm::Service<LHAPDFCache> _service;
+        if (_service.isAvailable()) return &(*_service);
+        std::cout << "[LHAPDFCache]: service not configured, PDF sets are cached per module" << std::endl;
+        return &fallback;
+    }
+
+    /// Load all members of a set, does nothing if it is already cached
+    std::vector<LHAPDF::PDF*> const & Load(std::string const & setname)
+    {
+        std::lock_guard<std::mutex> _lock(mMutex);
+        auto it = mSets.find(setname);
+        if (it != mSets.end()) return it->second;
+
+        std::cout << "[LHAPDFCache]: loading PDF set " << setname << std::endl;
+        const LHAPDF::PDFSet _set(setname);
+        return mSets[setname] = _set.mkPDFs();
+    }
+
+    unsigned int size(std::string const & setname) { return Load(setname).size(); }
+
+    /// xf(id1, x1, Q) * xf(id2, x2, Q) for one member of a set
+    double Product(std::string const & setname, unsigned int member, int id1, double x1, int id2, double x2, double Q)
+    {
+        LHAPDF::PDF const * pdf = Load(setname).at(member);
+        std::lock_guard<std::mutex> _lock(mEvalMutex);
+        return pdf->xfxQ(id1, x1, Q) * pdf->xfxQ(id2, x2, Q);
+    }
+
+    /// Batched evaluation for one (x1, x2, Q): weights[i] is the ratio of member i of newset
+    /// to member 0 of baseset. Returns the base product.
+    double MemberWeights(std::string const & baseset, std::string const & newset,
+                         int id1, double x1, int id2, double x2, double Q,
+                         std::vector<double> & weights)
+    {
+        LHAPDF::PDF const * _basepdf = Load(baseset).at(0);
+        std::vector<LHAPDF::PDF*> const & _members = Load(newset);
+
+        std::lock_guard<std::mutex> _lock(mEvalMutex);
+        double _base = _basepdf->xfxQ(id1, x1, Q) * _basepdf->xfxQ(id2, x2, Q);
+        weights.resize(_members.size());
+        for (unsigned int i = 0; i < _members.size(); i++){
+            weights[i] = _members[i]->xfxQ(id1, x1, Q) * _members[i]->xfxQ(id2, x2, Q) / _base;
+        }
+
+        return _base;
+    }
+
+private:
+
+    // loading, and the evaluation: the cache is shared by the streams and the parallel calculators,
+    // and the interpolation of a PDF is not known to be safe to call concurrently
+    std::mutex mMutex;
+    std::mutex mEvalMutex;
+    std::map<std::string, std::vector<LHAPDF::PDF*>> mSets;
+
+};
+
+#endif
@@ -11,11 +11,47 @@
 #include <vector>
 #include <string>
 #include <map>
+#include <deque>
+#include <memory>
+#include <mutex>
 #include <limits>
+#include <cstdlib>
+#include <utility>
+#include <regex>
+#include <set>
 #include "TH1.h"
 #include "TTree.h"
+#include "TDirectory.h"
 #include "FWCore/ParameterSet/interface/ParameterSet.h"
 
+class LjmetTreeWriter;
+
+/// Typed handle of a registered branch, see LjmetEventContent::RegisterBranch()
+template <typename T>
+class LjmetBranchHandle {
+public:
+    typedef T value_type;
+    LjmetBranchHandle(): mIndex(-1) { }
+    bool IsValid() const { return mIndex >= 0; }
+    
+private:
+    friend class LjmetEventContent;
+    explicit LjmetBranchHandle(int index): mIndex(index) { }
+    int mIndex;
+};
+
+/// Handle of a declared histogram, returned by LjmetEventContent::SetHistogram()
+class LjmetHistHandle {
+public:
+    LjmetHistHandle(): mIndex(-1) { }
+    bool IsValid() const { return mIndex >= 0; }
+    
+private:
+    friend class LjmetEventContent;
+    explicit LjmetHistHandle(int index): mIndex(index) { }
+    int mIndex;
+};
+
 class LjmetEventContent {
 public:
     /// Container for histogram basic info and current value to be held in event content and filled into hist
@@ -57,8 +93,38 @@ public:
     void SetVerbosity(int verbosity);
     void SetTree(TTree * tree);
     
-    /// Create histogram entry in event content, so it is created by the LjmetFactory
-    void SetHistogram(std::string modname, std::string histname, int nbins, double low, double high);
+    /// Hand the filled events to a background thread that does the TTree::Fill (compression and basket
+    /// writes), see LjmetTreeWriter. Has to be set before the first Fill().
+    void SetAsyncFill(bool async);
+    
+    /// Wait until all events passed to Fill() are in the tree (no-op without async fill)
+    void Sync();
+    
+    /// Output tree settings, all optional, have to be set before the first Fill():
+    ///     compressionAlgorithm  ZLIB, LZMA, LZ4 or ZSTD (ROOT >= 6.20), default: setting of the output file
+    ///     compressionLevel      1-9, default 4
+    ///     autoFlush             TTree::SetAutoFlush, entries if > 0, bytes if < 0, default: ROOT default
+    ///     basketSize            initial basket size per branch in bytes, default 32000
+    ///     drop_branches         regex on the full branch name (e.g. ".*_BestCalc"), matching branches are not written
+    ///     keep_branches         regex, branches matching one of these are written even if they match drop_branches
+    ///     branch_precision      VPSet of {branches: regex, type: float|int16|int8, mantissaBits: 1-23 for float},
+    ///                           storage type in the tree of matching double/int (and vector) branches, the
+    ///                           first rule that fits the branch type wins. Values are converted at Fill(),
+    ///                           floats rounded to mantissaBits, integers clamped to the range of the type
+    void SetOutputConfig(edm::ParameterSet const & iConfig);
+    void CopyOutputConfig(const LjmetEventContent & other);
+    
+    /// False if the branch is dropped from the output by the keep/drop lists
+    bool IsBranchKept(std::string const & key);
+    
+    /// False once the branches are created and none of the calculator's branches (name_<calcName>) is kept,
+    /// the factory does not run such a calculator
+    bool HasKeptBranches(std::string const & calcName);
+    
+    /// Create histogram entry in event content, so it is created by the LjmetFactory.
+    /// The returned handle fills the histogram without looking it up by name, in this and in
+    /// any other event content holding a copy of the histogram map (single-pass shift mode)
+    LjmetHistHandle SetHistogram(std::string modname, std::string histname, int nbins, double low, double high);
     
     void SetValue(std::string key, bool value);
     void SetValue(std::string key, int value);
@@ -68,6 +134,45 @@ public:
     void SetValue(std::string key, std::vector<int> value);
     void SetValue(std::string key, std::vector<double> value);
     void SetValue(std::string key, std::vector<std::string> value);
+    
+    /// Register a branch once (e.g. in BeginJob) and get a typed handle for the per-event writes.
+    /// Handles are valid for every event content instance: each one binds a handle to its branch
+    /// buffer on the first write, after that a write is a plain assignment without any string lookup.
+    /// As with the string API, the branch is created if it was written before the first Fill().
+    template <typename T>
+    static LjmetBranchHandle<T> RegisterBranch(std::string const & key)
+    {
+        std::lock_guard<std::mutex> _lock(registryMutex());
+        std::vector<std::string> & _names = handleNames<T>();
+        for (unsigned int i = 0; i < _names.size(); i++) if (_names[i] == key) return LjmetBranchHandle<T>(i);
+        _names.push_back(key);
+        return LjmetBranchHandle<T>(_names.size() - 1);
+    }
+    
+    /// Branch buffer behind a handle, can be filled in place
+    template <typename T>
+    T & GetBuffer(LjmetBranchHandle<T> handle)
+    {
+        std::vector<T*> & _slots = handleSlots<T>();
+        if ((unsigned int)handle.mIndex >= _slots.size() || !_slots[handle.mIndex]) return bindHandle(handle);
+        return *_slots[handle.mIndex];
+    }
+    
+    template <typename T>
+    void SetValue(LjmetBranchHandle<T> handle, typename LjmetBranchHandle<T>::value_type const & value) { GetBuffer(handle) = value; }
+    template <typename T>
+    void SetValue(LjmetBranchHandle<T> handle, typename LjmetBranchHandle<T>::value_type && value) { GetBuffer(handle) = std::move(value); }
+    /// Exchange the branch buffer with value (value gets the previous event's content)
+    template <typename T>
+    void SwapValue(LjmetBranchHandle<T> handle, T & value) { std::swap(GetBuffer(handle), value); }
+    
+    /// Per-file information (e.g. the trigger names behind a per-event bit mask), written once next to
+    /// the tree by the module (a TNamed with the entries comma separated) instead of in every event
+    void SetMetadata(std::string key, std::vector<std::string> value);
+    bool HasMetadata(std::string const & key) const { return mMetadata.find(key) != mMetadata.end(); }
+    std::map<std::string, std::vector<std::string>> const & GetMetadata() const { return mMetadata; }
+    void WriteMetadata(TDirectory * dir) const;
+    
     // histograms: mDoubleHist[module][histname]
     // actual histograms get created by TFileService in the main application
     // based on info in this container
@@ -76,11 +181,95 @@ public:
     /// Assign current hist value to hist metadata collection
     void SetHistValue(std::string modname, std::string histname, double value);
     void FillHist(std::string modname, std::string histname, double value);
+    void FillHist(LjmetHistHandle handle, double value);
     void Fill();
+
+    /// Copy all current branch values from another event content (used by the single-pass shift mode
+    /// to carry the shift-independent values into the variation trees). Existing map entries are
+    /// assigned in place so that branch addresses stay valid.
+    void CopyValues(const LjmetEventContent & other);
+    
+    /// Take over what a calculator wrote into its staging area (parallel mode): the branch values
+    /// are swapped as in SwapValues(), the staging area keeps the previous values of the calculator's
+    /// branches, and the metadata is copied
+    void MergeValues(LjmetEventContent & staging);
+    
+    /// Exchange the branch values with another event content, entries missing here are added.
+    /// Constant time per branch, used by the async writer to take over a filled event.
+    void SwapValues(LjmetEventContent & other);
     
 private:
     /// Create branches in the tree according to maps
     int createBranches();
+    
+    /// Apply the compression settings to a new branch
+    void configureBranch(TBranch * branch);
+    
+    /// Storage type of a branch from branch_precision
+    enum Precision { kNative, kFloat, kInt16, kInt8 };
+    struct PrecisionRule {
+        std::string pattern;
+        std::regex regex;
+        Precision type;
+        int mantissaBits;
+    };
+    PrecisionRule const * findPrecision(std::string const & key, bool isInteger) const;
+    
+    /// Reduced precision copy of a branch value, the tree is bound to pTo
+    template <typename From, typename To>
+    struct NarrowedBranch {
+        From const * pFrom;
+        To * pTo;
+        int mantissaBits;
+        std::string name;
+        bool clamped; // warned about an out of range integer
+    };
+    /// Convert the current values into the reduced precision copies, before TTree::Fill()
+    void narrowValues();
+    
+    /// Calculators with at least one kept branch, from the branches of the first event
+    void findKeptCalcs();
+    
+    /// Guards the registries below, handles get registered while the (stream) modules are constructed
+    static std::mutex & registryMutex()
+    {
+        static std::mutex _mutex;
+        return _mutex;
+    }
+    
+    /// Module and histogram names of the histogram handles, shared by all instances
+    static std::vector<std::pair<std::string, std::string>> & histKeys()
+    {
+        static std::vector<std::pair<std::string, std::string>> _keys;
+        return _keys;
+    }
+    HistMetadata * findHist(std::string const & modname, std::string const & histname);
+    HistMetadata * bindHist(LjmetHistHandle handle);
+    
+    /// Branch names of the registered handles, per type, shared by all instances
+    template <typename T>
+    static std::vector<std::string> & handleNames()
+    {
+        static std::vector<std::string> _names;
+        return _names;
+    }
+    /// Branch map and bound handle buffers of this instance, per type
+    template <typename T> std::map<std::string, T> & branchMap();
+    template <typename T> std::vector<T*> & handleSlots();
+    
+    template <typename T>
+    T & bindHandle(LjmetBranchHandle<T> handle)
+    {
+        if (!handle.IsValid()) {
+            std::cout << mLegend << "SetValue called with an unregistered branch handle" << std::endl;
+            std::exit(-1);
+        }
+        std::vector<T*> & _slots = handleSlots<T>();
+        if ((unsigned int)handle.mIndex >= _slots.size()) _slots.resize(handleNames<T>().size(), 0);
+        // map nodes are stable, so the pointer stays valid as more branches are added
+        _slots[handle.mIndex] = &(branchMap<T>()[handleNames<T>()[handle.mIndex]]);
+        return *_slots[handle.mIndex];
+    }
     std::string mName;
     std::string mLegend;
     TTree * mpTree;
@@ -94,10 +283,70 @@ private:
     std::map<std::string,std::vector<int> > mVectorIntBranch;
     std::map<std::string,std::vector<double> > mVectorDoubleBranch;
     std::map<std::string,std::vector<std::string> > mVectorStringBranch;
+    // buffers bound to handles, pointing into the maps above
+    std::vector<bool*> mvBoolSlots;
+    std::vector<int*> mvIntSlots;
+    std::vector<long long*> mvLongIntSlots;
+    std::vector<double*> mvDoubleSlots;
+    std::vector<std::vector<bool>*> mvVectorBoolSlots;
+    std::vector<std::vector<int>*> mvVectorIntSlots;
+    std::vector<std::vector<double>*> mvVectorDoubleSlots;
+    std::vector<std::vector<std::string>*> mvVectorStringSlots;
+    // per-file metadata
+    std::map<std::string, std::vector<std::string>> mMetadata;
     // mDoubleHist[module][histname]=value
     std::map<std::string,std::map<std::string,HistMetadata> > mDoubleHist;
+    // histograms bound to handles, pointing into mDoubleHist (bound on the first fill, so the
+    // map must not be replaced after that)
+    std::vector<HistMetadata*> mvHistSlots;
     bool mFirstEntry;
     int mVerbosity;
+    bool mbAsyncFill;
+    std::unique_ptr<LjmetTreeWriter> mpWriter;
+    // output tree settings
+    int mCompression;
+    int mBasketSize;
+    bool mbAutoFlush;
+    Long64_t mAutoFlush;
+    std::vector<std::string> mvKeep;
+    std::vector<std::string> mvDrop;
+    std::vector<std::regex> mvKeepRegex;
+    std::vector<std::regex> mvDropRegex;
+    std::vector<PrecisionRule> mvPrecision;
+    // reduced precision copies bound to the tree (deque: stable addresses)
+    std::deque<float> mFloatBuffers;
+    std::deque<short> mShortBuffers;
+    std::deque<char> mCharBuffers;
+    std::deque<std::vector<float>> mVectorFloatBuffers;
+    std::deque<std::vector<short>> mVectorShortBuffers;
+    std::deque<std::vector<char>> mVectorCharBuffers;
+    std::vector<NarrowedBranch<double, float>> mvFloatBranches;
+    std::vector<NarrowedBranch<int, short>> mvShortBranches;
+    std::vector<NarrowedBranch<int, char>> mvCharBranches;
+    std::vector<NarrowedBranch<std::vector<double>, std::vector<float>>> mvVectorFloatBranches;
+    std::vector<NarrowedBranch<std::vector<int>, std::vector<short>>> mvVectorShortBranches;
+    std::vector<NarrowedBranch<std::vector<int>, std::vector<char>>> mvVectorCharBranches;
+    // keep/drop decision per branch name, and calculators with kept branches
+    std::map<std::string, bool> mKeptBranches;
+    std::set<std::string> mKeptCalcs;
 };
 
+template <> inline std::map<std::string, bool> & LjmetEventContent::branchMap<bool>() { return mBoolBranch; }
+template <> inline std::map<std::string, int> & LjmetEventContent::branchMap<int>() { return mIntBranch; }
+template <> inline std::map<std::string, long long> & LjmetEventContent::branchMap<long long>() { return mLongIntBranch; }
+template <> inline std::map<std::string, double> & LjmetEventContent::branchMap<double>() { return mDoubleBranch; }
+template <> inline std::map<std::string, std::vector<bool>> & LjmetEventContent::branchMap<std::vector<bool>>() { return mVectorBoolBranch; }
+template <> inline std::map<std::string, std::vector<int>> & LjmetEventContent::branchMap<std::vector<int>>() { return mVectorIntBranch; }
+template <> inline std::map<std::string, std::vector<double>> & LjmetEventContent::branchMap<std::vector<double>>() { return mVectorDoubleBranch; }
+template <> inline std::map<std::string, std::vector<std::string>> & LjmetEventContent::branchMap<std::vector<std::string>>() { return mVectorStringBranch; }
+
+template <> inline std::vector<bool*> & LjmetEventContent::handleSlots<bool>() { return mvBoolSlots; }
+template <> inline std::vector<int*> & LjmetEventContent::handleSlots<int>() { return mvIntSlots; }
+template <> inline std::vector<long long*> & LjmetEventContent::handleSlots<long long>() { return mvLongIntSlots; }
+template <> inline std::vector<double*> & LjmetEventContent::handleSlots<double>() { return mvDoubleSlots; }
+template <> inline std::vector<std::vector<bool>*> & LjmetEventContent::handleSlots<std::vector<bool>>() { return mvVectorBoolSlots; }
+template <> inline std::vector<std::vector<int>*> & LjmetEventContent::handleSlots<std::vector<int>>() { return mvVectorIntSlots; }
+template <> inline std::vector<std::vector<double>*> & LjmetEventContent::handleSlots<std::vector<double>>() { return mvVectorDoubleSlots; }
+template <> inline std::vector<std::vector<std::string>*> & LjmetEventContent::handleSlots<std::vector<std::string>>() { return mvVectorStringSlots; }
+
 #endif
@@ -9,12 +9,46 @@
 
 #include <iostream>
 #include <map>
+#include <set>
+#include <vector>
+#include <chrono>
+#include <memory>
+#include <utility>
 #include "FWLJMET/LJMet/interface/BaseCalc.h"
 #include "FWLJMET/LJMet/interface/BaseEventSelector.h"
 #include "FWLJMET/LJMet/interface/LjmetEventContent.h"
 
 class LjmetFactory {
 public:
+    /// Latency of one calculator method: call count, mean and a histogram in log10(us)
+    /// (40 bins per decade from 10 ns to 10^4 s) for the percentiles
+    class CalcTiming {
+    public:
+        CalcTiming();
+        void Add(std::chrono::steady_clock::duration elapsed);
+        unsigned long long GetCalls() const { return mCalls; }
+        double GetMean() const { return mCalls > 0 ? mSum / mCalls : 0; }
+        double GetMax() const { return mMax; }
+        /// Latency in us below which a fraction q of the calls are, from the bin centers
+        double GetPercentile(double q) const;
+        
+    private:
+        unsigned long long mCalls;
+        double mSum;
+        double mMax;
+        std::vector<unsigned long long> mvBins;
+    };
+    
+    /// A calculator of an include list, resolved once (see MakePlan)
+    struct PlanEntry {
+        std::string name;
+        BaseCalc * calc;
+        CalcTiming * analyzeTiming;
+        CalcTiming * produceTiming;
+        int group; // consecutive entries of one group run concurrently (parallel mode)
+    };
+    typedef std::vector<PlanEntry> CalcPlan;
+    
     virtual ~LjmetFactory();
 
     LjmetFactory();
@@ -26,11 +60,30 @@ public:
     /// Return pointer to registered event selector. Exit if not found
     BaseEventSelector * GetEventSelector(std::string name);
     
-    /// Loop over all registered calculators and compute implemented variables
-    void RunAllCalculators(edm::Event const & event, BaseEventSelector * selector, LjmetEventContent & ec, std::vector<std::string> vIncl);
+    /// Resolve the registered (and not excluded) calculators of vIncl in that order, once after BeginJob.
+    /// The timing of the plan's calls is kept under the calculator name + tag.
+    /// In parallel mode, consecutive calculators that declared their dependencies and do not conflict
+    /// (BaseCalc::DeclareDependencies) are put in one group
+    CalcPlan MakePlan(std::vector<std::string> const & vIncl, std::string const & tag = "");
+    
+    /// Run the calculators of a group on TBB tasks, each one writing into its own staging event content
+    /// that is merged into the event content after the group, in the plan order. Set before MakePlan
+    void SetParallel(bool parallel) { mbParallel = parallel; }
+    
+    /// Run the calculators of the plan and compute implemented variables.
+    /// Calculators whose branches are all dropped from the output are skipped after the first event
+    void RunAllCalculators(edm::Event const & event, BaseEventSelector * selector, LjmetEventContent & ec, CalcPlan const & plan);
     
-    /// Loop over all registered calculators and run all producer methods (comes before selection)
-    void RunAllProducers(edm::EventBase const & event, BaseEventSelector * selector, std::vector<std::string> vIncl);
+    /// Set the jet/MET systematic of the single-pass shift mode for the given calculators (-1 for the nominal pass)
+    void SetShiftAllCalc(int syst, CalcPlan const & plan);
+    
+    /// Run all producer methods of the plan (comes before selection)
+    void RunAllProducers(edm::EventBase const & event, BaseEventSelector * selector, CalcPlan const & plan);
+    
+    /// Print calls, mean and percentile latency of each calculator, and store them as per-file
+    /// metadata in ec (timing_<method>_<calculator><tag>: calls,mean_us,p50_us,p90_us,p99_us,max_us)
+    void PrintTiming(std::ostream & out);
+    void SaveTiming(LjmetEventContent & ec);
     
     /// Set each calc's parameter set, if present
     void SetAllCalcConfig(edm::ParameterSet const Par, std::vector<std::string> vIncl);
@@ -50,6 +103,19 @@ private:
     std::map<std::string, BaseEventSelector * > mpSelectors;
     BaseEventSelector * theSelector;
     std::vector<std::string> mvExcludedCalcs;
+    std::set<std::string> mSkippedCalcs;
+    // timing per calculator name + plan tag
+    std::map<std::string, CalcTiming> mAnalyzeTiming;
+    std::map<std::string, CalcTiming> mProduceTiming;
+    
+    // parallel mode, staging event content per calculator and target event content
+    bool mbParallel;
+    std::map<std::pair<BaseCalc *, LjmetEventContent *>, std::unique_ptr<LjmetEventContent>> mStaging;
+    LjmetEventContent & stagingArea(BaseCalc * calc, LjmetEventContent & ec);
+    
+    /// False if all branches of the calculator are dropped
+    bool isKept(LjmetEventContent & ec, PlanEntry const & entry);
+    void runCalculator(edm::Event const & event, BaseEventSelector * selector, LjmetEventContent & ec, PlanEntry const & entry);
 };
 
 #endif
@@ -0,0 +1,88 @@
+#ifndef FWLJMET_LJMet_interface_LjmetRunner_h
+#define FWLJMET_LJMet_interface_LjmetRunner_h
+
+/*
+ Everything one LJMet module instance runs per event: the factory with the selector and calculators,
+ the event content, and the single-pass shift mode variations.
+
+ The modules only provide the output: they attach a tree to each event content and create the
+ histograms registered in the hist maps. LJMet (edm::one) owns one runner, LJMetStream one per stream.
+
+ Usage:
+     runner = new LjmetRunner(iConfig, consumesCollector());          // module constructor
+     runner->GetEventContent().SetTree(tree);                         // + GetShiftEventContent(i) for the shift trees
+     runner->Analyze(iEvent);                                         // analyze
+     runner->EndJob();
+*/
+
+#include <iostream>
+#include <string>
+#include <vector>
+
+#include "FWCore/Framework/interface/Event.h"
+#include "FWCore/Framework/interface/ConsumesCollector.h"
+#include "FWCore/ParameterSet/interface/ParameterSet.h"
+
+#include "FWLJMET/LJMet/interface/LjmetEventContent.h"
+#include "FWLJMET/LJMet/interface/LjmetFactory.h"
+#include "FWLJMET/LJMet/interface/BaseEventSelector.h"
+
+
+class LjmetRunner {
+
+public:
+
+    LjmetRunner(edm::ParameterSet const & iConfig, edm::ConsumesCollector && iC);
+    ~LjmetRunner();
+
+    std::string const & GetTreeName() const { return ttree_name; }
+
+    /// Nominal event content
+    LjmetEventContent & GetEventContent() { return ec; }
+
+    /// Single-pass shift mode variations (JECup, ...), each with its own event content
+    std::vector<std::string> const & GetShifts() const { return vShifts; }
+    LjmetEventContent & GetShiftEventContent(unsigned int ishift) { return *vShiftEc[ishift]; }
+
+    /// Selection, calculators and tree filling for one event, returns true if the nominal selection passed
+    bool Analyze(edm::Event const & iEvent);
+
+    /// Wait for the background tree writers (asyncOutput), before the trees are written out
+    void Sync();
+
+    /// Print the selection and the calculator timing, run EndJob() of the calculators and the selector
+    void EndJob();
+
+private:
+
+    std::string mLegend;
+
+    // internal LJMet event content
+    LjmetEventContent ec;
+
+    // The factory for event selector and calculator plugins
+    LjmetFactory * factory;
+
+    // choose event selector
+    BaseEventSelector * theSelector;
+
+    // calculators of vIncl and vShiftCalcs, resolved once
+    LjmetFactory::CalcPlan mPlan;
+    LjmetFactory::CalcPlan mShiftPlan;
+
+    bool debug;
+    int verbosity;
+    std::string selection;
+    std::vector<std::string> vExcl;
+    std::vector<std::string> vIncl;
+    std::string ttree_name;
+
+    // single-pass shift mode: one tree per jet/MET variation, all filled from this module
+    std::vector<std::string> vShifts;
+    std::vector<std::string> vShiftCalcs;
+    std::vector<int> vShiftSyst;
+    std::vector<LjmetEventContent *> vShiftEc;
+
+};
+
+#endif
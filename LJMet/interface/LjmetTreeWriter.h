@@ -0,0 +1,74 @@
+#ifndef FWLJMET_LJMet_interface_LjmetTreeWriter_h
+#define FWLJMET_LJMet_interface_LjmetTreeWriter_h
+
+/*
+ Background TTree writer for LjmetEventContent (async fill mode).
+
+ TTree::Fill compresses and writes the baskets when they are full, which stalls the event
+ that happens to fill them. In async mode the tree is bound to the writer's own copy of the
+ branch maps instead, and LjmetEventContent::Fill() only copies the event's values into one of
+ two hand-off buffers. The writer thread takes a buffer over (value swap, constant time per
+ branch), releases it and runs TTree::Fill while the next event is being calculated.
+
+ Backpressure: Push() waits while both buffers still hold events that were not taken over,
+ so at most two events are queued. Trees of one file are filled under a per file lock,
+ since basket writes to the same TFile must not overlap.
+
+ Sync() returns once every pushed event is in the tree, call it before the tree or its file
+ is written (end of job, TBufferMerger flush).
+*/
+
+#include <condition_variable>
+#include <map>
+#include <mutex>
+#include <thread>
+
+#include "TFile.h"
+#include "TTree.h"
+
+#include "FWLJMET/LJMet/interface/LjmetEventContent.h"
+
+
+class LjmetTreeWriter {
+
+public:
+
+    /// The tree gets the output settings (compression, keep/drop) of config
+    LjmetTreeWriter(TTree * tree, int verbosity, LjmetEventContent const & config);
+    ~LjmetTreeWriter();
+
+    /// Queue the current values of ec for the tree, blocks while both buffers are in use
+    void Push(LjmetEventContent const & ec);
+
+    /// Wait until all pushed events are filled
+    void Sync();
+
+private:
+
+    LjmetTreeWriter(const LjmetTreeWriter &); // stop default
+
+    void run();
+
+    /// Lock for the basket writes to one file
+    static std::mutex & fileMutex(TFile * file);
+
+    TTree * mpTree;
+
+    // values bound to the tree branches, only used by the writer thread
+    LjmetEventContent mBack;
+
+    // hand-off buffers, mBuffers[mHead] is the next one to write, mBuffers[mTail] the next one to push into
+    LjmetEventContent mBuffers[2];
+    int mHead;
+    int mTail;
+    int mNFull;
+    bool mbBusy;
+    bool mbStop;
+
+    std::mutex mMutex;
+    std::condition_variable mCond;
+    std::thread mThread;
+
+};
+
+#endif
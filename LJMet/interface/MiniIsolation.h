@@ -1,7 +1,13 @@
+#ifndef FWLJMET_LJMet_interface_MiniIsolation_h
+#define FWLJMET_LJMet_interface_MiniIsolation_h
+
 #include "DataFormats/PatCandidates/interface/PackedCandidate.h"
 #include "DataFormats/PatCandidates/interface/Muon.h"
 #include "DataFormats/PatCandidates/interface/Electron.h"
 #include "DataFormats/EgammaCandidates/interface/GsfElectron.h"
+#include "DataFormats/Provenance/interface/EventID.h"
+#include "DataFormats/Provenance/interface/ProductID.h"
+#include "FWCore/Framework/interface/Event.h"
 //Root Classes
 
 #include "TH1F.h"
@@ -30,6 +36,81 @@
 #include <memory>
 #include <iomanip>
 
+/*
+ Eta-phi grid over the packed PF candidates of one event.
+
+ The candidates that can enter a mini-isolation sum (photons, neutral hadrons, charged hadrons from PV,
+ charged from PU) are binned once per event, so each lepton only visits the cells overlapping its cone
+ instead of the whole collection, and all four sums are collected in that one sweep. The grid is shared
+ by all isolation calls of the event (selectors and calculators) through Get():
+
+     PFCandGrid const & pfGrid = PFCandGrid::Get(event, packedPFCands);
+     getPFMiniIsolation_DeltaBeta(pfGrid, lepton, 0.05, 0.2, 10., false);
+
+ The cone sums are added up in collection order, so they are identical to the full pass.
+*/
+class PFCandGrid {
+
+public:
+
+    struct DeadCones { double ch; double nh; double ph; double pu; };
+    struct ConeSums  { double ch; double nh; double ph; double pu; };
+
+    PFCandGrid();
+
+    /// Grid of the current event, built on the first call in the event
+    static PFCandGrid const & Get(edm::Event const & event, edm::Handle<pat::PackedCandidateCollection> const & pfcands);
+
+    void Build(pat::PackedCandidateCollection const & pfcands);
+
+    /// Charged (PV), neutral hadron, photon and charged PU pt sums within r_iso of (eta, phi)
+    ConeSums GetConeSums(double eta, double phi, double r_iso, double ptThresh,
+                         DeadCones const & deadcones, bool use_pfweight = false) const;
+
+private:
+
+    enum Kind { kPhoton, kNeutralHadron, kChargedPV, kChargedPU };
+
+    struct Cand {
+        double eta;
+        double phi;
+        double pt;
+        unsigned int index;
+        Kind kind;
+    };
+
+    static const int nEtaBins = 50;
+    static const int nPhiBins = 32;
+    static constexpr double etaMax = 5.;
+
+    int etaBin(double eta) const;
+    int phiBin(double phi) const;
+    double pfWeight(pat::PackedCandidate const & pfc) const;
+
+    pat::PackedCandidateCollection const * mpCands;
+    std::vector<Cand> mvCands;               // grouped by cell
+    std::vector<unsigned int> mvCellBegin;   // offset of each cell in mvCands, plus the end
+    edm::EventID mEventID;
+    edm::ProductID mProductID;
+
+};
+
+double getPFMiniIsolation_DeltaBeta(PFCandGrid const & pfgrid,
+			  const reco::Candidate* ptcl,
+			  double r_iso_min, double r_iso_max, double kt_scale,
+			  bool charged_only);
+
+double getPFMiniIsolation_EffectiveArea(PFCandGrid const & pfgrid,
+			  const reco::Candidate* ptcl,
+			  double r_iso_min, double r_iso_max, double kt_scale,
+                          bool use_pfweight,  bool charged_only, double rho);
+
+double getPFMiniIsolation_SUSY(PFCandGrid const & pfgrid,
+			  const reco::Candidate* ptcl,
+			  double r_iso_min, double r_iso_max, double kt_scale,
+                          bool use_pfweight,  bool charged_only, double rho);
+
+// same as above, building a grid for the single call
 double getPFMiniIsolation_DeltaBeta(edm::Handle<pat::PackedCandidateCollection> pfcands,
 			  const reco::Candidate* ptcl,  
 			  double r_iso_min, double r_iso_max, double kt_scale,
@@ -51,3 +132,4 @@ double getPFMiniIsolation_SUSY(edm::Handle<pat::PackedCandidateCollection> pfcan
 			  double r_iso_min, double r_iso_max, double kt_scale,
                           bool use_pfweight,  bool charged_only, double rho);
 
+#endif
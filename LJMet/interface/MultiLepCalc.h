@@ -26,6 +26,7 @@
 #include "LHAPDF/PDFInfo.h"
 #include "LHAPDF/PDFSet.h"
 #include "LHAPDF/Factories.h"
+#include "FWLJMET/LJMet/interface/LHAPDFCache.h"
 
 class LjmetFactory;
 
@@ -38,6 +39,7 @@ public:
     virtual int EndJob(){return 0;};
 
     void AnalyzeTriggers(edm::Event const & event, BaseEventSelector * selector);
+    void SetTriggerBits(std::string name, std::map<std::string, unsigned int> const & mTriggers);
     void AnalyzePV(edm::Event const & event, BaseEventSelector * selector);
     void AnalyzePU(edm::Event const & event, BaseEventSelector * selector);
     void AnalyzeBadDupMu(edm::Event const & event, BaseEventSelector * selector);
@@ -54,6 +56,7 @@ private:
     bool isMc;
     bool saveLooseLeps;
     bool keepFullMChistory;
+    bool saveTriggerNamesPerEvent;
     bool UseElMVA;
     bool UseElIDV1;
 
@@ -71,6 +74,8 @@ private:
     bool orlhew;
     std::string basePDFname;
     std::string newPDFname;
+    LHAPDFCache * pdfCache;
+    LHAPDFCache localPdfCache;
     std::vector<unsigned int> keepPDGID;
     std::vector<unsigned int> keepMomPDGID;
     std::vector<unsigned int> keepPDGIDForce;
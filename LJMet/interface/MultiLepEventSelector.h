@@ -18,6 +18,7 @@
 #include "DataFormats/PatCandidates/interface/Jet.h"
 
 #include "FWLJMET/LJMet/interface/MiniIsolation.h"
+#include "FWLJMET/LJMet/interface/TriggerPathMatcher.h"
 
 #include "CondFormats/JetMETObjects/interface/JetCorrectionUncertainty.h"
 #include "CondFormats/JetMETObjects/interface/FactorizedJetCorrector.h"
@@ -27,6 +28,7 @@
 #include <TRandom3.h>
 #include <boost/algorithm/string.hpp>
 #include <regex>
+#include <chrono>
 
 #include "FWLJMET/LJMet/interface/JetMETCorrHelper.h"
 #include "FWLJMET/LJMet/interface/BTagSFUtil.h"
@@ -49,6 +51,9 @@ public:
     // main method where the cuts are applied
     virtual bool operator()( edm::Event const & event, pat::strbitset & ret);
 
+    // single-pass shift mode: redo the jet/MET selection for the systematic set with SetShift()
+    virtual bool SelectShift( edm::Event const & event, pat::strbitset & ret);
+
     virtual void AnalyzeEvent( edm::EventBase const & event, LjmetEventContent & ec );
 
     // executes after loop over events
@@ -62,6 +67,37 @@ protected:
     bool debug;
     bool isMc;
 
+    //Cost-aware selection (optimize_selection): same cut bits and cut flow, but work no cut depends on is
+    //only done for events that pass, see LeptonCountPrecheck(), LazyJetMETSelection()
+    bool optimize_selection;
+
+    //Cost and rejection rate of each selection stage, printed in EndJob()
+    enum SelectionStage { kTrigger, kPV, kMETfilters, kLeptons, kJets, kMET, kJetBtag, kAK8Jets, kNStages };
+    struct StageStats {
+        std::string name;
+        unsigned long long calls;
+        unsigned long long rejected;
+        std::chrono::steady_clock::duration time;
+    };
+    std::vector<StageStats> mvStageStats;
+
+    template <typename Stage>
+    bool RunStage(SelectionStage istage, Stage stage)
+    {
+        std::chrono::steady_clock::time_point _start = std::chrono::steady_clock::now();
+        bool pass = stage();
+        StageStats & _stats = mvStageStats[istage];
+        _stats.time += std::chrono::steady_clock::now() - _start;
+        ++_stats.calls;
+        if (!pass) ++_stats.rejected;
+        return pass;
+    }
+
+    //Single-pass shift mode: result of the shift-independent part of the last operator() call
+    bool                     bPassShared;
+    pat::strbitset           retShared;
+    int                      sharedWeight;
+
 
     //Trigger
     bool trigger_cut;
@@ -72,6 +108,12 @@ protected:
     std::vector<std::string> trigger_path_el;
     std::vector<std::string> trigger_path_mu;
     std::vector<std::string> trigger_path_hadronic;
+    TriggerPathMatcher mctrigMatch_el;
+    TriggerPathMatcher mctrigMatch_mu;
+    TriggerPathMatcher mctrigMatch_hadronic;
+    TriggerPathMatcher trigMatch_el;
+    TriggerPathMatcher trigMatch_mu;
+    TriggerPathMatcher trigMatch_hadronic;
 
     //PV
     bool pv_cut;
@@ -167,13 +209,21 @@ protected:
 
 
     //Separate methods for each selction for organization
+    bool SharedSelection   (edm::Event const & event, pat::strbitset & ret);
+    bool JetMETSelection   (edm::Event const & event, pat::strbitset & ret);
+    bool LazyJetMETSelection (edm::Event const & event, pat::strbitset & ret);
+    unsigned int JetSyst   ();
     bool TriggerSelection  (edm::Event const & event);
     bool PVSelection       (edm::Event const & event);
     bool METfilter         (edm::Event const & event);
     void MuonSelection     (edm::Event const & event);
     void ElectronSelection (edm::Event const & event);
+    bool LeptonCountPrecheck (edm::Event const & event);
     bool LeptonsSelection  (edm::Event const & event, pat::strbitset & ret);
-    bool JetSelection      (edm::Event const & event, pat::strbitset & ret);
+    bool JetCountPrecheck  (edm::Event const & event);
+    bool JetSelection      (edm::Event const & event, pat::strbitset & ret, bool tagJets = true);
+    void TagSelectedJets   (edm::Event const & event);
+    void FillAllJets       (edm::Event const & event);
     void AK8JetSelection   (edm::Event const & event);
     bool METSelection      (edm::Event const & event);
 
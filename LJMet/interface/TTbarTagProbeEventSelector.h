@@ -18,6 +18,7 @@
 #include "DataFormats/PatCandidates/interface/Jet.h"
 
 #include "FWLJMET/LJMet/interface/MiniIsolation.h"
+#include "FWLJMET/LJMet/interface/TriggerPathMatcher.h"
 
 #include "CondFormats/JetMETObjects/interface/JetCorrectionUncertainty.h"
 #include "CondFormats/JetMETObjects/interface/FactorizedJetCorrector.h"
@@ -70,6 +71,10 @@ protected:
     std::vector<std::string> mctrigger_path_mu;
     std::vector<std::string> trigger_path_el;
     std::vector<std::string> trigger_path_mu;
+    TriggerPathMatcher mctrigMatch_el;
+    TriggerPathMatcher mctrigMatch_mu;
+    TriggerPathMatcher trigMatch_el;
+    TriggerPathMatcher trigMatch_mu;
 
     //PV
     bool pv_cut;
@@ -0,0 +1,54 @@
+#ifndef FWLJMET_LJMet_interface_TriggerPathMatcher_h
+#define FWLJMET_LJMet_interface_TriggerPathMatcher_h
+
+/*
+ Matches the trigger paths requested in the config against the HLT menu.
+
+ The config holds (sub)strings of path names, e.g. "HLT_Ele35_WPTight_Gsf" matches any version
+ of that path. Finding them in the menu is string work over the full menu, so the matching menu
+ indices are resolved only when the menu changes (new TriggerNames ParameterSetID, i.e. at most
+ once per run) and the per event work is reduced to accept(index) reads.
+
+ Usage:
+     matcher.SetPaths(trigger_path_el);           // BeginJob
+     matcher.Update(trigNames);                   // every event, cheap if the menu did not change
+     matcher.GetIndices(ipath)                    // menu indices matching trigger_path_el[ipath]
+*/
+
+#include <iostream>
+#include <string>
+#include <vector>
+
+#include "FWCore/Common/interface/TriggerNames.h"
+#include "FWCore/Utilities/interface/ParameterSetID.h"
+
+
+class TriggerPathMatcher {
+
+public:
+
+    TriggerPathMatcher();
+    ~TriggerPathMatcher();
+
+    /// Set the configured path names to look for
+    void SetPaths(std::vector<std::string> const & paths);
+
+    /// Re-resolve the menu indices if the HLT menu changed, returns true if it did
+    bool Update(edm::TriggerNames const & trigNames);
+
+    unsigned int size() const { return mvPaths.size(); }
+    std::string const & GetPath(unsigned int ipath) const { return mvPaths[ipath]; }
+
+    /// Menu indices (in menu order) of all paths containing the configured path ipath
+    std::vector<unsigned int> const & GetIndices(unsigned int ipath) const { return mvIndices[ipath]; }
+
+private:
+
+    std::vector<std::string> mvPaths;
+    std::vector<std::vector<unsigned int>> mvIndices;
+    edm::ParameterSetID mMenuID;
+    bool mbResolved;
+
+};
+
+#endif
@@ -1,10 +1,34 @@
 #include "FWLJMET/LJMet/interface/BaseCalc.h"
 #include "FWLJMET/LJMet/interface/LjmetEventContent.h"
 
+#include <algorithm>
+
 BaseCalc::BaseCalc():
 mName(""),
-mLegend("")
+mLegend(""),
+mpEc(0),
+mShift(-1),
+mbDeclared(false)
+{
+}
+
+bool BaseCalc::ConflictsWith(BaseCalc const & other) const
 {
+    if (!mbDeclared || !other.mbDeclared) return true;
+    
+    // one reads the other's branches
+    if (std::find(mvReads.begin(), mvReads.end(), other.mName) != mvReads.end()) return true;
+    if (std::find(other.mvReads.begin(), other.mvReads.end(), mName) != other.mvReads.end()) return true;
+    
+    // a shared resource written by one and used by the other
+    for (std::vector<std::string>::const_iterator it = mvWrites.begin(); it != mvWrites.end(); ++it) {
+        if (std::find(other.mvReads.begin(), other.mvReads.end(), *it) != other.mvReads.end()) return true;
+        if (std::find(other.mvWrites.begin(), other.mvWrites.end(), *it) != other.mvWrites.end()) return true;
+    }
+    for (std::vector<std::string>::const_iterator it = other.mvWrites.begin(); it != other.mvWrites.end(); ++it) {
+        if (std::find(mvReads.begin(), mvReads.end(), *it) != mvReads.end()) return true;
+    }
+    return false;
 }
 
 void BaseCalc::SetHistogram(std::string name, int nbins, double low, double high)
@@ -44,25 +68,25 @@ void BaseCalc::SetValue(std::string name, double value)
 void BaseCalc::SetValue(std::string name, std::vector<bool> value)
 {
     std::string _name = name + "_" + mName;
-    mpEc->SetValue(_name, value);
+    mpEc->SetValue(_name, std::move(value));
 }
 
 void BaseCalc::SetValue(std::string name, std::vector<int> value)
 {
     std::string _name = name + "_" + mName;
-    mpEc->SetValue(_name, value);
+    mpEc->SetValue(_name, std::move(value));
 }
 
 void BaseCalc::SetValue(std::string name, std::vector<double> value)
 {
     std::string _name = name + "_" + mName;
-    mpEc->SetValue(_name, value);
+    mpEc->SetValue(_name, std::move(value));
 }
 
 void BaseCalc::SetValue(std::string name, std::vector<std::string> value)
 {
   std::string _name = name + "_" + mName;
-  mpEc->SetValue(_name, value);
+  mpEc->SetValue(_name, std::move(value));
 }
 
 void BaseCalc::init()
@@ -10,7 +10,8 @@ using namespace std;
 
 BaseEventSelector::BaseEventSelector():
 mName(""),
-mLegend("")
+mLegend(""),
+mShift(-1)
 {
 }
 
@@ -23,6 +24,13 @@ void BaseEventSelector::EndJob()
 {
 }
 
+bool BaseEventSelector::SelectShift(edm::Event const & event, pat::strbitset & ret)
+{
+    std::cout << mLegend << "single-pass shift mode (shift_variations) is not implemented for " << mName << std::endl;
+    std::exit(-1);
+    return false;
+}
+
 void BaseEventSelector::BeginEvent(edm::EventBase const & event, LjmetEventContent & ec)
 {
 }
@@ -36,7 +44,25 @@ void BaseEventSelector::EndEvent(edm::EventBase const & event, LjmetEventContent
 void BaseEventSelector::Init( void )
 {
 
-    mpEc->SetHistogram(mName, "nEvents", 4, -2,2); // to record total events prior to any selection (and ideally negative weights for MC). 
+    mhNEvents = mpEc->SetHistogram(mName, "nEvents", 4, -2,2); // to record total events prior to any selection (and ideally negative weights for MC). 
 
 }
 
+
+void BaseEventSelector::AddCutFlowStep(std::string histname, std::vector<std::string> const & cuts)
+{
+    std::vector<index_type> _cuts;
+    for (std::vector<std::string>::const_iterator it = cuts.begin(); it != cuts.end(); ++it) _cuts.push_back(index_type(&bits_, *it));
+    mvCutFlowSteps.push_back(std::make_pair(SetHistogram(histname, 2, 0, 2), _cuts));
+}
+
+void BaseEventSelector::FillCutFlow(pat::strbitset const & ret, double value)
+{
+    for (unsigned int istep = 0; istep < mvCutFlowSteps.size(); istep++){
+        std::vector<index_type> const & _cuts = mvCutFlowSteps[istep].second;
+        for (unsigned int icut = 0; icut < _cuts.size(); icut++){
+            if ( ! ret[_cuts[icut]] ) return;
+        }
+        FillHist(mvCutFlowSteps[istep].first, value);
+    }
+}
@@ -1,5 +1,7 @@
 #include "FWLJMET/LJMet/interface/BestCalc.h"
 
+#include "tbb/parallel_for.h"
+
 
 int BestCalc::BeginJob(edm::ConsumesCollector && iC){
 
@@ -22,8 +24,62 @@ int BestCalc::BeginJob(edm::ConsumesCollector && iC){
     cfg = lwt::parse_json( input_cfg );
     m_lwtnn = std::unique_ptr<lwt::LightweightNeuralNetwork>(new lwt::LightweightNeuralNetwork(cfg.inputs, cfg.layers, cfg.outputs));
 
+    // names of the flat BEST inputs, same as the keys of m_BESTvars
+    std::vector<std::string> frameNames = {"top","W","Z","H","jet"};
+    m_varNames = std::vector<std::string>(kNBESTVars);
+    m_varNames[vbDisc]      = "bDisc";
+    m_varNames[vbDisc1]     = "bDisc1";
+    m_varNames[vbDisc2]     = "bDisc2";
+    m_varNames[vet]         = "et";
+    m_varNames[veta]        = "eta";
+    m_varNames[vmass]       = "mass";
+    m_varNames[vSDmass]     = "SDmass";
+    m_varNames[vtau32]      = "tau32";
+    m_varNames[vtau21]      = "tau21";
+    m_varNames[vq]          = "q";
+    m_varNames[vNjets_orig] = "Njets_orig";
+    for (unsigned int ff=0; ff<fLab; ff++){
+      std::string massName = (ff == fJet) ? "_jet" : frameNames[ff];
+      m_varNames[varIndex(vm1234,ff)]   = "m1234"+massName;
+      m_varNames[varIndex(vm12,ff)]     = "m12"+massName;
+      m_varNames[varIndex(vm23,ff)]     = "m23"+massName;
+      m_varNames[varIndex(vm13,ff)]     = "m13"+massName;
+      m_varNames[varIndex(vsumPz,ff)]   = "sumPz_"+frameNames[ff];
+      m_varNames[varIndex(vsumP,ff)]    = "sumP_"+frameNames[ff];
+      m_varNames[varIndex(vpzOverp,ff)] = "pzOverp_"+frameNames[ff];
+      m_varNames[varIndex(vNjets,ff)]   = "Njets_"+frameNames[ff];
+      if (ff == fJet) continue;  // no event shapes in the jet rest frame
+      m_varNames[varIndex(vFWmoment1,ff)]  = "FWmoment1"+frameNames[ff];
+      m_varNames[varIndex(vFWmoment2,ff)]  = "FWmoment2"+frameNames[ff];
+      m_varNames[varIndex(vFWmoment3,ff)]  = "FWmoment3"+frameNames[ff];
+      m_varNames[varIndex(vFWmoment4,ff)]  = "FWmoment4"+frameNames[ff];
+      m_varNames[varIndex(visotropy,ff)]   = "isotropy"+frameNames[ff];
+      m_varNames[varIndex(vsphericity,ff)] = "sphericity"+frameNames[ff];
+      m_varNames[varIndex(vaplanarity,ff)] = "aplanarity"+frameNames[ff];
+      m_varNames[varIndex(vthrust,ff)]     = "thrust"+frameNames[ff];
+    }
+
+    // resolve the network inputs to row entries once, the preprocessing is the one of lwt::InputPreprocessor
+    for (unsigned int i=0; i<cfg.inputs.size(); i++){
+      std::vector<std::string>::const_iterator it = std::find(m_varNames.begin(), m_varNames.end(), cfg.inputs[i].name);
+      if (cfg.inputs[i].name.empty() || it == m_varNames.end()){
+        std::cout << "["+GetName()+"]: network input " << cfg.inputs[i].name << " is not a BEST variable" << std::endl;
+        std::exit(-1);
+      }
+      m_inputIndex.push_back(it - m_varNames.begin());
+      m_inputOffsets.push_back(cfg.inputs[i].offset);
+      m_inputScales.push_back(cfg.inputs[i].scale);
+    }
+    m_stack = std::unique_ptr<lwt::Stack>(new lwt::Stack(cfg.inputs.size(), cfg.layers));
+
+    // the frames are reclustered concurrently, the fastjet banner is printed on the first ClusterSequence
+    fastjet::ClusterSequence::print_banner();
+
     std::cout << "END of BestCalc constructor" << std::endl;
 
+    // only reads the selector's AK8 jets, can run next to the other calculators
+    DeclareDependencies({}, {});
+
     return 0;
 
 }
@@ -144,6 +200,10 @@ int BestCalc::AnalyzeEvent(edm::Event const & event, BaseEventSelector * selecto
 
   //   std::vector <double> AK8JetRCN;
   //for (std::vector<pat::Jet>::const_iterator ijet = AK8Jets->begin(); ijet != AK8Jets->end(); ijet++){
+  // jets BEST runs on, their BEST inputs are computed for all of them at once
+  std::vector<const pat::Jet *> bestJets;
+  std::vector<unsigned int> bestSlots;
+
   for (std::vector<pat::Jet>::const_iterator ii = vSelCorrJets_AK8.begin(); ii != vSelCorrJets_AK8.end(); ii++){
 
     if(ii->pt() < 170) continue; // not all info there for lower pt
@@ -157,91 +217,13 @@ int BestCalc::AnalyzeEvent(edm::Event const & event, BaseEventSelector * selecto
     //AK8JetCSV    . push_back(ii->bDiscriminator( "pfCombinedInclusiveSecondaryVertexV2BJetTags" ));
     //     AK8JetRCN    . push_back((corrak8.chargedEmEnergy()+corrak8.chargedHadronEnergy()) / (corrak8.neutralEmEnergy()+corrak8.neutralHadronEnergy()));
 
-    std::map<std::string,double> myMap;
-    std::map<std::string,double> varMap;
-    myMap = {
-      {"dnn_qcd",  -999},
-      {"dnn_top",  -999},
-      {"dnn_higgs",-999},
-      {"dnn_z",    -999},
-      {"dnn_w",    -999},
-      {"dnn_b",    -999}
-    };
-    varMap = {
-      {"bDisc",      -999},
-      {"bDisc1",     -999},
-      {"bDisc2",     -999},
-      {"et",         -999},
-      {"eta",        -999},
-      {"mass",       -999},
-      {"SDmass",     -999},
-      {"tau32",      -999},
-      {"tau21",      -999},
-      {"q",          -999},
-      {"m1234_jet",  -999},
-      {"m12_jet",    -999},
-      {"m23_jet",    -999},
-      {"m13_jet",    -999},
-      {"m1234top",   -999},
-      {"m12top",     -999},
-      {"m23top",     -999},
-      {"m13top",     -999},
-      {"m1234W",     -999},
-      {"m12W",       -999},
-      {"m23W",       -999},
-      {"m13W",       -999},
-      {"m1234Z",     -999},
-      {"m12Z",       -999},
-      {"m23Z",       -999},
-      {"m13Z",       -999},
-      {"m1234H",     -999},
-      {"m12H",       -999},
-      {"m23H",       -999},
-      {"m13H",       -999},
-      {"pzOverp_top",-999},
-      {"pzOverp_W",  -999},
-      {"pzOverp_Z",  -999},
-      {"pzOverp_H",  -999},
-      {"pzOverp_jet",-999},
-      {"Njets_top",      -999},
-      {"Njets_W",        -999},
-      {"Njets_Z",        -999},
-      {"Njets_H",        -999},
-      {"Njets_jet",      -999},
-      {"Njets_orig",     -999},
-      {"FWmoment1top",   -999},
-      {"FWmoment2top",   -999},
-      {"FWmoment3top",   -999},
-      {"FWmoment4top",   -999},
-      {"isotropytop",    -999},
-      {"sphericitytop",  -999},
-      {"aplanaritytop",  -999},
-      {"thrusttop",      -999},
-      {"FWmoment1W",     -999},
-      {"FWmoment2W",     -999},
-      {"FWmoment3W",     -999},
-      {"FWmoment4W",     -999},
-      {"isotropyW",      -999},
-      {"sphericityW",    -999},
-      {"aplanarityW",    -999},
-      {"thrustW",        -999},
-      {"FWmoment1Z",     -999},
-      {"FWmoment2Z",     -999},
-      {"FWmoment3Z",     -999},
-      {"FWmoment4Z",     -999},
-      {"isotropyZ",      -999},
-      {"sphericityZ",    -999},
-      {"aplanarityZ",    -999},
-      {"thrustZ",        -999},
-      {"FWmoment1H",     -999},
-      {"FWmoment2H",     -999},
-      {"FWmoment3H",     -999},
-      {"FWmoment4H",     -999},
-      {"isotropyH",      -999},
-      {"sphericityH",    -999},
-      {"aplanarityH",    -999},
-      {"thrustH",        -999}
-    };
+    dnn_QCD.push_back(-999);
+    dnn_Top.push_back(-999);
+    dnn_Higgs.push_back(-999);
+    dnn_Z.push_back(-999);
+    dnn_W.push_back(-999);
+    dnn_B.push_back(-999);
+    dnn_largest.push_back(10);
 
     std::vector<std::string> labels = ii->subjetCollectionNames();
     if(labels.size() == 0) std::cout << "there are no subjet collection labels" << std::endl;
@@ -252,123 +234,58 @@ int BestCalc::AnalyzeEvent(edm::Event const & event, BaseEventSelector * selecto
 
     unsigned int numDaughters = ii->numberOfDaughters();
     float softdropmass = ii->userFloat("ak8PFJetsPuppiSoftDropMass");
-    int largest = 10;
 
     if (thisSubjets.size() >= m_numSubjetsMin && numDaughters >= m_numDaughtersMin && softdropmass >= m_jetSoftDropMassMin){
-      varMap = BestCalc::execute(*ii);
-      myMap = m_lwtnn->compute(varMap);
-
-      if (myMap["dnn_qcd"] > myMap["dnn_top"] && myMap["dnn_qcd"] > myMap["dnn_higgs"] && myMap["dnn_qcd"] > myMap["dnn_z"] && myMap["dnn_qcd"] > myMap["dnn_w"] && myMap["dnn_qcd"] > myMap["dnn_b"]){
-	largest = 0;
-      } else if (myMap["dnn_top"] > myMap["dnn_qcd"] && myMap["dnn_top"] > myMap["dnn_higgs"] && myMap["dnn_top"] > myMap["dnn_z"] && myMap["dnn_top"] > myMap["dnn_w"] && myMap["dnn_top"] > myMap["dnn_b"]){
-	largest = 1;
-      } else if (myMap["dnn_higgs"] > myMap["dnn_top"] && myMap["dnn_higgs"] > myMap["dnn_qcd"] && myMap["dnn_higgs"] > myMap["dnn_z"] && myMap["dnn_higgs"] > myMap["dnn_w"] && myMap["dnn_higgs"] > myMap["dnn_b"]){
-	largest = 2;
-      } else if (myMap["dnn_z"] > myMap["dnn_top"] && myMap["dnn_z"] > myMap["dnn_higgs"] && myMap["dnn_z"] > myMap["dnn_qcd"] && myMap["dnn_z"] > myMap["dnn_w"] && myMap["dnn_z"] > myMap["dnn_b"]){
-	largest = 3;
-      } else if (myMap["dnn_w"] > myMap["dnn_top"] && myMap["dnn_w"] > myMap["dnn_higgs"] && myMap["dnn_w"] > myMap["dnn_qcd"] && myMap["dnn_w"] > myMap["dnn_z"] && myMap["dnn_w"] > myMap["dnn_b"]){
-	largest = 4;
-      } else if (myMap["dnn_b"] > myMap["dnn_top"] && myMap["dnn_b"] > myMap["dnn_higgs"] && myMap["dnn_b"] > myMap["dnn_qcd"] && myMap["dnn_b"] > myMap["dnn_z"] && myMap["dnn_b"] > myMap["dnn_w"]){
-        largest = 5;
-      } else
-	largest = 10;
+      bestJets.push_back(&(*ii));
+      bestSlots.push_back(AK8JetPt.size() - 1);
     }
 
-    // bDisc.push_back(varMap["bDisc"]);
-    // bDisc1.push_back(varMap["bDisc1"]);
-    // bDisc2.push_back(varMap["bDisc2"]);
-
-    // et.push_back(varMap["et"]);
-    // eta.push_back(varMap["eta"]);
-    // mass.push_back(varMap["mass"]);
-    // SDmass.push_back(varMap["SDmass"]);
-    // tau32.push_back(varMap["tau32"]);
-    // tau21.push_back(varMap["tau21"]);
-    // q.push_back(varMap["q"]);
-
-    // m1234_jet.push_back(varMap["m1234_jet"]);
-    // m12_jet.push_back(varMap["m12_jet"]);
-    // m23_jet.push_back(varMap["m23_jet"]);
-    // m13_jet.push_back(varMap["m13_jet"]);
-
-    // m1234top.push_back(varMap["m1234top"]);
-    // m12top.push_back(varMap["m12top"]);
-    // m23top.push_back(varMap["m23top"]);
-    // m13top.push_back(varMap["m13top"]);
-
-    // m1234W.push_back(varMap["m1234W"]);
-    // m12W.push_back(varMap["m12W"]);
-    // m23W.push_back(varMap["m23W"]);
-    // m13W.push_back(varMap["m13W"]);
-
-    // m1234Z.push_back(varMap["m1234Z"]);
-    // m12Z.push_back(varMap["m12Z"]);
-    // m23Z.push_back(varMap["m23Z"]);
-    // m13Z.push_back(varMap["m13Z"]);
-
-    // m1234H.push_back(varMap["m1234H"]);
-    // m12H.push_back(varMap["m12H"]);
-    // m23H.push_back(varMap["m23H"]);
-    // m13H.push_back(varMap["m13H"]);
-
-    // pzOverp_top.push_back(varMap["pzOverp_top"]);
-    // pzOverp_W.push_back(varMap["pzOverp_W"]);
-    // pzOverp_Z.push_back(varMap["pzOverp_Z"]);
-    // pzOverp_H.push_back(varMap["pzOverp_H"]);
-    // pzOverp_jet.push_back(varMap["pzOverp_jet"]);
-
-    // Njets_top.push_back(varMap["Njets_top"]);
-    // Njets_W.push_back(varMap["Njets_W"]);
-    // Njets_Z.push_back(varMap["Njets_Z"]);
-    // Njets_H.push_back(varMap["Njets_H"]);
-    // Njets_jet.push_back(varMap["Njets_jet"]);
-    // Njets_orig.push_back(varMap["Njets_orig"]);
-
-    // FWmoment1top.push_back(varMap["FWmoment1top"]);
-    // FWmoment2top.push_back(varMap["FWmoment2top"]);
-    // FWmoment3top.push_back(varMap["FWmoment3top"]);
-    // FWmoment4top.push_back(varMap["FWmoment4top"]);
-    // isotropytop.push_back(varMap["isotropytop"]);
-    // sphericitytop.push_back(varMap["sphericitytop"]);
-    // aplanaritytop.push_back(varMap["aplanaritytop"]);
-    // thrusttop.push_back(varMap["thrusttop"]);
-
-    // FWmoment1W.push_back(varMap["FWmoment1W"]);
-    // FWmoment2W.push_back(varMap["FWmoment2W"]);
-    // FWmoment3W.push_back(varMap["FWmoment3W"]);
-    // FWmoment4W.push_back(varMap["FWmoment4W"]);
-    // isotropyW.push_back(varMap["isotropyW"]);
-    // sphericityW.push_back(varMap["sphericityW"]);
-    // aplanarityW.push_back(varMap["aplanarityW"]);
-    // thrustW.push_back(varMap["thrustW"]);
-
-    // FWmoment1Z.push_back(varMap["FWmoment1Z"]);
-    // FWmoment2Z.push_back(varMap["FWmoment2Z"]);
-    // FWmoment3Z.push_back(varMap["FWmoment3Z"]);
-    // FWmoment4Z.push_back(varMap["FWmoment4Z"]);
-    // isotropyZ.push_back(varMap["isotropyZ"]);
-    // sphericityZ.push_back(varMap["sphericityZ"]);
-    // aplanarityZ.push_back(varMap["aplanarityZ"]);
-    // thrustZ.push_back(varMap["thrustZ"]);
-
-    // FWmoment1H.push_back(varMap["FWmoment1H"]);
-    // FWmoment2H.push_back(varMap["FWmoment2H"]);
-    // FWmoment3H.push_back(varMap["FWmoment3H"]);
-    // FWmoment4H.push_back(varMap["FWmoment4H"]);
-    // isotropyH.push_back(varMap["isotropyH"]);
-    // sphericityH.push_back(varMap["sphericityH"]);
-    // aplanarityH.push_back(varMap["aplanarityH"]);
-    // thrustH.push_back(varMap["thrustH"]);
-
-    dnn_QCD.push_back(myMap["dnn_qcd"]);
-    dnn_Top.push_back(myMap["dnn_top"]);
-    dnn_Higgs.push_back(myMap["dnn_higgs"]);
-    dnn_Z.push_back(myMap["dnn_z"]);
-    dnn_W.push_back(myMap["dnn_w"]);
-    dnn_B.push_back(myMap["dnn_b"]);
-
-    dnn_largest.push_back(largest);
+  }
 
+  computeJetValues(bestJets);
+
+  // network over the batch: the inputs are taken from the rows by index, no string maps
+  unsigned int numOutputs = cfg.outputs.size();
+  m_NNoutputs.assign(bestJets.size() * numOutputs, 0.0);
+  Eigen::VectorXd nnInputs(m_inputIndex.size());
+  for (unsigned int ijet=0; ijet<bestJets.size(); ijet++){
+    const double * values = &m_values[ijet * kNBESTVars];
+    for (unsigned int i=0; i<m_inputIndex.size(); i++){
+      nnInputs(i) = (values[m_inputIndex[i]] + m_inputOffsets[i]) * m_inputScales[i];
+    }
+    Eigen::VectorXd nnOutputs = m_stack->compute(nnInputs);
+    for (unsigned int i=0; i<numOutputs; i++) m_NNoutputs[ijet * numOutputs + i] = nnOutputs(i);
+  }
+
+  for (unsigned int ijet=0; ijet<bestJets.size(); ijet++){
+    // outputs the network does not have are 0, as for a missing key of the lwtnn result map
+    std::map<std::string,double> myMap;
+    for (unsigned int i=0; i<numOutputs; i++) myMap[cfg.outputs[i]] = m_NNoutputs[ijet * numOutputs + i];
+
+    int largest = 10;
+    if (myMap["dnn_qcd"] > myMap["dnn_top"] && myMap["dnn_qcd"] > myMap["dnn_higgs"] && myMap["dnn_qcd"] > myMap["dnn_z"] && myMap["dnn_qcd"] > myMap["dnn_w"] && myMap["dnn_qcd"] > myMap["dnn_b"]){
+      largest = 0;
+    } else if (myMap["dnn_top"] > myMap["dnn_qcd"] && myMap["dnn_top"] > myMap["dnn_higgs"] && myMap["dnn_top"] > myMap["dnn_z"] && myMap["dnn_top"] > myMap["dnn_w"] && myMap["dnn_top"] > myMap["dnn_b"]){
+      largest = 1;
+    } else if (myMap["dnn_higgs"] > myMap["dnn_top"] && myMap["dnn_higgs"] > myMap["dnn_qcd"] && myMap["dnn_higgs"] > myMap["dnn_z"] && myMap["dnn_higgs"] > myMap["dnn_w"] && myMap["dnn_higgs"] > myMap["dnn_b"]){
+      largest = 2;
+    } else if (myMap["dnn_z"] > myMap["dnn_top"] && myMap["dnn_z"] > myMap["dnn_higgs"] && myMap["dnn_z"] > myMap["dnn_qcd"] && myMap["dnn_z"] > myMap["dnn_w"] && myMap["dnn_z"] > myMap["dnn_b"]){
+      largest = 3;
+    } else if (myMap["dnn_w"] > myMap["dnn_top"] && myMap["dnn_w"] > myMap["dnn_higgs"] && myMap["dnn_w"] > myMap["dnn_qcd"] && myMap["dnn_w"] > myMap["dnn_z"] && myMap["dnn_w"] > myMap["dnn_b"]){
+      largest = 4;
+    } else if (myMap["dnn_b"] > myMap["dnn_top"] && myMap["dnn_b"] > myMap["dnn_higgs"] && myMap["dnn_b"] > myMap["dnn_qcd"] && myMap["dnn_b"] > myMap["dnn_z"] && myMap["dnn_b"] > myMap["dnn_w"]){
+      largest = 5;
+    } else
+      largest = 10;
+
+    unsigned int islot = bestSlots[ijet];
+    dnn_QCD[islot]     = myMap["dnn_qcd"];
+    dnn_Top[islot]     = myMap["dnn_top"];
+    dnn_Higgs[islot]   = myMap["dnn_higgs"];
+    dnn_Z[islot]       = myMap["dnn_z"];
+    dnn_W[islot]       = myMap["dnn_w"];
+    dnn_B[islot]       = myMap["dnn_b"];
+    dnn_largest[islot] = largest;
   }
 
   //Four std::vector
@@ -499,23 +416,60 @@ std::map<std::string,double> BestCalc::execute( const pat::Jet& jet ){
 
 void BestCalc::getJetValues( const pat::Jet& jet ){
   /* Grab attributes from the jet and store them in map
+       (single jet version of computeJetValues)
+  */
+  std::vector<const pat::Jet *> jets(1, &jet);
+  computeJetValues(jets);
+
+  // clear the map from the previous jet's values
+  m_BESTvars.clear();
+  for (unsigned int i=0; i<kNBESTVars; i++){
+    if (!m_varNames[i].empty()) m_BESTvars[m_varNames[i]] = m_values[i];
+  }
+
+  return;
+}
+
+
+void BestCalc::computeJetValues( const std::vector<const pat::Jet *> & jets ){
+  /* BEST inputs of all jets in m_values
+       - the boosted constituents of all jets are collected in flat per frame buffers
+       - each (jet, frame) pair is reclustered and its event shapes computed
+         in parallel, they only read the buffers and write their own values
+  */
+  unsigned int numJets = jets.size();
+
+  for (unsigned int ff=0; ff<kNFrames; ff++) m_FJparticles[ff].clear();
+  m_jetOffsets.assign(1, 0);
+  m_values.assign(numJets * kNBESTVars, -999);
+
+  for (unsigned int ijet=0; ijet<numJets; ijet++){
+    fillConstituents(*jets[ijet], &m_values[ijet * kNBESTVars]);
+    m_jetOffsets.push_back(m_FJparticles[fTop].size());
+  }
+
+  unsigned int numFrames = kNFrames;
+  tbb::parallel_for(0u, numJets * numFrames, [&](unsigned int itask){
+    unsigned int ijet = itask / numFrames;
+    fillFrameValues(ijet, itask % numFrames, &m_values[ijet * kNBESTVars]);
+  });
+
+  return;
+}
+
+
+void BestCalc::fillConstituents( const pat::Jet& jet, double * values ){
+  /* Append the constituents of the jet to the frame buffers and set
+     the jet level values
        Jet requirements:
          pT > 500 GeV
          soft-drop mass > 40 GeV
          >=2 subjets
          >=2 daughters
            daughter->pt() >= 0.05
-         m_reclusterJetPtMin = 30 GeV
-         maxJets = 4
-           sumP, sumPz
-           pair-wise invariant mass
   */
-  using namespace fastjet;
   typedef reco::Candidate::PolarLorentzVector fourv;
 
-  // clear the map from the previous jet's values
-  m_BESTvars.clear();
-
   // Access the subjets
   auto const& thisSubjets   = jet.subjets("SoftDropPuppi");
   unsigned int numDaughters = jet.numberOfDaughters();
@@ -550,55 +504,24 @@ void BestCalc::getJetValues( const pat::Jet& jet ){
   // BEST vars
   fourv thisJet = jet.polarP4();
 
-  // Boost to rest frame
-  TLorentzVector thisJetLV;
-  TLorentzVector thisJetLV_W;
-  TLorentzVector thisJetLV_Z;
-  TLorentzVector thisJetLV_H;
-  TLorentzVector thisJetLV_top;
-  thisJetLV.SetPtEtaPhiM(thisJet.Pt(), thisJet.Eta(), thisJet.Phi(), thisJet.M() );
-  thisJetLV_W.SetPtEtaPhiM(thisJet.Pt(),   thisJet.Eta(), thisJet.Phi(), m_Wmass ); // W mass [GeV]
-  thisJetLV_Z.SetPtEtaPhiM(thisJet.Pt(),   thisJet.Eta(), thisJet.Phi(), m_Zmass ); // Z mass
-  thisJetLV_H.SetPtEtaPhiM(thisJet.Pt(),   thisJet.Eta(), thisJet.Phi(), m_Hmass ); // Higgs mass
-  thisJetLV_top.SetPtEtaPhiM(thisJet.Pt(), thisJet.Eta(), thisJet.Phi(), m_Tmass ); // Top mass
-
-  std::vector<TLorentzVector> particles_jet;
-  std::vector<TLorentzVector> particles_top;
-  std::vector<TLorentzVector> particles_W;
-  std::vector<TLorentzVector> particles_Z;
-  std::vector<TLorentzVector> particles_H;
-
-  std::vector<math::XYZVector> particles2_jet;
-  std::vector<math::XYZVector> particles2_top;
-  std::vector<math::XYZVector> particles2_W;
-  std::vector<math::XYZVector> particles2_Z;
-  std::vector<math::XYZVector> particles2_H;
-
-  std::vector<reco::LeafCandidate> particles3_jet;
-  std::vector<reco::LeafCandidate> particles3_top;
-  std::vector<reco::LeafCandidate> particles3_W;
-  std::vector<reco::LeafCandidate> particles3_Z;
-  std::vector<reco::LeafCandidate> particles3_H;
-
-  std::vector<fastjet::PseudoJet> topFJparticles;
-  std::vector<fastjet::PseudoJet> ZFJparticles;
-  std::vector<fastjet::PseudoJet> WFJparticles;
-  std::vector<fastjet::PseudoJet> HFJparticles;
-  std::vector<fastjet::PseudoJet> topFJparticles_noBoost;
-  std::vector<fastjet::PseudoJet> jetFJparticles;
-  std::vector<fastjet::PseudoJet> jetFJparticles_noBoost;
-  std::vector<fastjet::PseudoJet> jetFJparticles_transformed;
-
-  TVector3 transformedV;
+  // Boost to rest frame, indices = top, W, Z, H, j
+  double frameMass[fLab] = {m_Tmass, m_Wmass, m_Zmass, m_Hmass, thisJet.M()};
+  TVector3 frameBoost[fLab];
+  TVector3 frameAxis[fLab];
+  for (unsigned int ff=0; ff<fLab; ff++){
+    TLorentzVector thisJetLV;
+    thisJetLV.SetPtEtaPhiM(thisJet.Pt(), thisJet.Eta(), thisJet.Phi(), frameMass[ff] );
+    frameBoost[ff] = -thisJetLV.BoostVector();
+    frameAxis[ff]  = thisJetLV.Vect();
+  }
 
   // Jet charge calculation (from daughters)
   float qxptsum(0.0);                             // jet charge
   float ptsum = pow(jet.pt(), m_jetChargeKappa);  // weighted jet pT
 
   // loop over daughters
-  auto daus(jet.daughterPtrVector());             // load the daughters
-  auto daughter0 = jet.daughter(0); //daus.at(0); // First soft drop constituent
-  auto daughter1 = jet.daughter(1); //daus.at(1); // Second soft drop constituent
+  auto daughter0 = jet.daughter(0); // First soft drop constituent
+  auto daughter1 = jet.daughter(1); // Second soft drop constituent
   std::vector<reco::Candidate*> daughtersOfJet;   // store all daughters in one vector
 
   // access daughters of the first soft drop constituent
@@ -611,8 +534,8 @@ void BestCalc::getJetValues( const pat::Jet& jet ){
   }
 
   // access remaining daughters not retained by in soft drop
-  for (unsigned int i=2,size=jet.numberOfDaughters()/*daus.size()*/; i<size; i++){
-    daughtersOfJet.push_back( (reco::Candidate*)jet.daughter(i) ); //(reco::Candidate)daus.at(i) );
+  for (unsigned int i=2,size=jet.numberOfDaughters(); i<size; i++){
+    daughtersOfJet.push_back( (reco::Candidate*)jet.daughter(i) );
   }
 
   for(unsigned int i=0,size=daughtersOfJet.size(); i<size; i++){
@@ -626,354 +549,129 @@ void BestCalc::getJetValues( const pat::Jet& jet ){
     float dau_pz = daughter->pz();
     float dau_e  = daughter->energy();
 
-    TLorentzVector thisParticleLV_jet( dau_px,dau_py,dau_pz,dau_e );
-    TLorentzVector thisParticleLV_top( dau_px,dau_py,dau_pz,dau_e );
-    TLorentzVector thisParticleLV_W(   dau_px,dau_py,dau_pz,dau_e );
-    TLorentzVector thisParticleLV_Z(   dau_px,dau_py,dau_pz,dau_e );
-    TLorentzVector thisParticleLV_H(   dau_px,dau_py,dau_pz,dau_e );
-
     if (daughter->pt() > 1.0)
       qxptsum += daughter->charge() * pow( daughter->pt(), m_jetChargeKappa);
 
+    m_FJparticles[fLab].push_back( fastjet::PseudoJet( dau_px,dau_py,dau_pz,dau_e ) );
 
-    topFJparticles_noBoost.push_back( PseudoJet( thisParticleLV_top.X(), thisParticleLV_top.Y(), thisParticleLV_top.Z(), thisParticleLV_top.T() ) );
-    jetFJparticles_noBoost.push_back( PseudoJet( thisParticleLV_jet.X(), thisParticleLV_jet.Y(), thisParticleLV_jet.Z(), thisParticleLV_jet.T() ) );
-
-    TLorentzVector thisParticleLV_transformed( transformedV.X(), transformedV.Y(), transformedV.Z(), thisParticleLV_jet.E() );
-
-    jetFJparticles_transformed.push_back( PseudoJet( thisParticleLV_transformed.X(), thisParticleLV_transformed.Y(), thisParticleLV_transformed.Z(), thisParticleLV_transformed.T() ) );
-
-    thisParticleLV_jet.Boost( -thisJetLV.BoostVector() );
-    thisParticleLV_Z.Boost(   -thisJetLV_Z.BoostVector() );
-    thisParticleLV_W.Boost(   -thisJetLV_W.BoostVector() );
-    thisParticleLV_H.Boost(   -thisJetLV_H.BoostVector() );
-    thisParticleLV_top.Boost( -thisJetLV_top.BoostVector() );
-
-    pboost( thisJetLV_W.Vect(),   thisParticleLV_W.Vect(), thisParticleLV_W);
-    pboost( thisJetLV_Z.Vect(),   thisParticleLV_Z.Vect(), thisParticleLV_Z);
-    pboost( thisJetLV_top.Vect(), thisParticleLV_top.Vect(), thisParticleLV_top);
-    pboost( thisJetLV_H.Vect(),   thisParticleLV_H.Vect(), thisParticleLV_H);
-
-    particles_jet.push_back( thisParticleLV_jet );
-    particles_top.push_back( thisParticleLV_top );
-    particles_W.push_back(   thisParticleLV_W );
-    particles_Z.push_back(   thisParticleLV_Z );
-    particles_H.push_back(   thisParticleLV_H );
-
-    topFJparticles.push_back( PseudoJet( thisParticleLV_top.X(), thisParticleLV_top.Y(), thisParticleLV_top.Z(), thisParticleLV_top.T() ) );
-    WFJparticles.push_back(   PseudoJet( thisParticleLV_W.X(), thisParticleLV_W.Y(), thisParticleLV_W.Z(), thisParticleLV_W.T() ) );
-    ZFJparticles.push_back(   PseudoJet( thisParticleLV_Z.X(), thisParticleLV_Z.Y(), thisParticleLV_Z.Z(), thisParticleLV_Z.T() ) );
-    HFJparticles.push_back(   PseudoJet( thisParticleLV_H.X(), thisParticleLV_H.Y(), thisParticleLV_H.Z(), thisParticleLV_H.T() ) );
-    jetFJparticles.push_back( PseudoJet( thisParticleLV_jet.X(), thisParticleLV_jet.Y(), thisParticleLV_jet.Z(), thisParticleLV_jet.T() ) );
-
-    particles2_top.push_back( math::XYZVector( thisParticleLV_top.X(), thisParticleLV_top.Y(), thisParticleLV_top.Z() ));
-    particles3_top.push_back( reco::LeafCandidate(+1, reco::Candidate::LorentzVector( thisParticleLV_top.X(), thisParticleLV_top.Y(), thisParticleLV_top.Z(), thisParticleLV_top.T()     ) ));
-    particles2_W.push_back(   math::XYZVector( thisParticleLV_W.X(), thisParticleLV_W.Y(), thisParticleLV_W.Z() ));
-    particles3_W.push_back(   reco::LeafCandidate(+1, reco::Candidate::LorentzVector( thisParticleLV_W.X(), thisParticleLV_W.Y(), thisParticleLV_W.Z(), thisParticleLV_W.T()     ) ));
-    particles2_Z.push_back(   math::XYZVector( thisParticleLV_Z.X(), thisParticleLV_Z.Y(), thisParticleLV_Z.Z() ));
-    particles3_Z.push_back(   reco::LeafCandidate(+1, reco::Candidate::LorentzVector( thisParticleLV_Z.X(), thisParticleLV_Z.Y(), thisParticleLV_Z.Z(), thisParticleLV_Z.T()     ) ));
-    particles2_H.push_back(   math::XYZVector( thisParticleLV_H.X(), thisParticleLV_H.Y(), thisParticleLV_H.Z() ));
-    particles3_H.push_back(   reco::LeafCandidate(+1, reco::Candidate::LorentzVector( thisParticleLV_H.X(), thisParticleLV_H.Y(), thisParticleLV_H.Z(), thisParticleLV_H.T()     ) ));
+    for (unsigned int ff=0; ff<fLab; ff++){
+      TLorentzVector thisParticleLV( dau_px,dau_py,dau_pz,dau_e );
+      thisParticleLV.Boost( frameBoost[ff] );
+      if (ff != fJet) pboost( frameAxis[ff], thisParticleLV.Vect(), thisParticleLV );
+      m_FJparticles[ff].push_back( fastjet::PseudoJet( thisParticleLV.X(), thisParticleLV.Y(), thisParticleLV.Z(), thisParticleLV.T() ) );
+    }
   } // end loop over daughters
 
   float jetq = qxptsum / ptsum;  // Jet Charge
 
-  // Fox-Wolfram Moments
-  double fwm[5]     = {0.0, 0.0 ,0.0 ,0.0, 0.0};
-  double fwm_W[5]   = {0.0, 0.0 ,0.0 ,0.0, 0.0};
-  double fwm_top[5] = {0.0, 0.0 ,0.0 ,0.0, 0.0};
-  double fwm_Z[5]   = {0.0, 0.0 ,0.0 ,0.0, 0.0};
-  double fwm_H[5]   = {0.0, 0.0 ,0.0 ,0.0, 0.0};
-
-  FWMoments( particles_W,   fwm_W);
-  FWMoments( particles_jet, fwm);
-  FWMoments( particles_top, fwm_top);
-  FWMoments( particles_Z,   fwm_Z);
-  FWMoments( particles_H,   fwm_H);
-
-  // Event Shapes
-  EventShapeVariables eventShapes_top( particles2_top );
-  EventShapeVariables eventShapes_W( particles2_W );
-  EventShapeVariables eventShapes_Z( particles2_Z );
-  EventShapeVariables eventShapes_H( particles2_H );
-
-  // Thrust
-  Thrust thrustCalculator_top( particles3_top.begin(), particles3_top.end() );
-  Thrust thrustCalculator_W( particles3_W.begin(), particles3_W.end() );
-  Thrust thrustCalculator_Z( particles3_Z.begin(), particles3_Z.end() );
-  Thrust thrustCalculator_H( particles3_H.begin(), particles3_H.end() );
-
-  // Recluster constituents
-  JetDefinition jet_def(antikt_algorithm,  m_radiusSmall);
-  JetDefinition jet_def2(antikt_algorithm, m_radiusLarge);
-
-  ClusterSequence cs(    topFJparticles, jet_def);
-  ClusterSequence cs_W(  WFJparticles,   jet_def);
-  ClusterSequence cs_Z(  ZFJparticles,   jet_def);
-  ClusterSequence cs_H(  HFJparticles,   jet_def);
-  ClusterSequence cs_jet(jetFJparticles, jet_def);
-  ClusterSequence cs_noBoost(topFJparticles_noBoost, jet_def2);
-
-  ClusterSequence cs_transformed(jetFJparticles_transformed, jet_def);
-
-  std::vector<PseudoJet> jetsFJ     = sorted_by_pt( cs.inclusive_jets(m_reclusterJetPtMin) );
-  std::vector<PseudoJet> jetsFJ_W   = sorted_by_pt( cs_W.inclusive_jets(m_reclusterJetPtMin) );
-  std::vector<PseudoJet> jetsFJ_Z   = sorted_by_pt( cs_Z.inclusive_jets(m_reclusterJetPtMin) );
-  std::vector<PseudoJet> jetsFJ_H   = sorted_by_pt( cs_H.inclusive_jets(m_reclusterJetPtMin) );
-  std::vector<PseudoJet> jetsFJ_jet = sorted_by_pt( cs_jet.inclusive_jets(m_reclusterJetPtMin) );
-  std::vector<PseudoJet> jetsFJ_noBoost     = sorted_by_pt( cs_noBoost.inclusive_jets(m_reclusterJetPtMin) );
-  std::vector<PseudoJet> jetsFJ_transformed = sorted_by_pt( cs_transformed.inclusive_jets(m_reclusterJetPtMin) );
+  values[vbDisc]  = (btagValue1 > btagValue2) ? btagValue1 : btagValue2;
+  values[vbDisc1] = btagValue1;
+  values[vbDisc2] = btagValue2;
+  values[vet]     = thisJet.Pt();
+  values[veta]    = thisJet.Rapidity();
+  values[vmass]   = thisJet.M();
+  values[vSDmass] = jet.userFloat("ak8PFJetsPuppiSoftDropMass");
+  values[vtau32]  = (tau2 > 1e-8) ? tau3/tau2 : 999.;
+  values[vtau21]  = (tau1 > 1e-8) ? tau2/tau1 : 999.;
+  values[vq]      = jetq;
 
+  return;
+}
 
-  // pair-wise invariant masses
-  TLorentzVector m1234LV_jet(0.,0.,0.,0.);
-  TLorentzVector m1234LV_W(0.,0.,0.,0.);
-  TLorentzVector m1234LV_Z(0.,0.,0.,0.);
-  TLorentzVector m1234LV_H(0.,0.,0.,0.);
-  TLorentzVector m1234LV_top(0.,0.,0.,0.);
-
-  TLorentzVector m12LV_jet(0.,0.,0.,0.);
-  TLorentzVector m12LV_W(0.,0.,0.,0.);
-  TLorentzVector m12LV_Z(0.,0.,0.,0.);
-  TLorentzVector m12LV_H(0.,0.,0.,0.);
-  TLorentzVector m12LV_top(0.,0.,0.,0.);
-
-  TLorentzVector m13LV_jet(0.,0.,0.,0.);
-  TLorentzVector m13LV_W(0.,0.,0.,0.);
-  TLorentzVector m13LV_Z(0.,0.,0.,0.);
-  TLorentzVector m13LV_H(0.,0.,0.,0.);
-  TLorentzVector m13LV_top(0.,0.,0.,0.);
-
-  TLorentzVector m23LV_jet(0.,0.,0.,0.);
-  TLorentzVector m23LV_W(0.,0.,0.,0.);
-  TLorentzVector m23LV_Z(0.,0.,0.,0.);
-  TLorentzVector m23LV_H(0.,0.,0.,0.);
-  TLorentzVector m23LV_top(0.,0.,0.,0.);
-
-  // sum of jet pz and p  Indices = top, W, Z, H, j
-  float sumP[5]  = {0.0,0.0,0.0,0.0,0.0};
-  float sumPz[5] = {0.0,0.0,0.0,0.0,0.0};
-
-  // -- top
-  for (size_t ii=0,size=std::min(m_maxJetSize,jetsFJ.size()); ii<size; ii++){
-    sumPz[0] += jetsFJ[ii].pz();
-    sumP[0]  += sqrt( jetsFJ[ii].modp2() );
-    thisJetLV    = TLorentzVector(jetsFJ[ii].px(), jetsFJ[ii].py(), jetsFJ[ii].pz(), jetsFJ[ii].e());
-    m1234LV_top += thisJetLV;
-    switch (ii){
-    case 0:
-      m12LV_top += thisJetLV;
-      m13LV_top += thisJetLV;
-      break;
-    case 1:
-      m12LV_top += thisJetLV;
-      m23LV_top += thisJetLV;
-      break;
-    case 2:
-      m13LV_top += thisJetLV;
-      m23LV_top += thisJetLV;
-      break;
-    case 3:
-      break;
-    }
-  }
 
-  // -- W jets
-  for (size_t ii=0,size=std::min(m_maxJetSize,jetsFJ_W.size()); ii<size; ii++){
-    sumPz[1] += jetsFJ_W[ii].pz();
-    sumP[1]  += sqrt( jetsFJ_W[ii].modp2() );
-    thisJetLV  = TLorentzVector(jetsFJ_W[ii].px(), jetsFJ_W[ii].py(), jetsFJ_W[ii].pz(), jetsFJ_W[ii].e());
-    m1234LV_W += thisJetLV;
-    switch (ii){
-    case 0:
-      m12LV_W += thisJetLV;
-      m13LV_W += thisJetLV;
-      break;
-    case 1:
-      m12LV_W += thisJetLV;
-      m23LV_W += thisJetLV;
-      break;
-    case 2:
-      m13LV_W += thisJetLV;
-      m23LV_W += thisJetLV;
-      break;
-    case 3:
-      break;
-    }
-  }
+void BestCalc::fillFrameValues( unsigned int ijet, unsigned int frame, double * values ) const {
+  /* Recluster the constituents of one jet in one frame
+       m_reclusterJetPtMin = 30 GeV
+       maxJets = 4
+         sumP, sumPz
+         pair-wise invariant mass
+  */
+  using namespace fastjet;
 
-  // -- Z jets
-  for (size_t ii=0,size=std::min(m_maxJetSize,jetsFJ_Z.size()); ii<size; ii++){
-    sumPz[2] += jetsFJ_Z[ii].pz();
-    sumP[2]  += sqrt( jetsFJ_Z[ii].modp2() );
-    thisJetLV  = TLorentzVector(jetsFJ_Z[ii].px(), jetsFJ_Z[ii].py(), jetsFJ_Z[ii].pz(), jetsFJ_Z[ii].e());
-    m1234LV_Z += thisJetLV;
-    switch (ii){
-    case 0:
-      m12LV_Z += thisJetLV;
-      m13LV_Z += thisJetLV;
-      break;
-    case 1:
-      m12LV_Z += thisJetLV;
-      m23LV_Z += thisJetLV;
-      break;
-    case 2:
-      m13LV_Z += thisJetLV;
-      m23LV_Z += thisJetLV;
-      break;
-    case 3:
-      break;
-    }
-  }
+  std::vector<PseudoJet> particles( m_FJparticles[frame].begin() + m_jetOffsets[ijet], m_FJparticles[frame].begin() + m_jetOffsets[ijet+1] );
 
-  // -- Higgs jets
-  for (size_t ii=0,size=std::min(m_maxJetSize,jetsFJ_H.size()); ii<size; ii++){
-    sumPz[3] += jetsFJ_H[ii].pz();
-    sumP[3]  += sqrt( jetsFJ_H[ii].modp2() );
-    thisJetLV  = TLorentzVector(jetsFJ_H[ii].px(), jetsFJ_H[ii].py(), jetsFJ_H[ii].pz(), jetsFJ_H[ii].e());
-    m1234LV_H += thisJetLV;
-    switch (ii){
-    case 0:
-      m12LV_H += thisJetLV;
-      m13LV_H += thisJetLV;
-      break;
-    case 1:
-      m12LV_H += thisJetLV;
-      m23LV_H += thisJetLV;
-      break;
-    case 2:
-      m13LV_H += thisJetLV;
-      m23LV_H += thisJetLV;
-      break;
-    case 3:
-      break;
-    }
+  // Recluster constituents, the lab frame only gives the number of jets
+  JetDefinition jet_def(antikt_algorithm, (frame == fLab) ? m_radiusLarge : m_radiusSmall);
+  ClusterSequence cs( particles, jet_def );
+  std::vector<PseudoJet> jetsFJ = sorted_by_pt( cs.inclusive_jets(m_reclusterJetPtMin) );
+
+  if (frame == fLab){
+    values[vNjets_orig] = jetsFJ.size();
+    return;
   }
 
-  // -- jets
-  for (size_t ii=0,size=std::min(m_maxJetSize,jetsFJ_jet.size()); ii<size; ii++){
-    sumPz[4] += jetsFJ_jet[ii].pz();
-    sumP[4]  += sqrt( jetsFJ_jet[ii].modp2() );
-    thisJetLV    = TLorentzVector(jetsFJ_jet[ii].px(), jetsFJ_jet[ii].py(), jetsFJ_jet[ii].pz(), jetsFJ_jet[ii].e());
-    m1234LV_jet += thisJetLV;
+  // pair-wise invariant masses
+  TLorentzVector m1234LV(0.,0.,0.,0.);
+  TLorentzVector m12LV(0.,0.,0.,0.);
+  TLorentzVector m13LV(0.,0.,0.,0.);
+  TLorentzVector m23LV(0.,0.,0.,0.);
+
+  // sum of jet pz and p
+  float sumP(0.0);
+  float sumPz(0.0);
+
+  for (size_t ii=0,size=std::min(m_maxJetSize,jetsFJ.size()); ii<size; ii++){
+    sumPz += jetsFJ[ii].pz();
+    sumP  += sqrt( jetsFJ[ii].modp2() );
+    TLorentzVector thisJetLV(jetsFJ[ii].px(), jetsFJ[ii].py(), jetsFJ[ii].pz(), jetsFJ[ii].e());
+    m1234LV += thisJetLV;
     switch (ii){
     case 0:
-      m12LV_jet += thisJetLV;
-      m13LV_jet += thisJetLV;
+      m12LV += thisJetLV;
+      m13LV += thisJetLV;
       break;
     case 1:
-      m12LV_jet += thisJetLV;
-      m23LV_jet += thisJetLV;
+      m12LV += thisJetLV;
+      m23LV += thisJetLV;
       break;
     case 2:
-      m13LV_jet += thisJetLV;
-      m23LV_jet += thisJetLV;
+      m13LV += thisJetLV;
+      m23LV += thisJetLV;
       break;
     case 3:
       break;
     }
   }
 
+  values[varIndex(vm1234,frame)]   = m1234LV.M();
+  values[varIndex(vm12,frame)]     = m12LV.M();
+  values[varIndex(vm23,frame)]     = m23LV.M();
+  values[varIndex(vm13,frame)]     = m13LV.M();
+  values[varIndex(vsumPz,frame)]   = sumPz;
+  values[varIndex(vsumP,frame)]    = sumP;
+  values[varIndex(vpzOverp,frame)] = ( sumPz / (sumP + 0.0001) ); // not used for 'jet'
+  values[varIndex(vNjets,frame)]   = jetsFJ.size();
 
-  // Update the map with new values
-  m_BESTvars["bDisc"]   = (btagValue1 > btagValue2) ? btagValue1 : btagValue2;
-  m_BESTvars["bDisc1"]  = btagValue1;
-  m_BESTvars["bDisc2"]  = btagValue2;
-  m_BESTvars["et"]      = thisJet.Pt();
-  m_BESTvars["eta"]     = thisJet.Rapidity();
-  m_BESTvars["mass"]    = thisJet.M();
-  m_BESTvars["SDmass"]  = jet.userFloat("ak8PFJetsPuppiSoftDropMass");
-  m_BESTvars["tau32"]   = (tau2 > 1e-8) ? tau3/tau2 : 999.;
-  m_BESTvars["tau21"]   = (tau1 > 1e-8) ? tau2/tau1 : 999.;
-  m_BESTvars["q"]       = jetq;
-
-  m_BESTvars["m1234_jet"] = m1234LV_jet.M();
-  m_BESTvars["m12_jet"]   = m12LV_jet.M();
-  m_BESTvars["m23_jet"]   = m23LV_jet.M();
-  m_BESTvars["m13_jet"]   = m13LV_jet.M();
-
-  m_BESTvars["m1234top"] = m1234LV_top.M();
-  m_BESTvars["m12top"]   = m12LV_top.M();
-  m_BESTvars["m23top"]   = m23LV_top.M();
-  m_BESTvars["m13top"]   = m13LV_top.M();
-
-  m_BESTvars["m1234W"] = m1234LV_W.M();
-  m_BESTvars["m12W"]   = m12LV_W.M();
-  m_BESTvars["m23W"]   = m23LV_W.M();
-  m_BESTvars["m13W"]   = m13LV_W.M();
-
-  m_BESTvars["m1234Z"] = m1234LV_Z.M();
-  m_BESTvars["m12Z"]   = m12LV_Z.M();
-  m_BESTvars["m23Z"]   = m23LV_Z.M();
-  m_BESTvars["m13Z"]   = m13LV_Z.M();
-
-  m_BESTvars["m1234H"] = m1234LV_H.M();
-  m_BESTvars["m12H"]   = m12LV_H.M();
-  m_BESTvars["m23H"]   = m23LV_H.M();
-  m_BESTvars["m13H"]   = m13LV_H.M();
-
-  std::vector<std::string> jetNames = {"top","W","Z","H","jet"};
-
-  for (unsigned int pp=0; pp<5; pp++){
-    std::string jetName = jetNames[pp];
-
-    m_BESTvars["sumPz_"+jetName]   = sumPz[pp];
-    m_BESTvars["sumP_"+jetName]    = sumP[pp];
-    m_BESTvars["pzOverp_"+jetName] =  ( sumPz[pp] / (sumP[pp] + 0.0001) ); // not used for 'jet'
-  }
+  if (frame == fJet) return;
 
-  m_BESTvars["Njets_top"]  = jetsFJ.size();
-  m_BESTvars["Njets_W"]    = jetsFJ_W.size();
-  m_BESTvars["Njets_Z"]    = jetsFJ_Z.size();
-  m_BESTvars["Njets_H"]    = jetsFJ_H.size();
-  m_BESTvars["Njets_jet"]  = jetsFJ_jet.size();
-  m_BESTvars["Njets_orig"] = jetsFJ_noBoost.size();
-
-  // -- top values
-  m_BESTvars["FWmoment1top"] = fwm_top[1];
-  m_BESTvars["FWmoment2top"] = fwm_top[2];
-  m_BESTvars["FWmoment3top"] = fwm_top[3];
-  m_BESTvars["FWmoment4top"] = fwm_top[4];
-  m_BESTvars["isotropytop"]   = eventShapes_top.isotropy();
-  m_BESTvars["sphericitytop"] = eventShapes_top.sphericity();
-  m_BESTvars["aplanaritytop"] = eventShapes_top.aplanarity();
-  m_BESTvars["thrusttop"]     = thrustCalculator_top.thrust();
-
-  // -- W values
-  m_BESTvars["FWmoment1W"] = fwm_W[1];
-  m_BESTvars["FWmoment2W"] = fwm_W[2];
-  m_BESTvars["FWmoment3W"] = fwm_W[3];
-  m_BESTvars["FWmoment4W"] = fwm_W[4];
-  m_BESTvars["isotropyW"]   = eventShapes_W.isotropy();
-  m_BESTvars["sphericityW"] = eventShapes_W.sphericity();
-  m_BESTvars["aplanarityW"] = eventShapes_W.aplanarity();
-  m_BESTvars["thrustW"]     = thrustCalculator_W.thrust();
-
-  // -- Z values
-  m_BESTvars["FWmoment1Z"] = fwm_Z[1];
-  m_BESTvars["FWmoment2Z"] = fwm_Z[2];
-  m_BESTvars["FWmoment3Z"] = fwm_Z[3];
-  m_BESTvars["FWmoment4Z"] = fwm_Z[4];
-  m_BESTvars["isotropyZ"]   = eventShapes_Z.isotropy();
-  m_BESTvars["sphericityZ"] = eventShapes_Z.sphericity();
-  m_BESTvars["aplanarityZ"] = eventShapes_Z.aplanarity();
-  m_BESTvars["thrustZ"]     = thrustCalculator_Z.thrust();
-
-  // -- H values
-  m_BESTvars["FWmoment1H"] = fwm_H[1];
-  m_BESTvars["FWmoment2H"] = fwm_H[2];
-  m_BESTvars["FWmoment3H"] = fwm_H[3];
-  m_BESTvars["FWmoment4H"] = fwm_H[4];
-  m_BESTvars["isotropyH"]   = eventShapes_H.isotropy();
-  m_BESTvars["sphericityH"] = eventShapes_H.sphericity();
-  m_BESTvars["aplanarityH"] = eventShapes_H.aplanarity();
-  m_BESTvars["thrustH"]     = thrustCalculator_H.thrust();
+  // Fox-Wolfram Moments
+  double fwm[5] = {0.0, 0.0 ,0.0 ,0.0, 0.0};
+  FWMoments( particles.data(), particles.size(), fwm );
+
+  // Event Shapes and Thrust
+  std::vector<math::XYZVector> particles2;
+  std::vector<reco::LeafCandidate> particles3;
+  for (unsigned int i=0; i<particles.size(); i++){
+    particles2.push_back( math::XYZVector( particles[i].px(), particles[i].py(), particles[i].pz() ));
+    particles3.push_back( reco::LeafCandidate(+1, reco::Candidate::LorentzVector( particles[i].px(), particles[i].py(), particles[i].pz(), particles[i].e() ) ));
+  }
+  EventShapeVariables eventShapes( particles2 );
+  Thrust thrustCalculator( particles3.begin(), particles3.end() );
+
+  values[varIndex(vFWmoment1,frame)]  = fwm[1];
+  values[varIndex(vFWmoment2,frame)]  = fwm[2];
+  values[varIndex(vFWmoment3,frame)]  = fwm[3];
+  values[varIndex(vFWmoment4,frame)]  = fwm[4];
+  values[varIndex(visotropy,frame)]   = eventShapes.isotropy();
+  values[varIndex(vsphericity,frame)] = eventShapes.sphericity();
+  values[varIndex(vaplanarity,frame)] = eventShapes.aplanarity();
+  values[varIndex(vthrust,frame)]     = thrustCalculator.thrust();
 
   return;
 }
 
 
-void BestCalc::pboost( TVector3 pbeam, TVector3 plab, TLorentzVector &pboo ){
+void BestCalc::pboost( TVector3 pbeam, TVector3 plab, TLorentzVector &pboo ) const {
   /* Given jet constituent momentum plab, find momentum relative to
        beam direction pbeam
   */
@@ -1001,26 +699,21 @@ void BestCalc::pboost( TVector3 pbeam, TVector3 plab, TLorentzVector &pboo ){
 }
 
 
-void BestCalc::FWMoments( std::vector<TLorentzVector> particles, double (&outputs)[5] ){
+void BestCalc::FWMoments( const fastjet::PseudoJet * particles, size_t numParticles, double (&outputs)[5] ) const {
   /* Fox-Wolfram moments */
-  int numParticles = particles.size();
-
-  float s(0.0);
-  for(int i = 0; i < numParticles; i++){
-    s += particles[i].E();
-  }
-
   float H0(0.0);
   float H4(0.0);
   float H3(0.0);
   float H2(0.0);
   float H1(0.0);
 
-  for (int i=0; i<numParticles; i++){
-    for (int j=i; j<numParticles; j++){
-      float costh = ( particles[i].Px() * particles[j].Px() + particles[i].Py() * particles[j].Py() + particles[i].Pz() * particles[j].Pz() ) / ( particles[i].P() * particles[j].P() );
-      float w1 = particles[i].P();
-      float w2 = particles[j].P();
+  for (size_t i=0; i<numParticles; i++){
+    double p1 = sqrt( particles[i].modp2() );
+    for (size_t j=i; j<numParticles; j++){
+      double p2 = sqrt( particles[j].modp2() );
+      float costh = ( particles[i].px() * particles[j].px() + particles[i].py() * particles[j].py() + particles[i].pz() * particles[j].pz() ) / ( p1 * p2 );
+      float w1 = p1;
+      float w2 = p2;
 
       float fw0 = LegP(costh, 0);
       float fw1 = LegP(costh, 1);
@@ -1047,7 +740,7 @@ void BestCalc::FWMoments( std::vector<TLorentzVector> particles, double (&output
 }
 
 
-float BestCalc::LegP(float x, int order){
+float BestCalc::LegP(float x, int order) const {
   /* Calculation in FWMoments */
   float value(0.0);
 
@@ -6,6 +6,9 @@ using namespace std;
 
 int DeepAK8Calc::BeginJob(edm::ConsumesCollector && iC){
 
+  // only reads the selector's AK8 jets, can run next to the other calculators
+  DeclareDependencies({}, {});
+
   return 0;
 
 }
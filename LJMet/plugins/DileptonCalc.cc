@@ -66,6 +66,11 @@ int DileptonCalc::BeginJob(edm::ConsumesCollector && iC)
 	  std::cout << "["+GetName()+"]: "<< "Overriding LHE weights, using "<<newPDFname<<" as new and "<<basePDFname<<" as base PDF set." << std::endl;
 	  LHAPDF::Info& cfg = LHAPDF::getConfig();
 	  cfg.set_entry("Verbosity", 0);
+
+	  // load the sets once, members are evaluated from the cached grids per event
+	  pdfCache = LHAPDFCache::Get(localPdfCache);
+	  pdfCache->Load(basePDFname);
+	  pdfCache->Load(newPDFname);
 	}
     else cout << "["+GetName()+"]: "<< "Writing LHE weights (no override)." << endl;
 
@@ -509,6 +514,7 @@ void DileptonCalc::AnalyzeElectron(edm::Event const & event, BaseEventSelector *
     
     edm::Handle<pat::PackedCandidateCollection> packedPFCands;
     event.getByToken(PFCandToken, packedPFCands);
+    PFCandGrid const & pfCandGrid = PFCandGrid::Get(event, packedPFCands);
         
 
     //keep track of which electron we are looking at
@@ -571,9 +577,9 @@ void DileptonCalc::AnalyzeElectron(edm::Event const & event, BaseEventSelector *
           elRelIso . push_back(relIso);
           
           //add miniIso
-          elMiniIsoEA.push_back(getPFMiniIsolation_EffectiveArea(packedPFCands, dynamic_cast<const reco::Candidate *>(iel->get()),0.05, 0.2, 10., false, false,myRhoJetsNC));
-          elMiniIsoDB.push_back(getPFMiniIsolation_DeltaBeta(packedPFCands, dynamic_cast<const reco::Candidate *>(iel->get()), 0.05, 0.2, 10., false));
-          elMiniIsoSUSY.push_back(getPFMiniIsolation_SUSY(packedPFCands, dynamic_cast<const reco::Candidate *>(iel->get()),0.05, 0.2, 10., false, false,myRhoJetsNC));
+          elMiniIsoEA.push_back(getPFMiniIsolation_EffectiveArea(pfCandGrid, dynamic_cast<const reco::Candidate *>(iel->get()),0.05, 0.2, 10., false, false,myRhoJetsNC));
+          elMiniIsoDB.push_back(getPFMiniIsolation_DeltaBeta(pfCandGrid, dynamic_cast<const reco::Candidate *>(iel->get()), 0.05, 0.2, 10., false));
+          elMiniIsoSUSY.push_back(getPFMiniIsolation_SUSY(pfCandGrid, dynamic_cast<const reco::Candidate *>(iel->get()),0.05, 0.2, 10., false, false,myRhoJetsNC));
 
 
           //Conversion rejection
@@ -913,6 +919,7 @@ void DileptonCalc::AnalyzeMuon(edm::Event const & event, BaseEventSelector * sel
     //pfcandidates for mini iso    
     edm::Handle<pat::PackedCandidateCollection> packedPFCands;
     event.getByToken(PFCandToken, packedPFCands);
+    PFCandGrid const & pfCandGrid = PFCandGrid::Get(event, packedPFCands);
 
 
     //make index for muons
@@ -969,9 +976,9 @@ void DileptonCalc::AnalyzeMuon(edm::Event const & event, BaseEventSelector * sel
             muPuIso . push_back(puIso);
 
             //get miniIso
-            muMiniIsoEA.push_back(getPFMiniIsolation_EffectiveArea(packedPFCands, dynamic_cast<const reco::Candidate *>(imu->get()),0.05, 0.2, 10., false, false,myRhoJetsNC));
-            muMiniIsoDB.push_back(getPFMiniIsolation_DeltaBeta(packedPFCands, dynamic_cast<const reco::Candidate *>(imu->get()), 0.05, 0.2, 10., false));            
-            muMiniIsoSUSY.push_back(getPFMiniIsolation_SUSY(packedPFCands, dynamic_cast<const reco::Candidate *>(imu->get()),0.05, 0.2, 10., false, false,myRhoJetsNC));
+            muMiniIsoEA.push_back(getPFMiniIsolation_EffectiveArea(pfCandGrid, dynamic_cast<const reco::Candidate *>(imu->get()),0.05, 0.2, 10., false, false,myRhoJetsNC));
+            muMiniIsoDB.push_back(getPFMiniIsolation_DeltaBeta(pfCandGrid, dynamic_cast<const reco::Candidate *>(imu->get()), 0.05, 0.2, 10., false));            
+            muMiniIsoSUSY.push_back(getPFMiniIsolation_SUSY(pfCandGrid, dynamic_cast<const reco::Candidate *>(imu->get()),0.05, 0.2, 10., false, false,myRhoJetsNC));
 
             float musip3d;
             pat::Muon::IpType muIP3d = (pat::Muon::IpType) 1;
@@ -1591,29 +1598,13 @@ void DileptonCalc::AnalyzeGenInfo(edm::Event const & event, BaseEventSelector *
           //std::cout<<"x1 x2 Q id1 id2"<<std::endl;
           //std::cout<<x1<<" "<<x2<<" "<<Q<<" "<<id1<<" "<<id2<<std::endl;
 
-          //Initialize PDF sets
-          LHAPDF::PDF* basepdf1 = LHAPDF::mkPDF(basePDFname,0);
-          const LHAPDF::GridPDF& pdf1 = * dynamic_cast<const LHAPDF::GridPDF*>(basepdf1);
-  
-          // calculate central PDFs for generator set,
-          double pdf1_gen = pdf1.xfxQ(id1, x1, Q);
-          double pdf2_gen = pdf1.xfxQ(id2, x2, Q);
-          //std::cout<<"pdf1_gen = "<<pdf1_gen<<" pdf2_gen = "<<pdf2_gen<<std::endl;
-          delete basepdf1;
-  
-          const LHAPDF::PDFSet newset(newPDFname);
-          const size_t nmem = newset.size();
-          const std::vector<LHAPDF::PDF*> newpdfs = newset.mkPDFs();
-          for (size_t i = 0; i<nmem; i++) {
-            const LHAPDF::GridPDF& pdf2 = * dynamic_cast<const LHAPDF::GridPDF*>(newpdfs[i]);
-
-            double pdf1_new = pdf2.xfxQ(id1, x1, Q);
-            double pdf2_new = pdf2.xfxQ(id2, x2, Q);
-            NewPDFweights.push_back((pdf1_new*pdf2_new)/(pdf1_gen*pdf2_gen));
-            NewPDFweightsBase.push_back(pdf1_gen*pdf2_gen);
+          // all members of the new set relative to the central generator set, from the cached grids
+          std::vector<double> memberWeights;
+          double pdf_gen = pdfCache->MemberWeights(basePDFname, newPDFname, id1, x1, id2, x2, Q, memberWeights);
+          for (size_t i = 0; i<memberWeights.size(); i++) {
+            NewPDFweights.push_back(memberWeights[i]);
+            NewPDFweightsBase.push_back(pdf_gen);
             NewPDFids.push_back(315000+i);
-
-            delete (newpdfs[i]);
           }
         }
 
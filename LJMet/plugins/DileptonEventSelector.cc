@@ -28,6 +28,9 @@ void DileptonEventSelector::BeginJob( const edm::ParameterSet& iConfig, edm::Con
     trigger_path_ee          = selectorConfig.getParameter<std::vector<std::string> >  ("trigger_path_ee");
     trigger_path_em          = selectorConfig.getParameter<std::vector<std::string> >  ("trigger_path_em");
     trigger_path_mm          = selectorConfig.getParameter<std::vector<std::string> >  ("trigger_path_mm");
+    trigMatch_ee.SetPaths(trigger_path_ee);
+    trigMatch_em.SetPaths(trigger_path_em);
+    trigMatch_mm.SetPaths(trigger_path_mm);
 
 
     //PV
@@ -237,10 +240,15 @@ bool DileptonEventSelector::TriggerSelection(edm::Event const & event)
       if(debug)std::cout << "\t" <<"TriggerSelection:"<< std::endl;
 
       event.getByToken( triggersToken, TriggerHandle );
-      const edm::TriggerNames trigNames = event.triggerNames(*TriggerHandle);
+      edm::TriggerNames const & trigNames = event.triggerNames(*TriggerHandle);
 
       unsigned int _tSize = TriggerHandle->size();
 
+      // menu indices of the configured paths, only resolved again when the menu changes
+      trigMatch_ee.Update(trigNames);
+      trigMatch_em.Update(trigNames);
+      trigMatch_mm.Update(trigNames);
+
       // dump trigger names
       if (bFirstEntry && dump_trigger){
         for (unsigned int i=0; i<_tSize; i++){
@@ -260,15 +268,12 @@ bool DileptonEventSelector::TriggerSelection(edm::Event const & event)
       //Loop over each channel separately
       //loop over triggers we registered in LJMet (config)
       for (unsigned int ipath = 0; ipath < trigger_path_ee.size(); ipath++){
-        //loop over triggers in sample
-        for (unsigned int i=0; i<_tSize;i++){
-          //compare strings
-          std::string trigName_sample = trigNames.triggerName(i);
-          std::string trigName_LJMet = trigger_path_ee.at(ipath);
-          if ( trigName_sample.find(trigName_LJMet) == std::string::npos) continue;
-          unsigned int _tIndex = trigNames.triggerIndex(trigName_sample);
+        //loop over the matching triggers in sample
+        std::vector<unsigned int> const & _tIndices = trigMatch_ee.GetIndices(ipath);
+        for (unsigned int j=0; j<_tIndices.size();j++){
+          unsigned int _tIndex = _tIndices[j];
           if (TriggerHandle->accept(_tIndex)){
-            if (debug) std::cout << "           trigger_path_ee:" << trigNames.triggerName(i)  << std::endl;
+            if (debug) std::cout << "           trigger_path_ee:" << trigNames.triggerName(_tIndex)  << std::endl;
             passEE++;
             mvSelTriggersEl[trigger_path_ee.at(ipath)] = 1;
             break;
@@ -282,15 +287,12 @@ bool DileptonEventSelector::TriggerSelection(edm::Event const & event)
 
       //loop over triggers we registered in LJMet (config)
       for (unsigned int ipath = 0; ipath < trigger_path_em.size(); ipath++){
-        //loop over triggers in sample
-        for (unsigned int i=0; i<_tSize;i++){
-          //compare strings
-          std::string trigName_sample = trigNames.triggerName(i);
-          std::string trigName_LJMet = trigger_path_em.at(ipath);
-          if ( trigName_sample.find(trigName_LJMet) == std::string::npos) continue;
-          unsigned int _tIndex = trigNames.triggerIndex(trigName_sample);
+        //loop over the matching triggers in sample
+        std::vector<unsigned int> const & _tIndices = trigMatch_em.GetIndices(ipath);
+        for (unsigned int j=0; j<_tIndices.size();j++){
+          unsigned int _tIndex = _tIndices[j];
           if (TriggerHandle->accept(_tIndex)){
-            if (debug) std::cout << "           trigger_path_em:" << trigNames.triggerName(i)  << std::endl;
+            if (debug) std::cout << "           trigger_path_em:" << trigNames.triggerName(_tIndex)  << std::endl;
             mvSelTriggersEl[trigger_path_em.at(ipath)] = 1;
             mvSelTriggersMu[trigger_path_em.at(ipath)] = 1;
             passEM++;
@@ -306,15 +308,12 @@ bool DileptonEventSelector::TriggerSelection(edm::Event const & event)
 
       //loop over triggers we registered in LJMet (config)
       for (unsigned int ipath = 0; ipath < trigger_path_mm.size(); ipath++){
-        //loop over triggers in sample
-        for (unsigned int i=0; i<_tSize;i++){
-          //compare strings
-          std::string trigName_sample = trigNames.triggerName(i);
-          std::string trigName_LJMet = trigger_path_mm.at(ipath);
-          if ( trigName_sample.find(trigName_LJMet) == std::string::npos) continue;
-          unsigned int _tIndex = trigNames.triggerIndex(trigName_sample);
+        //loop over the matching triggers in sample
+        std::vector<unsigned int> const & _tIndices = trigMatch_mm.GetIndices(ipath);
+        for (unsigned int j=0; j<_tIndices.size();j++){
+          unsigned int _tIndex = _tIndices[j];
           if (TriggerHandle->accept(_tIndex)){
-            if (debug) std::cout << "           trigger_path_mm:" << trigNames.triggerName(i)  << std::endl;
+            if (debug) std::cout << "           trigger_path_mm:" << trigNames.triggerName(_tIndex)  << std::endl;
             passMM++;
             mvSelTriggersMu[trigger_path_mm.at(ipath)] = 1;
             break;
@@ -567,6 +566,7 @@ bool DileptonEventSelector::ElectronSelection(edm::Event const & event, pat::str
 	//packed pf candidates and rho source needed miniIso
 	edm::Handle<pat::PackedCandidateCollection> packedPFCandsHandle;
 	event.getByToken(PFCandToken, packedPFCandsHandle);
+	PFCandGrid const & pfCandGrid = PFCandGrid::Get(event, packedPFCandsHandle);
 
 	//rho isolation from susy recommendation
 	edm::Handle<double> rhoJetsNC_Handle;
@@ -610,7 +610,7 @@ bool DileptonEventSelector::ElectronSelection(edm::Event const & event, pat::str
 
           //mva loose for cleaning
           std::unique_ptr<pat::Electron> elptr (new pat::Electron(*_iel));
-          float miniIso = getPFMiniIsolation_EffectiveArea(packedPFCandsHandle, dynamic_cast<const reco::Candidate* > (elptr.get()), 0.05, 0.2, 10., false, false,myRhoJetsNC);
+          float miniIso = getPFMiniIsolation_EffectiveArea(pfCandGrid, dynamic_cast<const reco::Candidate* > (elptr.get()), 0.05, 0.2, 10., false, false,myRhoJetsNC);
           
           //at some point all these hardcoded things needs to be configurable. this is all very messy. -- May 31, 2019.
           if(_iel->pt() > 10) { 
@@ -721,6 +721,7 @@ bool DileptonEventSelector::JetSelection(edm::Event const & event, pat::strbitse
 	//packed pf candidates and rho source needed miniIso
 	edm::Handle<pat::PackedCandidateCollection> packedPFCandsHandle;
 	event.getByToken(PFCandToken, packedPFCandsHandle);
+	PFCandGrid const & pfCandGrid = PFCandGrid::Get(event, packedPFCandsHandle);
 
 	//rho isolation from susy recommendation
 	edm::Handle<double> rhoJetsNC_Handle;
@@ -792,7 +793,7 @@ bool DileptonEventSelector::JetSelection(edm::Event const & event, pat::strbitse
           bool looseMuon; //bool to loop over only loose muons can easily do here since loose muon id so easy to implement
           //get miniIso
           std::unique_ptr<pat::Muon> muptr(new pat::Muon(vSelMuons[ilep]));
-          float miniIso = getPFMiniIsolation_EffectiveArea(packedPFCandsHandle, dynamic_cast<const reco::Candidate* > (muptr.get()), 0.05, 0.2, 10., false, false,myRhoJetsNC);
+          float miniIso = getPFMiniIsolation_EffectiveArea(pfCandGrid, dynamic_cast<const reco::Candidate* > (muptr.get()), 0.05, 0.2, 10., false, false,myRhoJetsNC);
 
           if(miniIso > 0.4) looseMuon=false;
           else if(!(vSelMuons[ilep]->isPFMuon())) looseMuon=false;
@@ -25,6 +25,9 @@ int HOTTaggerCalc::BeginJob(edm::ConsumesCollector && iC){
       throw cms::Exception(e.getFileName() + ":" + std::to_string(e.getLineNumber()) + ", in function \"" + e.getFunctionName() + "\" -- " + e.getMessage());
     }
     
+    // only reads the selector's jets, can run next to the other calculators
+    DeclareDependencies({}, {});
+    
     return 0;
   }
 
@@ -0,0 +1,115 @@
+#include "FWLJMET/LJMet/interface/JetCorrParStore.h"
+
+#include <cstdio>
+#include <fstream>
+#include <functional>
+#include <sys/stat.h>
+#include <unistd.h>
+
+#include "CondFormats/Serialization/interface/Archive.h"
+
+
+JetCorrParStore & JetCorrParStore::Instance()
+{
+    static JetCorrParStore store;
+    return store;
+}
+
+JetCorrParStore::JetCorrParStore():
+mLegend("\t[JetCorrParStore]: ")
+{
+}
+
+void JetCorrParStore::SetCacheDir(std::string const & dir)
+{
+    std::lock_guard<std::mutex> _lock(mMutex);
+    if (dir == mCacheDir) return;
+    mCacheDir = dir;
+    if (mCacheDir.empty()) return;
+    mkdir(mCacheDir.c_str(), 0755); // fine if it exists already
+    std::cout << mLegend << "Caching parsed JEC parameters in " << mCacheDir << std::endl;
+}
+
+std::shared_ptr<JetCorrectorParameters const> JetCorrParStore::GetParameters(std::string const & txtfile)
+{
+    std::lock_guard<std::mutex> _lock(mMutex);
+
+    std::map<std::string, std::shared_ptr<JetCorrectorParameters const>>::const_iterator it = mParameters.find(txtfile);
+    if (it != mParameters.end()) return it->second;
+
+    std::shared_ptr<JetCorrectorParameters> par;
+    if (!mCacheDir.empty()) {
+        par = std::make_shared<JetCorrectorParameters>();
+        if (!readSnapshot(txtfile, *par)) {
+            par = std::make_shared<JetCorrectorParameters>(txtfile);
+            writeSnapshot(txtfile, *par);
+        }
+    }
+    else par = std::make_shared<JetCorrectorParameters>(txtfile);
+
+    mParameters[txtfile] = par;
+    return par;
+}
+
+JME::JetResolution JetCorrParStore::GetResolution(std::string const & txtfile)
+{
+    // JME::JetResolution holds its parsed object through a shared_ptr, copies are cheap
+    std::lock_guard<std::mutex> _lock(mMutex);
+    std::map<std::string, JME::JetResolution>::iterator it = mResolutions.find(txtfile);
+    if (it == mResolutions.end()) it = mResolutions.insert(std::make_pair(txtfile, JME::JetResolution(txtfile))).first;
+    return it->second;
+}
+
+JME::JetResolutionScaleFactor JetCorrParStore::GetResolutionScaleFactor(std::string const & txtfile)
+{
+    std::lock_guard<std::mutex> _lock(mMutex);
+    std::map<std::string, JME::JetResolutionScaleFactor>::iterator it = mScaleFactors.find(txtfile);
+    if (it == mScaleFactors.end()) it = mScaleFactors.insert(std::make_pair(txtfile, JME::JetResolutionScaleFactor(txtfile))).first;
+    return it->second;
+}
+
+std::string JetCorrParStore::snapshotName(std::string const & txtfile)
+{
+    // same file name in different releases/areas must not collide
+    std::string base = txtfile.substr(txtfile.find_last_of('/') + 1);
+    return mCacheDir + "/" + base + "." + std::to_string(std::hash<std::string>()(txtfile)) + ".bin";
+}
+
+bool JetCorrParStore::readSnapshot(std::string const & txtfile, JetCorrectorParameters & par)
+{
+    std::string snapshot = snapshotName(txtfile);
+
+    struct stat txtStat, binStat;
+    if (stat(snapshot.c_str(), &binStat) != 0) return false;
+    if (stat(txtfile.c_str(), &txtStat) == 0 && txtStat.st_mtime > binStat.st_mtime) return false; // outdated
+
+    try {
+        std::ifstream ifs(snapshot.c_str(), std::ios::in | std::ios::binary);
+        cond::serialization::InputArchive ia(ifs);
+        ia >> par;
+    }
+    catch (std::exception const & e) {
+        std::cout << mLegend << "Could not read " << snapshot << " (" << e.what() << "), parsing " << txtfile << std::endl;
+        return false;
+    }
+    return par.isValid();
+}
+
+void JetCorrParStore::writeSnapshot(std::string const & txtfile, JetCorrectorParameters const & par)
+{
+    // write to a temporary file and rename, jobs sharing the directory never see a partial snapshot
+    std::string snapshot = snapshotName(txtfile);
+    std::string tmp = snapshot + ".tmp" + std::to_string(getpid());
+
+    try {
+        std::ofstream ofs(tmp.c_str(), std::ios::out | std::ios::binary);
+        cond::serialization::OutputArchive oa(ofs);
+        oa << par;
+    }
+    catch (std::exception const & e) {
+        std::cout << mLegend << "Could not write " << snapshot << " (" << e.what() << ")" << std::endl;
+        std::remove(tmp.c_str());
+        return;
+    }
+    std::rename(tmp.c_str(), snapshot.c_str());
+}
@@ -1,4 +1,5 @@
 #include "FWLJMET/LJMet/interface/JetMETCorrHelper.h"
+#include "FWLJMET/LJMet/interface/JetCorrParStore.h"
 
 using namespace std;
 
@@ -47,21 +48,34 @@ void JetMETCorrHelper::Initialize(const edm::ParameterSet& iConfig){
     mJetParStr["DataL3JetParAK8"] = iConfig.getParameter<edm::FileInPath>("DataL3JetParAK8").fullPath();
     mJetParStr["DataResJetParAK8"] = iConfig.getParameter<edm::FileInPath>("DataResJetParAK8").fullPath();
 
-    if ( isMc ) jecUnc = std::shared_ptr<JetCorrectionUncertainty>( new JetCorrectionUncertainty(JEC_txtfile) );
+    // helpers configured with the same files share the per-event corrected jet cache
+    static std::vector<std::string> vConfigs;
+    static std::mutex configMutex;
+    std::string config = (isMc ? "mc" : "data") + std::string(":") + JEC_txtfile + ":" + JERSF_txtfile + ":" + JER_txtfile + ":" + JERAK8_txtfile;
+    for (std::map<std::string,std::string>::const_iterator it = mJetParStr.begin(); it != mJetParStr.end(); ++it) config += ":" + it->second;
+    std::lock_guard<std::mutex> configLock(configMutex);
+    mConfigID = std::find(vConfigs.begin(), vConfigs.end(), config) - vConfigs.begin();
+    if (mConfigID == (int)vConfigs.size()) vConfigs.push_back(config);
 
-    resolution = JME::JetResolution(JER_txtfile);
-    resolutionAK8 = JME::JetResolution(JERAK8_txtfile);
-    resolution_SF = JME::JetResolutionScaleFactor(JERSF_txtfile);
+    // parameter files are parsed once per process and shared by all helpers
+    JetCorrParStore & parStore = JetCorrParStore::Instance();
+    if (iConfig.existsAs<std::string>("JECParCacheDir")) parStore.SetCacheDir(iConfig.getParameter<std::string>("JECParCacheDir"));
+
+    if ( isMc ) jecUnc = std::shared_ptr<JetCorrectionUncertainty>( new JetCorrectionUncertainty(*parStore.GetParameters(JEC_txtfile)) );
+
+    resolution = parStore.GetResolution(JER_txtfile);
+    resolutionAK8 = parStore.GetResolution(JERAK8_txtfile);
+    resolution_SF = parStore.GetResolutionScaleFactor(JERSF_txtfile);
 
     if ( isMc ) {
 
       // Create the JetCorrectorParameter objects, the order does not matter.
-      mStrJetCorPar["L3JetPar"]  = std::shared_ptr<JetCorrectorParameters>(new JetCorrectorParameters(mJetParStr["MCL3JetPar"]) );
-      mStrJetCorPar["L2JetPar"]  = std::shared_ptr<JetCorrectorParameters>(new JetCorrectorParameters(mJetParStr["MCL2JetPar"]) );
-      mStrJetCorPar["L1JetPar"]  = std::shared_ptr<JetCorrectorParameters>(new JetCorrectorParameters(mJetParStr["MCL1JetPar"]) );
-      mStrJetCorPar["L3JetParAK8"]  = std::shared_ptr<JetCorrectorParameters>(new JetCorrectorParameters(mJetParStr["MCL3JetParAK8"]) );
-      mStrJetCorPar["L2JetParAK8"]  = std::shared_ptr<JetCorrectorParameters>(new JetCorrectorParameters(mJetParStr["MCL2JetParAK8"]) );
-      mStrJetCorPar["L1JetParAK8"]  = std::shared_ptr<JetCorrectorParameters>(new JetCorrectorParameters(mJetParStr["MCL1JetParAK8"]) );
+      mStrJetCorPar["L3JetPar"]  = parStore.GetParameters(mJetParStr["MCL3JetPar"]);
+      mStrJetCorPar["L2JetPar"]  = parStore.GetParameters(mJetParStr["MCL2JetPar"]);
+      mStrJetCorPar["L1JetPar"]  = parStore.GetParameters(mJetParStr["MCL1JetPar"]);
+      mStrJetCorPar["L3JetParAK8"]  = parStore.GetParameters(mJetParStr["MCL3JetParAK8"]);
+      mStrJetCorPar["L2JetParAK8"]  = parStore.GetParameters(mJetParStr["MCL2JetParAK8"]);
+      mStrJetCorPar["L1JetParAK8"]  = parStore.GetParameters(mJetParStr["MCL1JetParAK8"]);
 
       // Load the JetCorrectorParameter objects into a std::vector,
       // IMPORTANT: THE ORDER MATTERS HERE !!!!
@@ -76,6 +90,10 @@ void JetMETCorrHelper::Initialize(const edm::ParameterSet& iConfig){
       JetCorrector = std::shared_ptr<FactorizedJetCorrector>(new FactorizedJetCorrector(vPar) );
       JetCorrectorAK8 = std::shared_ptr<FactorizedJetCorrector>(new FactorizedJetCorrector(vParAK8) );
 
+      // the correctors keep their own copy
+      vPar.clear();
+      vParAK8.clear();
+
     }
     else if ( !isMc ) {
       // Create the JetCorrectorParameter objects, the order does not matter.
@@ -128,14 +146,14 @@ void JetMETCorrHelper::Initialize(const edm::ParameterSet& iConfig){
           if(debug) std::cout << mLegend << "Using JEC files DataResJetParAK8ByIOV : era "+era+": " <<  mEraJetParStr[era]["DataResJetParAK8ByIOV"] << std::endl;
 
 
-          mEra_mStrJetCorPar[era]["ResJetPar"] = std::shared_ptr<JetCorrectorParameters>( new JetCorrectorParameters(mEraJetParStr[era]["DataResJetParByIOV"]) );
-          mEra_mStrJetCorPar[era]["L3JetPar"]  = std::shared_ptr<JetCorrectorParameters>( new JetCorrectorParameters(mEraJetParStr[era]["DataL3JetParByIOV"]) );
-          mEra_mStrJetCorPar[era]["L2JetPar"]  = std::shared_ptr<JetCorrectorParameters>( new JetCorrectorParameters(mEraJetParStr[era]["DataL2JetParByIOV"]) );
-          mEra_mStrJetCorPar[era]["L1JetPar"]  = std::shared_ptr<JetCorrectorParameters>( new JetCorrectorParameters(mEraJetParStr[era]["DataL1JetParByIOV"]) );
-          mEra_mStrJetCorPar[era]["ResJetParAK8"] = std::shared_ptr<JetCorrectorParameters>( new JetCorrectorParameters(mEraJetParStr[era]["DataResJetParAK8ByIOV"]) );
-          mEra_mStrJetCorPar[era]["L3JetParAK8"]  = std::shared_ptr<JetCorrectorParameters>( new JetCorrectorParameters(mEraJetParStr[era]["DataL3JetParAK8ByIOV"]) );
-          mEra_mStrJetCorPar[era]["L2JetParAK8"]  = std::shared_ptr<JetCorrectorParameters>( new JetCorrectorParameters(mEraJetParStr[era]["DataL2JetParAK8ByIOV"]) );
-          mEra_mStrJetCorPar[era]["L1JetParAK8"]  = std::shared_ptr<JetCorrectorParameters>( new JetCorrectorParameters(mEraJetParStr[era]["DataL1JetParAK8ByIOV"]) );
+          mEra_mStrJetCorPar[era]["ResJetPar"] = parStore.GetParameters(mEraJetParStr[era]["DataResJetParByIOV"]);
+          mEra_mStrJetCorPar[era]["L3JetPar"]  = parStore.GetParameters(mEraJetParStr[era]["DataL3JetParByIOV"]);
+          mEra_mStrJetCorPar[era]["L2JetPar"]  = parStore.GetParameters(mEraJetParStr[era]["DataL2JetParByIOV"]);
+          mEra_mStrJetCorPar[era]["L1JetPar"]  = parStore.GetParameters(mEraJetParStr[era]["DataL1JetParByIOV"]);
+          mEra_mStrJetCorPar[era]["ResJetParAK8"] = parStore.GetParameters(mEraJetParStr[era]["DataResJetParAK8ByIOV"]);
+          mEra_mStrJetCorPar[era]["L3JetParAK8"]  = parStore.GetParameters(mEraJetParStr[era]["DataL3JetParAK8ByIOV"]);
+          mEra_mStrJetCorPar[era]["L2JetParAK8"]  = parStore.GetParameters(mEraJetParStr[era]["DataL2JetParAK8ByIOV"]);
+          mEra_mStrJetCorPar[era]["L1JetParAK8"]  = parStore.GetParameters(mEraJetParStr[era]["DataL1JetParAK8ByIOV"]);
 
           // Load the JetCorrectorParameter objects into a std::vector,
           // IMPORTANT: THE ORDER MATTERS HERE !!!!
@@ -151,6 +169,10 @@ void JetMETCorrHelper::Initialize(const edm::ParameterSet& iConfig){
           mEraFacJetCorr[era] = std::shared_ptr<FactorizedJetCorrector>( new FactorizedJetCorrector(mEraVPar[era]) );
 	  mEraFacJetCorrAK8[era] = std::shared_ptr<FactorizedJetCorrector> (new FactorizedJetCorrector(mEraVParAK8[era]) );
 
+          // the correctors keep their own copy
+          mEraVPar[era].clear();
+          mEraVParAK8[era].clear();
+
       }
 
     }
@@ -256,6 +278,30 @@ TLorentzVector JetMETCorrHelper::correctJet(const pat::Jet & jet,
   return jetP4;
 }
 
+JetMETCorrHelper::EventCache & JetMETCorrHelper::eventCache(edm::Event const & event)
+{
+  static thread_local EventCache cache;
+  if (cache.eventID != event.id()) {
+    cache.eventID = event.id();
+    cache.jets.clear();
+    cache.metJets.clear();
+  }
+  return cache;
+}
+
+JetMETCorrHelper::CacheKey JetMETCorrHelper::cacheKey(const pat::Jet & jet, int kind, unsigned int syst, double rho) const
+{
+  double jecFactor = jet.jecSetsAvailable() ? jet.jecFactor(0) : 1.0;
+  return CacheKey(mConfigID, kind, syst, rho, jet.px(), jet.py(), jet.pz(), jet.energy(), jecFactor);
+}
+
+double JetMETCorrHelper::getRho(edm::Event const & event, edm::EDGetTokenT<double> const & rhoJetsToken) const
+{
+  edm::Handle<double> rhoHandle;
+  event.getByToken(rhoJetsToken, rhoHandle);
+  return std::max(*(rhoHandle.product()), 0.0);
+}
+
 pat::Jet JetMETCorrHelper::correctJetReturnPatJet(const pat::Jet & jet,
                                                        edm::Event const & event,
                                                        edm::EDGetTokenT<double> rhoJetsToken,
@@ -263,184 +309,303 @@ pat::Jet JetMETCorrHelper::correctJetReturnPatJet(const pat::Jet & jet,
                                                        bool reCorrectJet,
                                                        unsigned int syst)
 {
+  return correctJetReturnPatJet(jet, event, getRho(event, rhoJetsToken), doAK8Corr, reCorrectJet, syst);
+}
+
+pat::Jet JetMETCorrHelper::correctJetReturnPatJet(const pat::Jet & jet,
+                                                       edm::Event const & event,
+                                                       double rho,
+                                                       bool doAK8Corr,
+                                                       bool reCorrectJet,
+                                                       unsigned int syst)
+{
+  rho = std::max(rho, 0.0);
+
+  std::map<CacheKey, pat::Jet> & cache = eventCache(event).jets;
+  CacheKey key = cacheKey(jet, (doAK8Corr ? 1 : 0) + (reCorrectJet ? 2 : 0), syst, rho);
+  std::map<CacheKey, pat::Jet>::const_iterator cached = cache.find(key);
+  if (cached != cache.end()) return cached->second;
+
+  return cache.insert(std::make_pair(key, computeCorrectedJet(jet, rho, doAK8Corr, reCorrectJet, syst))).first->second;
+}
+
+void JetMETCorrHelper::CorrectJets(std::vector<const pat::Jet *> const & jets,
+                                   edm::Event const & event,
+                                   edm::EDGetTokenT<double> rhoJetsToken,
+                                   bool doAK8Corr,
+                                   bool reCorrectJet,
+                                   unsigned int syst)
+{
+  CorrectJets(jets, event, getRho(event, rhoJetsToken), doAK8Corr, reCorrectJet, syst);
+}
+
+void JetMETCorrHelper::CorrectJets(std::vector<const pat::Jet *> const & jets,
+                                   edm::Event const & event,
+                                   double rho,
+                                   bool doAK8Corr,
+                                   bool reCorrectJet,
+                                   unsigned int syst)
+{
+  rho = std::max(rho, 0.0);
+
+  // jets that are not in the cache yet
+  std::map<CacheKey, pat::Jet> & cache = eventCache(event).jets;
+  std::vector<const pat::Jet *> vJets;
+  std::vector<CacheKey> vKeys;
+  JetBatch batch;
+  batch.rho = rho;
+  for (std::vector<const pat::Jet *>::const_iterator ijet = jets.begin(); ijet != jets.end(); ++ijet) {
+    CacheKey key = cacheKey(**ijet, (doAK8Corr ? 1 : 0) + (reCorrectJet ? 2 : 0), syst, rho);
+    if (cache.find(key) != cache.end()) continue;
+    vJets.push_back(*ijet);
+    vKeys.push_back(key);
+    batch.push_back(**ijet, reCorrectJet);
+  }
+  if (vJets.empty()) return;
+
+  JetBatchFactors factors;
+  CorrectJetBatch(batch, factors, doAK8Corr, reCorrectJet, syst);
+
+  for (size_t i = 0; i < vJets.size(); i++) {
+    cache.insert(std::make_pair(vKeys[i], applyFactors(*vJets[i], factors, i, reCorrectJet, syst)));
+  }
+}
+
+pat::Jet JetMETCorrHelper::computeCorrectedJet(const pat::Jet & jet,
+                                                    double rho,
+                                                    bool doAK8Corr,
+                                                    bool reCorrectJet,
+                                                    unsigned int syst)
+{
+  // a batch of one
+  JetBatch batch;
+  batch.rho = rho;
+  batch.push_back(jet, reCorrectJet);
 
+  JetBatchFactors factors;
+  CorrectJetBatch(batch, factors, doAK8Corr, reCorrectJet, syst);
+
+  return applyFactors(jet, factors, 0, reCorrectJet, syst);
+}
+
+pat::Jet JetMETCorrHelper::applyFactors(const pat::Jet & jet,
+                                        JetBatchFactors const & factors,
+                                        size_t i,
+                                        bool reCorrectJet,
+                                        unsigned int syst) const
+{
   // JES and JES systematics
   pat::Jet correctedJet;
   if (reCorrectJet) correctedJet = jet.correctedJet(0);                 //copy original jet
   else correctedJet = jet;                                 //copy default corrected jet
 
-  double ptscale = 1.0;
-  double unc = 1.0;
-  double pt = correctedJet.pt();
-  double correction = 1.0;
-
-  edm::Handle<double> rhoHandle;
-  event.getByToken(rhoJetsToken, rhoHandle);
-  double rho = std::max(*(rhoHandle.product()), 0.0);
+  // We need to undo the default corrections and then apply the new ones
+  if (reCorrectJet) correctedJet.scaleEnergy(factors.jec[i]);
 
-  if ( isMc ){
+  if (isMc) correctedJet.scaleEnergy(factors.SystFactor(i, syst));
 
-    if (reCorrectJet) {
-      // We need to undo the default corrections and then apply the new ones
+  return correctedJet;
+}
 
-      double pt_raw = jet.correctedJet(0).pt();
+void JetMETCorrHelper::JetBatch::clear()
+{
+  pt.clear();
+  eta.clear();
+  phi.clear();
+  area.clear();
+  genPt.clear();
+  genEta.clear();
+  genPhi.clear();
+}
 
-      if (doAK8Corr){
-		JetCorrectorAK8->setJetEta(jet.eta());
-		JetCorrectorAK8->setJetPt(pt_raw);
-		JetCorrectorAK8->setJetA(jet.jetArea());
-		JetCorrectorAK8->setRho(rho);
+void JetMETCorrHelper::JetBatch::push_back(const pat::Jet & jet, bool reCorrectJet)
+{
+  pt.push_back(reCorrectJet ? jet.correctedJet(0).pt() : jet.pt());
+  eta.push_back(jet.eta());
+  phi.push_back(jet.phi());
+  area.push_back(jet.jetArea());
+
+  const reco::GenJet * genJet = jet.genJet();
+  genPt.push_back(genJet ? genJet->pt() : -1.0);
+  genEta.push_back(genJet ? genJet->eta() : 0.0);
+  genPhi.push_back(genJet ? genJet->phi() : 0.0);
+}
 
-		try{
-		  correction = JetCorrectorAK8->getCorrection();
-		}
-		catch(...){
-		  std::cout << mLegend << "WARNING! Exception thrown by JetCorrectionUncertainty!" << std::endl;
-		  std::cout << mLegend << "WARNING! Possibly, trying to correct a jet/MET outside correction range." << std::endl;
-		  std::cout << mLegend << "WARNING! Jet/MET will remain uncorrected." << std::endl;
-		}
-      }
+double JetMETCorrHelper::JetBatchFactors::SystFactor(size_t i, unsigned int syst) const
+{
+  if (syst == 1) return jesUp[i]*jer[i];
+  if (syst == 2) return jesDown[i]*jer[i];
+  if (syst == 3) return jerUp[i];
+  if (syst == 4) return jerDown[i];
+  return jer[i];
+}
 
-      else{
-		JetCorrector->setJetEta(jet.eta());
-		JetCorrector->setJetPt(pt_raw);
-		JetCorrector->setJetA(jet.jetArea());
-		JetCorrector->setRho(rho);
-
-		try{
-		  correction = JetCorrector->getCorrection();
-		}
-		catch(...){
-		  std::cout << mLegend << "WARNING! Exception thrown by JetCorrectionUncertainty!" << std::endl;
-		  std::cout << mLegend << "WARNING! Possibly, trying to correct a jet/MET outside correction range." << std::endl;
-		  std::cout << mLegend << "WARNING! Jet/MET will remain uncorrected." << std::endl;
-		}
+void JetMETCorrHelper::findRecords(JME::JetResolutionObject const & object,
+                                   std::vector<double> const & pt,
+                                   JetBatch const & batch,
+                                   std::vector<const JME::JetResolutionObject::Record *> & records) const
+{
+  size_t nJets = batch.size();
+  records.assign(nJets, nullptr);
+
+  // bin variables of all jets, as JME::JetParameters stores them
+  std::vector<Binning> const & binning = object.getDefinition().getBins();
+  std::vector<std::vector<float> > values(binning.size(), std::vector<float>(nJets));
+  for (size_t ibin = 0; ibin < binning.size(); ibin++) {
+    if (binning[ibin] != Binning::JetPt && binning[ibin] != Binning::JetEta && binning[ibin] != Binning::JetAbsEta && binning[ibin] != Binning::Rho) {
+      // not set by this helper, the object throws as it does per jet
+      for (size_t i = 0; i < nJets; i++) {
+        JME::JetParameters parameters;
+        parameters.setJetPt(pt[i]).setJetEta(batch.eta[i]).setRho(batch.rho);
+        records[i] = object.getRecord(parameters);
       }
-
-      correctedJet.scaleEnergy(correction);
-      pt = correctedJet.pt();
-
+      return;
     }
+    for (size_t i = 0; i < nJets; i++) {
+      if (binning[ibin] == Binning::JetPt) values[ibin][i] = pt[i];
+      else if (binning[ibin] == Binning::JetEta) values[ibin][i] = batch.eta[i];
+      else if (binning[ibin] == Binning::JetAbsEta) values[ibin][i] = std::abs(batch.eta[i]);
+      else values[ibin][i] = batch.rho;
+    }
+  }
 
-    Variation JERsystematic = Variation::NOMINAL;
-    if( syst==3) JERsystematic = Variation::UP;
-    if( syst==4) JERsystematic = Variation::DOWN;
-
-    JME::JetParameters parameters;
-    parameters.setJetPt(pt);
-    parameters.setJetEta(correctedJet.eta());
-    parameters.setRho(rho);
-    double res = 0.0;
-    if(doAK8Corr) res = resolutionAK8.getResolution(parameters);
-    else res = resolution.getResolution(parameters);
-    double factor = resolution_SF.getScaleFactor(parameters,JERsystematic) - 1;
-
-    const reco::GenJet * genJet = jet.genJet();
-    bool smeared = false;
-    if(genJet){
-      double deltaPt = fabs(genJet->pt() - pt);
-      double deltaR = reco::deltaR(genJet->p4(),correctedJet.p4());
-      if (deltaR < ((doAK8Corr) ? 0.4 : 0.2) && deltaPt <= 3*pt*res){
-		double gen_pt = genJet->pt();
-		double reco_pt = pt;
-		double deltapt = (reco_pt - gen_pt) * factor;
-		ptscale = max(0.0, (reco_pt + deltapt) / reco_pt);
-		smeared = true;
-      }
+  // first record containing the jet, as JME::JetResolutionObject::getRecord()
+  std::vector<JME::JetResolutionObject::Record> const & vRecords = object.getRecords();
+  std::vector<char> inside(nJets);
+  size_t nFound = 0;
+  for (size_t irec = 0; irec < vRecords.size() && nFound < nJets; irec++) {
+    std::vector<JME::JetResolutionObject::Range> const & ranges = vRecords[irec].getBinsRange();
+    std::fill(inside.begin(), inside.end(), 1);
+    for (size_t ibin = 0; ibin < binning.size(); ibin++) {
+      float const min = ranges[ibin].min;
+      float const max = ranges[ibin].max;
+      float const * x = values[ibin].data();
+      for (size_t i = 0; i < nJets; i++) inside[i] &= (x[i] >= min) & (x[i] <= max);
     }
-    if (!smeared && factor>0) {
-      JERrand.SetSeed(abs(static_cast<int>(jet.phi()*1e4)));
-      ptscale = max(0.0, JERrand.Gaus(pt,sqrt(factor*(factor+2))*res*pt)/pt);
+    for (size_t i = 0; i < nJets; i++) {
+      if (inside[i] && !records[i]) {
+        records[i] = &vRecords[irec];
+        ++nFound;
+      }
     }
+  }
+}
 
-    if (  syst==1 || syst==2) {
-      jecUnc->setJetEta(jet.eta());
-      jecUnc->setJetPt(pt*ptscale);
-
-      if ( syst==1) {
-	try{
-	  unc = jecUnc->getUncertainty(true);
-	}
-	catch(...){ // catch all exceptions. Jet Uncertainty tool throws when binning out of range
-	  std::cout << mLegend << "WARNING! Exception thrown by JetCorrectionUncertainty!" << std::endl;
-	  std::cout << mLegend << "WARNING! Possibly, trying to correct a jet/MET outside correction range." << std::endl;
-	  std::cout << mLegend << "WARNING! Jet/MET will remain uncorrected." << std::endl;
-	  unc = 0.0;
-	}
-	unc = 1 + unc;
+void JetMETCorrHelper::CorrectJetBatch(JetBatch const & batch,
+                                       JetBatchFactors & factors,
+                                       bool doAK8Corr,
+                                       bool reCorrectJet,
+                                       int syst)
+{
+  size_t nJets = batch.size();
+  factors.jec.assign(nJets, 1.0);
+  factors.jer.assign(nJets, 1.0);
+  factors.jerUp.assign(nJets, 1.0);
+  factors.jerDown.assign(nJets, 1.0);
+  factors.jesUp.assign(nJets, 1.0);
+  factors.jesDown.assign(nJets, 1.0);
+
+  // JEC, pt after the JEC
+  std::vector<double> pt(batch.pt);
+  if (reCorrectJet) {
+    std::shared_ptr<FactorizedJetCorrector> corrector = doAK8Corr ? JetCorrectorAK8 : JetCorrector;
+    for (size_t i = 0; i < nJets; i++) {
+      corrector->setJetEta(batch.eta[i]);
+      corrector->setJetPt(batch.pt[i]);
+      corrector->setJetA(batch.area[i]);
+      corrector->setRho(batch.rho);
+
+      try{
+        factors.jec[i] = corrector->getCorrection();
       }
-      else {
-	try{
-	  unc = jecUnc->getUncertainty(false);
-	}
-	catch(...){
-	  std::cout << mLegend << "WARNING! Exception thrown by JetCorrectionUncertainty!" << std::endl;
-	  std::cout << mLegend << "WARNING! Possibly, trying to correct a jet/MET outside correction range." << std::endl;
-	  std::cout << mLegend << "WARNING! Jet/MET will remain uncorrected." << std::endl;
-	  unc = 0.0;
-	}
-	unc = 1 - unc;
+      catch(...){
+        std::cout << mLegend << "WARNING! Exception thrown by JetCorrectionUncertainty!" << std::endl;
+        std::cout << mLegend << "WARNING! Possibly, trying to correct a jet/MET outside correction range." << std::endl;
+        std::cout << mLegend << "WARNING! Jet/MET will remain uncorrected." << std::endl;
       }
+      pt[i] = batch.pt[i] * factors.jec[i];
+    }
+  }
 
-      if (pt*ptscale < 10.0 && ( syst==1)) unc = 2.0;
-      if (pt*ptscale < 10.0 && ( syst==2)) unc = 0.01;
+  if (!isMc) return;
 
-    }
+  bool doAll = syst < 0;
+  bool doJERNominal = doAll || syst <= 2;
+  bool doJERUp = doAll || syst == 3;
+  bool doJERDown = doAll || syst == 4;
+  bool doJESUp = doAll || syst == 1;
+  bool doJESDown = doAll || syst == 2;
 
-    correctedJet.scaleEnergy(unc*ptscale);
+  // JER bins of all jets
+  JME::JetResolution const & res_object = doAK8Corr ? resolutionAK8 : resolution;
+  std::vector<const JME::JetResolutionObject::Record *> resRecords;
+  std::vector<const JME::JetResolutionObject::Record *> sfRecords;
+  findRecords(*res_object.getResolutionObject(), pt, batch, resRecords);
+  findRecords(*resolution_SF.getResolutionObject(), pt, batch, sfRecords);
 
-  }
-  else if (!isMc) {
-
-    if (reCorrectJet) {
-
-      double pt_raw = jet.correctedJet(0).pt();
-      // We need to undo the default corrections and then apply the new ones
-
-      if (doAK8Corr){
-		JetCorrectorAK8->setJetEta(jet.eta());
-		JetCorrectorAK8->setJetPt(pt_raw);
-		JetCorrectorAK8->setJetA(jet.jetArea());
-		JetCorrectorAK8->setRho(rho);
-
-		try{
-		  correction = JetCorrectorAK8->getCorrection();
-		}
-		catch(...){
-		  std::cout << mLegend << "WARNING! Exception thrown by JetCorrectionUncertainty!" << std::endl;
-		  std::cout << mLegend << "WARNING! Possibly, trying to correct a jet/MET outside correction range." << std::endl;
-		  std::cout << mLegend << "WARNING! Jet/MET will remain uncorrected." << std::endl;
-		}
-      }
+  for (size_t i = 0; i < nJets; i++) {
 
-      else{
-		JetCorrector->setJetEta(jet.eta());
-		JetCorrector->setJetPt(pt_raw);
-		JetCorrector->setJetA(jet.jetArea());
-		JetCorrector->setRho(rho);
-
-		try{
-		  correction = JetCorrector->getCorrection();
-		}
-		catch(...){
-		  std::cout << mLegend << "WARNING! Exception thrown by JetCorrectionUncertainty!" << std::endl;
-		  std::cout << mLegend << "WARNING! Possibly, trying to correct a jet/MET outside correction range." << std::endl;
-		  std::cout << mLegend << "WARNING! Jet/MET will remain uncorrected." << std::endl;
-		}
-      }
-      correctedJet.scaleEnergy(correction);
-      pt = correctedJet.pt();
+    JME::JetParameters parameters;
+    parameters.setJetPt(pt[i]);
+    parameters.setJetEta(batch.eta[i]);
+    parameters.setRho(batch.rho);
+    double res = resRecords[i] ? res_object.getResolutionObject()->evaluateFormula(*resRecords[i], parameters) : 1.0;
+
+    bool matched = false;
+    if (batch.genPt[i] >= 0) {
+      double deltaPt = fabs(batch.genPt[i] - pt[i]);
+      double deltaR = reco::deltaR(batch.genEta[i], batch.genPhi[i], batch.eta[i], batch.phi[i]);
+      matched = deltaR < ((doAK8Corr) ? 0.4 : 0.2) && deltaPt <= 3*pt[i]*res;
+    }
 
+    // JER smearing for one scale factor variation
+    auto smear = [&](Variation JERsystematic) {
+      double ptscale = 1.0;
+      double factor = (sfRecords[i] ? sfRecords[i]->getParametersValues()[static_cast<size_t>(JERsystematic)] : 1.0) - 1;
+      if (matched) {
+        double gen_pt = batch.genPt[i];
+        double reco_pt = pt[i];
+        double deltapt = (reco_pt - gen_pt) * factor;
+        ptscale = max(0.0, (reco_pt + deltapt) / reco_pt);
+      }
+      else if (factor>0) {
+        JERrand.SetSeed(abs(static_cast<int>(batch.phi[i]*1e4)));
+        ptscale = max(0.0, JERrand.Gaus(pt[i],sqrt(factor*(factor+2))*res*pt[i])/pt[i]);
+      }
+      return ptscale;
+    };
+    if (doJERNominal) factors.jer[i] = smear(Variation::NOMINAL);
+    if (doJERUp) factors.jerUp[i] = smear(Variation::UP);
+    if (doJERDown) factors.jerDown[i] = smear(Variation::DOWN);
+
+    // JES uncertainty at the smeared pt
+    double ptSmeared = pt[i]*factors.jer[i];
+    for (int dir = 0; dir < 2; dir++) {
+      if (dir == 0 && !doJESUp) continue;
+      if (dir == 1 && !doJESDown) continue;
+
+      double unc = 0.0;
+      jecUnc->setJetEta(batch.eta[i]);
+      jecUnc->setJetPt(ptSmeared);
+      try{
+        unc = jecUnc->getUncertainty(dir == 0);
+      }
+      catch(...){ // catch all exceptions. Jet Uncertainty tool throws when binning out of range
+        std::cout << mLegend << "WARNING! Exception thrown by JetCorrectionUncertainty!" << std::endl;
+        std::cout << mLegend << "WARNING! Possibly, trying to correct a jet/MET outside correction range." << std::endl;
+        std::cout << mLegend << "WARNING! Jet/MET will remain uncorrected." << std::endl;
+        unc = 0.0;
+      }
+      if (dir == 0) factors.jesUp[i] = (ptSmeared < 10.0) ? 2.0 : 1 + unc;
+      else factors.jesDown[i] = (ptSmeared < 10.0) ? 0.01 : 1 - unc;
     }
   }
-
-  return correctedJet;
 }
 
 TLorentzVector JetMETCorrHelper::correctMet(const pat::MET & met,
                                                  edm::Event const & event,
                                                  edm::EDGetTokenT<double> rhoJetsToken,
-                                                 std::vector<edm::Ptr<pat::Jet>> vAllJets,
+                                                 std::vector<edm::Ptr<pat::Jet>> const & vAllJets,
                                                  bool reCorrectjet,
                                                  unsigned int syst,
                                                  bool useHF)
@@ -472,6 +637,20 @@ TLorentzVector JetMETCorrHelper::correctJetForMet(const pat::Jet & jet,
                                                        edm::EDGetTokenT<double> rhoJetsToken,
                                                        unsigned int syst)
 {
+    double rho = getRho(event, rhoJetsToken);
+
+    std::map<CacheKey, TLorentzVector> & cache = eventCache(event).metJets;
+    CacheKey key = cacheKey(jet, 4, syst, rho);
+    std::map<CacheKey, TLorentzVector>::const_iterator cached = cache.find(key);
+    if (cached != cache.end()) return cached->second;
+
+    return cache.insert(std::make_pair(key, computeCorrectedJetForMet(jet, rho, syst))).first->second;
+}
+
+TLorentzVector JetMETCorrHelper::computeCorrectedJetForMet(const pat::Jet & jet,
+                                                                double rho,
+                                                                unsigned int syst)
+{
 
     TLorentzVector jetP4, offJetP4;
     jetP4.SetPtEtaPhiM(0.000001,1.,1.,0.000001);
@@ -501,10 +680,6 @@ TLorentzVector JetMETCorrHelper::correctJetForMet(const pat::Jet & jet,
     double pt = correctedJet.pt();
     std::vector<float> corrVec;
 
-    edm::Handle<double> rhoHandle;
-    event.getByToken(rhoJetsToken, rhoHandle);
-    double rho = std::max(*(rhoHandle.product()), 0.0);
-
     if ( isMc ){
 
         JetCorrector->setJetEta(correctedJet.eta());
@@ -42,6 +42,104 @@ int JetSubCalc::BeginJob(edm::ConsumesCollector && iC)
   //BTAG parameter initialization
   btagSfUtil.Initialize(mPset);
 
+  // output branches
+  // AK4 jets
+  h_theJetPt = RegisterBranch<std::vector<double>>("theJetPt");
+  h_theJetEta = RegisterBranch<std::vector<double>>("theJetEta");
+  h_theJetPhi = RegisterBranch<std::vector<double>>("theJetPhi");
+  h_theJetEnergy = RegisterBranch<std::vector<double>>("theJetEnergy");
+  h_theJetDeepFlavB = RegisterBranch<std::vector<double>>("theJetDeepFlavB");
+  h_theJetPFlav = RegisterBranch<std::vector<int>>("theJetPFlav");
+  h_theJetHFlav = RegisterBranch<std::vector<int>>("theJetHFlav");
+  h_theJetBTag = RegisterBranch<std::vector<int>>("theJetBTag");
+  h_theJetBTag_bSFup = RegisterBranch<std::vector<int>>("theJetBTag_bSFup");
+  h_theJetBTag_bSFdn = RegisterBranch<std::vector<int>>("theJetBTag_bSFdn");
+  h_theJetBTag_lSFup = RegisterBranch<std::vector<int>>("theJetBTag_lSFup");
+  h_theJetBTag_lSFdn = RegisterBranch<std::vector<int>>("theJetBTag_lSFdn");
+  h_theJetHT = RegisterBranch<double>("theJetHT");
+  h_theJetLeadPt = RegisterBranch<double>("theJetLeadPt");
+  h_theJetSubLeadPt = RegisterBranch<double>("theJetSubLeadPt");
+  h_theJetPileupJetId = RegisterBranch<std::vector<double>>("theJetPileupJetId");
+  h_theJetPileupJetLoose = RegisterBranch<std::vector<bool>>("theJetPileupJetLoose");
+  h_theJetPileupJetMedium = RegisterBranch<std::vector<bool>>("theJetPileupJetMedium");
+  h_theJetPileupJetTight = RegisterBranch<std::vector<bool>>("theJetPileupJetTight");
+  h_theJetnDaughters = RegisterBranch<std::vector<int>>("theJetnDaughters");
+  // AK8 jets and subjets
+  h_maxProb = RegisterBranch<std::vector<int>>("maxProb");
+  h_theJetAK8Pt = RegisterBranch<std::vector<double>>("theJetAK8Pt");
+  h_theJetAK8Eta = RegisterBranch<std::vector<double>>("theJetAK8Eta");
+  h_theJetAK8Phi = RegisterBranch<std::vector<double>>("theJetAK8Phi");
+  h_theJetAK8Energy = RegisterBranch<std::vector<double>>("theJetAK8Energy");
+  h_theJetAK8CSV = RegisterBranch<std::vector<double>>("theJetAK8CSV");
+  h_theJetAK8DoubleB = RegisterBranch<std::vector<double>>("theJetAK8DoubleB");
+  h_theJetAK8JetCharge = RegisterBranch<std::vector<double>>("theJetAK8JetCharge");
+  h_theJetAK8GenPt = RegisterBranch<std::vector<double>>("theJetAK8GenPt");
+  h_theJetAK8GenDR = RegisterBranch<std::vector<double>>("theJetAK8GenDR");
+  h_theJetAK8GenMass = RegisterBranch<std::vector<double>>("theJetAK8GenMass");
+  h_theJetAK8CHSPt = RegisterBranch<std::vector<double>>("theJetAK8CHSPt");
+  h_theJetAK8CHSEta = RegisterBranch<std::vector<double>>("theJetAK8CHSEta");
+  h_theJetAK8CHSPhi = RegisterBranch<std::vector<double>>("theJetAK8CHSPhi");
+  h_theJetAK8CHSMass = RegisterBranch<std::vector<double>>("theJetAK8CHSMass");
+  h_theJetAK8SoftDropRaw = RegisterBranch<std::vector<double>>("theJetAK8SoftDropRaw");
+  h_theJetAK8SoftDropCorr = RegisterBranch<std::vector<double>>("theJetAK8SoftDropCorr");
+  h_theJetAK8SoftDrop = RegisterBranch<std::vector<double>>("theJetAK8SoftDrop");
+  h_theJetAK8SoftDrop_JMSup = RegisterBranch<std::vector<double>>("theJetAK8SoftDrop_JMSup");
+  h_theJetAK8SoftDrop_JMSdn = RegisterBranch<std::vector<double>>("theJetAK8SoftDrop_JMSdn");
+  h_theJetAK8SoftDrop_JMRup = RegisterBranch<std::vector<double>>("theJetAK8SoftDrop_JMRup");
+  h_theJetAK8SoftDrop_JMRdn = RegisterBranch<std::vector<double>>("theJetAK8SoftDrop_JMRdn");
+  h_theJetAK8CHSPrunedMass = RegisterBranch<std::vector<double>>("theJetAK8CHSPrunedMass");
+  h_theJetAK8CHSSoftDropMass = RegisterBranch<std::vector<double>>("theJetAK8CHSSoftDropMass");
+  h_theJetAK8NjettinessTau1 = RegisterBranch<std::vector<double>>("theJetAK8NjettinessTau1");
+  h_theJetAK8NjettinessTau2 = RegisterBranch<std::vector<double>>("theJetAK8NjettinessTau2");
+  h_theJetAK8NjettinessTau3 = RegisterBranch<std::vector<double>>("theJetAK8NjettinessTau3");
+  h_theJetAK8CHSTau1 = RegisterBranch<std::vector<double>>("theJetAK8CHSTau1");
+  h_theJetAK8CHSTau2 = RegisterBranch<std::vector<double>>("theJetAK8CHSTau2");
+  h_theJetAK8CHSTau3 = RegisterBranch<std::vector<double>>("theJetAK8CHSTau3");
+  h_theJetAK8SoftDropn2b1 = RegisterBranch<std::vector<double>>("theJetAK8SoftDropn2b1");
+  h_theJetAK8SoftDropn2b2 = RegisterBranch<std::vector<double>>("theJetAK8SoftDropn2b2");
+  h_theJetAK8SoftDropn3b1 = RegisterBranch<std::vector<double>>("theJetAK8SoftDropn3b1");
+  h_theJetAK8SoftDropn3b2 = RegisterBranch<std::vector<double>>("theJetAK8SoftDropn3b2");
+  h_theJetAK8Mass = RegisterBranch<std::vector<double>>("theJetAK8Mass");
+  h_theJetAK8nDaughters = RegisterBranch<std::vector<int>>("theJetAK8nDaughters");
+  h_theJetAK8SDSubjetPt = RegisterBranch<std::vector<double>>("theJetAK8SDSubjetPt");
+  h_theJetAK8SDSubjetEta = RegisterBranch<std::vector<double>>("theJetAK8SDSubjetEta");
+  h_theJetAK8SDSubjetPhi = RegisterBranch<std::vector<double>>("theJetAK8SDSubjetPhi");
+  h_theJetAK8SDSubjetMass = RegisterBranch<std::vector<double>>("theJetAK8SDSubjetMass");
+  h_theJetAK8SDSubjetDeepCSVb = RegisterBranch<std::vector<double>>("theJetAK8SDSubjetDeepCSVb");
+  h_theJetAK8SDSubjetHFlav = RegisterBranch<std::vector<int>>("theJetAK8SDSubjetHFlav");
+  h_theJetAK8SDSubjetBTag = RegisterBranch<std::vector<int>>("theJetAK8SDSubjetBTag");
+  h_theJetAK8SDSubjetDR = RegisterBranch<std::vector<double>>("theJetAK8SDSubjetDR");
+  h_theJetAK8SDSubjetIndex = RegisterBranch<std::vector<int>>("theJetAK8SDSubjetIndex");
+  h_theJetAK8SDSubjetSize = RegisterBranch<std::vector<int>>("theJetAK8SDSubjetSize");
+  h_theJetAK8SDSubjetNDeepCSVL = RegisterBranch<std::vector<int>>("theJetAK8SDSubjetNDeepCSVL");
+  h_theJetAK8SDSubjetNDeepCSVMSF = RegisterBranch<std::vector<int>>("theJetAK8SDSubjetNDeepCSVMSF");
+  h_theJetAK8SDSubjetNDeepCSVM_bSFup = RegisterBranch<std::vector<int>>("theJetAK8SDSubjetNDeepCSVM_bSFup");
+  h_theJetAK8SDSubjetNDeepCSVM_bSFdn = RegisterBranch<std::vector<int>>("theJetAK8SDSubjetNDeepCSVM_bSFdn");
+  h_theJetAK8SDSubjetNDeepCSVM_lSFup = RegisterBranch<std::vector<int>>("theJetAK8SDSubjetNDeepCSVM_lSFup");
+  h_theJetAK8SDSubjetNDeepCSVM_lSFdn = RegisterBranch<std::vector<int>>("theJetAK8SDSubjetNDeepCSVM_lSFdn");
+  // hadronic V/H/t truth
+  h_HadronicVHtStatus = RegisterBranch<std::vector<int>>("HadronicVHtStatus");
+  h_HadronicVHtID = RegisterBranch<std::vector<int>>("HadronicVHtID");
+  h_HadronicVHtPt = RegisterBranch<std::vector<double>>("HadronicVHtPt");
+  h_HadronicVHtEta = RegisterBranch<std::vector<double>>("HadronicVHtEta");
+  h_HadronicVHtPhi = RegisterBranch<std::vector<double>>("HadronicVHtPhi");
+  h_HadronicVHtEnergy = RegisterBranch<std::vector<double>>("HadronicVHtEnergy");
+  h_HadronicVHtD0Pt = RegisterBranch<std::vector<double>>("HadronicVHtD0Pt");
+  h_HadronicVHtD0Eta = RegisterBranch<std::vector<double>>("HadronicVHtD0Eta");
+  h_HadronicVHtD0Phi = RegisterBranch<std::vector<double>>("HadronicVHtD0Phi");
+  h_HadronicVHtD0E = RegisterBranch<std::vector<double>>("HadronicVHtD0E");
+  h_HadronicVHtD1Pt = RegisterBranch<std::vector<double>>("HadronicVHtD1Pt");
+  h_HadronicVHtD1Eta = RegisterBranch<std::vector<double>>("HadronicVHtD1Eta");
+  h_HadronicVHtD1Phi = RegisterBranch<std::vector<double>>("HadronicVHtD1Phi");
+  h_HadronicVHtD1E = RegisterBranch<std::vector<double>>("HadronicVHtD1E");
+  h_HadronicVHtD2Pt = RegisterBranch<std::vector<double>>("HadronicVHtD2Pt");
+  h_HadronicVHtD2Eta = RegisterBranch<std::vector<double>>("HadronicVHtD2Eta");
+  h_HadronicVHtD2Phi = RegisterBranch<std::vector<double>>("HadronicVHtD2Phi");
+  h_HadronicVHtD2E = RegisterBranch<std::vector<double>>("HadronicVHtD2E");
+
+  // reads the selector's jets and the gen particles, can run next to the other calculators
+  DeclareDependencies({}, {});
+
   return 0;
 
 }
@@ -184,29 +282,29 @@ int JetSubCalc::AnalyzeEvent(edm::Event const & event, BaseEventSelector * selec
       }
     }
 
-    SetValue("theJetPt",     theJetPt);
-    SetValue("theJetEta",    theJetEta);
-    SetValue("theJetPhi",    theJetPhi);
-    SetValue("theJetEnergy", theJetEnergy);
-
-    SetValue("theJetDeepFlavB",    theJetDeepFlavB);
-    SetValue("theJetPFlav",  theJetPFlav);
-    SetValue("theJetHFlav",  theJetHFlav);
-    SetValue("theJetBTag",   theJetBTag);
-    SetValue("theJetBTag_bSFup",   theJetBTag_bSFup);
-    SetValue("theJetBTag_bSFdn",   theJetBTag_bSFdn);
-    SetValue("theJetBTag_lSFup",   theJetBTag_lSFup);
-    SetValue("theJetBTag_lSFdn",   theJetBTag_lSFdn);
-
-    SetValue("theJetHT", theJetHT);
-    SetValue("theJetLeadPt", leading_pt);
-    SetValue("theJetSubLeadPt", second_leading_pt);
-
-    SetValue("theJetPileupJetId", theJetPileupJetId);
-    SetValue("theJetPileupJetLoose", theJetPileupJetLoose);
-    SetValue("theJetPileupJetMedium", theJetPileupJetMedium);
-    SetValue("theJetPileupJetTight", theJetPileupJetTight);
-    SetValue("theJetnDaughters", theJetnDaughters);
+    SetValue(h_theJetPt, std::move(theJetPt));
+    SetValue(h_theJetEta, std::move(theJetEta));
+    SetValue(h_theJetPhi, std::move(theJetPhi));
+    SetValue(h_theJetEnergy, std::move(theJetEnergy));
+
+    SetValue(h_theJetDeepFlavB, std::move(theJetDeepFlavB));
+    SetValue(h_theJetPFlav, std::move(theJetPFlav));
+    SetValue(h_theJetHFlav, std::move(theJetHFlav));
+    SetValue(h_theJetBTag, std::move(theJetBTag));
+    SetValue(h_theJetBTag_bSFup, std::move(theJetBTag_bSFup));
+    SetValue(h_theJetBTag_bSFdn, std::move(theJetBTag_bSFdn));
+    SetValue(h_theJetBTag_lSFup, std::move(theJetBTag_lSFup));
+    SetValue(h_theJetBTag_lSFdn, std::move(theJetBTag_lSFdn));
+
+    SetValue(h_theJetHT, theJetHT);
+    SetValue(h_theJetLeadPt, leading_pt);
+    SetValue(h_theJetSubLeadPt, second_leading_pt);
+
+    SetValue(h_theJetPileupJetId, std::move(theJetPileupJetId));
+    SetValue(h_theJetPileupJetLoose, std::move(theJetPileupJetLoose));
+    SetValue(h_theJetPileupJetMedium, std::move(theJetPileupJetMedium));
+    SetValue(h_theJetPileupJetTight, std::move(theJetPileupJetTight));
+    SetValue(h_theJetnDaughters, std::move(theJetnDaughters));
 
     // Load in AK8 jets (no selection performed on these)
 
@@ -300,6 +398,29 @@ int JetSubCalc::AnalyzeEvent(edm::Event const & event, BaseEventSelector * selec
     int nSDSubsDeepCSVM_lSFdn;
     int SDSubJetIndex;
 
+    // correct the soft drop subjets of all AK8 jets in one batch, the loop finds them in the JetMETCorrHelper event cache
+    unsigned int subjetSyst;
+    if (JECup){subjetSyst=1;}
+    else if (JECdown){subjetSyst=2;}
+    else if (JERup){subjetSyst=3;}
+    else if (JERdown){subjetSyst=4;}
+    else subjetSyst = 0; //nominal
+    if (IsShiftPass()) subjetSyst = GetShift(); // single-pass shift mode
+
+    // rho read once under the event lock, the helper does not read the event itself
+    edm::Handle<double> rhoHandle;
+    GetByToken(event, rhoJetsToken, rhoHandle);
+    double rho = *(rhoHandle.product());
+
+    std::vector<const pat::Jet *> vSubjetsToCorrect;
+    for (std::vector<pat::Jet>::const_iterator ii = theAK8Jets.begin(); ii != theAK8Jets.end(); ii++){
+      if (ii->pt() < 170) continue;
+      if (killHF && fabs(ii->eta()) > 2.4) continue;
+      auto const & sdSubjets = ii->subjets("SoftDropPuppi");
+      for ( auto const & it : sdSubjets ) vSubjetsToCorrect.push_back(it.get());
+    }
+    JetMETCorr.CorrectJets(vSubjetsToCorrect, event, rho, false, doNewJEC, subjetSyst);
+
     //for (std::vector<pat::Jet>::const_iterator ijet = theAK8Jets->begin(); ijet != theAK8Jets->end(); ijet++) {
     for (std::vector<pat::Jet>::const_iterator ii = theAK8Jets.begin(); ii != theAK8Jets.end(); ii++){
       int index = (int)(ii-theAK8Jets.begin());
@@ -454,10 +575,11 @@ int JetSubCalc::AnalyzeEvent(edm::Event const & event, BaseEventSelector * selec
         else if (JERup){syst=3;}
         else if (JERdown){syst=4;}
         else syst = 0; //nominal
+        if (IsShiftPass()) syst = GetShift(); // single-pass shift mode
         bool isAK8 = false;
 
         pat::Jet corrsubjet;
-        corrsubjet = JetMETCorr.correctJetReturnPatJet(*it, event, rhoJetsToken, isAK8, doNewJEC, syst);
+        corrsubjet = JetMETCorr.correctJetReturnPatJet(*it, event, rho, isAK8, doNewJEC, syst);
 
 
         SDsubjetPt          = -std::numeric_limits<double>::max();
@@ -574,65 +696,65 @@ int JetSubCalc::AnalyzeEvent(edm::Event const & event, BaseEventSelector * selec
 
     }
 
-    SetValue("maxProb", maxProb);
-    SetValue("theJetAK8Pt",     theJetAK8Pt);
-    SetValue("theJetAK8Eta",    theJetAK8Eta);
-    SetValue("theJetAK8Phi",    theJetAK8Phi);
-    SetValue("theJetAK8Energy", theJetAK8Energy);
-    SetValue("theJetAK8CSV",    theJetAK8CSV);
-    SetValue("theJetAK8DoubleB",    theJetAK8DoubleB);
-    SetValue("theJetAK8JetCharge", theJetAK8JetCharge);
-    SetValue("theJetAK8GenPt",  theJetAK8GenPt);
-    SetValue("theJetAK8GenDR",  theJetAK8GenDR);
-    SetValue("theJetAK8GenMass",  theJetAK8GenMass);
-
-    SetValue("theJetAK8CHSPt",     theJetAK8CHSPt);
-    SetValue("theJetAK8CHSEta",    theJetAK8CHSEta);
-    SetValue("theJetAK8CHSPhi",    theJetAK8CHSPhi);
-    SetValue("theJetAK8CHSMass", theJetAK8CHSMass);
-    SetValue("theJetAK8SoftDropRaw", theJetAK8SoftDropRaw);
-    SetValue("theJetAK8SoftDropCorr", theJetAK8SoftDropCorr);
-    SetValue("theJetAK8SoftDrop", theJetAK8SoftDrop);
-    SetValue("theJetAK8SoftDrop_JMSup", theJetAK8SoftDrop_JMSup);
-    SetValue("theJetAK8SoftDrop_JMSdn", theJetAK8SoftDrop_JMSdn);
-    SetValue("theJetAK8SoftDrop_JMRup", theJetAK8SoftDrop_JMRup);
-    SetValue("theJetAK8SoftDrop_JMRdn", theJetAK8SoftDrop_JMRdn);
-
-    SetValue("theJetAK8CHSPrunedMass",   theJetAK8CHSPrunedMass);
-    SetValue("theJetAK8CHSSoftDropMass", theJetAK8CHSSoftDropMass);
-
-    SetValue("theJetAK8NjettinessTau1", theJetAK8NjettinessTau1);
-    SetValue("theJetAK8NjettinessTau2", theJetAK8NjettinessTau2);
-    SetValue("theJetAK8NjettinessTau3", theJetAK8NjettinessTau3);
-    SetValue("theJetAK8CHSTau1", theJetAK8CHSTau1);
-    SetValue("theJetAK8CHSTau2", theJetAK8CHSTau2);
-    SetValue("theJetAK8CHSTau3", theJetAK8CHSTau3);
-
-    SetValue("theJetAK8SoftDropn2b1",theJetAK8SoftDropn2b1);
-    SetValue("theJetAK8SoftDropn2b2",theJetAK8SoftDropn2b2);
-    SetValue("theJetAK8SoftDropn3b1",theJetAK8SoftDropn3b1);
-    SetValue("theJetAK8SoftDropn3b2",theJetAK8SoftDropn3b2);
-
-    SetValue("theJetAK8Mass",   theJetAK8Mass);
-    SetValue("theJetAK8nDaughters", theJetAK8nDaughters);
-
-    SetValue("theJetAK8SDSubjetPt",   theJetAK8SDSubjetPt);
-    SetValue("theJetAK8SDSubjetEta",  theJetAK8SDSubjetEta);
-    SetValue("theJetAK8SDSubjetPhi",  theJetAK8SDSubjetPhi);
-    SetValue("theJetAK8SDSubjetMass", theJetAK8SDSubjetMass);
-    SetValue("theJetAK8SDSubjetDeepCSVb",  theJetAK8SDSubjetDeepCSVb);
-    SetValue("theJetAK8SDSubjetHFlav", theJetAK8SDSubjetHFlav);
-    SetValue("theJetAK8SDSubjetBTag",  theJetAK8SDSubjetBTag);
-    SetValue("theJetAK8SDSubjetDR",   theJetAK8SDSubjetDR);
-    SetValue("theJetAK8SDSubjetIndex",theJetAK8SDSubjetIndex);
-    SetValue("theJetAK8SDSubjetSize", theJetAK8SDSubjetSize);
-
-    SetValue("theJetAK8SDSubjetNDeepCSVL",theJetAK8SDSubjetNDeepCSVL);
-    SetValue("theJetAK8SDSubjetNDeepCSVMSF",theJetAK8SDSubjetNDeepCSVMSF);
-    SetValue("theJetAK8SDSubjetNDeepCSVM_bSFup",theJetAK8SDSubjetNDeepCSVM_bSFup);
-    SetValue("theJetAK8SDSubjetNDeepCSVM_bSFdn",theJetAK8SDSubjetNDeepCSVM_bSFdn);
-    SetValue("theJetAK8SDSubjetNDeepCSVM_lSFup",theJetAK8SDSubjetNDeepCSVM_lSFup);
-    SetValue("theJetAK8SDSubjetNDeepCSVM_lSFdn",theJetAK8SDSubjetNDeepCSVM_lSFdn);
+    SetValue(h_maxProb, std::move(maxProb));
+    SetValue(h_theJetAK8Pt, std::move(theJetAK8Pt));
+    SetValue(h_theJetAK8Eta, std::move(theJetAK8Eta));
+    SetValue(h_theJetAK8Phi, std::move(theJetAK8Phi));
+    SetValue(h_theJetAK8Energy, std::move(theJetAK8Energy));
+    SetValue(h_theJetAK8CSV, std::move(theJetAK8CSV));
+    SetValue(h_theJetAK8DoubleB, std::move(theJetAK8DoubleB));
+    SetValue(h_theJetAK8JetCharge, std::move(theJetAK8JetCharge));
+    SetValue(h_theJetAK8GenPt, std::move(theJetAK8GenPt));
+    SetValue(h_theJetAK8GenDR, std::move(theJetAK8GenDR));
+    SetValue(h_theJetAK8GenMass, std::move(theJetAK8GenMass));
+
+    SetValue(h_theJetAK8CHSPt, std::move(theJetAK8CHSPt));
+    SetValue(h_theJetAK8CHSEta, std::move(theJetAK8CHSEta));
+    SetValue(h_theJetAK8CHSPhi, std::move(theJetAK8CHSPhi));
+    SetValue(h_theJetAK8CHSMass, std::move(theJetAK8CHSMass));
+    SetValue(h_theJetAK8SoftDropRaw, std::move(theJetAK8SoftDropRaw));
+    SetValue(h_theJetAK8SoftDropCorr, std::move(theJetAK8SoftDropCorr));
+    SetValue(h_theJetAK8SoftDrop, std::move(theJetAK8SoftDrop));
+    SetValue(h_theJetAK8SoftDrop_JMSup, std::move(theJetAK8SoftDrop_JMSup));
+    SetValue(h_theJetAK8SoftDrop_JMSdn, std::move(theJetAK8SoftDrop_JMSdn));
+    SetValue(h_theJetAK8SoftDrop_JMRup, std::move(theJetAK8SoftDrop_JMRup));
+    SetValue(h_theJetAK8SoftDrop_JMRdn, std::move(theJetAK8SoftDrop_JMRdn));
+
+    SetValue(h_theJetAK8CHSPrunedMass, std::move(theJetAK8CHSPrunedMass));
+    SetValue(h_theJetAK8CHSSoftDropMass, std::move(theJetAK8CHSSoftDropMass));
+
+    SetValue(h_theJetAK8NjettinessTau1, std::move(theJetAK8NjettinessTau1));
+    SetValue(h_theJetAK8NjettinessTau2, std::move(theJetAK8NjettinessTau2));
+    SetValue(h_theJetAK8NjettinessTau3, std::move(theJetAK8NjettinessTau3));
+    SetValue(h_theJetAK8CHSTau1, std::move(theJetAK8CHSTau1));
+    SetValue(h_theJetAK8CHSTau2, std::move(theJetAK8CHSTau2));
+    SetValue(h_theJetAK8CHSTau3, std::move(theJetAK8CHSTau3));
+
+    SetValue(h_theJetAK8SoftDropn2b1, std::move(theJetAK8SoftDropn2b1));
+    SetValue(h_theJetAK8SoftDropn2b2, std::move(theJetAK8SoftDropn2b2));
+    SetValue(h_theJetAK8SoftDropn3b1, std::move(theJetAK8SoftDropn3b1));
+    SetValue(h_theJetAK8SoftDropn3b2, std::move(theJetAK8SoftDropn3b2));
+
+    SetValue(h_theJetAK8Mass, std::move(theJetAK8Mass));
+    SetValue(h_theJetAK8nDaughters, std::move(theJetAK8nDaughters));
+
+    SetValue(h_theJetAK8SDSubjetPt, std::move(theJetAK8SDSubjetPt));
+    SetValue(h_theJetAK8SDSubjetEta, std::move(theJetAK8SDSubjetEta));
+    SetValue(h_theJetAK8SDSubjetPhi, std::move(theJetAK8SDSubjetPhi));
+    SetValue(h_theJetAK8SDSubjetMass, std::move(theJetAK8SDSubjetMass));
+    SetValue(h_theJetAK8SDSubjetDeepCSVb, std::move(theJetAK8SDSubjetDeepCSVb));
+    SetValue(h_theJetAK8SDSubjetHFlav, std::move(theJetAK8SDSubjetHFlav));
+    SetValue(h_theJetAK8SDSubjetBTag, std::move(theJetAK8SDSubjetBTag));
+    SetValue(h_theJetAK8SDSubjetDR, std::move(theJetAK8SDSubjetDR));
+    SetValue(h_theJetAK8SDSubjetIndex, std::move(theJetAK8SDSubjetIndex));
+    SetValue(h_theJetAK8SDSubjetSize, std::move(theJetAK8SDSubjetSize));
+
+    SetValue(h_theJetAK8SDSubjetNDeepCSVL, std::move(theJetAK8SDSubjetNDeepCSVL));
+    SetValue(h_theJetAK8SDSubjetNDeepCSVMSF, std::move(theJetAK8SDSubjetNDeepCSVMSF));
+    SetValue(h_theJetAK8SDSubjetNDeepCSVM_bSFup, std::move(theJetAK8SDSubjetNDeepCSVM_bSFup));
+    SetValue(h_theJetAK8SDSubjetNDeepCSVM_bSFdn, std::move(theJetAK8SDSubjetNDeepCSVM_bSFdn));
+    SetValue(h_theJetAK8SDSubjetNDeepCSVM_lSFup, std::move(theJetAK8SDSubjetNDeepCSVM_lSFup));
+    SetValue(h_theJetAK8SDSubjetNDeepCSVM_lSFdn, std::move(theJetAK8SDSubjetNDeepCSVM_lSFdn));
 
     //////////////// TRUE HADRONIC W/Z/H/Top decays //////////////////
     std::vector<int>    HadronicVHtID;
@@ -656,7 +778,7 @@ int JetSubCalc::AnalyzeEvent(edm::Event const & event, BaseEventSelector * selec
 
     // Get the generated particle collection
     edm::Handle<reco::GenParticleCollection> genParticles;
-    if(isMc && event.getByToken(genParticlesToken, genParticles)){
+    if(isMc && GetByToken(event, genParticlesToken, genParticles)){
 
       for(size_t i = 0; i < genParticles->size(); i++){
         const reco::GenParticle &p = (*genParticles).at(i);
@@ -792,24 +914,24 @@ int JetSubCalc::AnalyzeEvent(edm::Event const & event, BaseEventSelector * selec
       }
     }
 
-    SetValue("HadronicVHtStatus",HadronicVHtStatus);
-    SetValue("HadronicVHtID",HadronicVHtID);
-    SetValue("HadronicVHtPt",HadronicVHtPt);
-    SetValue("HadronicVHtEta",HadronicVHtEta);
-    SetValue("HadronicVHtPhi",HadronicVHtPhi);
-    SetValue("HadronicVHtEnergy",HadronicVHtEnergy);
-    SetValue("HadronicVHtD0Pt",HadronicVHtD0Pt);
-    SetValue("HadronicVHtD0Eta",HadronicVHtD0Eta);
-    SetValue("HadronicVHtD0Phi",HadronicVHtD0Phi);
-    SetValue("HadronicVHtD0E",HadronicVHtD0E);
-    SetValue("HadronicVHtD1Pt",HadronicVHtD1Pt);
-    SetValue("HadronicVHtD1Eta",HadronicVHtD1Eta);
-    SetValue("HadronicVHtD1Phi",HadronicVHtD1Phi);
-    SetValue("HadronicVHtD1E",HadronicVHtD1E);
-    SetValue("HadronicVHtD2Pt",HadronicVHtD2Pt);
-    SetValue("HadronicVHtD2Eta",HadronicVHtD2Eta);
-    SetValue("HadronicVHtD2Phi",HadronicVHtD2Phi);
-    SetValue("HadronicVHtD2E",HadronicVHtD2E);
+    SetValue(h_HadronicVHtStatus, std::move(HadronicVHtStatus));
+    SetValue(h_HadronicVHtID, std::move(HadronicVHtID));
+    SetValue(h_HadronicVHtPt, std::move(HadronicVHtPt));
+    SetValue(h_HadronicVHtEta, std::move(HadronicVHtEta));
+    SetValue(h_HadronicVHtPhi, std::move(HadronicVHtPhi));
+    SetValue(h_HadronicVHtEnergy, std::move(HadronicVHtEnergy));
+    SetValue(h_HadronicVHtD0Pt, std::move(HadronicVHtD0Pt));
+    SetValue(h_HadronicVHtD0Eta, std::move(HadronicVHtD0Eta));
+    SetValue(h_HadronicVHtD0Phi, std::move(HadronicVHtD0Phi));
+    SetValue(h_HadronicVHtD0E, std::move(HadronicVHtD0E));
+    SetValue(h_HadronicVHtD1Pt, std::move(HadronicVHtD1Pt));
+    SetValue(h_HadronicVHtD1Eta, std::move(HadronicVHtD1Eta));
+    SetValue(h_HadronicVHtD1Phi, std::move(HadronicVHtD1Phi));
+    SetValue(h_HadronicVHtD1E, std::move(HadronicVHtD1E));
+    SetValue(h_HadronicVHtD2Pt, std::move(HadronicVHtD2Pt));
+    SetValue(h_HadronicVHtD2Eta, std::move(HadronicVHtD2Eta));
+    SetValue(h_HadronicVHtD2Phi, std::move(HadronicVHtD2Phi));
+    SetValue(h_HadronicVHtD2E, std::move(HadronicVHtD2E));
 
     return 0;
 }
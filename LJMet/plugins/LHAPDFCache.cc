@@ -0,0 +1,6 @@
+#include "FWLJMET/LJMet/interface/LHAPDFCache.h"
+
+#include "FWCore/ServiceRegistry/interface/ServiceMaker.h"
+
+
+DEFINE_FWK_SERVICE(LHAPDFCache);
@@ -20,6 +20,8 @@
 // system include files
 #include <memory>
 #include <iostream>
+#include <algorithm>
+#include <vector>
 
 // user include files
 #include "FWCore/Framework/interface/Frameworkfwd.h"
@@ -34,14 +36,15 @@
 
 
 #include "TTree.h"
+#include "TH1F.h"
+#include "TDirectory.h"
 
 // Adding TFile service stuff -- https://twiki.cern.ch/twiki/bin/view/CMSPublic/SWGuideTFileService, https://github.com/cms-sw/cmssw/blob/CMSSW_9_4_X/FWCore/Skeletons/scripts/mkTemplates/EDAnalyzer/EDAnalyzer.cc
 #include "FWCore/ServiceRegistry/interface/Service.h"
 #include "CommonTools/UtilAlgos/interface/TFileService.h"
 
 #include "FWLJMET/LJMet/interface/LjmetEventContent.h"
-#include "FWLJMET/LJMet/interface/LjmetFactory.h"
-#include "FWLJMET/LJMet/interface/BaseEventSelector.h"
+#include "FWLJMET/LJMet/interface/LjmetRunner.h"
 
 
 //
@@ -67,29 +70,16 @@ class LJMet : public edm::one::EDAnalyzer<edm::one::SharedResources>  {
       virtual void analyze(const edm::Event&, const edm::EventSetup&) override;
       virtual void endJob() override;
 
+      // create the histograms registered in the event content
+      void makeHistograms(LjmetEventContent & _ec, TDirectory * _dir);
+
       // ----------member data ---------------------------
 
       TTree * _tree;
+      std::vector<TTree *> _shifttrees;
 
-      // harvest all parameter sets from config file
-      std::map<std::string, edm::ParameterSet const> mPar;
-
-      // internal LJMet event content
-      LjmetEventContent ec;
-
-      // The factory for event selector and calculator plugins
-      LjmetFactory * factory;
-
-      // choose event selector
-      BaseEventSelector * theSelector = 0;
-
-
-      bool debug;
-      int verbosity;
-      std::string selection;
-      std::vector<std::string> vExcl;
-      std::vector<std::string> vIncl;
-      std::string ttree_name;
+      // selector, calculators and event content
+      LjmetRunner * runner;
 
 };
 
@@ -109,79 +99,38 @@ LJMet::LJMet(const edm::ParameterSet& iConfig)
 {
    //now do what ever initialization is needed
 
-   debug      = iConfig.getParameter<bool>("debug"); //this is debug feature from new ljmet, only on and off.
-   verbosity  = iConfig.getParameter<int>("verbosity"); // this is debug feature from old ljmet. this has levels, which is better. Need to utilize both old and new ! #TODO.
-   selection  = iConfig.getParameter<std::string>("selector");
-   vExcl      = iConfig.getParameter<std::vector<std::string>>("exclude_calcs");
-   vIncl      = iConfig.getParameter<std::vector<std::string>>("include_calcs");
-   ttree_name = iConfig.getParameter<std::string>("ttree_name");
-
-
    usesResource("TFileService"); // came originally with EDAnalyzer
 
    edm::Service<TFileService> fs; //for purpose of creating / saving to root file
 
+   //Object to pass to eventSelector and Calculators access data - https://twiki.cern.ch/twiki/bin/view/CMSPublic/SWGuideEDMGetDataFromEvent#Consumes_and_Helpers
+   runner = new LjmetRunner(iConfig, consumesCollector());
+
    // output tree
    std::cout << "\n========================================="<< std::endl;
-   std::cout << "[FWLJMet] : " << "Creating output tree : "  << ttree_name << std::endl;
+   std::cout << "[FWLJMet] : " << "Creating output tree : "  << runner->GetTreeName() << std::endl;
    std::cout <<   "========================================="<< std::endl;
-   std::string const _treename = ttree_name;
-   _tree = fs->make<TTree>(_treename.c_str(), _treename.c_str(), 64000000);
-
-   // internal LJMet event content
-   ec.SetVerbosity(verbosity);
-   ec.SetTree(_tree);
-
-   // The factory for event selector and calculator plugins
-   factory = new LjmetFactory;
-
-   // choose event selector
-   std::cout << "[FWLJMet] : " << "instantiating the event selector : "<< ttree_name << std::endl;
-   theSelector = factory->GetEventSelector(selection);
-
-   // sanity check histograms from the selector
-   theSelector->SetEventContent(&ec);
-   theSelector->Init();
-
-   //Object to pass to eventSelector and Calculators access data - https://twiki.cern.ch/twiki/bin/view/CMSPublic/SWGuideEDMGetDataFromEvent#Consumes_and_Helpers
-   edm::ConsumesCollector && cC = consumesCollector();
-
-   theSelector->BeginJob(iConfig, (edm::ConsumesCollector &&)cC);
-
-   //print out included Calculators
-   for (std::vector<std::string>::const_iterator it = vIncl.begin(); it != vIncl.end(); ++it){
-      std::cout << "[FWLJMet] : " << "including " << *it <<std::endl;
-   }
-
-   // send config parameters to calculators
-   factory->SetAllCalcConfig(iConfig, vIncl);
-
-   // Run BeginJob() for calculators
-   factory->BeginJobAllCalc((edm::ConsumesCollector &&)cC, vIncl);
-
-   // set excluded calculators
-   factory->SetExcludedCalcs(vExcl);
+   std::string const _treename = runner->GetTreeName();
+   _tree = fs->make<TTree>(_treename.c_str(), _treename.c_str());
+   runner->GetEventContent().SetTree(_tree);
 
    // create histograms
-   std::map<std::string,std::map<std::string,LjmetEventContent::HistMetadata> > & mh = ec.GetHistMap();
-   std::map<std::string,std::map<std::string,LjmetEventContent::HistMetadata> >::iterator iMod;
-   std::map<std::string,LjmetEventContent::HistMetadata>::iterator iHist;
-   for (iMod=mh.begin();iMod!=mh.end();++iMod){
-
-        TFileDirectory _dir = fs->mkdir( iMod->first.c_str() );
-        for (iHist=iMod->second.begin();iHist!=iMod->second.end();++iHist){
-            std::cout << "[FWLJMet] : "
-            << "Creating histograms : " << iMod->first << "/"
-            << iHist->second.GetName() << std::endl;
-            iHist->second.SetHist( _dir.make<TH1F>(iHist->second.GetName().c_str(),
-                                                   iHist->second.GetName().c_str(),
-                                                   iHist->second.GetNBins(),
-                                                   iHist->second.GetXMin(),
-                                                   iHist->second.GetXMax()
-                                                   )
-                                  );
-        }
-    }
+   makeHistograms(runner->GetEventContent(), _tree->GetDirectory());
+
+   // output trees and histograms for the single-pass shift mode, in top-level directories named after the module
+   // and the variation, the layout of the separate shift modules (ljmet_JECup/ljmet_JECup)
+   std::string const _label = _tree->GetDirectory()->GetName();
+   for (unsigned int i = 0; i < runner->GetShifts().size(); i++){
+      std::string const _shifttreename = _treename + "_" + runner->GetShifts()[i];
+      std::cout << "[FWLJMet] : " << "Creating output tree : "  << _shifttreename << std::endl;
+      TDirectory * _shiftdir = fs->file().mkdir( (_label + "_" + runner->GetShifts()[i]).c_str() );
+      _shiftdir->cd();
+      TTree * _shifttree = new TTree(_shifttreename.c_str(), _shifttreename.c_str());
+      _shifttree->SetDirectory(_shiftdir);
+      runner->GetShiftEventContent(i).SetTree(_shifttree);
+      _shifttrees.push_back(_shifttree);
+      makeHistograms(runner->GetShiftEventContent(i), _shiftdir);
+   }
 
 
 }
@@ -193,9 +142,7 @@ LJMet::~LJMet()
    // do anything here that needs to be done at desctruction time
    // (e.g. close files, deallocate resources etc.)
 
-    delete theSelector;
-
-    delete factory;
+    delete runner;
 
 }
 
@@ -208,53 +155,38 @@ LJMet::~LJMet()
 void
 LJMet::analyze(const edm::Event& iEvent, const edm::EventSetup& iSetup)
 {
-	if(debug) std::cout << " " <<std::endl;
-	if(debug) std::cout << "Processing Event in FWLJMet::analyze" << std::endl;
-
-	//
-	//_____ Run private begin-of-event methods ___________________
-	//
-	factory->RunBeginEvent(iEvent, ec);
-
-
-	// run producers
-	factory->RunAllProducers(iEvent, theSelector, vIncl);
-
-	// event selection
-	pat::strbitset ret = theSelector->getBitTemplate();
-	bool passed = (*theSelector)( iEvent, ret );
-
-
-	if ( passed ) {
-
-		//
-		//_____ Run all variable calculators now ___________________
-		//
-		factory->RunAllCalculators(iEvent, theSelector, ec, vIncl);
-
-
-		//
-		//_____ Run selector-specific code if any___________________
-		//
-		theSelector->AnalyzeEvent(iEvent, ec);
-
-
-		//
-		//_____ Run private end-of-event methods ___________________
-		//
-		factory->RunEndEvent(iEvent, ec);
-
+	runner->Analyze(iEvent);
+}
 
-		//
-		//_____Fill output file ____________________________________
-		//
-		ec.Fill();
 
-	} // end if statement for final cut requirements
+// ------------ create the histograms registered in the event content ------------
+void
+LJMet::makeHistograms(LjmetEventContent & _ec, TDirectory * _top)
+{
+   std::map<std::string,std::map<std::string,LjmetEventContent::HistMetadata> > & mh = _ec.GetHistMap();
+   std::map<std::string,std::map<std::string,LjmetEventContent::HistMetadata> >::iterator iMod;
+   std::map<std::string,LjmetEventContent::HistMetadata>::iterator iHist;
+   for (iMod=mh.begin();iMod!=mh.end();++iMod){
 
+        TDirectory * _dir = _top->mkdir( iMod->first.c_str() );
+        for (iHist=iMod->second.begin();iHist!=iMod->second.end();++iHist){
+            std::cout << "[FWLJMet] : "
+            << "Creating histograms : " << _top->GetName() << "/" << iMod->first << "/"
+            << iHist->second.GetName() << std::endl;
+            // written with the file when TFileService closes it
+            _dir->cd();
+            TH1F * _hist = new TH1F(iHist->second.GetName().c_str(),
+                                    iHist->second.GetName().c_str(),
+                                    iHist->second.GetNBins(),
+                                    iHist->second.GetXMin(),
+                                    iHist->second.GetXMax()
+                                    );
+            _hist->SetDirectory(_dir);
+            iHist->second.SetHist(_hist);
+        }
+    }
 }
 
-
 // ------------ method called once each job just before starting event loop  ------------
 void
 LJMet::beginJob()
@@ -266,17 +198,11 @@ LJMet::beginJob()
 void
 LJMet::endJob()
 {
-    std::cout << "\n[FWLJMet] : " << "Selection (" << ttree_name << ")" << std::endl;
-    theSelector->print(std::cout);
-
-
-    // Run EndJob() for calculators
-    factory->EndJobAllCalc(vIncl);
-
-
-    // EndJob() for the selector
-    theSelector->EndJob();
+    runner->EndJob();
 
+    // per-file information (trigger names, calculator timing), next to the trees
+    runner->GetEventContent().WriteMetadata(_tree->GetDirectory());
+    for (unsigned int i = 0; i < _shifttrees.size(); i++) runner->GetEventContent().WriteMetadata(_shifttrees[i]->GetDirectory());
 }
 
 // ------------ method fills 'descriptions' with the allowed parameters for the module  ------------
@@ -0,0 +1,220 @@
+// -*- C++ -*-
+//
+// Package:    FWLJMET/LJMet
+// Class:      LJMetPrefilter
+//
+/**\class LJMetPrefilter LJMetPrefilter.cc FWLJMET/LJMet/plugins/LJMetPrefilter.cc
+
+ Description: [Cheap leptonic prefilter ahead of the expensive producers in the cmsRun path]
+
+ Implementation:
+     Counts the leptons of the MiniAOD collections against the LJMet selector thresholds (MultiLepSelector_cfg)
+     and drops the events that can not pass the selection, so egammaPostRecoSeq, DeepAK8, QGTagger etc. only
+     run on the others. The tight leptons are a subset of the loose ones and identification and isolation only
+     remove leptons, so the counts are upper bounds of the selected ones. Muons are used uncorrected by the
+     selector; the electron pt thresholds are lowered by electronMargin (relative) to cover the energy
+     scale/smearing corrections applied later in the path.
+
+     The jet and MET requirements are only applied with jetMETCuts. They are approximate: jets and the MET are
+     corrected later (JEC/JER, type-1 MET, and the JEC/JER shifts for the shift trees) and jetMargin (relative)
+     and metMargin (GeV) are heuristic margins rather than bounds of these corrections, so an event the selector
+     would keep can be lost.
+*/
+
+
+// system include files
+#include <memory>
+#include <iostream>
+#include <atomic>
+#include <cmath>
+
+// user include files
+#include "FWCore/Framework/interface/Frameworkfwd.h"
+#include "FWCore/Framework/interface/global/EDFilter.h"
+
+#include "FWCore/Framework/interface/Event.h"
+#include "FWCore/Framework/interface/MakerMacros.h"
+
+#include "FWCore/ParameterSet/interface/ParameterSet.h"
+
+#include "DataFormats/PatCandidates/interface/Muon.h"
+#include "DataFormats/PatCandidates/interface/Electron.h"
+#include "DataFormats/PatCandidates/interface/Jet.h"
+#include "DataFormats/PatCandidates/interface/MET.h"
+
+
+//
+// class declaration
+//
+
+class LJMetPrefilter : public edm::global::EDFilter<> {
+   public:
+      explicit LJMetPrefilter(const edm::ParameterSet&);
+      ~LJMetPrefilter();
+
+      static void fillDescriptions(edm::ConfigurationDescriptions& descriptions);
+
+   private:
+      virtual bool filter(edm::StreamID, edm::Event&, const edm::EventSetup&) const override;
+      virtual void endJob() override;
+
+      // ----------member data ---------------------------
+      std::string mLegend;
+
+      edm::EDGetTokenT<pat::MuonCollection>     muonsToken;
+      edm::EDGetTokenT<pat::ElectronCollection> electronsToken;
+      edm::EDGetTokenT<pat::JetCollection>      jetsToken;
+      edm::EDGetTokenT<std::vector<pat::MET> >  METtoken;
+
+      // selector thresholds
+      bool   muon_cuts;
+      double muon_minpt;
+      double muon_maxeta;
+      double loose_muon_minpt;
+      double loose_muon_maxeta;
+      bool   electron_cuts;
+      double electron_minpt;
+      double electron_maxeta;
+      double loose_electron_minpt;
+      double loose_electron_maxeta;
+      int    minLooseLeptons;
+      int    minLeptons;
+      int    min_jet;
+      double jet_minpt;
+      double leading_jet_pt;
+      double min_met;
+
+      // allowance for the corrections applied after the prefilter
+      double electronMargin;
+      bool   jetMETCuts;
+      double jetMargin;
+      double metMargin;
+
+      mutable std::atomic<unsigned long long> mNEvents;
+      mutable std::atomic<unsigned long long> mNPassed;
+};
+
+
+//
+// constructors and destructor
+//
+LJMetPrefilter::LJMetPrefilter(const edm::ParameterSet& iConfig):
+mLegend("[LJMetPrefilter]: "),
+mNEvents(0),
+mNPassed(0)
+{
+   muonsToken            = consumes<pat::MuonCollection>(iConfig.getParameter<edm::InputTag>("muonsCollection"));
+   electronsToken        = consumes<pat::ElectronCollection>(iConfig.getParameter<edm::InputTag>("electronsCollection"));
+   jetsToken             = consumes<pat::JetCollection>(iConfig.getParameter<edm::InputTag>("jetsCollection"));
+   METtoken              = consumes<std::vector<pat::MET> >(iConfig.getParameter<edm::InputTag>("metCollection"));
+
+   muon_cuts             = iConfig.getParameter<bool>("muon_cuts");
+   muon_minpt            = iConfig.getParameter<double>("muon_minpt");
+   muon_maxeta           = iConfig.getParameter<double>("muon_maxeta");
+   loose_muon_minpt      = iConfig.getParameter<double>("loose_muon_minpt");
+   loose_muon_maxeta     = iConfig.getParameter<double>("loose_muon_maxeta");
+   electron_cuts         = iConfig.getParameter<bool>("electron_cuts");
+   electron_minpt        = iConfig.getParameter<double>("electron_minpt");
+   electron_maxeta       = iConfig.getParameter<double>("electron_maxeta");
+   loose_electron_minpt  = iConfig.getParameter<double>("loose_electron_minpt");
+   loose_electron_maxeta = iConfig.getParameter<double>("loose_electron_maxeta");
+   minLooseLeptons       = iConfig.getParameter<int>("minLooseLeptons");
+   minLeptons            = iConfig.getParameter<int>("minLeptons");
+   min_jet               = iConfig.getParameter<int>("min_jet");
+   jet_minpt             = iConfig.getParameter<double>("jet_minpt");
+   leading_jet_pt        = iConfig.getParameter<double>("leading_jet_pt");
+   min_met               = iConfig.getParameter<double>("min_met");
+
+   electronMargin        = 0.2;
+   if (iConfig.existsAs<double>("electronMargin")) electronMargin = iConfig.getParameter<double>("electronMargin");
+   jetMETCuts            = false;
+   if (iConfig.existsAs<bool>("jetMETCuts")) jetMETCuts = iConfig.getParameter<bool>("jetMETCuts");
+   jetMargin             = 0.2;
+   if (iConfig.existsAs<double>("jetMargin")) jetMargin = iConfig.getParameter<double>("jetMargin");
+   metMargin             = 20.0;
+   if (iConfig.existsAs<double>("metMargin")) metMargin = iConfig.getParameter<double>("metMargin");
+}
+
+
+LJMetPrefilter::~LJMetPrefilter()
+{
+}
+
+
+//
+// member functions
+//
+
+// ------------ method called on each new Event  ------------
+bool
+LJMetPrefilter::filter(edm::StreamID, edm::Event& iEvent, const edm::EventSetup& iSetup) const
+{
+   ++mNEvents;
+
+   // cheapest first: MET, jets, leptons
+   if (jetMETCuts && min_met > 0) {
+      edm::Handle<std::vector<pat::MET> > metHandle;
+      iEvent.getByToken(METtoken, metHandle);
+      if (metHandle->empty() || metHandle->at(0).pt() < min_met - metMargin) return false;
+   }
+
+   if (jetMETCuts && (min_jet > 0 || leading_jet_pt > 0)) {
+      edm::Handle<pat::JetCollection> jetsHandle;
+      iEvent.getByToken(jetsToken, jetsHandle);
+
+      // jet eta changes with the lepton cleaning, only the pt is used
+      int _n_jets = 0;
+      double _leading_jet_pt = 0;
+      for (pat::JetCollection::const_iterator _ijet = jetsHandle->begin(); _ijet != jetsHandle->end(); ++_ijet){
+         if (_ijet->pt() > (1 - jetMargin) * jet_minpt) ++_n_jets;
+         if (_ijet->pt() > _leading_jet_pt) _leading_jet_pt = _ijet->pt();
+      }
+      if (_n_jets < min_jet) return false;
+      if (_leading_jet_pt < (1 - jetMargin) * leading_jet_pt) return false;
+   }
+
+   if (minLooseLeptons > 0 || minLeptons > 0) {
+      edm::Handle<pat::MuonCollection> muonsHandle;
+      iEvent.getByToken(muonsToken, muonsHandle);
+      edm::Handle<pat::ElectronCollection> electronsHandle;
+      iEvent.getByToken(electronsToken, electronsHandle);
+
+      // without muon_cuts/electron_cuts the selector keeps all of them
+      int _n_loose = 0;
+      int _n_tight = 0;
+      for (pat::MuonCollection::const_iterator _imu = muonsHandle->begin(); _imu != muonsHandle->end(); ++_imu){
+         if (!muon_cuts || (_imu->pt() >= loose_muon_minpt && fabs(_imu->eta()) <= loose_muon_maxeta)) ++_n_loose;
+         if (!muon_cuts || (_imu->pt() >= muon_minpt && fabs(_imu->eta()) <= muon_maxeta)) ++_n_tight;
+      }
+      for (pat::ElectronCollection::const_iterator _iel = electronsHandle->begin(); _iel != electronsHandle->end(); ++_iel){
+         if (!electron_cuts || (_iel->pt() >= (1 - electronMargin) * loose_electron_minpt && fabs(_iel->superCluster()->eta()) <= loose_electron_maxeta)) ++_n_loose;
+         if (!electron_cuts || (_iel->pt() >= (1 - electronMargin) * electron_minpt && fabs(_iel->superCluster()->eta()) <= electron_maxeta)) ++_n_tight;
+      }
+      if (_n_loose < minLooseLeptons) return false;
+      if (_n_tight < minLeptons) return false;
+   }
+
+   ++mNPassed;
+   return true;
+}
+
+
+// ------------ method called once each job just after ending the event loop  ------------
+void
+LJMetPrefilter::endJob()
+{
+   std::cout << mLegend << mNPassed << " of " << mNEvents << " events passed" << std::endl;
+}
+
+
+// ------------ method fills 'descriptions' with the allowed parameters for the module  ------------
+void
+LJMetPrefilter::fillDescriptions(edm::ConfigurationDescriptions& descriptions) {
+  //The following says we do not know what parameters are allowed so do no validation
+  edm::ParameterSetDescription desc;
+  desc.setUnknown();
+  descriptions.addDefault(desc);
+}
+
+//define this as a plug-in
+DEFINE_FWK_MODULE(LJMetPrefilter);
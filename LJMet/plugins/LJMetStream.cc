@@ -0,0 +1,313 @@
+// -*- C++ -*-
+//
+// Package:    FWLJMET/LJMet
+// Class:      LJMetStream
+//
+/**\class LJMetStream LJMetStream.cc FWLJMET/LJMet/plugins/LJMetStream.cc
+
+ Description: [Stream-parallel Full Framework LJMET]
+
+ Implementation:
+     Same configuration and output as LJMet, but as an edm::stream module: every stream runs its own
+     selector, calculators and event contents (LjmetRunner), so events are no longer serialized through
+     the TFileService resource.
+
+     Each stream fills its trees and histograms in its own in-memory file from a TBufferMerger and hands
+     the content to the merger every streamFlushEvents events; the merger thread appends the trees and adds
+     up the histograms in one file (streamMergeFile). At the end of the job the merged content is fast-copied
+     into the TFileService file, in the same <module label>/ and <module label>_<shift>/ layout as LJMet, and
+     the merge file is removed.
+*/
+
+
+// system include files
+#include <memory>
+#include <iostream>
+#include <cstdio>
+#include <set>
+
+// user include files
+#include "FWCore/Framework/interface/Frameworkfwd.h"
+#include "FWCore/Framework/interface/stream/EDAnalyzer.h"
+
+#include "FWCore/Framework/interface/Event.h"
+#include "FWCore/Framework/interface/MakerMacros.h"
+
+#include "FWCore/ParameterSet/interface/ParameterSet.h"
+
+#include "FWCore/ServiceRegistry/interface/Service.h"
+#include "CommonTools/UtilAlgos/interface/TFileService.h"
+
+#include "ROOT/TBufferMerger.hxx"
+#include "TDirectory.h"
+#include "TFile.h"
+#include "TH1F.h"
+#include "TKey.h"
+#include "TNamed.h"
+#include "TTree.h"
+
+#include "FWLJMET/LJMet/interface/LjmetEventContent.h"
+#include "FWLJMET/LJMet/interface/LjmetRunner.h"
+
+
+//
+// class declaration
+//
+
+// shared by all streams of one module
+struct LJMetStreamOutput {
+   std::string label;
+   std::string fileName;
+   unsigned int flushEvents;
+   std::unique_ptr<ROOT::Experimental::TBufferMerger> merger;
+};
+
+class LJMetStream : public edm::stream::EDAnalyzer<edm::GlobalCache<LJMetStreamOutput>>  {
+   public:
+      explicit LJMetStream(const edm::ParameterSet&, LJMetStreamOutput const*);
+      ~LJMetStream();
+
+      static std::unique_ptr<LJMetStreamOutput> initializeGlobalCache(edm::ParameterSet const&);
+      static void globalEndJob(LJMetStreamOutput*);
+
+      static void fillDescriptions(edm::ConfigurationDescriptions& descriptions);
+
+
+   private:
+      virtual void analyze(const edm::Event&, const edm::EventSetup&) override;
+      virtual void endStream() override;
+
+      // create the histograms registered in the event content
+      void makeHistograms(LjmetEventContent & _ec, TDirectory * _top);
+
+      // hand the stream's trees and histograms to the merger
+      void flush();
+
+      // copy the merged output into the TFileService file
+      static void copyDirectory(TDirectory * _from, TDirectory * _to);
+
+      // ----------member data ---------------------------
+
+      // selector, calculators and event content of this stream
+      LjmetRunner * runner;
+
+      std::shared_ptr<ROOT::Experimental::TBufferMergerFile> mFile;
+      std::vector<TTree *> mvTrees;
+      std::vector<TH1F *> mvHists;
+      unsigned int mNEvents;
+
+};
+
+//
+// constructors and destructor
+//
+LJMetStream::LJMetStream(const edm::ParameterSet& iConfig, LJMetStreamOutput const* output):
+mNEvents(0)
+{
+   runner = new LjmetRunner(iConfig, consumesCollector());
+
+   mFile = output->merger->GetFile();
+   TDirectory * _top = mFile->mkdir(output->label.c_str());
+
+   // output trees, nominal first, the shifts in top-level directories named after the module and the variation
+   std::vector<std::string> _treenames(1, runner->GetTreeName());
+   std::vector<TDirectory *> _dirs(1, _top);
+   for (unsigned int i = 0; i < runner->GetShifts().size(); i++){
+      _treenames.push_back(runner->GetTreeName() + "_" + runner->GetShifts()[i]);
+      _dirs.push_back(mFile->mkdir((output->label + "_" + runner->GetShifts()[i]).c_str()));
+   }
+   for (unsigned int i = 0; i < _treenames.size(); i++){
+      std::cout << "[FWLJMet] : " << "Creating output tree : "  << _treenames[i] << std::endl;
+      _dirs[i]->cd();
+      TTree * _tree = new TTree(_treenames[i].c_str(), _treenames[i].c_str());
+      _tree->SetDirectory(_dirs[i]);
+      if (i == 0) runner->GetEventContent().SetTree(_tree);
+      else runner->GetShiftEventContent(i - 1).SetTree(_tree);
+      mvTrees.push_back(_tree);
+   }
+
+   // create histograms
+   makeHistograms(runner->GetEventContent(), _top);
+   for (unsigned int i = 0; i < runner->GetShifts().size(); i++){
+      makeHistograms(runner->GetShiftEventContent(i), _dirs[i + 1]);
+   }
+}
+
+
+LJMetStream::~LJMetStream()
+{
+    delete runner;
+}
+
+
+std::unique_ptr<LJMetStreamOutput>
+LJMetStream::initializeGlobalCache(edm::ParameterSet const& iConfig)
+{
+   std::unique_ptr<LJMetStreamOutput> _output(new LJMetStreamOutput);
+   _output->label = iConfig.getParameter<std::string>("@module_label");
+   _output->fileName = _output->label + "_streams.root";
+   if (iConfig.existsAs<std::string>("streamMergeFile")) _output->fileName = iConfig.getParameter<std::string>("streamMergeFile");
+   _output->flushEvents = 1000;
+   if (iConfig.existsAs<unsigned int>("streamFlushEvents")) _output->flushEvents = iConfig.getParameter<unsigned int>("streamFlushEvents");
+
+   std::cout << "[FWLJMet] : " << "stream mode, merging the streams' output in " << _output->fileName << std::endl;
+   _output->merger.reset(new ROOT::Experimental::TBufferMerger(_output->fileName.c_str()));
+
+   return _output;
+}
+
+
+//
+// member functions
+//
+
+// ------------ method called for each event  ------------
+void
+LJMetStream::analyze(const edm::Event& iEvent, const edm::EventSetup& iSetup)
+{
+	runner->Analyze(iEvent);
+
+	if (++mNEvents % globalCache()->flushEvents == 0) flush();
+}
+
+
+// ------------ hand the stream's output to the merger, the in-memory file is reset afterwards ------------
+void
+LJMetStream::flush()
+{
+   runner->Sync();
+
+   // a tree gets its branches on the first Fill(), one without branches yet can not be merged
+   std::vector<TDirectory *> _dirs(mvTrees.size(), 0);
+   for (unsigned int i = 0; i < mvTrees.size(); i++){
+      if (mvTrees[i]->GetListOfBranches()->GetEntries() > 0) continue;
+      _dirs[i] = mvTrees[i]->GetDirectory();
+      mvTrees[i]->SetDirectory(0);
+   }
+
+   mFile->Write();
+
+   for (unsigned int i = 0; i < mvTrees.size(); i++){
+      if (_dirs[i]) mvTrees[i]->SetDirectory(_dirs[i]);
+   }
+
+   // the in-memory file only resets the trees, the merger adds up the histograms of every flush
+   for (unsigned int i = 0; i < mvHists.size(); i++) mvHists[i]->Reset();
+}
+
+
+// ------------ create the histograms registered in the event content ------------
+void
+LJMetStream::makeHistograms(LjmetEventContent & _ec, TDirectory * _top)
+{
+   std::map<std::string,std::map<std::string,LjmetEventContent::HistMetadata> > & mh = _ec.GetHistMap();
+   std::map<std::string,std::map<std::string,LjmetEventContent::HistMetadata> >::iterator iMod;
+   std::map<std::string,LjmetEventContent::HistMetadata>::iterator iHist;
+   for (iMod=mh.begin();iMod!=mh.end();++iMod){
+
+        TDirectory * _dir = _top->mkdir( iMod->first.c_str() );
+        for (iHist=iMod->second.begin();iHist!=iMod->second.end();++iHist){
+            _dir->cd();
+            TH1F * _hist = new TH1F(iHist->second.GetName().c_str(),
+                                    iHist->second.GetName().c_str(),
+                                    iHist->second.GetNBins(),
+                                    iHist->second.GetXMin(),
+                                    iHist->second.GetXMax()
+                                    );
+            _hist->SetDirectory(_dir);
+            iHist->second.SetHist(_hist);
+            mvHists.push_back(_hist);
+        }
+    }
+}
+
+
+// ------------ method called once each stream after the event loop  ------------
+void
+LJMetStream::endStream()
+{
+    runner->EndJob();
+
+    // per-file information (trigger names, this stream's calculator timing), the merged file keeps
+    // the copy of one stream
+    for (unsigned int i = 0; i < mvTrees.size(); i++) runner->GetEventContent().WriteMetadata(mvTrees[i]->GetDirectory());
+
+    flush();
+
+    // the in-memory file owns the trees and histograms, it has to go before the merger
+    mvTrees.clear();
+    mvHists.clear();
+    mFile.reset();
+}
+
+
+// ------------ method called once each job after all streams ended  ------------
+void
+LJMetStream::globalEndJob(LJMetStreamOutput* output)
+{
+    // finish merging and close the merge file
+    output->merger.reset();
+
+    TFile * _in = TFile::Open(output->fileName.c_str());
+    if (!_in || _in->IsZombie()) {
+        std::cout << "[FWLJMet] : " << "can not open the stream merge file " << output->fileName << std::endl;
+        std::exit(-1);
+    }
+
+    // the module directory and the shift directories next to it
+    edm::Service<TFileService> fs;
+    std::cout << "[FWLJMet] : " << "copying the merged stream output to " << fs->file().GetName() << ":" << output->label << std::endl;
+    copyDirectory(_in, &fs->file());
+
+    _in->Close();
+    delete _in;
+    std::remove(output->fileName.c_str());
+}
+
+
+void
+LJMetStream::copyDirectory(TDirectory * _from, TDirectory * _to)
+{
+    // keys are ordered by cycle, highest first
+    std::set<std::string> _done;
+    TIter _next(_from->GetListOfKeys());
+    while (TKey * _key = (TKey *)_next()){
+        if (!_done.insert(_key->GetName()).second) continue;
+
+        TObject * _obj = _key->ReadObj();
+        if (_obj->InheritsFrom(TDirectory::Class())){
+            TDirectory * _sub = _to->GetDirectory(_key->GetName());
+            if (!_sub) _sub = _to->mkdir(_key->GetName());
+            copyDirectory((TDirectory *)_obj, _sub);
+        }
+        else if (_obj->InheritsFrom(TTree::Class())){
+            // baskets are copied without unzipping, the tree is written when TFileService closes the file
+            _to->cd();
+            TTree * _tree = ((TTree *)_obj)->CloneTree(-1, "fast");
+            _tree->SetDirectory(_to);
+            delete _obj;
+        }
+        else if (_obj->InheritsFrom(TH1::Class())){
+            TH1 * _hist = (TH1 *)_obj->Clone();
+            _hist->SetDirectory(_to);
+            delete _obj;
+        }
+        else if (_obj->IsA() == TNamed::Class()){
+            // metadata, one copy per stream in the merge file
+            _to->WriteTObject(_obj);
+            delete _obj;
+        }
+    }
+}
+
+// ------------ method fills 'descriptions' with the allowed parameters for the module  ------------
+void
+LJMetStream::fillDescriptions(edm::ConfigurationDescriptions& descriptions) {
+  //The following says we do not know what parameters are allowed so do no validation
+  edm::ParameterSetDescription desc;
+  desc.setUnknown();
+  descriptions.addDefault(desc);
+}
+
+//define this as a plug-in
+DEFINE_FWK_MODULE(LJMetStream);
@@ -1,11 +1,25 @@
 #include "FWLJMET/LJMet/interface/LjmetEventContent.h"
+#include "FWLJMET/LJMet/interface/LjmetTreeWriter.h"
+
+#include <cstdint>
+#include <cstring>
+#include <type_traits>
+
+#include "RVersion.h"
+#include "TBranch.h"
+#include "TNamed.h"
 
 LjmetEventContent::LjmetEventContent():
 mName("LjmetEventContent"),
 mLegend("[LjmetEventContent]: "),
 mpTree(0),
 mFirstEntry(true),
-mVerbosity(0)
+mVerbosity(0),
+mbAsyncFill(false),
+mCompression(-1),
+mBasketSize(32000),
+mbAutoFlush(false),
+mAutoFlush(0)
 {
 }
 
@@ -14,7 +28,12 @@ mName("LjmetEventContent"),
 mLegend("[LjmetEventContent]: "),
 mpTree(0),
 mFirstEntry(true),
-mVerbosity(0)
+mVerbosity(0),
+mbAsyncFill(false),
+mCompression(-1),
+mBasketSize(32000),
+mbAutoFlush(false),
+mAutoFlush(0)
 {
 	mVerbosity = iConfig.getParameter<int>("verbosity");
 }
@@ -33,7 +52,181 @@ void LjmetEventContent::SetTree(TTree * tree)
     mpTree = tree;
 }
 
-void LjmetEventContent::SetHistogram(std::string modname, std::string histname, int nbins, double low, double high)
+void LjmetEventContent::SetAsyncFill(bool async)
+{
+    mbAsyncFill = async;
+}
+
+void LjmetEventContent::Sync()
+{
+    if (mpWriter) mpWriter->Sync();
+}
+
+void LjmetEventContent::SetOutputConfig(edm::ParameterSet const & iConfig)
+{
+    mLegend = "[" + mName + "]: " ;
+    
+    if (iConfig.existsAs<std::string>("compressionAlgorithm")) {
+        std::string _algo = iConfig.getParameter<std::string>("compressionAlgorithm");
+        int _level = 4;
+        if (iConfig.existsAs<int>("compressionLevel")) _level = iConfig.getParameter<int>("compressionLevel");
+        
+        // ROOT compression settings: 100 * algorithm + level
+        int _id = -1;
+        if (_algo == "ZLIB") _id = 1;
+        else if (_algo == "LZMA") _id = 2;
+        else if (_algo == "LZ4") _id = 4;
+#if ROOT_VERSION_CODE >= ROOT_VERSION(6,20,0)
+        else if (_algo == "ZSTD") _id = 5;
+#endif
+        if (_id < 0) {
+            std::cout << mLegend << "unknown compression algorithm " << _algo << ", expected ZLIB, LZMA, LZ4"
+#if ROOT_VERSION_CODE >= ROOT_VERSION(6,20,0)
+                      << " or ZSTD"
+#endif
+                      << std::endl;
+            std::exit(-1);
+        }
+        if (_level < 0 || _level > 9) {
+            std::cout << mLegend << "compression level " << _level << " out of range, expected 0-9" << std::endl;
+            std::exit(-1);
+        }
+        mCompression = 100 * _id + _level;
+    }
+    
+    if (iConfig.existsAs<int>("basketSize")) mBasketSize = iConfig.getParameter<int>("basketSize");
+    if (iConfig.existsAs<int>("autoFlush")) {
+        mbAutoFlush = true;
+        mAutoFlush = iConfig.getParameter<int>("autoFlush");
+    }
+    
+    if (iConfig.existsAs<std::vector<std::string>>("keep_branches")) mvKeep = iConfig.getParameter<std::vector<std::string>>("keep_branches");
+    if (iConfig.existsAs<std::vector<std::string>>("drop_branches")) mvDrop = iConfig.getParameter<std::vector<std::string>>("drop_branches");
+    mvKeepRegex.clear();
+    mvDropRegex.clear();
+    try {
+        for (unsigned int i = 0; i < mvKeep.size(); i++) mvKeepRegex.push_back(std::regex(mvKeep[i]));
+        for (unsigned int i = 0; i < mvDrop.size(); i++) mvDropRegex.push_back(std::regex(mvDrop[i]));
+    }
+    catch (std::regex_error const & e) {
+        std::cout << mLegend << "bad regex in keep_branches/drop_branches: " << e.what() << std::endl;
+        std::exit(-1);
+    }
+    mKeptBranches.clear();
+    
+    if (iConfig.existsAs<std::vector<edm::ParameterSet>>("branch_precision")) {
+        std::vector<edm::ParameterSet> const _rules = iConfig.getParameter<std::vector<edm::ParameterSet>>("branch_precision");
+        mvPrecision.clear();
+        for (unsigned int i = 0; i < _rules.size(); i++) {
+            PrecisionRule _rule;
+            _rule.pattern = _rules[i].getParameter<std::string>("branches");
+            std::string _type = _rules[i].getParameter<std::string>("type");
+            _rule.mantissaBits = 23;
+            if (_rules[i].existsAs<int>("mantissaBits")) _rule.mantissaBits = _rules[i].getParameter<int>("mantissaBits");
+            
+            if (_type == "double" || _type == "int") _rule.type = kNative; // exempt from the rules below
+            else if (_type == "float") _rule.type = kFloat;
+            else if (_type == "int16") _rule.type = kInt16;
+            else if (_type == "int8") _rule.type = kInt8;
+            else {
+                std::cout << mLegend << "unknown branch_precision type " << _type << ", expected double, float, int, int16 or int8" << std::endl;
+                std::exit(-1);
+            }
+            if (_rule.mantissaBits < 1 || _rule.mantissaBits > 23) {
+                std::cout << mLegend << "branch_precision mantissaBits " << _rule.mantissaBits << " out of range, expected 1-23" << std::endl;
+                std::exit(-1);
+            }
+            try {
+                _rule.regex = std::regex(_rule.pattern);
+            }
+            catch (std::regex_error const & e) {
+                std::cout << mLegend << "bad regex in branch_precision: " << _rule.pattern << " " << e.what() << std::endl;
+                std::exit(-1);
+            }
+            mvPrecision.push_back(_rule);
+        }
+    }
+}
+
+void LjmetEventContent::CopyOutputConfig(const LjmetEventContent & other)
+{
+    mCompression = other.mCompression;
+    mBasketSize = other.mBasketSize;
+    mbAutoFlush = other.mbAutoFlush;
+    mAutoFlush = other.mAutoFlush;
+    mvKeep = other.mvKeep;
+    mvDrop = other.mvDrop;
+    mvKeepRegex = other.mvKeepRegex;
+    mvDropRegex = other.mvDropRegex;
+    mvPrecision = other.mvPrecision;
+    mKeptBranches.clear();
+}
+
+LjmetEventContent::PrecisionRule const * LjmetEventContent::findPrecision(std::string const & key, bool isInteger) const
+{
+    for (unsigned int i = 0; i < mvPrecision.size(); i++) {
+        PrecisionRule const & _rule = mvPrecision[i];
+        bool _fits = (_rule.type == kNative) || (isInteger ? _rule.type != kFloat : _rule.type == kFloat);
+        if (!_fits) continue;
+        if (!std::regex_match(key, _rule.regex)) continue;
+        if (_rule.type == kNative) return 0;
+        return &_rule;
+    }
+    return 0;
+}
+
+bool LjmetEventContent::IsBranchKept(std::string const & key)
+{
+    if (mvDropRegex.empty()) return true;
+    
+    std::map<std::string, bool>::iterator _it = mKeptBranches.lower_bound(key);
+    if (_it != mKeptBranches.end() && _it->first == key) return _it->second;
+    
+    bool _kept = true;
+    for (unsigned int i = 0; i < mvDropRegex.size() && _kept; i++) {
+        if (std::regex_match(key, mvDropRegex[i])) _kept = false;
+    }
+    for (unsigned int i = 0; i < mvKeepRegex.size() && !_kept; i++) {
+        if (std::regex_match(key, mvKeepRegex[i])) _kept = true;
+    }
+    mKeptBranches.insert(_it, std::make_pair(key, _kept));
+    return _kept;
+}
+
+bool LjmetEventContent::HasKeptBranches(std::string const & calcName)
+{
+    // the branch list is only known after the first event
+    if (mFirstEntry || mvDropRegex.empty()) return true;
+    return mKeptCalcs.count(calcName) > 0;
+}
+
+namespace {
+    template <typename T>
+    void addKeptCalcs(std::map<std::string, T> const & branches, LjmetEventContent & ec, std::set<std::string> & calcs)
+    {
+        // calculator branches are named <variable>_<calculator>
+        for (typename std::map<std::string, T>::const_iterator it = branches.begin(); it != branches.end(); ++it) {
+            std::string::size_type _pos = it->first.rfind('_');
+            if (_pos == std::string::npos) continue;
+            if (ec.IsBranchKept(it->first)) calcs.insert(it->first.substr(_pos + 1));
+        }
+    }
+}
+
+void LjmetEventContent::findKeptCalcs()
+{
+    mKeptCalcs.clear();
+    addKeptCalcs(mBoolBranch, *this, mKeptCalcs);
+    addKeptCalcs(mIntBranch, *this, mKeptCalcs);
+    addKeptCalcs(mLongIntBranch, *this, mKeptCalcs);
+    addKeptCalcs(mDoubleBranch, *this, mKeptCalcs);
+    addKeptCalcs(mVectorBoolBranch, *this, mKeptCalcs);
+    addKeptCalcs(mVectorIntBranch, *this, mKeptCalcs);
+    addKeptCalcs(mVectorDoubleBranch, *this, mKeptCalcs);
+    addKeptCalcs(mVectorStringBranch, *this, mKeptCalcs);
+}
+
+LjmetHistHandle LjmetEventContent::SetHistogram(std::string modname, std::string histname, int nbins, double low, double high)
 {
     // Create histogram entry in event content, so it is created by the LjmetFactory
     mLegend = "[" + mName + "]: " ;
@@ -62,6 +255,13 @@ void LjmetEventContent::SetHistogram(std::string modname, std::string histname,
         mDoubleHist.insert(iMod, std::pair<std::string, std::map<std::string, HistMetadata>>(modname, _map));
         // Use iMod as a hint to insert, so it can avoid another lookup
     }
+    
+    std::lock_guard<std::mutex> _lock(registryMutex());
+    std::vector<std::pair<std::string, std::string>> & _keys = histKeys();
+    std::pair<std::string, std::string> _key(modname, histname);
+    for (unsigned int i = 0; i < _keys.size(); i++) if (_keys[i] == _key) return LjmetHistHandle(i);
+    _keys.push_back(_key);
+    return LjmetHistHandle(_keys.size() - 1);
 }
 
 void LjmetEventContent::SetValue(std::string key, bool value)
@@ -87,22 +287,38 @@ void LjmetEventContent::SetValue(std::string key, double value)
 
 void LjmetEventContent::SetValue(std::string key, std::vector<bool> value)
 {
-    mVectorBoolBranch[key] = value;
+    mVectorBoolBranch[key] = std::move(value); // value is already a copy
 }
 
 void LjmetEventContent::SetValue(std::string key, std::vector<int> value)
 {
-    mVectorIntBranch[key] = value;
+    mVectorIntBranch[key] = std::move(value); // value is already a copy
 }
 
 void LjmetEventContent::SetValue(std::string key, std::vector<double> value)
 {
-    mVectorDoubleBranch[key] = value;
+    mVectorDoubleBranch[key] = std::move(value); // value is already a copy
 }
 
 
 void LjmetEventContent::SetValue(std::string key,std::vector<std::string> value){
-    mVectorStringBranch[key] = value;
+    mVectorStringBranch[key] = std::move(value); // value is already a copy
+}
+
+
+void LjmetEventContent::SetMetadata(std::string key, std::vector<std::string> value)
+{
+    mMetadata[key] = std::move(value);
+}
+
+void LjmetEventContent::WriteMetadata(TDirectory * dir) const
+{
+    for (std::map<std::string, std::vector<std::string>>::const_iterator it = mMetadata.begin(); it != mMetadata.end(); ++it) {
+        std::string _value;
+        for (unsigned int i = 0; i < it->second.size(); i++) _value += (i > 0 ? "," : "") + it->second[i];
+        TNamed _named(it->first.c_str(), _value.c_str());
+        dir->WriteTObject(&_named);
+    }
 }
 
 
@@ -133,50 +349,88 @@ void LjmetEventContent::SetHistValue(std::string modname, std::string histname,
     }
 }
 
-void LjmetEventContent::FillHist(std::string modname, std::string histname, double value)
+LjmetEventContent::HistMetadata * LjmetEventContent::findHist(std::string const & modname, std::string const & histname)
 {
+    std::map<std::string, std::map<std::string, HistMetadata>>::iterator iMod = mDoubleHist.find(modname);
+    if (iMod == mDoubleHist.end()) {
+        std::cout << mLegend <<"["+modname+"]:"<<"Problem finding map of map of histo for this module" << std::endl;
+        return 0;
+    }
+    std::map<std::string, HistMetadata>::iterator iHist = iMod->second.find(histname);
+    if (iHist == iMod->second.end()) {
+        std::cout << mLegend <<"["+modname+"]:"<<"Problem finding map of of histo for this module" << std::endl;
+        return 0;
+    }
+    return &(iHist->second);
+}
 
-    // fill histograms NOTE: THIS CAN BE IMROVED! NO NEED TO LOOP, JUST DIRECTLY FIND VALUE BY KEY! (For some reason it was not working at first try. But try again!)
-    std::map<std::string, std::map<std::string, LjmetEventContent::HistMetadata>>::iterator iMod;
-    std::map<std::string, LjmetEventContent::HistMetadata>::iterator iHist;
-    for (iMod = mDoubleHist.begin(); iMod != mDoubleHist.end(); ++iMod) {
-    	if(iMod->first == modname){    			
-			for (iHist = iMod->second.begin(); iHist != iMod->second.end(); ++iHist) {
-    			if(iHist->first==histname){
-					TH1 * _hist = iHist->second.GetHist();
-					if (_hist){
-						_hist->Fill(value);
-						if(mVerbosity>1) std::cout << mLegend <<"["+modname+"]:"<<"Filling "+histname+" histogram" << std::endl;
-					}
-					else{
-						std::cout << mLegend <<"Histo "+histname+" is NULL" << std::endl;
-					}
-					break; // end loop when map of histo is found
-				}
-				else if (iHist == iMod->second.end()){
-					std::cout << mLegend <<"["+modname+"]:"<<"Problem finding map of of histo for this module" << std::endl;
-				}
-			}
-			break; //end loop when map of map of histo is found
-		}
-		else if(iMod == mDoubleHist.end()){
-			std::cout << mLegend <<"["+modname+"]:"<<"Problem finding map of map of histo for this module" << std::endl;		
-		}
+LjmetEventContent::HistMetadata * LjmetEventContent::bindHist(LjmetHistHandle handle)
+{
+    if (!handle.IsValid()) {
+        std::cout << mLegend << "FillHist called with an undeclared histogram handle" << std::endl;
+        return 0;
+    }
+    if ((unsigned int)handle.mIndex >= mvHistSlots.size()) mvHistSlots.resize(histKeys().size(), 0);
+    std::pair<std::string, std::string> const & _key = histKeys()[handle.mIndex];
+    mvHistSlots[handle.mIndex] = findHist(_key.first, _key.second);
+    return mvHistSlots[handle.mIndex];
+}
+
+void LjmetEventContent::FillHist(std::string modname, std::string histname, double value)
+{
+    HistMetadata * _meta = findHist(modname, histname);
+    if (!_meta) return;
 
+    TH1 * _hist = _meta->GetHist();
+    if (_hist){
+        _hist->Fill(value);
+        if(mVerbosity>1) std::cout << mLegend <<"["+modname+"]:"<<"Filling "+histname+" histogram" << std::endl;
     }
+    else{
+        std::cout << mLegend <<"Histo "+histname+" is NULL" << std::endl;
+    }
+}
+
+void LjmetEventContent::FillHist(LjmetHistHandle handle, double value)
+{
+    HistMetadata * _meta = 0;
+    if (handle.IsValid() && (unsigned int)handle.mIndex < mvHistSlots.size()) _meta = mvHistSlots[handle.mIndex];
+    if (!_meta) _meta = bindHist(handle);
+    if (!_meta) return;
 
+    TH1 * _hist = _meta->GetHist();
+    if (_hist){
+        _hist->Fill(value);
+        if(mVerbosity>1) std::cout << mLegend <<"Filling "+_meta->GetName()+" histogram" << std::endl;
+    }
+    else{
+        std::cout << mLegend <<"Histo "+_meta->GetName()+" is NULL" << std::endl;
+    }
 }
 
 
 void LjmetEventContent::Fill()
 {
+    if (mbAsyncFill) {
+        // the writer's own copy of the maps is bound to the tree, it creates the branches on its first fill
+        if (!mpWriter) {
+            mpWriter.reset(new LjmetTreeWriter(mpTree, mVerbosity, *this));
+            findKeptCalcs();
+            mFirstEntry = false;
+        }
+        mpWriter->Push(*this);
+        return;
+    }
+    
     if (mFirstEntry) {
         std::cout << "\n========================================="<< std::endl;
         std::cout << "[FWLJMet] : " << "Branch Info : " << std::endl;
         std::cout <<   "========================================="<< std::endl;
         createBranches();
+        findKeptCalcs();
         mFirstEntry = false;
     }
+    narrowValues();
     mpTree->Fill();
     
     // fill histograms --> Replaced by FillHist !! Now we fill each histogram one at a time individually, not all at once.
@@ -192,19 +446,150 @@ void LjmetEventContent::Fill()
     */
 }
 
+namespace {
+    // round to the nearest float with the given number of mantissa bits, the zeroed
+    // low bits compress away
+    float roundMantissa(double value, int bits)
+    {
+        float _f = value;
+        if (bits >= 23) return _f;
+        uint32_t _u;
+        std::memcpy(&_u, &_f, sizeof(_u));
+        if ((_u & 0x7f800000) == 0x7f800000) return _f; // inf, nan
+        int _shift = 23 - bits;
+        _u += (uint32_t)1 << (_shift - 1);
+        _u &= ~(((uint32_t)1 << _shift) - 1);
+        std::memcpy(&_f, &_u, sizeof(_f));
+        return _f;
+    }
+    
+    template <typename T>
+    T clampInt(int value, bool & clamped)
+    {
+        if (value > std::numeric_limits<T>::max()) { clamped = true; return std::numeric_limits<T>::max(); }
+        if (value < std::numeric_limits<T>::min()) { clamped = true; return std::numeric_limits<T>::min(); }
+        return (T)value;
+    }
+    
+    template <typename NB>
+    void narrowInt(NB & nb, std::string const & legend)
+    {
+        bool _clamped = false;
+        *nb.pTo = clampInt<typename std::remove_pointer<decltype(nb.pTo)>::type>(*nb.pFrom, _clamped);
+        if (_clamped && !nb.clamped) {
+            std::cout << legend << "value " << *nb.pFrom << " of branch " << nb.name << " out of range of its branch_precision type, clamped" << std::endl;
+            nb.clamped = true;
+        }
+    }
+    
+    template <typename NB>
+    void narrowVectorInt(NB & nb, std::string const & legend)
+    {
+        typedef typename std::remove_pointer<decltype(nb.pTo)>::type::value_type T;
+        bool _clamped = false;
+        nb.pTo->resize(nb.pFrom->size());
+        for (unsigned int i = 0; i < nb.pFrom->size(); i++) (*nb.pTo)[i] = clampInt<T>((*nb.pFrom)[i], _clamped);
+        if (_clamped && !nb.clamped) {
+            std::cout << legend << "value of branch " << nb.name << " out of range of its branch_precision type, clamped" << std::endl;
+            nb.clamped = true;
+        }
+    }
+}
+
+void LjmetEventContent::narrowValues()
+{
+    for (unsigned int i = 0; i < mvFloatBranches.size(); i++) {
+        *mvFloatBranches[i].pTo = roundMantissa(*mvFloatBranches[i].pFrom, mvFloatBranches[i].mantissaBits);
+    }
+    for (unsigned int i = 0; i < mvVectorFloatBranches.size(); i++) {
+        NarrowedBranch<std::vector<double>, std::vector<float>> & _nb = mvVectorFloatBranches[i];
+        _nb.pTo->resize(_nb.pFrom->size());
+        for (unsigned int j = 0; j < _nb.pFrom->size(); j++) (*_nb.pTo)[j] = roundMantissa((*_nb.pFrom)[j], _nb.mantissaBits);
+    }
+    for (unsigned int i = 0; i < mvShortBranches.size(); i++) narrowInt(mvShortBranches[i], mLegend);
+    for (unsigned int i = 0; i < mvCharBranches.size(); i++) narrowInt(mvCharBranches[i], mLegend);
+    for (unsigned int i = 0; i < mvVectorShortBranches.size(); i++) narrowVectorInt(mvVectorShortBranches[i], mLegend);
+    for (unsigned int i = 0; i < mvVectorCharBranches.size(); i++) narrowVectorInt(mvVectorCharBranches[i], mLegend);
+}
+
+namespace {
+    // both maps are sorted, so one merge pass finds the matching entries
+    template <typename T>
+    void copyMap(std::map<std::string, T> const & from, std::map<std::string, T> & to)
+    {
+        typename std::map<std::string, T>::iterator _to = to.begin();
+        for (typename std::map<std::string, T>::const_iterator it = from.begin(); it != from.end(); ++it) {
+            while (_to != to.end() && _to->first < it->first) ++_to;
+            if (_to == to.end() || it->first < _to->first) _to = to.insert(_to, *it);
+            else _to->second = it->second;
+            ++_to;
+        }
+    }
+    
+    template <typename T>
+    void swapMap(std::map<std::string, T> & from, std::map<std::string, T> & to)
+    {
+        typename std::map<std::string, T>::iterator _to = to.begin();
+        for (typename std::map<std::string, T>::iterator it = from.begin(); it != from.end(); ++it) {
+            while (_to != to.end() && _to->first < it->first) ++_to;
+            if (_to == to.end() || it->first < _to->first) _to = to.insert(_to, std::make_pair(it->first, T()));
+            std::swap(_to->second, it->second);
+            ++_to;
+        }
+    }
+}
+
+void LjmetEventContent::CopyValues(const LjmetEventContent & other)
+{
+    // assign element by element - the tree holds pointers to the map entries
+    copyMap(other.mBoolBranch, mBoolBranch);
+    copyMap(other.mIntBranch, mIntBranch);
+    copyMap(other.mLongIntBranch, mLongIntBranch);
+    copyMap(other.mDoubleBranch, mDoubleBranch);
+    copyMap(other.mVectorBoolBranch, mVectorBoolBranch);
+    copyMap(other.mVectorIntBranch, mVectorIntBranch);
+    copyMap(other.mVectorDoubleBranch, mVectorDoubleBranch);
+    copyMap(other.mVectorStringBranch, mVectorStringBranch);
+}
+
+void LjmetEventContent::MergeValues(LjmetEventContent & staging)
+{
+    SwapValues(staging);
+    for (std::map<std::string, std::vector<std::string>>::const_iterator it = staging.mMetadata.begin(); it != staging.mMetadata.end(); ++it) {
+        mMetadata[it->first] = it->second;
+    }
+}
+
+void LjmetEventContent::SwapValues(LjmetEventContent & other)
+{
+    // map nodes stay where they are, only the values move
+    swapMap(other.mBoolBranch, mBoolBranch);
+    swapMap(other.mIntBranch, mIntBranch);
+    swapMap(other.mLongIntBranch, mLongIntBranch);
+    swapMap(other.mDoubleBranch, mDoubleBranch);
+    swapMap(other.mVectorBoolBranch, mVectorBoolBranch);
+    swapMap(other.mVectorIntBranch, mVectorIntBranch);
+    swapMap(other.mVectorDoubleBranch, mVectorDoubleBranch);
+    swapMap(other.mVectorStringBranch, mVectorStringBranch);
+}
+
 int LjmetEventContent::createBranches()
 {
     // Create branches in the tree according to maps
     
     mLegend = "[" + mName + "]: " ;
     std::string name_type;
+    unsigned int _ndropped = 0;
     
     std::cout << mLegend << "Creating branches in output tree" << std::endl;
     
+    if (mbAutoFlush) mpTree->SetAutoFlush(mAutoFlush);
+    
     // Boolean branches
     for (std::map<std::string, bool>::iterator br = mBoolBranch.begin(); br != mBoolBranch.end(); ++br) {
+        if (!IsBranchKept(br->first)) { ++_ndropped; continue; }
         name_type = br->first + "/O";
-        mpTree->Branch(br->first.c_str(), &(br->second), name_type.c_str());
+        configureBranch(mpTree->Branch(br->first.c_str(), &(br->second), name_type.c_str(), mBasketSize));
         
         if (mVerbosity > 0) {
             std::cout << mLegend << "Branch " << name_type << " created" << std::endl;
@@ -214,8 +599,26 @@ int LjmetEventContent::createBranches()
     
     // Integer branches
     for (std::map<std::string, int>::iterator br = mIntBranch.begin(); br != mIntBranch.end(); ++br) {
-        name_type = br->first + "/I";
-        mpTree->Branch(br->first.c_str(), &(br->second), name_type.c_str());
+        if (!IsBranchKept(br->first)) { ++_ndropped; continue; }
+        PrecisionRule const * _rule = findPrecision(br->first, true);
+        if (_rule && _rule->type == kInt16) {
+            mShortBuffers.push_back(0);
+            NarrowedBranch<int, short> _nb = { &(br->second), &mShortBuffers.back(), 0, br->first, false };
+            mvShortBranches.push_back(_nb);
+            name_type = br->first + "/S";
+            configureBranch(mpTree->Branch(br->first.c_str(), _nb.pTo, name_type.c_str(), mBasketSize));
+        }
+        else if (_rule && _rule->type == kInt8) {
+            mCharBuffers.push_back(0);
+            NarrowedBranch<int, char> _nb = { &(br->second), &mCharBuffers.back(), 0, br->first, false };
+            mvCharBranches.push_back(_nb);
+            name_type = br->first + "/B";
+            configureBranch(mpTree->Branch(br->first.c_str(), _nb.pTo, name_type.c_str(), mBasketSize));
+        }
+        else {
+            name_type = br->first + "/I";
+            configureBranch(mpTree->Branch(br->first.c_str(), &(br->second), name_type.c_str(), mBasketSize));
+        }
         
         if (mVerbosity > 0) {
             std::cout << mLegend << "Branch " << name_type << " created" << std::endl;
@@ -226,8 +629,9 @@ int LjmetEventContent::createBranches()
 
     // Long Integer branches
     for (std::map<std::string, long long>::iterator br = mLongIntBranch.begin(); br != mLongIntBranch.end(); ++br) {
+        if (!IsBranchKept(br->first)) { ++_ndropped; continue; }
         name_type = br->first + "/L";
-        mpTree->Branch(br->first.c_str(), &(br->second), name_type.c_str());
+        configureBranch(mpTree->Branch(br->first.c_str(), &(br->second), name_type.c_str(), mBasketSize));
         
         if (mVerbosity > 0) {
             std::cout << mLegend << "Branch " << name_type << " created" << std::endl;
@@ -238,8 +642,19 @@ int LjmetEventContent::createBranches()
 
     // Double branches
     for (std::map<std::string, double>::iterator br = mDoubleBranch.begin(); br != mDoubleBranch.end(); ++br) {
-        name_type = br->first + "/D";
-        mpTree->Branch(br->first.c_str(), &(br->second), name_type.c_str());
+        if (!IsBranchKept(br->first)) { ++_ndropped; continue; }
+        PrecisionRule const * _rule = findPrecision(br->first, false);
+        if (_rule) {
+            mFloatBuffers.push_back(0);
+            NarrowedBranch<double, float> _nb = { &(br->second), &mFloatBuffers.back(), _rule->mantissaBits, br->first, false };
+            mvFloatBranches.push_back(_nb);
+            name_type = br->first + "/F";
+            configureBranch(mpTree->Branch(br->first.c_str(), _nb.pTo, name_type.c_str(), mBasketSize));
+        }
+        else {
+            name_type = br->first + "/D";
+            configureBranch(mpTree->Branch(br->first.c_str(), &(br->second), name_type.c_str(), mBasketSize));
+        }
         
         if (mVerbosity > 0) {
             std::cout << mLegend << "Branch " << name_type << " created" << std::endl;
@@ -249,7 +664,8 @@ int LjmetEventContent::createBranches()
     
     // Vector-of-bool branches
     for (std::map<std::string, std::vector<bool>>::iterator br = mVectorBoolBranch.begin(); br != mVectorBoolBranch.end(); ++br) {
-        mpTree->Branch(br->first.c_str(), &(br->second));
+        if (!IsBranchKept(br->first)) { ++_ndropped; continue; }
+        configureBranch(mpTree->Branch(br->first.c_str(), &(br->second), mBasketSize));
         
         if (mVerbosity > 0) {
             std::cout << mLegend << "Branch " << br->first << " std::vector<bool> created" << std::endl;
@@ -259,7 +675,21 @@ int LjmetEventContent::createBranches()
     
     // Vector-of-int branches
     for (std::map<std::string, std::vector<int>>::iterator br = mVectorIntBranch.begin(); br != mVectorIntBranch.end(); ++br) {
-        mpTree-> Branch(br->first.c_str(), &(br->second));
+        if (!IsBranchKept(br->first)) { ++_ndropped; continue; }
+        PrecisionRule const * _rule = findPrecision(br->first, true);
+        if (_rule && _rule->type == kInt16) {
+            mVectorShortBuffers.push_back(std::vector<short>());
+            NarrowedBranch<std::vector<int>, std::vector<short>> _nb = { &(br->second), &mVectorShortBuffers.back(), 0, br->first, false };
+            mvVectorShortBranches.push_back(_nb);
+            configureBranch(mpTree->Branch(br->first.c_str(), _nb.pTo, mBasketSize));
+        }
+        else if (_rule && _rule->type == kInt8) {
+            mVectorCharBuffers.push_back(std::vector<char>());
+            NarrowedBranch<std::vector<int>, std::vector<char>> _nb = { &(br->second), &mVectorCharBuffers.back(), 0, br->first, false };
+            mvVectorCharBranches.push_back(_nb);
+            configureBranch(mpTree->Branch(br->first.c_str(), _nb.pTo, mBasketSize));
+        }
+        else configureBranch(mpTree->Branch(br->first.c_str(), &(br->second), mBasketSize));
         
         if (mVerbosity > 0) {
             std::cout << mLegend << "Branch " << br->first << " std::vector<int> created" << std::endl;
@@ -269,7 +699,15 @@ int LjmetEventContent::createBranches()
     
     // Vector-of-double branches
     for (std::map<std::string, std::vector<double>>::iterator br = mVectorDoubleBranch.begin(); br != mVectorDoubleBranch.end(); ++br) {
-        mpTree->Branch(br->first.c_str(), &(br->second));
+        if (!IsBranchKept(br->first)) { ++_ndropped; continue; }
+        PrecisionRule const * _rule = findPrecision(br->first, false);
+        if (_rule) {
+            mVectorFloatBuffers.push_back(std::vector<float>());
+            NarrowedBranch<std::vector<double>, std::vector<float>> _nb = { &(br->second), &mVectorFloatBuffers.back(), _rule->mantissaBits, br->first, false };
+            mvVectorFloatBranches.push_back(_nb);
+            configureBranch(mpTree->Branch(br->first.c_str(), _nb.pTo, mBasketSize));
+        }
+        else configureBranch(mpTree->Branch(br->first.c_str(), &(br->second), mBasketSize));
         
         if (mVerbosity > 0) {
             std::cout << mLegend << "Branch " << br->first << " std::vector<double> created" << std::endl;
@@ -283,10 +721,11 @@ int LjmetEventContent::createBranches()
     for(std::map<std::string,std::vector<std::string> >::iterator br = mVectorStringBranch.begin();
 	br != mVectorStringBranch.end();
 	++br){
+        if (!IsBranchKept(br->first)) { ++_ndropped; continue; }
         std::string name_type = br->first+" std::vector<std::string>";
       //      std::string type = "VVString";
-      mpTree -> Branch(br->first.c_str(),
-		       &(br->second));
+      configureBranch(mpTree -> Branch(br->first.c_str(),
+		       &(br->second), mBasketSize));
 
     if (mVerbosity>0){
             std::cout << mLegend << "Branch " << name_type
@@ -294,5 +733,16 @@ int LjmetEventContent::createBranches()
         }
     }
 
+    if (_ndropped > 0) std::cout << mLegend << "branches dropped (drop_branches): " << _ndropped << std::endl;
+    unsigned int _nnarrowed = mvFloatBranches.size() + mvShortBranches.size() + mvCharBranches.size()
+                            + mvVectorFloatBranches.size() + mvVectorShortBranches.size() + mvVectorCharBranches.size();
+    if (_nnarrowed > 0) std::cout << mLegend << "branches stored with reduced precision (branch_precision): " << _nnarrowed << std::endl;
+
     return 0;
 }
+
+void LjmetEventContent::configureBranch(TBranch * branch)
+{
+    // also sets the sub-branches
+    if (branch && mCompression >= 0) branch->SetCompressionSettings(mCompression);
+}
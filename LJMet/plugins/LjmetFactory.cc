@@ -1,5 +1,10 @@
 #include "FWLJMET/LJMet/interface/LjmetFactory.h"
 
+#include <cmath>
+#include <cstdio>
+
+#include "tbb/task_group.h"
+
 #include "FWLJMET/LJMet/interface/MultiLepEventSelector.h"
 #include "FWLJMET/LJMet/interface/TTbarTagProbeEventSelector.h"
 #include "FWLJMET/LJMet/interface/DileptonEventSelector.h"
@@ -21,7 +26,7 @@
 #include "FWLJMET/LJMet/interface/TestEventSelector.h"
 
 
-LjmetFactory::LjmetFactory(): theSelector(0)
+LjmetFactory::LjmetFactory(): theSelector(0), mbParallel(false)
 {
     mLegend = "[LjmetFactory]: ";
 
@@ -112,28 +117,116 @@ BaseEventSelector * LjmetFactory::GetEventSelector(std::string name)
     return theSelector;
 }
 
-void LjmetFactory::RunAllCalculators(edm::Event const & event, BaseEventSelector * selector, LjmetEventContent & ec, std::vector<std::string> vIncl)
+LjmetFactory::CalcPlan LjmetFactory::MakePlan(std::vector<std::string> const & vIncl, std::string const & tag)
 {
+    CalcPlan _plan;
+    int _group = -1;
     for (std::vector<std::string>::const_iterator it = vIncl.begin(); it != vIncl.end(); ++it){
+    	std::map<std::string, BaseCalc *>::const_iterator _calc = mpCalculators.find(*it);
+    	if (_calc == mpCalculators.end()) continue;
+    	PlanEntry _entry;
+    	_entry.name = *it;
+    	_entry.calc = _calc->second;
+    	_entry.analyzeTiming = &mAnalyzeTiming[*it + tag];
+    	_entry.produceTiming = &mProduceTiming[*it + tag];
+    	
+    	// join the current group if independent of all its calculators, otherwise start a new one
+    	bool _join = mbParallel && !_plan.empty();
+    	for (CalcPlan::const_reverse_iterator jt = _plan.rbegin(); _join && jt != _plan.rend() && jt->group == _group; ++jt){
+    		if (_entry.calc->ConflictsWith(*jt->calc)) _join = false;
+    	}
+    	if (!_join) ++_group;
+    	_entry.group = _group;
+    	_plan.push_back(_entry);
+    }
     
-    	if(mpCalculators.find(*it)!=mpCalculators.end()){
-    		mpCalculators[*it]->SetEventContent(&ec);
-    		mpCalculators[*it]->AnalyzeEvent(event, selector);
-    		
+    if (mbParallel) {
+    	for (CalcPlan::const_iterator it = _plan.begin(); it != _plan.end(); ){
+    		CalcPlan::const_iterator _end = it + 1;
+    		while (_end != _plan.end() && _end->group == it->group) ++_end;
+    		if (_end - it > 1) {
+    			std::cout << mLegend << "running concurrently :";
+    			for (CalcPlan::const_iterator jt = it; jt != _end; ++jt) std::cout << " " << jt->name;
+    			std::cout << std::endl;
+    		}
+    		it = _end;
     	}
+    }
+    return _plan;
+}
+
+
+bool LjmetFactory::isKept(LjmetEventContent & ec, PlanEntry const & entry)
+{
+    // nothing of this calculator goes to the output (drop_branches)
+    if (ec.HasKeptBranches(entry.name)) return true;
+    if (mSkippedCalcs.insert(entry.name).second) std::cout << mLegend << "all branches of " << entry.name << " are dropped, not running it" << std::endl;
+    return false;
+}
+
+
+void LjmetFactory::runCalculator(edm::Event const & event, BaseEventSelector * selector, LjmetEventContent & ec, PlanEntry const & entry)
+{
+    if (entry.calc->mpEc != &ec) entry.calc->SetEventContent(&ec);
     
+    std::chrono::steady_clock::time_point _start = std::chrono::steady_clock::now();
+    entry.calc->AnalyzeEvent(event, selector);
+    entry.analyzeTiming->Add(std::chrono::steady_clock::now() - _start);
+}
+
+
+LjmetEventContent & LjmetFactory::stagingArea(BaseCalc * calc, LjmetEventContent & ec)
+{
+    std::unique_ptr<LjmetEventContent> & _staging = mStaging[std::make_pair(calc, &ec)];
+    if (!_staging) {
+        _staging.reset(new LjmetEventContent());
+        _staging->CopyOutputConfig(ec); // for IsBranchKept()
     }
+    return *_staging;
 }
 
 
-void LjmetFactory::RunAllProducers(edm::EventBase const & event, BaseEventSelector * selector, std::vector<std::string> vIncl)
+void LjmetFactory::RunAllCalculators(edm::Event const & event, BaseEventSelector * selector, LjmetEventContent & ec, CalcPlan const & plan)
+{
+    for (CalcPlan::const_iterator it = plan.begin(); it != plan.end(); ){
+    	CalcPlan::const_iterator _end = it + 1;
+    	while (_end != plan.end() && _end->group == it->group) ++_end;
+    	
+    	if (_end - it == 1) {
+    		if (isKept(ec, *it)) runCalculator(event, selector, ec, *it);
+    	}
+    	else {
+    		// independent calculators, each writes into its own staging area
+    		std::vector<LjmetEventContent *> _staged(_end - it, 0);
+    		tbb::task_group _tasks;
+    		for (CalcPlan::const_iterator jt = it; jt != _end; ++jt){
+    			if (!isKept(ec, *jt)) continue;
+    			LjmetEventContent * _staging = &stagingArea(jt->calc, ec);
+    			_staged[jt - it] = _staging;
+    			_tasks.run([this, &event, selector, _staging, jt]{ runCalculator(event, selector, *_staging, *jt); });
+    		}
+    		_tasks.wait();
+    		
+    		for (unsigned int i = 0; i < _staged.size(); i++) if (_staged[i]) ec.MergeValues(*_staged[i]);
+    	}
+    	it = _end;
+    }
+}
+
+
+void LjmetFactory::SetShiftAllCalc(int syst, CalcPlan const & plan)
+{
+    for (CalcPlan::const_iterator it = plan.begin(); it != plan.end(); ++it) it->calc->SetShift(syst);
+}
+
+
+void LjmetFactory::RunAllProducers(edm::EventBase const & event, BaseEventSelector * selector, CalcPlan const & plan)
 {
-    // Loop over all registered calculators and
     // run all producer methods (comes before selection)
-    for (std::vector<std::string>::const_iterator it = vIncl.begin(); it != vIncl.end(); ++it){
-    	if(mpCalculators.find(*it)!=mpCalculators.end()){
-    		mpCalculators[*it]->ProduceEvent(event, selector);    		
-    	}    
+    for (CalcPlan::const_iterator it = plan.begin(); it != plan.end(); ++it){
+    	std::chrono::steady_clock::time_point _start = std::chrono::steady_clock::now();
+    	it->calc->ProduceEvent(event, selector);
+    	it->produceTiming->Add(std::chrono::steady_clock::now() - _start);
     }
 }
 
@@ -201,3 +294,78 @@ void LjmetFactory::RunEndEvent(edm::EventBase const & event, LjmetEventContent &
 {
     theSelector->EndEvent(event, ec);
 }
+
+
+LjmetFactory::CalcTiming::CalcTiming():
+mCalls(0),
+mSum(0),
+mMax(0),
+mvBins(360, 0)
+{
+}
+
+void LjmetFactory::CalcTiming::Add(std::chrono::steady_clock::duration elapsed)
+{
+    double _us = std::chrono::duration<double, std::micro>(elapsed).count();
+    mCalls++;
+    mSum += _us;
+    if (_us > mMax) mMax = _us;
+    
+    // 40 bins per decade, from 10^-2 us
+    int _bin = _us > 0 ? (int)std::floor(40 * (std::log10(_us) + 2)) : 0;
+    if (_bin < 0) _bin = 0;
+    if (_bin >= (int)mvBins.size()) _bin = mvBins.size() - 1;
+    mvBins[_bin]++;
+}
+
+double LjmetFactory::CalcTiming::GetPercentile(double q) const
+{
+    if (mCalls == 0) return 0;
+    unsigned long long _sum = 0;
+    for (unsigned int i = 0; i < mvBins.size(); i++) {
+        _sum += mvBins[i];
+        if (_sum >= q * mCalls) return std::pow(10., (i + 0.5) / 40 - 2);
+    }
+    return mMax;
+}
+
+
+void LjmetFactory::PrintTiming(std::ostream & out)
+{
+    char _line[256];
+    out << mLegend << "calculator timing (us per call)" << std::endl;
+    snprintf(_line, sizeof(_line), "  %-32s %12s %10s %10s %10s %10s %10s", "", "calls", "mean", "p50", "p90", "p99", "max");
+    out << _line << std::endl;
+    
+    std::map<std::string, CalcTiming> const * _timings[2] = { &mProduceTiming, &mAnalyzeTiming };
+    std::string const _methods[2] = { "ProduceEvent", "AnalyzeEvent" };
+    for (unsigned int m = 0; m < 2; m++) {
+        for (std::map<std::string, CalcTiming>::const_iterator it = _timings[m]->begin(); it != _timings[m]->end(); ++it) {
+            if (it->second.GetCalls() == 0) continue;
+            std::string _name = it->first + "::" + _methods[m];
+            snprintf(_line, sizeof(_line), "  %-32s %12llu %10.1f %10.1f %10.1f %10.1f %10.1f", _name.c_str(),
+                     it->second.GetCalls(), it->second.GetMean(), it->second.GetPercentile(0.5),
+                     it->second.GetPercentile(0.9), it->second.GetPercentile(0.99), it->second.GetMax());
+            out << _line << std::endl;
+        }
+    }
+}
+
+void LjmetFactory::SaveTiming(LjmetEventContent & ec)
+{
+    std::map<std::string, CalcTiming> const * _timings[2] = { &mProduceTiming, &mAnalyzeTiming };
+    std::string const _methods[2] = { "ProduceEvent", "AnalyzeEvent" };
+    for (unsigned int m = 0; m < 2; m++) {
+        for (std::map<std::string, CalcTiming>::const_iterator it = _timings[m]->begin(); it != _timings[m]->end(); ++it) {
+            if (it->second.GetCalls() == 0) continue;
+            std::vector<std::string> _values;
+            _values.push_back("calls=" + std::to_string(it->second.GetCalls()));
+            _values.push_back("mean_us=" + std::to_string(it->second.GetMean()));
+            _values.push_back("p50_us=" + std::to_string(it->second.GetPercentile(0.5)));
+            _values.push_back("p90_us=" + std::to_string(it->second.GetPercentile(0.9)));
+            _values.push_back("p99_us=" + std::to_string(it->second.GetPercentile(0.99)));
+            _values.push_back("max_us=" + std::to_string(it->second.GetMax()));
+            ec.SetMetadata("timing_" + _methods[m] + "_" + it->first, _values);
+        }
+    }
+}
@@ -0,0 +1,224 @@
+#include "FWLJMET/LJMet/interface/LjmetRunner.h"
+
+#include <algorithm>
+
+#include "PhysicsTools/SelectorUtils/interface/strbitset.h"
+
+
+LjmetRunner::LjmetRunner(edm::ParameterSet const & iConfig, edm::ConsumesCollector && iC):
+mLegend("[FWLJMet] : "),
+factory(0),
+theSelector(0)
+{
+   debug      = iConfig.getParameter<bool>("debug"); //this is debug feature from new ljmet, only on and off.
+   verbosity  = iConfig.getParameter<int>("verbosity"); // this is debug feature from old ljmet. this has levels, which is better. Need to utilize both old and new ! #TODO.
+   selection  = iConfig.getParameter<std::string>("selector");
+   vExcl      = iConfig.getParameter<std::vector<std::string>>("exclude_calcs");
+   vIncl      = iConfig.getParameter<std::vector<std::string>>("include_calcs");
+   ttree_name = iConfig.getParameter<std::string>("ttree_name");
+
+   // optional single-pass shift mode
+   if (iConfig.existsAs<std::vector<std::string>>("shift_variations")) vShifts = iConfig.getParameter<std::vector<std::string>>("shift_variations");
+   std::vector<std::string> _shiftCalcs;
+   if (iConfig.existsAs<std::vector<std::string>>("shift_calcs")) _shiftCalcs = iConfig.getParameter<std::vector<std::string>>("shift_calcs");
+   for (std::vector<std::string>::const_iterator it = vIncl.begin(); it != vIncl.end(); ++it){
+      if (std::find(_shiftCalcs.begin(), _shiftCalcs.end(), *it) != _shiftCalcs.end()) vShiftCalcs.push_back(*it); // keep the include_calcs order
+   }
+
+   // optionally the trees are filled by a background thread
+   bool _async = false;
+   if (iConfig.existsAs<bool>("asyncOutput")) _async = iConfig.getParameter<bool>("asyncOutput");
+
+   // internal LJMet event content
+   ec.SetVerbosity(verbosity);
+   ec.SetAsyncFill(_async);
+   ec.SetOutputConfig(iConfig);
+
+   // event contents for the single-pass shift mode
+   for (std::vector<std::string>::const_iterator it = vShifts.begin(); it != vShifts.end(); ++it){
+      int _syst = -1;
+      if (*it == "JECup") _syst = 1;
+      else if (*it == "JECdown") _syst = 2;
+      else if (*it == "JERup") _syst = 3;
+      else if (*it == "JERdown") _syst = 4;
+      else {
+         std::cout << mLegend << "unknown shift variation " << *it << ", expected JECup, JECdown, JERup or JERdown" << std::endl;
+         std::exit(-1);
+      }
+      LjmetEventContent * _ec = new LjmetEventContent();
+      _ec->SetVerbosity(verbosity);
+      _ec->SetAsyncFill(_async);
+      _ec->SetOutputConfig(iConfig);
+      vShiftSyst.push_back(_syst);
+      vShiftEc.push_back(_ec);
+   }
+
+   // The factory for event selector and calculator plugins
+   factory = new LjmetFactory;
+
+   // choose event selector
+   std::cout << mLegend << "instantiating the event selector : "<< ttree_name << std::endl;
+   theSelector = factory->GetEventSelector(selection);
+
+   // sanity check histograms from the selector
+   theSelector->SetEventContent(&ec);
+   theSelector->Init();
+
+   theSelector->BeginJob(iConfig, (edm::ConsumesCollector &&)iC);
+
+   //print out included Calculators
+   for (std::vector<std::string>::const_iterator it = vIncl.begin(); it != vIncl.end(); ++it){
+      std::cout << mLegend << "including " << *it <<std::endl;
+   }
+
+   // send config parameters to calculators
+   factory->SetAllCalcConfig(iConfig, vIncl);
+
+   // Run BeginJob() for calculators
+   factory->BeginJobAllCalc((edm::ConsumesCollector &&)iC, vIncl);
+
+   // set excluded calculators
+   factory->SetExcludedCalcs(vExcl);
+
+   // optionally independent calculators run concurrently
+   bool _parallel = false;
+   if (iConfig.existsAs<bool>("parallelCalcs")) _parallel = iConfig.getParameter<bool>("parallelCalcs");
+   factory->SetParallel(_parallel);
+
+   // resolve the calculators to run, nominal and shift passes are timed separately
+   mPlan = factory->MakePlan(vIncl);
+   mShiftPlan = factory->MakePlan(vShiftCalcs, "_shift");
+
+   // each shift variation gets its own copy of the histograms (cut flow)
+   for (unsigned int i = 0; i < vShifts.size(); i++){
+      std::cout << mLegend << "single-pass shift mode, variation " << vShifts[i] << " re-runs :";
+      for (std::vector<std::string>::const_iterator it = vShiftCalcs.begin(); it != vShiftCalcs.end(); ++it) std::cout << " " << *it;
+      std::cout << std::endl;
+      vShiftEc[i]->GetHistMap() = ec.GetHistMap();
+   }
+}
+
+
+LjmetRunner::~LjmetRunner()
+{
+    delete theSelector;
+
+    delete factory;
+
+    for (unsigned int i = 0; i < vShiftEc.size(); i++) delete vShiftEc[i];
+}
+
+
+bool LjmetRunner::Analyze(edm::Event const & iEvent)
+{
+	if(debug) std::cout << " " <<std::endl;
+	if(debug) std::cout << "Processing Event in FWLJMet::analyze" << std::endl;
+
+	//
+	//_____ Run private begin-of-event methods ___________________
+	//
+	factory->RunBeginEvent(iEvent, ec);
+
+
+	// run producers
+	factory->RunAllProducers(iEvent, theSelector, mPlan);
+
+	// event selection
+	pat::strbitset ret = theSelector->getBitTemplate();
+	bool passed = (*theSelector)( iEvent, ret );
+
+
+	if ( passed ) {
+
+		//
+		//_____ Run all variable calculators now ___________________
+		//
+		factory->RunAllCalculators(iEvent, theSelector, ec, mPlan);
+
+
+		//
+		//_____ Run selector-specific code if any___________________
+		//
+		theSelector->AnalyzeEvent(iEvent, ec);
+
+
+		//
+		//_____ Run private end-of-event methods ___________________
+		//
+		factory->RunEndEvent(iEvent, ec);
+
+
+		//
+		//_____Fill output file ____________________________________
+		//
+		ec.Fill();
+
+	} // end if statement for final cut requirements
+
+
+	//
+	//_____ Single-pass shift mode: redo only the jet/MET dependent part for each variation ___
+	//
+	for (unsigned int i = 0; i < vShifts.size(); i++) {
+
+		theSelector->SetEventContent(vShiftEc[i]);
+		theSelector->SetShift(vShiftSyst[i]);
+
+		pat::strbitset retShift = theSelector->getBitTemplate();
+		bool passedShift = theSelector->SelectShift( iEvent, retShift );
+
+		if ( passedShift ) {
+
+			// nominal selection failed, the shift-independent branches are computed for this variation,
+			// not reused by the next one: the selector holds this variation's objects
+			if ( !passed ) factory->RunAllCalculators(iEvent, theSelector, ec, mPlan);
+
+			vShiftEc[i]->CopyValues(ec);
+
+			factory->SetShiftAllCalc(vShiftSyst[i], mShiftPlan);
+			factory->RunAllCalculators(iEvent, theSelector, *vShiftEc[i], mShiftPlan);
+			factory->SetShiftAllCalc(-1, mShiftPlan);
+
+			theSelector->AnalyzeEvent(iEvent, *vShiftEc[i]);
+			factory->RunEndEvent(iEvent, *vShiftEc[i]);
+
+			vShiftEc[i]->Fill();
+		}
+
+	}
+
+	if ( vShifts.size() > 0 ) {
+		theSelector->SetEventContent(&ec);
+		theSelector->SetShift(-1);
+	}
+
+	return passed;
+}
+
+
+void LjmetRunner::Sync()
+{
+    ec.Sync();
+    for (unsigned int i = 0; i < vShiftEc.size(); i++) vShiftEc[i]->Sync();
+}
+
+
+void LjmetRunner::EndJob()
+{
+    Sync();
+
+    std::cout << "\n" << mLegend << "Selection (" << ttree_name << ")" << std::endl;
+    theSelector->print(std::cout);
+
+    // calculator latency, also written next to the tree
+    factory->PrintTiming(std::cout);
+    factory->SaveTiming(ec);
+
+
+    // Run EndJob() for calculators
+    factory->EndJobAllCalc(vIncl);
+
+
+    // EndJob() for the selector
+    theSelector->EndJob();
+}
@@ -0,0 +1,96 @@
+#include "FWLJMET/LJMet/interface/LjmetTreeWriter.h"
+
+
+LjmetTreeWriter::LjmetTreeWriter(TTree * tree, int verbosity, LjmetEventContent const & config):
+mpTree(tree),
+mHead(0),
+mTail(0),
+mNFull(0),
+mbBusy(false),
+mbStop(false)
+{
+    mBack.SetVerbosity(verbosity);
+    mBack.SetTree(tree);
+    mBack.CopyOutputConfig(config);
+
+    mThread = std::thread(&LjmetTreeWriter::run, this);
+}
+
+LjmetTreeWriter::~LjmetTreeWriter()
+{
+    Sync();
+    {
+        std::lock_guard<std::mutex> _lock(mMutex);
+        mbStop = true;
+    }
+    mCond.notify_all();
+    mThread.join();
+}
+
+void LjmetTreeWriter::Push(LjmetEventContent const & ec)
+{
+    int _slot;
+    {
+        std::unique_lock<std::mutex> _lock(mMutex);
+        mCond.wait(_lock, [this]{ return mNFull < 2; });
+        _slot = mTail;
+    }
+
+    // the writer only touches buffers that were pushed, so this one is ours until it is counted
+    mBuffers[_slot].CopyValues(ec);
+
+    {
+        std::lock_guard<std::mutex> _lock(mMutex);
+        mTail = 1 - mTail;
+        mNFull++;
+    }
+    mCond.notify_all();
+}
+
+void LjmetTreeWriter::Sync()
+{
+    std::unique_lock<std::mutex> _lock(mMutex);
+    mCond.wait(_lock, [this]{ return mNFull == 0 && !mbBusy; });
+}
+
+void LjmetTreeWriter::run()
+{
+    while (true) {
+        int _slot;
+        {
+            std::unique_lock<std::mutex> _lock(mMutex);
+            mCond.wait(_lock, [this]{ return mNFull > 0 || mbStop; });
+            if (mNFull == 0) break;
+            _slot = mHead;
+            mbBusy = true;
+        }
+
+        // take the event over and give the buffer back before the slow part
+        mBack.SwapValues(mBuffers[_slot]);
+        {
+            std::lock_guard<std::mutex> _lock(mMutex);
+            mHead = 1 - mHead;
+            mNFull--;
+        }
+        mCond.notify_all();
+
+        {
+            std::lock_guard<std::mutex> _fileLock(fileMutex(mpTree->GetCurrentFile()));
+            mBack.Fill();
+        }
+
+        {
+            std::lock_guard<std::mutex> _lock(mMutex);
+            mbBusy = false;
+        }
+        mCond.notify_all();
+    }
+}
+
+std::mutex & LjmetTreeWriter::fileMutex(TFile * file)
+{
+    static std::mutex _mapMutex;
+    static std::map<TFile *, std::mutex> _mutexes;
+    std::lock_guard<std::mutex> _lock(_mapMutex);
+    return _mutexes[file];
+}
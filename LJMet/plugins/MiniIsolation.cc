@@ -1,7 +1,139 @@
 #include "FWLJMET/LJMet/interface/MiniIsolation.h"
 #include "DataFormats/Math/interface/deltaR.h"
 
-double getPFMiniIsolation_DeltaBeta(edm::Handle<pat::PackedCandidateCollection> pfcands,
+
+PFCandGrid::PFCandGrid():
+mpCands(0)
+{
+}
+
+PFCandGrid const & PFCandGrid::Get(edm::Event const & event, edm::Handle<pat::PackedCandidateCollection> const & pfcands)
+{
+  static thread_local PFCandGrid grid;
+  if (grid.mEventID != event.id() || grid.mProductID != pfcands.id()) {
+    grid.Build(*pfcands);
+    grid.mEventID = event.id();
+    grid.mProductID = pfcands.id();
+  }
+  return grid;
+}
+
+int PFCandGrid::etaBin(double eta) const
+{
+  int bin = (int)std::floor((eta + etaMax) * nEtaBins / (2.*etaMax));
+  return std::max(0, std::min(nEtaBins - 1, bin));
+}
+
+int PFCandGrid::phiBin(double phi) const
+{
+  int bin = (int)std::floor((phi + M_PI) * nPhiBins / (2.*M_PI));
+  return std::max(0, std::min(nPhiBins - 1, bin));
+}
+
+void PFCandGrid::Build(pat::PackedCandidateCollection const & pfcands)
+{
+  mpCands = &pfcands;
+
+  // keep only what can enter one of the sums, the pt thresholds depend on the lepton
+  std::vector<Cand> _cands;
+  std::vector<int> _cells;
+  _cands.reserve(pfcands.size());
+  _cells.reserve(pfcands.size());
+  for (unsigned int i = 0; i < pfcands.size(); i++) {
+    const pat::PackedCandidate &pfc = pfcands[i];
+    if (abs(pfc.pdgId())<7) continue;
+
+    Kind kind;
+    if (pfc.charge()==0) {
+      if (abs(pfc.pdgId())==22) kind = kPhoton;
+      else if (abs(pfc.pdgId())==130) kind = kNeutralHadron;
+      else continue;
+    } else if (pfc.fromPV()>1) {
+      if (abs(pfc.pdgId())==211) kind = kChargedPV;
+      else continue;
+    } else kind = kChargedPU;
+
+    Cand _cand = { pfc.eta(), pfc.phi(), pfc.pt(), i, kind };
+    _cands.push_back(_cand);
+    _cells.push_back(etaBin(_cand.eta) * nPhiBins + phiBin(_cand.phi));
+  }
+
+  // counting sort by cell, keeps the collection order within a cell
+  mvCellBegin.assign(nEtaBins * nPhiBins + 1, 0);
+  for (int cell : _cells) mvCellBegin[cell + 1]++;
+  for (unsigned int c = 1; c < mvCellBegin.size(); c++) mvCellBegin[c] += mvCellBegin[c - 1];
+
+  mvCands.resize(_cands.size());
+  std::vector<unsigned int> _fill(mvCellBegin.begin(), mvCellBegin.end() - 1);
+  for (unsigned int i = 0; i < _cands.size(); i++) mvCands[_fill[_cells[i]]++] = _cands[i];
+}
+
+double PFCandGrid::pfWeight(pat::PackedCandidate const & pfc) const
+{
+  double wpv(0.), wpu(0.);
+  for (const pat::PackedCandidate &jpfc : *mpCands) {
+    double jdr = deltaR(pfc, jpfc);
+    if (pfc.charge()!=0 || jdr<0.00001) continue;
+    double jpt = jpfc.pt();
+    if (pfc.fromPV()>1) wpv *= jpt/jdr;
+    else wpu *= jpt/jdr;
+  }
+  wpv = log(wpv);
+  wpu = log(wpu);
+  return wpv/(wpv+wpu);
+}
+
+PFCandGrid::ConeSums PFCandGrid::GetConeSums(double eta, double phi, double r_iso, double ptThresh,
+                                             DeadCones const & deadcones, bool use_pfweight) const
+{
+  // cells overlapping the cone, one extra cell on each side against rounding at the cell edges
+  int etaLo = std::max(0, etaBin(eta - r_iso) - 1);
+  int etaHi = std::min(nEtaBins - 1, etaBin(eta + r_iso) + 1);
+  int phiLo = (int)std::floor((phi - r_iso + M_PI) * nPhiBins / (2.*M_PI)) - 1;
+  int phiHi = (int)std::floor((phi + r_iso + M_PI) * nPhiBins / (2.*M_PI)) + 1;
+  if (phiHi - phiLo + 1 >= nPhiBins) { phiLo = 0; phiHi = nPhiBins - 1; }
+
+  std::vector<std::pair<unsigned int, Cand const *>> _inCone;
+  for (int ieta = etaLo; ieta <= etaHi; ieta++) {
+    for (int iphi = phiLo; iphi <= phiHi; iphi++) {
+      int cell = ieta * nPhiBins + ((iphi % nPhiBins) + nPhiBins) % nPhiBins;
+      for (unsigned int i = mvCellBegin[cell]; i < mvCellBegin[cell + 1]; i++) {
+        if (reco::deltaR(mvCands[i].eta, mvCands[i].phi, eta, phi) > r_iso) continue;
+        _inCone.push_back(std::make_pair(mvCands[i].index, &mvCands[i]));
+      }
+    }
+  }
+  std::sort(_inCone.begin(), _inCone.end());
+
+  ConeSums sums = { 0., 0., 0., 0. };
+  for (auto const & _entry : _inCone) {
+    Cand const & cand = *_entry.second;
+    double dr = reco::deltaR(cand.eta, cand.phi, eta, phi);
+
+    switch (cand.kind) {
+    case kPhoton:
+      if (cand.pt <= ptThresh || dr < deadcones.ph) break;
+      sums.ph += (use_pfweight ? pfWeight((*mpCands)[cand.index]) : 1.) * cand.pt;
+      break;
+    case kNeutralHadron:
+      if (cand.pt <= ptThresh || dr < deadcones.nh) break;
+      sums.nh += (use_pfweight ? pfWeight((*mpCands)[cand.index]) : 1.) * cand.pt;
+      break;
+    case kChargedPV:
+      if (dr < deadcones.ch) break;
+      sums.ch += cand.pt;
+      break;
+    case kChargedPU:
+      if (cand.pt <= ptThresh || dr < deadcones.pu) break;
+      sums.pu += cand.pt;
+      break;
+    }
+  }
+
+  return sums;
+}
+
+double getPFMiniIsolation_DeltaBeta(PFCandGrid const & pfgrid,
 		      const reco::Candidate* ptcl,  
 		      double r_iso_min, double r_iso_max, double kt_scale,
 		      bool charged_only) {
@@ -22,39 +154,11 @@ double getPFMiniIsolation_DeltaBeta(edm::Handle<pat::PackedCandidateCollection>
   double ptThresh(0.5);
   if(ptcl->isElectron()) ptThresh = 0;
   double r_iso = std::max(r_iso_min,std::min(r_iso_max, kt_scale/ptcl->pt()));
-  for (const pat::PackedCandidate &pfc : *pfcands) {
-    if (abs(pfc.pdgId())<7) continue;
+  PFCandGrid::DeadCones deadcones = { deadcone_ch, deadcone_nh, deadcone_ph, deadcone_pu };
+  PFCandGrid::ConeSums sums = pfgrid.GetConeSums(ptcl->eta(), ptcl->phi(), r_iso, ptThresh, deadcones);
+  iso_nh = sums.nh; iso_ch = sums.ch;
+  iso_ph = sums.ph; iso_pu = sums.pu;
 
-    double dr = reco::deltaR(pfc, *ptcl);
-    if (dr > r_iso) continue;
-      
-    //////////////////  NEUTRALS  /////////////////////////
-    if (pfc.charge()==0){
-      if (pfc.pt()>ptThresh) {
-	/////////// PHOTONS ////////////
-	if (abs(pfc.pdgId())==22) {
-	  if(dr < deadcone_ph) continue;
-	  iso_ph += pfc.pt();
-	  /////////// NEUTRAL HADRONS ////////////
-	    } else if (abs(pfc.pdgId())==130) {
-	  if(dr < deadcone_nh) continue;
-	  iso_nh += pfc.pt();
-	}
-      }
-      //////////////////  CHARGED from PV  /////////////////////////
-    } else if (pfc.fromPV()>1){
-      if (abs(pfc.pdgId())==211) {
-	if(dr < deadcone_ch) continue;
-	iso_ch += pfc.pt();
-      }
-      //////////////////  CHARGED from PU  /////////////////////////
-    } else {
-      if (pfc.pt()>ptThresh){
-	if(dr < deadcone_pu) continue;
-	iso_pu += pfc.pt();
-      }
-    }
-  }
   double iso(0.);
   if (charged_only){
     iso = iso_ch;
@@ -118,7 +222,7 @@ double getPFMiniIsolation_el( const pat::Electron *el, double r_iso_min, double
   return miniIso;
 }
 
-double getPFMiniIsolation_EffectiveArea(edm::Handle<pat::PackedCandidateCollection> pfcands,
+double getPFMiniIsolation_EffectiveArea(PFCandGrid const & pfgrid,
 					const reco::Candidate* ptcl,  
 					double r_iso_min, double r_iso_max, double kt_scale,
 					bool use_pfweight, bool charged_only, double rho) {
@@ -139,40 +243,11 @@ double getPFMiniIsolation_EffectiveArea(edm::Handle<pat::PackedCandidateCollecti
   if(ptcl->isElectron()) ptThresh = 0;
   double r_iso = kt_scale / std::min( std::max( ptcl->pt(), r_iso_max ), r_iso_min );
 
-  for (const pat::PackedCandidate &pfc : *pfcands) {
-    if (abs(pfc.pdgId())<7) continue;
+  PFCandGrid::DeadCones deadcones = { deadcone_ch, deadcone_nh, deadcone_ph, deadcone_pu };
+  PFCandGrid::ConeSums sums = pfgrid.GetConeSums(ptcl->eta(), ptcl->phi(), r_iso, ptThresh, deadcones);
+  iso_nh = sums.nh; iso_ch = sums.ch;
+  iso_ph = sums.ph; iso_pu = sums.pu;
 
-    double dr = deltaR(pfc, *ptcl);
-    if (dr > r_iso) continue;
-      
-    //////////////////  NEUTRALS  /////////////////////////
-    if (pfc.charge()==0){
-      if (pfc.pt()>ptThresh) {
-	double wpf(1.);
-	/////////// PHOTONS ////////////
-	if (abs(pfc.pdgId())==22) {
-	  if(dr < deadcone_ph) continue;
-	  iso_ph += wpf*pfc.pt();
-          /////////// NEUTRAL HADRONS ////////////
-	} else if (abs(pfc.pdgId())==130) {
-	  if(dr < deadcone_nh) continue;
-	  iso_nh += wpf*pfc.pt();
-	}
-      }
-      //////////////////  CHARGED from PV  /////////////////////////
-    } else if (pfc.fromPV()>1){
-      if (abs(pfc.pdgId())==211) {
-	if(dr < deadcone_ch) continue;
-	iso_ch += pfc.pt();
-      }
-      //////////////////  CHARGED from PU  /////////////////////////
-    } else {
-      if (pfc.pt()>ptThresh){
-	if(dr < deadcone_pu) continue;
-	iso_pu += pfc.pt();
-      }
-    }
-  }
   double iso(0.);
   
   int em = 0;
@@ -215,7 +290,7 @@ double getPFMiniIsolation_EffectiveArea(edm::Handle<pat::PackedCandidateCollecti
   return iso;
 }
 
-double getPFMiniIsolation_SUSY(edm::Handle<pat::PackedCandidateCollection> pfcands,
+double getPFMiniIsolation_SUSY(PFCandGrid const & pfgrid,
 			     const reco::Candidate* ptcl,
 			     double r_iso_min, double r_iso_max, double kt_scale,
 			     bool use_pfweight, bool charged_only, double rho) {
@@ -236,53 +311,11 @@ double getPFMiniIsolation_SUSY(edm::Handle<pat::PackedCandidateCollection> pfcan
   double ptThresh(0.5);
   if(ptcl->isElectron()) ptThresh = 0;
   double r_iso = std::max(r_iso_min,std::min(r_iso_max, kt_scale/ptcl->pt()));
-  for (const pat::PackedCandidate &pfc : *pfcands) {
-    if (abs(pfc.pdgId())<7) continue;
-        
-    double dr = deltaR(pfc, *ptcl);
-    if (dr > r_iso) continue;
-        
-    //////////////////  NEUTRALS  /////////////////////////
-    if (pfc.charge()==0){
-      if (pfc.pt()>ptThresh) {
-	double wpf(1.);
-	if (use_pfweight){
-	  double wpv(0.), wpu(0.);
-	  for (const pat::PackedCandidate &jpfc : *pfcands) {
-	    double jdr = deltaR(pfc, jpfc);
-	    if (pfc.charge()!=0 || jdr<0.00001) continue;
-	    double jpt = jpfc.pt();
-	    if (pfc.fromPV()>1) wpv *= jpt/jdr;
-	    else wpu *= jpt/jdr;
-	  }
-	  wpv = log(wpv);
-	  wpu = log(wpu);
-	  wpf = wpv/(wpv+wpu);
-	}
-	/////////// PHOTONS ////////////
-	if (abs(pfc.pdgId())==22) {
-	  if(dr < deadcone_ph) continue;
-	  iso_ph += wpf*pfc.pt();
-	  /////////// NEUTRAL HADRONS ////////////
-	} else if (abs(pfc.pdgId())==130) {
-	  if(dr < deadcone_nh) continue;
-	  iso_nh += wpf*pfc.pt();
-	}
-      }
-      //////////////////  CHARGED from PV  /////////////////////////
-    } else if (pfc.fromPV()>1){
-      if (abs(pfc.pdgId())==211) {
-	if(dr < deadcone_ch) continue;
-	iso_ch += pfc.pt();
-      }
-      //////////////////  CHARGED from PU  /////////////////////////
-    } else {
-      if (pfc.pt()>ptThresh){
-	if(dr < deadcone_pu) continue;
-	iso_pu += pfc.pt();
-      }
-    }
-  }
+  PFCandGrid::DeadCones deadcones = { deadcone_ch, deadcone_nh, deadcone_ph, deadcone_pu };
+  PFCandGrid::ConeSums sums = pfgrid.GetConeSums(ptcl->eta(), ptcl->phi(), r_iso, ptThresh, deadcones, use_pfweight);
+  iso_nh = sums.nh; iso_ch = sums.ch;
+  iso_ph = sums.ph; iso_pu = sums.pu;
+
   double iso(0.);
     
   int em = 0;
@@ -326,3 +359,30 @@ double getPFMiniIsolation_SUSY(edm::Handle<pat::PackedCandidateCollection> pfcan
     
   return iso;
 }
+
+double getPFMiniIsolation_DeltaBeta(edm::Handle<pat::PackedCandidateCollection> pfcands,
+		      const reco::Candidate* ptcl,
+		      double r_iso_min, double r_iso_max, double kt_scale,
+		      bool charged_only) {
+  PFCandGrid pfgrid;
+  pfgrid.Build(*pfcands);
+  return getPFMiniIsolation_DeltaBeta(pfgrid, ptcl, r_iso_min, r_iso_max, kt_scale, charged_only);
+}
+
+double getPFMiniIsolation_EffectiveArea(edm::Handle<pat::PackedCandidateCollection> pfcands,
+					const reco::Candidate* ptcl,
+					double r_iso_min, double r_iso_max, double kt_scale,
+					bool use_pfweight, bool charged_only, double rho) {
+  PFCandGrid pfgrid;
+  pfgrid.Build(*pfcands);
+  return getPFMiniIsolation_EffectiveArea(pfgrid, ptcl, r_iso_min, r_iso_max, kt_scale, use_pfweight, charged_only, rho);
+}
+
+double getPFMiniIsolation_SUSY(edm::Handle<pat::PackedCandidateCollection> pfcands,
+			     const reco::Candidate* ptcl,
+			     double r_iso_min, double r_iso_max, double kt_scale,
+			     bool use_pfweight, bool charged_only, double rho) {
+  PFCandGrid pfgrid;
+  pfgrid.Build(*pfcands);
+  return getPFMiniIsolation_SUSY(pfgrid, ptcl, r_iso_min, r_iso_max, kt_scale, use_pfweight, charged_only, rho);
+}
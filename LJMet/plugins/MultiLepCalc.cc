@@ -49,6 +49,11 @@ int MultiLepCalc::BeginJob(edm::ConsumesCollector && iC)
 	  std::cout << "["+GetName()+"]: "<< "Overriding LHE weights, using "<<newPDFname<<" as new and "<<basePDFname<<" as base PDF set." << std::endl;
 	  LHAPDF::Info& cfg = LHAPDF::getConfig();
 	  cfg.set_entry("Verbosity", 0);
+
+	  // load the sets once, members are evaluated from the cached grids per event
+	  pdfCache = LHAPDFCache::Get(localPdfCache);
+	  pdfCache->Load(basePDFname);
+	  pdfCache->Load(newPDFname);
 	}
 
 	//Triggering
@@ -67,6 +72,8 @@ int MultiLepCalc::BeginJob(edm::ConsumesCollector && iC)
 	isMc              = mPset.getParameter<bool>("isMc");
 	saveLooseLeps     = mPset.getParameter<bool>("saveLooseLeps");
 	keepFullMChistory = mPset.getParameter<bool>("keepFullMChistory");
+	saveTriggerNamesPerEvent = false; // old per-event vsSelTriggers*/viSelTriggers* branches
+	if (mPset.existsAs<bool>("saveTriggerNamesPerEvent")) saveTriggerNamesPerEvent = mPset.getParameter<bool>("saveTriggerNamesPerEvent");
 
 	//JET CORRECTION  initialization
 	doNewJEC                 = mPset.getParameter<bool>("doNewJEC");
@@ -90,6 +97,18 @@ int MultiLepCalc::AnalyzeEvent(edm::Event const & event, BaseEventSelector * sel
 
 	if(!isMc)JetMETCorr.SetFacJetCorr(event);
 
+	// single-pass shift mode: the shift-independent branches are copied from the nominal pass
+	if (IsShiftPass()) {
+
+		AnalyzeJets(event, selector);
+
+		AnalyzeAK8Jets(event, selector);
+
+		AnalyzeMET(event, selector);
+
+		return 0;
+	}
+
 	AnalyzeTriggers(event, selector);
 
 	AnalyzePV(event, selector);
@@ -127,47 +146,46 @@ void MultiLepCalc::AnalyzeTriggers(edm::Event const & event, BaseEventSelector *
 	//
 	//_____Triggers______
 	//
-	std::vector<std::string> vsSelMCTriggersEl, vsSelTriggersEl, vsSelMCTriggersMu, vsSelTriggersMu, vsSelMCTriggersHad, vsSelTriggersHad;
-	std::vector<int> viSelMCTriggersEl, viSelTriggersEl, viSelMCTriggersMu, viSelTriggersMu, viSelMCTriggersHad, viSelTriggersHad;
-	for(std::map<std::string, unsigned int>::const_iterator j = mSelMCTriggersEl.begin(); j != mSelMCTriggersEl.end();j++) {
-	  vsSelMCTriggersEl.push_back(j->first);
-	  viSelMCTriggersEl.push_back((int)(j->second));
-	}
-	for(std::map<std::string, unsigned int>::const_iterator j = mSelTriggersEl.begin(); j != mSelTriggersEl.end();j++) {
-	  vsSelTriggersEl.push_back(j->first);
-	  viSelTriggersEl.push_back((int)(j->second));
-	}
-	for(std::map<std::string, unsigned int>::const_iterator j = mSelMCTriggersMu.begin(); j != mSelMCTriggersMu.end();j++) {
-	  vsSelMCTriggersMu.push_back(j->first);
-	  viSelMCTriggersMu.push_back((int)(j->second));
-	}
-	for(std::map<std::string, unsigned int>::const_iterator j = mSelTriggersMu.begin(); j != mSelTriggersMu.end();j++) {
-	  vsSelTriggersMu.push_back(j->first);
-	  viSelTriggersMu.push_back((int)(j->second));
-	}
-	for(std::map<std::string, unsigned int>::const_iterator j = mSelMCTriggersHad.begin(); j != mSelMCTriggersHad.end();j++) {
-      vsSelMCTriggersHad.push_back(j->first);
-      viSelMCTriggersHad.push_back((int)(j->second));
-    }
-    for(std::map<std::string, unsigned int>::const_iterator j = mSelTriggersHad.begin(); j != mSelTriggersHad.end();j++) {
-      vsSelTriggersHad.push_back(j->first);
-      viSelTriggersHad.push_back((int)(j->second));
-    }
-	SetValue("vsSelMCTriggersEl", vsSelMCTriggersEl);
-	SetValue("vsSelTriggersEl", vsSelTriggersEl);
-	SetValue("vsSelMCTriggersMu", vsSelMCTriggersMu);
-	SetValue("vsSelTriggersMu", vsSelTriggersMu);
-	SetValue("viSelMCTriggersEl", viSelMCTriggersEl);
-	SetValue("viSelTriggersEl", viSelTriggersEl);
-	SetValue("viSelMCTriggersMu", viSelMCTriggersMu);
-	SetValue("viSelTriggersMu", viSelTriggersMu);
-	SetValue("vsSelMCTriggersHad", vsSelMCTriggersHad);
-    SetValue("vsSelTriggersHad", vsSelTriggersHad);
-    SetValue("viSelMCTriggersHad", viSelMCTriggersHad);
-    SetValue("viSelTriggersHad", viSelTriggersHad);
+	SetTriggerBits("SelMCTriggersEl", mSelMCTriggersEl);
+	SetTriggerBits("SelTriggersEl", mSelTriggersEl);
+	SetTriggerBits("SelMCTriggersMu", mSelMCTriggersMu);
+	SetTriggerBits("SelTriggersMu", mSelTriggersMu);
+	SetTriggerBits("SelMCTriggersHad", mSelMCTriggersHad);
+	SetTriggerBits("SelTriggersHad", mSelTriggersHad);
 
+}
 
+void MultiLepCalc::SetTriggerBits(std::string name, std::map<std::string, unsigned int> const & mTriggers)
+{
+	// The keys are the configured paths, the same in every event: the names go once per file into
+	// the vs<name>_MultiLepCalc metadata, per event bit i of <name>Bits is the decision of the i-th name
+	if (!HasMetadata("vs" + name)) {
+		if (mTriggers.size() > 64) {
+			std::cout << mLegend << name << ": " << mTriggers.size() << " trigger paths do not fit in the 64 bit mask" << std::endl;
+			std::exit(-1);
+		}
+		std::vector<std::string> vsNames;
+		for(std::map<std::string, unsigned int>::const_iterator j = mTriggers.begin(); j != mTriggers.end();j++) vsNames.push_back(j->first);
+		SetMetadata("vs" + name, vsNames);
+	}
 
+	long long bits = 0;
+	unsigned int i = 0;
+	for(std::map<std::string, unsigned int>::const_iterator j = mTriggers.begin(); j != mTriggers.end();j++, i++) {
+	  if (j->second) bits |= (1LL << i);
+	}
+	SetValue(name + "Bits", bits);
+
+	if (saveTriggerNamesPerEvent) {
+	  std::vector<std::string> vsTriggers;
+	  std::vector<int> viTriggers;
+	  for(std::map<std::string, unsigned int>::const_iterator j = mTriggers.begin(); j != mTriggers.end();j++) {
+	    vsTriggers.push_back(j->first);
+	    viTriggers.push_back((int)(j->second));
+	  }
+	  SetValue("vs" + name, vsTriggers);
+	  SetValue("vi" + name, viTriggers);
+	}
 }
 
 void MultiLepCalc::AnalyzePV(edm::Event const & event, BaseEventSelector * selector)
@@ -287,6 +305,7 @@ void MultiLepCalc::AnalyzeMuon(edm::Event const & event, BaseEventSelector * sel
   //packed pf candidates and rho source needed miniIso
   edm::Handle<pat::PackedCandidateCollection> packedPFCands;
   event.getByToken(PFCandToken, packedPFCands);
+  PFCandGrid const & pfCandGrid = PFCandGrid::Get(event, packedPFCands);
   
   edm::Handle<double> miniIsoRho_Handle;
   event.getByToken( rhoJetsToken, miniIsoRho_Handle);
@@ -445,7 +464,7 @@ void MultiLepCalc::AnalyzeMuon(edm::Event const & event, BaseEventSelector * sel
 	//Do we need two of these? And don't we need to update to the official CMSSW MiniIsolation.cc rather than some old file --Rizki Mar 12, 2019.
 	//double miniIso = getPFMiniIsolation_EffectiveArea(packedPFCands, dynamic_cast<const reco::Candidate *>(imu->get()), 200., 50., 10., false, false, miniIsoRho);
         double miniIso = getPFMiniIsolation_mu( imu->get(), 200., 50., 10., miniIsoRho );
-	double miniIsoDB = getPFMiniIsolation_DeltaBeta(packedPFCands, dynamic_cast<const reco::Candidate *>(imu->get()), 0.05, 0.2, 10., false);
+	double miniIsoDB = getPFMiniIsolation_DeltaBeta(pfCandGrid, dynamic_cast<const reco::Candidate *>(imu->get()), 0.05, 0.2, 10., false);
 	
 	muRelIso . push_back(relIso);
 	muMiniIso . push_back(miniIso);
@@ -1256,6 +1275,7 @@ void MultiLepCalc::AnalyzeMET(edm::Event const & event, BaseEventSelector * sele
     else if (JERup){syst=3;}
     else if (JERdown){syst=4;}
     else syst = 0; //nominal
+    if (IsShiftPass()) syst = GetShift(); // single-pass shift mode
 
     double _met = -9999.0;
     double _met_phi = -9999.0;
@@ -1436,7 +1456,8 @@ void MultiLepCalc::AnalyzeGenInfo(edm::Event const & event, BaseEventSelector *
         evtWeightsMC=evtWeights;
         MCWeight = theWeight;
 
-        if (orlhew) {
+        // the member weights are the expensive part, only when they are written out
+        if (orlhew && (IsBranchKept("NewPDFweights") || IsBranchKept("NewPDFweightsBase") || IsBranchKept("NewPDFids"))) {
 
           float x1 = genEvtInfo->pdf()->x.first;
           float x2 = genEvtInfo->pdf()->x.second;
@@ -1446,29 +1467,13 @@ void MultiLepCalc::AnalyzeGenInfo(edm::Event const & event, BaseEventSelector *
           //std::cout<<"x1 x2 Q id1 id2"<<std::endl;
           //std::cout<<x1<<" "<<x2<<" "<<Q<<" "<<id1<<" "<<id2<<std::endl;
 
-          //Initialize PDF sets
-          LHAPDF::PDF* basepdf1 = LHAPDF::mkPDF(basePDFname,0);
-          const LHAPDF::GridPDF& pdf1 = * dynamic_cast<const LHAPDF::GridPDF*>(basepdf1);
-
-          // calculate central PDFs for generator set,
-          double pdf1_gen = pdf1.xfxQ(id1, x1, Q);
-          double pdf2_gen = pdf1.xfxQ(id2, x2, Q);
-          //std::cout<<"pdf1_gen = "<<pdf1_gen<<" pdf2_gen = "<<pdf2_gen<<std::endl;
-          delete basepdf1;
-
-          const LHAPDF::PDFSet newset(newPDFname);
-          const size_t nmem = newset.size();
-          const std::vector<LHAPDF::PDF*> newpdfs = newset.mkPDFs();
-          for (size_t i = 0; i<nmem; i++) {
-            const LHAPDF::GridPDF& pdf2 = * dynamic_cast<const LHAPDF::GridPDF*>(newpdfs[i]);
-
-            double pdf1_new = pdf2.xfxQ(id1, x1, Q);
-            double pdf2_new = pdf2.xfxQ(id2, x2, Q);
-            NewPDFweights.push_back((pdf1_new*pdf2_new)/(pdf1_gen*pdf2_gen));
-            NewPDFweightsBase.push_back(pdf1_gen*pdf2_gen);
+          // all members of the new set relative to the central generator set, from the cached grids
+          std::vector<double> memberWeights;
+          double pdf_gen = pdfCache->MemberWeights(basePDFname, newPDFname, id1, x1, id2, x2, Q, memberWeights);
+          for (size_t i = 0; i<memberWeights.size(); i++) {
+            NewPDFweights.push_back(memberWeights[i]);
+            NewPDFweightsBase.push_back(pdf_gen);
             NewPDFids.push_back(315000+i);
-
-            delete (newpdfs[i]);
           }
         }
         edm::Handle<LHEEventProduct> EvtHandle;
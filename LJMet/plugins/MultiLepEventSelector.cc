@@ -1,6 +1,9 @@
 #include "FWLJMET/LJMet/interface/MultiLepEventSelector.h"
 
-MultiLepEventSelector::MultiLepEventSelector()
+MultiLepEventSelector::MultiLepEventSelector():
+optimize_selection(false),
+bPassShared(false),
+sharedWeight(1)
 {
 }
 
@@ -21,6 +24,14 @@ void MultiLepEventSelector::BeginJob( const edm::ParameterSet& iConfig, edm::Con
     debug               = selectorConfig.getParameter<bool>("debug");
     isMc                = selectorConfig.getParameter<bool>("isMc");
     bFirstEntry         = true; //in case anything needs a first entry bool.
+    if (selectorConfig.existsAs<bool>("optimize_selection")) optimize_selection = selectorConfig.getParameter<bool>("optimize_selection");
+
+    //Selection stages, in the order of SelectionStage
+    std::string const stageNames[kNStages] = {"Trigger", "Primary Vertex", "MET filters", "Leptons", "Jets", "MET", "Jet b tagging", "AK8 jets"};
+    for (unsigned int istage = 0; istage < kNStages; istage++){
+        StageStats _stats = {stageNames[istage], 0, 0, std::chrono::steady_clock::duration::zero()};
+        mvStageStats.push_back(_stats);
+    }
 
     //nEvents info
     if(isMc) genToken            = iC.consumes<GenEventInfoProduct>(edm::InputTag("generator"));
@@ -36,6 +47,12 @@ void MultiLepEventSelector::BeginJob( const edm::ParameterSet& iConfig, edm::Con
     trigger_path_mu     = selectorConfig.getParameter<std::vector<std::string>>("trigger_path_mu");
     trigger_path_hadronic     = selectorConfig.getParameter<std::vector<std::string>>("trigger_path_hadronic");
     ecalBadCalibFilterToken = selectorConfig.getParameter<bool>("ecalBadCalibFilter");
+    mctrigMatch_el.SetPaths(mctrigger_path_el);
+    mctrigMatch_mu.SetPaths(mctrigger_path_mu);
+    mctrigMatch_hadronic.SetPaths(mctrigger_path_hadronic);
+    trigMatch_el.SetPaths(trigger_path_el);
+    trigMatch_mu.SetPaths(trigger_path_mu);
+    trigMatch_hadronic.SetPaths(trigger_path_hadronic);
 
     //PV
     const edm::ParameterSet& PVconfig = selectorConfig.getParameterSet("pvSelector") ;
@@ -174,15 +191,20 @@ void MultiLepEventSelector::BeginJob( const edm::ParameterSet& iConfig, edm::Con
     set("All cuts",true);
 
     //Record cut flow information - will be saved under folder named after the selector name.
-    SetHistogram( "Trigger", 2, 0,2);
-    SetHistogram("Primary Vertex", 2, 0,2);
-    SetHistogram("MET filters", 2, 0,2);
-    SetHistogram("Lepton Selection", 2, 0,2); // keeping it simple for now
+    //Filled from the selection result at the end of the event, see FillCutFlow().
+    AddCutFlowStep("Trigger", {"Trigger"});
+    AddCutFlowStep("Primary Vertex", {"Primary Vertex"});
+    AddCutFlowStep("MET filters", {"MET filters"});
+    std::vector<std::string> leptonCuts; // LeptonsSelection() only applies the considered cuts
+    for (std::string const & _cut : {"Min Loose Leptons", "Max Loose Leptons", "Min Leptons", "Max Leptons"}){
+        if (considerCut(_cut)) leptonCuts.push_back(_cut);
+    }
+    AddCutFlowStep("Lepton Selection", leptonCuts); // keeping it simple for now
     if(jet_cuts){
-		SetHistogram("Jet Selection", 2, 0,2); // keeping it simple for now
+		AddCutFlowStep("Jet Selection", {"Min jet multiplicity", "Max jet multiplicity", "Leading jet pt"}); // keeping it simple for now
     }
-    SetHistogram("MET", 2, 0,2);
-    SetHistogram("All cuts", 2, 0,2);
+    AddCutFlowStep("MET", {"MET"});
+    AddCutFlowStep("All cuts", {"All cuts"});
 
 
 
@@ -203,58 +225,152 @@ bool MultiLepEventSelector::operator()( edm::Event const & event, pat::strbitset
       event.getByToken(genToken, genEvtInfo );
       theWeight = genEvtInfo->weight()/fabs(genEvtInfo->weight());
    }
-  FillHist("nEvents", theWeight);
+  FillHist(mhNEvents, theWeight);
+  sharedWeight = theWeight;
 
-  while(1){ // standard infinite while loop trick to avoid nested ifs
+  bPassShared = SharedSelection(event, ret);
+  retShared = ret;
 
-    passCut(ret, "No selection");
+  if ( bPassShared ) JetMETSelection(event, ret);
 
-    if( ! TriggerSelection(event) ) break;
-    passCut(ret, "Trigger");
-    FillHist("Trigger", 1);
+  FillCutFlow(ret);
 
-    if( ! PVSelection(event) ) break;
-    passCut(ret, "Primary Vertex");
-    FillHist("Primary Vertex", 1);
+  bFirstEntry = false;
+
+  return (bool)ret;
+
+  setIgnored(ret);
+
+  return false;
+}// end of operator()
+
+
+bool MultiLepEventSelector::SharedSelection(edm::Event const & event, pat::strbitset & ret)
+{
+  //
+  // Cuts that do not depend on the jet/MET systematic, run once per event
+  //
+  passCut(ret, "No selection");
 
-    if( ! METfilter(event) ) break;
-    passCut(ret, "MET filters");
-    FillHist("MET filters", 1);
+  if( ! RunStage(kTrigger, [&]{ return TriggerSelection(event); }) ) return false;
+  passCut(ret, "Trigger");
+
+  if( ! RunStage(kPV, [&]{ return PVSelection(event); }) ) return false;
+  passCut(ret, "Primary Vertex");
+
+  if( ! RunStage(kMETfilters, [&]{ return METfilter(event); }) ) return false;
+  passCut(ret, "MET filters");
+
+  bool passLeptons = RunStage(kLeptons, [&]{
+    if( optimize_selection && ! LeptonCountPrecheck(event) ) return false;
 
     //Collect selected leptons
     MuonSelection(event);
     ElectronSelection(event);
 
-    if( ! LeptonsSelection(event, ret) ) break;
-    FillHist("Lepton Selection", 1); // keeping it simple for now
+    return LeptonsSelection(event, ret);
+  });
+
+  return passLeptons;
+}
+
+
+bool MultiLepEventSelector::JetMETSelection(edm::Event const & event, pat::strbitset & ret)
+{
+  //
+  // Cuts that depend on the jet/MET systematic, run again for every variation in the single-pass shift mode
+  //
+  if ( optimize_selection ) return LazyJetMETSelection(event, ret);
+
+  while(1){ // standard infinite while loop trick to avoid nested ifs
 
     //Collect jets
-    if( ! JetSelection(event, ret) ) break;
-    FillHist("Jet Selection", 1); // keeping it simple for now
+    if( ! RunStage(kJets, [&]{ return JetSelection(event, ret); }) ) break;
 
     //Collect AK8 jets
-    AK8JetSelection(event);
+    RunStage(kAK8Jets, [&]{ AK8JetSelection(event); return true; });
 
-    if( ! METSelection(event) ) break;
+    if( ! RunStage(kMET, [&]{ return METSelection(event); }) ) break;
     passCut(ret, "MET");
-    FillHist("MET", 1);
 
+    passCut(ret, "All cuts");
+    break;
+
+  } // end of while loop
+
+  return (bool)ret;
+}
+
+
+bool MultiLepEventSelector::LazyJetMETSelection(edm::Event const & event, pat::strbitset & ret)
+{
+  //
+  // optimize_selection: the cuts of JetMETSelection() with the same result, the cut flow needs every step up to
+  // the first failing one, so only work no cut depends on is moved:
+  //  - no jet correction if the jet collection is too small for the jet multiplicity cut
+  //  - without jet cuts the MET cut goes first, it only needs the uncorrected jets (vAllJets)
+  //  - b tagging of the selected jets and the AK8 jets only for events that pass all cuts
+  //
+  bool metFirst = !jet_cuts;
+
+  while(1){
+
+    if ( metFirst ) {
+      FillAllJets(event);
+      if( ! RunStage(kMET, [&]{ return METSelection(event); }) ) break;
+    }
+
+    //Collect jets, corrected but not tagged yet
+    if( ! RunStage(kJets, [&]{ return JetCountPrecheck(event) && JetSelection(event, ret, false); }) ) break;
+
+    if( ! metFirst && ! RunStage(kMET, [&]{ return METSelection(event); }) ) break;
+    passCut(ret, "MET");
 
     passCut(ret, "All cuts");
-    FillHist("All cuts", 1);
+
+    RunStage(kJetBtag, [&]{ TagSelectedJets(event); return true; });
+
+    //Collect AK8 jets
+    RunStage(kAK8Jets, [&]{ AK8JetSelection(event); return true; });
     break;
 
   } // end of while loop
 
+  return (bool)ret;
+}
 
-  bFirstEntry = false;
+
+bool MultiLepEventSelector::SelectShift(edm::Event const & event, pat::strbitset & ret)
+{
+  //
+  // Single-pass shift mode: reuse the shift-independent part of the last operator() call and
+  // redo only the jet/MET selection. The cut flow histograms go to the event content of the
+  // variation, the printed cut flow is kept for the nominal selection only.
+  //
+  FillHist(mhNEvents, sharedWeight);
+
+  ret = retShared;
+  if ( bPassShared ) {
+    cut_flow_map nominalCutFlow = cutFlow_;
+    JetMETSelection(event, ret);
+    cutFlow_ = nominalCutFlow;
+  }
+
+  FillCutFlow(ret);
 
   return (bool)ret;
+}
 
-  setIgnored(ret);
 
-  return false;
-}// end of operator()
+unsigned int MultiLepEventSelector::JetSyst()
+{
+  if (mShift >= 0) return mShift; // single-pass shift mode
+  if (JECup) return 1;
+  if (JECdown) return 2;
+  if (JERup) return 3;
+  if (JERdown) return 4;
+  return 0; //nominal
+}
 
 
 void MultiLepEventSelector::AnalyzeEvent( edm::EventBase const & event, LjmetEventContent & ec )
@@ -272,6 +388,18 @@ void MultiLepEventSelector::AnalyzeEvent( edm::EventBase const & event, LjmetEve
 
 void MultiLepEventSelector::EndJob()
 {
+  // where the selection spends its time, and how often each stage rejects the events that reach it
+  char _line[256];
+  std::cout << mLegend << "selection stages (optimize_selection " << (optimize_selection ? "on" : "off") << ")" << std::endl;
+  snprintf(_line, sizeof(_line), "  %-20s %12s %10s %12s", "", "calls", "rejected", "mean (us)");
+  std::cout << _line << std::endl;
+  for (unsigned int istage = 0; istage < mvStageStats.size(); istage++){
+    StageStats const & _stats = mvStageStats[istage];
+    if (_stats.calls == 0) continue;
+    double _mean = std::chrono::duration<double, std::micro>(_stats.time).count() / _stats.calls;
+    snprintf(_line, sizeof(_line), "  %-20s %12llu %9.1f%% %12.1f", _stats.name.c_str(), _stats.calls, 100. * _stats.rejected / _stats.calls, _mean);
+    std::cout << _line << std::endl;
+  }
 }
 
 bool MultiLepEventSelector::TriggerSelection(edm::Event const & event)
@@ -289,9 +417,17 @@ bool MultiLepEventSelector::TriggerSelection(edm::Event const & event)
 	  
 	  edm::Handle< edm::TriggerResults > triggersHandle;
 	  event.getByToken(triggersToken,triggersHandle);
-	  const edm::TriggerNames trigNames = event.triggerNames(*triggersHandle);
+	  edm::TriggerNames const & trigNames = event.triggerNames(*triggersHandle);
 	  
 	  unsigned int _tSize = triggersHandle->size();
+
+	  // menu indices of the configured paths, only resolved again when the menu changes
+	  mctrigMatch_el.Update(trigNames);
+	  mctrigMatch_mu.Update(trigNames);
+	  mctrigMatch_hadronic.Update(trigNames);
+	  trigMatch_el.Update(trigNames);
+	  trigMatch_mu.Update(trigNames);
+	  trigMatch_hadronic.Update(trigNames);
 	  
 	  bool passTrigElMC = false;
 	  bool passTrigMuMC = false;
@@ -321,10 +457,10 @@ bool MultiLepEventSelector::TriggerSelection(edm::Event const & event)
 	  if (debug) std::cout<< "\t" <<"	In MC El trig list: "<<std::endl;
 	  for (unsigned int ipath = 0; ipath < mctrigger_path_el.size() && mctrigger_path_el.at(0)!="" ; ipath++){
 	    mvSelMCTriggersEl[mctrigger_path_el.at(ipath)] = 0;
-	    for(unsigned int i=0; i<_tSize; i++){
-	      std::string trigName = trigNames.triggerName(i);
-	      if (trigName.find(mctrigger_path_el.at(ipath)) == std::string::npos) continue;
-	      if (triggersHandle->accept(trigNames.triggerIndex(trigName))) {
+	    std::vector<unsigned int> const & _tIndices = mctrigMatch_el.GetIndices(ipath);
+	    for(unsigned int j=0; j<_tIndices.size(); j++){
+	      unsigned int i = _tIndices[j];
+	      if (triggersHandle->accept(i)) {
 		passTrigEl = 1;
 		mvSelMCTriggersEl[mctrigger_path_el.at(ipath)] = 1;
 		if (debug) std::cout << "		" << trigNames.triggerName(i)  << std::endl;
@@ -337,10 +473,10 @@ bool MultiLepEventSelector::TriggerSelection(edm::Event const & event)
 	  if (debug) std::cout<< "\t" <<"	In MC Mu trig list: "<<std::endl;
 	  for (unsigned int ipath = 0; ipath < mctrigger_path_mu.size() && mctrigger_path_mu.at(0)!="" ; ipath++){
 	    mvSelMCTriggersMu[mctrigger_path_mu.at(ipath)] = 0;
-	    for(unsigned int i=0; i<_tSize; i++){
-	      std::string trigName = trigNames.triggerName(i);
-	      if ( trigName.find(mctrigger_path_mu.at(ipath)) == std::string::npos) continue;
-	      if (triggersHandle->accept(trigNames.triggerIndex(trigName))){
+	    std::vector<unsigned int> const & _tIndices = mctrigMatch_mu.GetIndices(ipath);
+	    for(unsigned int j=0; j<_tIndices.size(); j++){
+	      unsigned int i = _tIndices[j];
+	      if (triggersHandle->accept(i)) {
 		passTrigMu = 1;
 		mvSelMCTriggersMu[mctrigger_path_mu.at(ipath)] = 1;
 		if (debug) std::cout << "		" << trigNames.triggerName(i)  << std::endl;
@@ -354,10 +490,10 @@ bool MultiLepEventSelector::TriggerSelection(edm::Event const & event)
 	  if (debug) std::cout<< "\t" <<" In MC Hadronic trig list: "<<std::endl;
 	  for (unsigned int ipath = 0; ipath < mctrigger_path_hadronic.size() && mctrigger_path_hadronic.at(0)!="" ; ipath++){
             mvSelMCTriggersHad[mctrigger_path_hadronic.at(ipath)] = 0;
-            for(unsigned int i=0; i<_tSize; i++){
-	      std::string trigName = trigNames.triggerName(i);
-	      if (trigName.find(mctrigger_path_hadronic.at(ipath)) == std::string::npos) continue;
-	      if (triggersHandle->accept(trigNames.triggerIndex(trigName))) {
+            std::vector<unsigned int> const & _tIndices = mctrigMatch_hadronic.GetIndices(ipath);
+            for(unsigned int j=0; j<_tIndices.size(); j++){
+	      unsigned int i = _tIndices[j];
+	      if (triggersHandle->accept(i)) {
 		passTrigHad = 1;
 		mvSelMCTriggersHad[mctrigger_path_hadronic.at(ipath)] = 1;
 		if (debug) std::cout << "               " << trigNames.triggerName(i)  << std::endl;
@@ -373,10 +509,10 @@ bool MultiLepEventSelector::TriggerSelection(edm::Event const & event)
 	  if (debug) std::cout<< "\t" <<"	In Data El trig list: "<<std::endl;
 	  for (unsigned int ipath = 0; ipath < trigger_path_el.size() && trigger_path_el.at(0)!="" ; ipath++){
 	    mvSelTriggersEl[trigger_path_el.at(ipath)] = 0;
-	    for(unsigned int i=0; i<_tSize; i++){
-	      std::string trigName = trigNames.triggerName(i);
-	      if ( trigName.find(trigger_path_el.at(ipath)) == std::string::npos) continue;
-	      if (triggersHandle->accept(trigNames.triggerIndex(trigName))){
+	    std::vector<unsigned int> const & _tIndices = trigMatch_el.GetIndices(ipath);
+	    for(unsigned int j=0; j<_tIndices.size(); j++){
+	      unsigned int i = _tIndices[j];
+	      if (triggersHandle->accept(i)) {
 		passTrigEl = 1;
 		mvSelTriggersEl[trigger_path_el.at(ipath)] = 1;
 		if (debug) std::cout << "		" << trigNames.triggerName(i)  << std::endl;
@@ -389,10 +525,10 @@ bool MultiLepEventSelector::TriggerSelection(edm::Event const & event)
 	  if (debug) std::cout<< "\t" <<"	In Data Mu trig list: "<<std::endl;
 	  for (unsigned int ipath = 0; ipath < trigger_path_mu.size() && trigger_path_mu.at(0)!="" ; ipath++){
 	    mvSelTriggersMu[trigger_path_mu.at(ipath)] = 0;
-	    for(unsigned int i=0; i<_tSize; i++){
-	      std::string trigName = trigNames.triggerName(i);
-	      if ( trigName.find(trigger_path_mu.at(ipath)) == std::string::npos) continue;
-	      if (triggersHandle->accept(trigNames.triggerIndex(trigName))){
+	    std::vector<unsigned int> const & _tIndices = trigMatch_mu.GetIndices(ipath);
+	    for(unsigned int j=0; j<_tIndices.size(); j++){
+	      unsigned int i = _tIndices[j];
+	      if (triggersHandle->accept(i)) {
 		passTrigMu = 1;
 		mvSelTriggersMu[trigger_path_mu.at(ipath)] = 1;
 		if (debug) std::cout << "		" << trigNames.triggerName(i)  << std::endl;
@@ -405,10 +541,10 @@ bool MultiLepEventSelector::TriggerSelection(edm::Event const & event)
 	  if (debug) std::cout<< "\t" <<" In Data Hadronic trig list: "<<std::endl;
 	  for (unsigned int ipath = 0; ipath < trigger_path_hadronic.size() && trigger_path_hadronic.at(0)!="" ; ipath++){
 	    mvSelTriggersHad[trigger_path_hadronic.at(ipath)] = 0;
-	    for(unsigned int i=0; i<_tSize; i++){
-	      std::string trigName = trigNames.triggerName(i);
-	      if ( trigName.find(trigger_path_hadronic.at(ipath)) == std::string::npos) continue;
-	      if (triggersHandle->accept(trigNames.triggerIndex(trigName))){
+	    std::vector<unsigned int> const & _tIndices = trigMatch_hadronic.GetIndices(ipath);
+	    for(unsigned int j=0; j<_tIndices.size(); j++){
+	      unsigned int i = _tIndices[j];
+	      if (triggersHandle->accept(i)) {
 		passTrigHad = 1;
 		mvSelTriggersHad[trigger_path_hadronic.at(ipath)] = 1;
 		if (debug) std::cout << "               " << trigNames.triggerName(i)  << std::endl;
@@ -912,6 +1048,31 @@ void MultiLepEventSelector::ElectronSelection(edm::Event const & event)
 
 }
 
+bool MultiLepEventSelector::LeptonCountPrecheck(edm::Event const & event)
+{
+	//
+	// The loose leptons are a subset of the input collections. If those are too small for the first
+	// lepton cut, LeptonsSelection() fails there before setting any cut bit, so the lepton
+	// identification (isolation, MVA) can be skipped
+	//
+	if ( ! considerCut("Min Loose Leptons") ) return true;
+
+	edm::Handle< pat::MuonCollection > muonsHandle;
+	event.getByToken(muonsToken, muonsHandle);
+	edm::Handle< pat::ElectronCollection > electronsHandle;
+	event.getByToken(electronsToken, electronsHandle);
+
+	if ( muonsHandle->size() + electronsHandle->size() >= (unsigned int)minLooseLeptons ) return true;
+
+	if(debug)std::cout << "\t" << "\t" << "only " << muonsHandle->size() + electronsHandle->size() << " leptons in the event, fails Min Loose Leptons" << std::endl;
+
+	vSelMuons.clear();
+	vSelLooseMuons.clear();
+	vSelElectrons.clear();
+	vSelLooseElectrons.clear();
+	return false;
+}
+
 bool MultiLepEventSelector::LeptonsSelection(edm::Event const & event, pat::strbitset & ret)
 {
 	bool pass = false;
@@ -986,7 +1147,56 @@ bool MultiLepEventSelector::LeptonsSelection(edm::Event const & event, pat::strb
 	return pass;
 }
 
-bool MultiLepEventSelector::JetSelection(edm::Event const & event, pat::strbitset & ret)
+bool MultiLepEventSelector::JetCountPrecheck(edm::Event const & event)
+{
+  //
+  // Corrections and cleaning do not add jets. If the collection is smaller than the minimum multiplicity,
+  // JetSelection() fails at its first cut before setting any cut bit, so the jets need no correction
+  //
+  if ( ! jet_cuts || ignoreCut("Min jet multiplicity") ) return true;
+
+  edm::Handle<std::vector<pat::Jet> > jetsHandle;
+  event.getByToken( jetsToken, jetsHandle );
+
+  if ( (int)jetsHandle->size() >= cut("Min jet multiplicity",int()) ) return true;
+
+  if(debug) std::cout << "\t\t\t" << "only " << jetsHandle->size() << " jets in the event, fails Min jet multiplicity" << std::endl;
+
+  vAllJets.clear();
+  vSelJets.clear();
+  vSelCorrJets.clear();
+  vSelCorrJetsWithBTags.clear();
+  vSelBtagJets.clear();
+  return false;
+}
+
+void MultiLepEventSelector::FillAllJets(edm::Event const & event)
+{
+  //
+  // vAllJets as JetSelection() leaves it (all jets pass the PF ID), for a MET cut evaluated before the jets
+  //
+  if(!isMc) JetMETCorr.SetFacJetCorr(event);
+
+  edm::Handle<std::vector<pat::Jet> > jetsHandle;
+  event.getByToken( jetsToken, jetsHandle );
+
+  vAllJets.clear();
+  for (unsigned int i = 0; i < jetsHandle->size(); i++) vAllJets.push_back(edm::Ptr<pat::Jet>( jetsHandle, i));
+}
+
+void MultiLepEventSelector::TagSelectedJets(edm::Event const & event)
+{
+  //
+  // b tagging of the selected jets, JetSelection(event, ret, false) leaves it for the events that pass
+  //
+  vSelBtagJets.clear();
+  for (unsigned int i = 0; i < vSelJets.size(); i++){
+    vSelCorrJetsWithBTags[i].second = btagSfUtil.isJetTagged(*vSelJets[i], vSelCorrJetsWithBTags[i].first, event, isMc);
+    if (vSelCorrJetsWithBTags[i].second) vSelBtagJets.push_back(vSelJets[i]);
+  }
+}
+
+bool MultiLepEventSelector::JetSelection(edm::Event const & event, pat::strbitset & ret, bool tagJets)
 {
 
   //
@@ -1029,12 +1239,12 @@ bool MultiLepEventSelector::JetSelection(edm::Event const & event, pat::strbitse
   //for jet correction
   bool isAK8 = false;
   bool reCorrectJet = doNewJEC;
-  unsigned int syst;
-  if (JECup){syst=1;}
-  else if (JECdown){syst=2;}
-  else if (JERup){syst=3;}
-  else if (JERdown){syst=4;}
-  else syst = 0; //nominal
+  unsigned int syst = JetSyst();
+
+  // correct all jets in one batch, the loop finds them in the JetMETCorrHelper event cache
+  std::vector<const pat::Jet *> vJetsToCorrect;
+  for (std::vector<pat::Jet>::const_iterator _ijet = jetsHandle->begin();_ijet != jetsHandle->end(); ++_ijet) vJetsToCorrect.push_back(&(*_ijet));
+  JetMETCorr.CorrectJets(vJetsToCorrect, event, rhoJetsToken, isAK8, reCorrectJet, syst);
 
   for (std::vector<pat::Jet>::const_iterator _ijet = jetsHandle->begin();_ijet != jetsHandle->end(); ++_ijet){
 
@@ -1141,7 +1351,7 @@ bool MultiLepEventSelector::JetSelection(edm::Event const & event, pat::strbitse
       corrJet = JetMETCorr.correctJetReturnPatJet(*_ijet, event, rhoJetsToken, isAK8, reCorrectJet, syst);
     }
 
-    _isTagged = btagSfUtil.isJetTagged(*_ijet, jetP4, event, isMc);
+    if ( tagJets ) _isTagged = btagSfUtil.isJetTagged(*_ijet, jetP4, event, isMc);
 
     // jet cuts  //NOTE: THIS IDEALLY SHOULDN'T BE HARD CODED -- Mar 13, 2019
     while(1){
@@ -1289,6 +1499,15 @@ void MultiLepEventSelector::AK8JetSelection(edm::Event const & event)
   bool isAK8 = true;
   bool reCorrectJet = doNewJEC;
 
+  // correct all jets in one batch, the loop finds them in the JetMETCorrHelper event cache
+  std::vector<const pat::Jet *> vJetsToCorrect;
+  for (std::vector<pat::Jet>::const_iterator _ijet = AK8jetsHandle->begin();_ijet != AK8jetsHandle->end(); ++_ijet){
+    if(_ijet->pt() < 170) continue;
+    if(_ijet->correctedJet(0).pt() < 170) continue;
+    vJetsToCorrect.push_back(&(*_ijet));
+  }
+  JetMETCorr.CorrectJets(vJetsToCorrect, event, rhoJetsToken, isAK8, reCorrectJet);
+
   for (std::vector<pat::Jet>::const_iterator _ijet = AK8jetsHandle->begin();_ijet != AK8jetsHandle->end(); ++_ijet){
 
     if(_ijet->pt() < 170) continue;
@@ -1446,12 +1665,7 @@ bool MultiLepEventSelector::METSelection(edm::Event const & event)
 
 	//for jet correction
 	bool reCorrectJet = doNewJEC;
-	unsigned int syst;
-	if (JECup){syst=1;}
-	else if (JECdown){syst=2;}
-	else if (JERup){syst=3;}
-	else if (JERdown){syst=4;}
-	else syst = 0; //nominal
+	unsigned int syst = JetSyst();
 
 
 	//
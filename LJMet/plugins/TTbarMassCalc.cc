@@ -10,6 +10,9 @@ int TTbarMassCalc::BeginJob(edm::ConsumesCollector && iC)
       genParticlesToken = iC.consumes<reco::GenParticleCollection>(mPset.getParameter<edm::InputTag>("genParticles"));
       genTtbarIdToken   = iC.consumes<int>(mPset.getParameter<edm::InputTag>("genTtbarId"));
       
+      // only reads the gen particles, can run next to the other calculators
+      DeclareDependencies({}, {});
+      
       return 0;
 
 
@@ -26,7 +29,7 @@ int TTbarMassCalc::AnalyzeEvent(edm::Event const & event, BaseEventSelector * se
     int category = -1;
 
     edm::Handle<int> ttbarId;
-    if(event.getByToken(genTtbarIdToken, ttbarId)){  
+    if(GetByToken(event, genTtbarIdToken, ttbarId)){  
       const int* ID = ttbarId.product();
       id = *ID;
     }
@@ -82,7 +85,7 @@ int TTbarMassCalc::AnalyzeEvent(edm::Event const & event, BaseEventSelector * se
 
     // Get the generated particle collection
     edm::Handle<reco::GenParticleCollection> genParticles;
-    if(event.getByToken(genParticlesToken, genParticles)){
+    if(GetByToken(event, genParticlesToken, genParticles)){
 
       // loop over all gen particles in event
       for(size_t i = 0; i < genParticles->size(); i++){
@@ -33,6 +33,10 @@ void TTbarTagProbeEventSelector::BeginJob( const edm::ParameterSet& iConfig, edm
     mctrigger_path_mu   = selectorConfig.getParameter<std::vector<std::string>>("mctrigger_path_mu");
     trigger_path_el     = selectorConfig.getParameter<std::vector<std::string>>("trigger_path_el");;
     trigger_path_mu     = selectorConfig.getParameter<std::vector<std::string>>("trigger_path_mu");;
+    mctrigMatch_el.SetPaths(mctrigger_path_el);
+    mctrigMatch_mu.SetPaths(mctrigger_path_mu);
+    trigMatch_el.SetPaths(trigger_path_el);
+    trigMatch_mu.SetPaths(trigger_path_mu);
 
     //PV
     const edm::ParameterSet& PVconfig = selectorConfig.getParameterSet("pvSelector") ;
@@ -297,10 +301,16 @@ bool TTbarTagProbeEventSelector::TriggerSelection(edm::Event const & event)
 
 		edm::Handle< edm::TriggerResults > triggersHandle;
 		event.getByToken(triggersToken,triggersHandle);
-		const edm::TriggerNames trigNames = event.triggerNames(*triggersHandle);
+		edm::TriggerNames const & trigNames = event.triggerNames(*triggersHandle);
 
 		unsigned int _tSize = triggersHandle->size();
 
+		// menu indices of the configured paths, only resolved again when the menu changes
+		mctrigMatch_el.Update(trigNames);
+		mctrigMatch_mu.Update(trigNames);
+		trigMatch_el.Update(trigNames);
+		trigMatch_mu.Update(trigNames);
+
 		bool passTrigElMC = false;
 		bool passTrigMuMC = false;
 		bool passTrigElData = false;
@@ -324,10 +334,10 @@ bool TTbarTagProbeEventSelector::TriggerSelection(edm::Event const & event)
 		int passTrigEl = 0;
 		if (debug) std::cout<< "\t" <<"	In MC El trig list: "<<std::endl;
 		for (unsigned int ipath = 0; ipath < mctrigger_path_el.size() && mctrigger_path_el.at(0)!="" ; ipath++){
-			for(unsigned int i=0; i<_tSize; i++){
-				std::string trigName = trigNames.triggerName(i);
-				if (trigName.find(mctrigger_path_el.at(ipath)) == std::string::npos) continue;
-				if (triggersHandle->accept(trigNames.triggerIndex(trigName))) {
+			std::vector<unsigned int> const & _tIndices = mctrigMatch_el.GetIndices(ipath);
+			for(unsigned int j=0; j<_tIndices.size(); j++){
+				unsigned int i = _tIndices[j];
+				if (triggersHandle->accept(i)) {
 					passTrigEl = 1;
 					mvSelMCTriggersEl[mctrigger_path_el.at(ipath)] = 1;
 					if (debug) std::cout << "		" << trigNames.triggerName(i)  << std::endl;
@@ -340,10 +350,10 @@ bool TTbarTagProbeEventSelector::TriggerSelection(edm::Event const & event)
 		int passTrigMu = 0;
 		if (debug) std::cout<< "\t" <<"	In MC Mu trig list: "<<std::endl;
 		for (unsigned int ipath = 0; ipath < mctrigger_path_mu.size() && mctrigger_path_mu.at(0)!="" ; ipath++){
-			for(unsigned int i=0; i<_tSize; i++){
-				std::string trigName = trigNames.triggerName(i);
-				if ( trigName.find(mctrigger_path_mu.at(ipath)) == std::string::npos) continue;
-				if (triggersHandle->accept(trigNames.triggerIndex(trigName))){
+			std::vector<unsigned int> const & _tIndices = mctrigMatch_mu.GetIndices(ipath);
+			for(unsigned int j=0; j<_tIndices.size(); j++){
+				unsigned int i = _tIndices[j];
+				if (triggersHandle->accept(i)) {
 					passTrigMu = 1;
 					mvSelMCTriggersMu[mctrigger_path_mu.at(ipath)] = 1;
 					if (debug) std::cout << "		" << trigNames.triggerName(i)  << std::endl;
@@ -357,10 +367,10 @@ bool TTbarTagProbeEventSelector::TriggerSelection(edm::Event const & event)
 		passTrigEl = 0;
 		if (debug) std::cout<< "\t" <<"	In Data El trig list: "<<std::endl;
 		for (unsigned int ipath = 0; ipath < trigger_path_el.size() && trigger_path_el.at(0)!="" ; ipath++){
-			for(unsigned int i=0; i<_tSize; i++){
-				std::string trigName = trigNames.triggerName(i);
-				if ( trigName.find(trigger_path_el.at(ipath)) == std::string::npos) continue;
-				if (triggersHandle->accept(trigNames.triggerIndex(trigName))){
+			std::vector<unsigned int> const & _tIndices = trigMatch_el.GetIndices(ipath);
+			for(unsigned int j=0; j<_tIndices.size(); j++){
+				unsigned int i = _tIndices[j];
+				if (triggersHandle->accept(i)) {
 					passTrigEl = 1;
 					mvSelTriggersEl[trigger_path_el.at(ipath)] = 1;
 					if (debug) std::cout << "		" << trigNames.triggerName(i)  << std::endl;
@@ -373,10 +383,10 @@ bool TTbarTagProbeEventSelector::TriggerSelection(edm::Event const & event)
 		passTrigMu = 0;
 		if (debug) std::cout<< "\t" <<"	In Data Mu trig list: "<<std::endl;
 		for (unsigned int ipath = 0; ipath < trigger_path_mu.size() && trigger_path_mu.at(0)!="" ; ipath++){
-			for(unsigned int i=0; i<_tSize; i++){
-			std::string trigName = trigNames.triggerName(i);
-			if ( trigName.find(trigger_path_mu.at(ipath)) == std::string::npos) continue;
-			if (triggersHandle->accept(trigNames.triggerIndex(trigName))){
+			std::vector<unsigned int> const & _tIndices = trigMatch_mu.GetIndices(ipath);
+			for(unsigned int j=0; j<_tIndices.size(); j++){
+			unsigned int i = _tIndices[j];
+			if (triggersHandle->accept(i)) {
 				passTrigMu = 1;
 				mvSelTriggersMu[trigger_path_mu.at(ipath)] = 1;
 				if (debug) std::cout << "		" << trigNames.triggerName(i)  << std::endl;
@@ -676,6 +686,7 @@ void TTbarTagProbeEventSelector::ElectronSelection(edm::Event const & event)
 	//packed pf candidates and rho source needed miniIso
 	edm::Handle<pat::PackedCandidateCollection> packedPFCandsHandle;
 	event.getByToken(PFCandToken, packedPFCandsHandle);
+	PFCandGrid const & pfCandGrid = PFCandGrid::Get(event, packedPFCandsHandle);
 
 	//rho isolation from susy recommendation
 	edm::Handle<double> rhoJetsNC_Handle;
@@ -761,7 +772,7 @@ void TTbarTagProbeEventSelector::ElectronSelection(edm::Event const & event)
 		  
 		  pat::Electron* elptr = new pat::Electron(*_iel);
 		  //Attention: Don't we need to update to the official CMSSW MiniIsolation.cc rather than some old file? --Rizki Mar 12, 2019.
-		  float miniIso = getPFMiniIsolation_EffectiveArea(packedPFCandsHandle, dynamic_cast<const reco::Candidate* > (elptr), 0.05, 0.2, 10., false, false,myRhoJetsNC);
+		  float miniIso = getPFMiniIsolation_EffectiveArea(pfCandGrid, dynamic_cast<const reco::Candidate* > (elptr), 0.05, 0.2, 10., false, false,myRhoJetsNC);
 		  
 		  if(miniIso > electron_miniIso){delete elptr;  break;}
 		  if(debug)std::cout << "\t\t\t" << "pass_electron_useMiniIso" <<std::endl;
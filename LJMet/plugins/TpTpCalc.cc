@@ -8,6 +8,9 @@ int TpTpCalc::BeginJob(edm::ConsumesCollector && iC)
 	//Gen
 	genParticlesToken   = iC.consumes<reco::GenParticleCollection>(mPset.getParameter<edm::InputTag>("genParticlesCollection"));
 
+	// only reads the gen particles, can run next to the other calculators
+	DeclareDependencies({}, {});
+
   return 0;
 
 }
@@ -96,7 +99,7 @@ int TpTpCalc::AnalyzeEvent(edm::Event const & event, BaseEventSelector * selecto
 
     // Get the generated particle collection
     edm::Handle<reco::GenParticleCollection> genParticles;
-    if(event.getByToken(genParticlesToken, genParticles)){
+    if(GetByToken(event, genParticlesToken, genParticles)){
       // loop over all gen particles in event
       for(size_t i = 0; i < genParticles->size(); i++){
         const reco::GenParticle &p = (*genParticles).at(i);
@@ -0,0 +1,38 @@
+#include "FWLJMET/LJMet/interface/TriggerPathMatcher.h"
+
+
+TriggerPathMatcher::TriggerPathMatcher():
+mbResolved(false)
+{
+}
+
+TriggerPathMatcher::~TriggerPathMatcher()
+{
+}
+
+void TriggerPathMatcher::SetPaths(std::vector<std::string> const & paths)
+{
+    mvPaths = paths;
+    mvIndices.assign(mvPaths.size(), std::vector<unsigned int>());
+    mbResolved = false;
+}
+
+bool TriggerPathMatcher::Update(edm::TriggerNames const & trigNames)
+{
+    if (mbResolved && trigNames.parameterSetID() == mMenuID) return false;
+
+    unsigned int _tSize = trigNames.size();
+
+    for (unsigned int ipath = 0; ipath < mvPaths.size(); ipath++){
+        mvIndices[ipath].clear();
+        for (unsigned int i = 0; i < _tSize; i++){
+            if (trigNames.triggerName(i).find(mvPaths[ipath]) == std::string::npos) continue;
+            mvIndices[ipath].push_back(i);
+        }
+    }
+
+    mMenuID = trigNames.parameterSetID();
+    mbResolved = true;
+
+    return true;
+}
@@ -11,6 +11,19 @@ options.register('isTTbar', '', VarParsing.multiplicity.singleton, VarParsing.va
 options.register('isVLQsignal', '', VarParsing.multiplicity.singleton, VarParsing.varType.bool, 'Is VLQ Signal')
 options.register('doGenHT', '', VarParsing.multiplicity.singleton, VarParsing.varType.bool, 'Do Gen HT')
 options.register('shifts', '', VarParsing.multiplicity.singleton, VarParsing.varType.bool, 'Include JEC/JER shift trees')
+options.register('singlePassShifts', True, VarParsing.multiplicity.singleton, VarParsing.varType.bool, 'Fill the JEC/JER shift trees from the nominal LJMet module')
+options.register('streamParallel', False, VarParsing.multiplicity.singleton, VarParsing.varType.bool, 'Run LJMet as a stream module (one selector/calculator set per stream)')
+options.register('asyncOutput', False, VarParsing.multiplicity.singleton, VarParsing.varType.bool, 'Fill the LJMet trees from a background writer thread')
+options.register('compression', '', VarParsing.multiplicity.singleton, VarParsing.varType.string, 'Compression of the LJMet trees, ALGORITHM:level e.g. LZ4:4 or LZMA:9 (default: output file setting)')
+options.register('autoFlush', 0, VarParsing.multiplicity.singleton, VarParsing.varType.int, 'TTree autoflush of the LJMet trees, entries if > 0, bytes if < 0 (0: ROOT default)')
+options.register('basketSize', 0, VarParsing.multiplicity.singleton, VarParsing.varType.int, 'Initial basket size of the LJMet branches in bytes (0: 32000)')
+options.register('dropBranches', '', VarParsing.multiplicity.list, VarParsing.varType.string, 'Regex of LJMet branches not to write, e.g. .*_BestCalc')
+options.register('keepBranches', '', VarParsing.multiplicity.list, VarParsing.varType.string, 'Regex of LJMet branches to write even if they match dropBranches')
+options.register('reducedPrecision', False, VarParsing.multiplicity.singleton, VarParsing.varType.bool, 'Store the LJMet double branches as float and flags as 8 bit integers (branch_precision)')
+options.register('parallelCalcs', False, VarParsing.multiplicity.singleton, VarParsing.varType.bool, 'Run the LJMet calculators that declare no shared state concurrently within an event')
+options.register('optimizeSelection', False, VarParsing.multiplicity.singleton, VarParsing.varType.bool, 'Skip the lepton/jet work no selection cut depends on for events that fail (same selection and cut flow)')
+options.register('prefilter', False, VarParsing.multiplicity.singleton, VarParsing.varType.bool, 'Drop events that can not pass the LJMet lepton cuts right after the trigger filter')
+options.register('prefilterJetMET', False, VarParsing.multiplicity.singleton, VarParsing.varType.bool, 'Also apply the LJMet jet/MET cuts in the prefilter (approximate, can lose selected events)')
 
 ## SET DEFAULT VALUES
 ## ATTENTION: THESE DEFAULT VALUES ARE SET FOR VLQ SIGNAL ! isMC=True, isTTbar=False, isVLQsignal=True options.isMC = False
@@ -33,6 +46,9 @@ isTTbar = options.isTTbar
 isVLQsignal = options.isVLQsignal
 doGenHT = options.doGenHT
 shifts = options.shifts
+singlePassShifts = options.singlePassShifts
+streamParallel = options.streamParallel
+asyncOutput = options.asyncOutput
 
 #Check arguments
 print options
@@ -87,6 +103,9 @@ process.source = cms.Source(
 OUTFILENAME = "DATASET"
 process.TFileService = cms.Service("TFileService", fileName = cms.string(OUTFILENAME+'.root'))
 
+## PDF sets for the LHE weight override, loaded once and shared by WeightAnalyzer and the LJMet calculators
+process.LHAPDFCache = cms.Service("LHAPDFCache")
+
 ################################
 ## MC Weights Analyzer
 ################################
@@ -200,7 +219,7 @@ pfMassDecorrelatedDeepBoostedJetTags.preprocessParams = pfMassDecorrelatedDeepBo
 
 updateJetCollection(
   process,
-  jetSource = cms.InputTag('slimmedJetsAK8'),
+  jetSource = cms.InputTag('preselectedJetsAK8'), # slimmedJetsAK8 that can pass the AK8 selection, see below
   pvSource = cms.InputTag('offlineSlimmedPrimaryVertices'),
   svSource = cms.InputTag('slimmedSecondaryVertices'),
   rParam = 0.8,
@@ -434,6 +453,10 @@ MultiLepSelector_cfg = cms.PSet(
   debug  = cms.bool(False),
   isMc  = cms.bool(isMC),
 
+  # Lepton identification and jet corrections are skipped if the collections are too small for the cuts, b tagging
+  # and AK8 jets only for selected events. Same selection and cut flow, the stage timing is printed either way
+  optimize_selection = cms.bool(options.optimizeSelection),
+
   # Trigger cuts
   trigger_cut  = cms.bool(True),
   HLTcollection= cms.InputTag("TriggerResults","","HLT"),
@@ -588,6 +611,7 @@ MultiLepCalc_cfg = cms.PSet(
   isMc                   = cms.bool(isMC),
   saveLooseLeps          = cms.bool(False),
   keepFullMChistory      = cms.bool(isMC),
+  saveTriggerNamesPerEvent = cms.bool(False), # trigger names are stored once per file (TNamed vsSelTriggers*_MultiLepCalc), per event the *Bits masks
 
   rhoJetsNCInputTag      = cms.InputTag("fixedGridRhoFastjetCentralNeutral",""), #this is for muon
   genParticlesCollection = cms.InputTag("prunedGenParticles"),
@@ -963,6 +987,77 @@ process.ljmet_JERdown = cms.EDAnalyzer(
 )
 
 
+## Single-pass shifts - the nominal module runs the selection and the shift-independent calculators once
+## and re-evaluates only the jet/MET dependent parts for each variation, filling ljmet_JECup, ljmet_JECdown,
+## ljmet_JERup and ljmet_JERdown in the same output layout as the modules above, which are then left out of the path.
+if shifts and singlePassShifts:
+  process.ljmet.shift_variations = cms.vstring(
+    'JECup',
+    'JECdown',
+    'JERup',
+    'JERdown',
+  )
+  process.ljmet.shift_calcs = cms.vstring(
+    'CommonCalc',
+    'MultiLepCalc',
+    'JetSubCalc',
+    'DeepAK8Calc',
+    'HOTTaggerCalc',
+    'BestCalc',
+  )
+
+
+## Output tree settings - compression, flushing and basket size of the ljmet trees, and branch keep/drop lists
+## (regex on the full branch name <variable>_<calculator>). A branch matching dropBranches is not written unless it
+## also matches keepBranches, a calculator with all its branches dropped is not run.
+## Branch precision - storage type of the double and int branches, first matching rule of the right kind wins,
+## type 'double'/'int' keeps a branch as it is. Floats are rounded to mantissaBits (23 = full float), integers
+## are clamped to the type range, so pdg ids (up to 8000001 for the VLQs) stay int.
+branch_precision = cms.VPSet(
+  cms.PSet(branches = cms.string('.*([Ww]eight|PDF|Prob).*'), type = cms.string('float')),
+  cms.PSet(branches = cms.string('.*(Pt|Eta|Phi|Energy)(_.*)?_(MultiLepCalc|JetSubCalc|TpTpCalc)'), type = cms.string('float'), mantissaBits = cms.int32(16)),
+  cms.PSet(branches = cms.string('(el|mu)(Charge|.*Is[A-Z].*|TrigMatchFilter.|Matched|Global|NotConversion|ChargeConsistent)_.*'), type = cms.string('int8')),
+  cms.PSet(branches = cms.string('.*'), type = cms.string('float')),
+)
+for label in [ 'ljmet', 'ljmet_JECup', 'ljmet_JECdown', 'ljmet_JERup', 'ljmet_JERdown' ]:
+  if not hasattr(process, label): continue
+  module = getattr(process, label)
+  if options.compression:
+    algorithm, level = (options.compression.split(':') + ['4'])[:2]
+    module.compressionAlgorithm = cms.string(algorithm.upper())
+    module.compressionLevel = cms.int32(int(level))
+  if options.autoFlush != 0:
+    module.autoFlush = cms.int32(options.autoFlush)
+  if options.basketSize > 0:
+    module.basketSize = cms.int32(options.basketSize)
+  if len(options.dropBranches) > 0:
+    module.drop_branches = cms.vstring(options.dropBranches)
+    module.keep_branches = cms.vstring(options.keepBranches)
+  if options.reducedPrecision:
+    module.branch_precision = branch_precision
+
+## Parallel calculators - calculators that declare their dependencies (BestCalc, DeepAK8Calc, JetSubCalc, ...) run
+## concurrently within an event on the framework's TBB threads, the output is the same as in the serial mode
+if options.parallelCalcs:
+  for label in [ 'ljmet', 'ljmet_JECup', 'ljmet_JECdown', 'ljmet_JERup', 'ljmet_JERdown' ]:
+    if hasattr(process, label):
+      getattr(process, label).parallelCalcs = cms.bool(True)
+
+## Asynchronous output - the tree filling (compression, basket writes) runs on a background thread per tree
+## and overlaps with the next events. At most two filled events per tree wait for the writer.
+if asyncOutput:
+  for label in [ 'ljmet', 'ljmet_JECup', 'ljmet_JECdown', 'ljmet_JERup', 'ljmet_JERdown' ]:
+    if hasattr(process, label):
+      getattr(process, label).asyncOutput = cms.bool(True)
+
+## Stream-parallel LJMet - same parameters and output, but each stream runs its own selector and calculators
+## instead of all events going through one module. The trees are merged and copied into the TFileService file
+## at the end of the job.
+if streamParallel:
+  for label in [ 'ljmet', 'ljmet_JECup', 'ljmet_JECdown', 'ljmet_JERup', 'ljmet_JERdown' ]:
+    if hasattr(process, label):
+      setattr(process, label, cms.EDAnalyzer('LJMetStream', **getattr(process, label).parameters_()))
+
 ################################################
 ### PROCESS PATH
 ################################################
@@ -1000,7 +1095,7 @@ if isTTbar:
     process.categorizeGenTtbar  ## return already a categorization id for tt                  
   )
 
-  if shifts:
+  if shifts and not singlePassShifts:
     process.p = cms.Path(
       process.mcweightanalyzer *
       process.filter_any_explicit *
@@ -1036,7 +1131,7 @@ if isTTbar:
     )
 
 elif isMC:
-  if shifts:
+  if shifts and not singlePassShifts:
     process.p = cms.Path(
       process.mcweightanalyzer *
       process.filter_any_explicit *
@@ -1082,4 +1177,50 @@ else: #Data
     process.ljmet #(ntuplizer) 
   )
 
+## AK8 preselection for the DeepBoostedJet tagging - MultiLepEventSelector::AK8JetSelection only keeps AK8 jets with
+## uncorrected pt >= 170 GeV (DeepAK8Calc, BestCalc, JetSubCalc use its jets), so the ONNX inference only runs on those.
+## The eta cut is widened by the lepton cleaning cone, the cleaned jet direction is what the selector cuts on
+sel = MultiLepSelector_cfg
+process.preselectedJetsAK8 = cms.EDFilter('PATJetSelector',
+  src = cms.InputTag('slimmedJetsAK8'),
+  cut = cms.string("correctedJet('Uncorrected').pt() >= 170 && abs(eta) < %f" % (sel.jet_maxeta_AK8.value() + sel.LepJetDRAK8.value())),
+)
+patAlgosToolsTask.add(process.preselectedJetsAK8)
+
+## Leptonic prefilter - right after the trigger filter, drops the events that can not pass the LJMet lepton selection
+## before egammaPostRecoSeq, DeepAK8, QGTagger, pileup jet ID and the prefiring weights run. The MultiLepSelector_cfg
+## lepton counts are applied to the MiniAOD leptons, muons as the selector uses them, electrons with a margin for the
+## energy scale/smearing. With prefilterJetMET the jet and MET cuts are applied as well, with heuristic margins for the
+## JEC/JER and type-1 MET corrections (and shifts) applied later: an approximation that can lose selected events, so
+## check the cut flow with and without it before using it for a production.
+## The ljmet cut flow histograms then count the events after the prefilter (mcweightanalyzer still sees all of them)
+if options.prefilter:
+  process.ljmetPrefilter = cms.EDFilter('LJMetPrefilter',
+    muonsCollection       = cms.InputTag('slimmedMuons'),
+    electronsCollection   = cms.InputTag('slimmedElectrons', '', '@skipCurrentProcess'), # before egammaPostRecoSeq
+    jetsCollection        = cms.InputTag('slimmedJets'),
+    metCollection         = sel.met_collection,
+    muon_cuts             = sel.muon_cuts,
+    muon_minpt            = sel.muon_minpt,
+    muon_maxeta           = sel.muon_maxeta,
+    loose_muon_minpt      = sel.loose_muon_minpt,
+    loose_muon_maxeta     = sel.loose_muon_maxeta,
+    electron_cuts         = sel.electron_cuts,
+    electron_minpt        = sel.electron_minpt,
+    electron_maxeta       = sel.electron_maxeta,
+    loose_electron_minpt  = sel.loose_electron_minpt,
+    loose_electron_maxeta = sel.loose_electron_maxeta,
+    minLooseLeptons       = cms.int32(sel.minLooseLeptons.value() if sel.minLooseLeptons_cut.value() else 0),
+    minLeptons            = cms.int32(sel.minLeptons.value() if sel.minLeptons_cut.value() else 0),
+    min_jet               = cms.int32(sel.min_jet.value() if sel.jet_cuts.value() else 0),
+    jet_minpt             = sel.jet_minpt,
+    leading_jet_pt        = cms.double(sel.leading_jet_pt.value() if sel.jet_cuts.value() else 0.),
+    min_met               = cms.double(sel.min_met.value() if sel.met_cuts.value() else 0.),
+    electronMargin        = cms.double(0.2),  # electron pt thresholds lowered by 20% (scale/smearing)
+    jetMETCuts            = cms.bool(options.prefilterJetMET),
+    jetMargin             = cms.double(0.2),  # jet pt thresholds lowered by 20% (JEC/JER), heuristic
+    metMargin             = cms.double(20.0), # GeV below min_met (type-1 MET with the new JEC), heuristic
+  )
+  process.p.insert(process.p.index(process.filter_any_explicit) + 1, process.ljmetPrefilter)
+
 process.p.associate(patAlgosToolsTask)
@@ -46,6 +46,8 @@
 #include "LHAPDF/PDFSet.h"
 #include "LHAPDF/Factories.h"
 
+#include "FWLJMET/LJMet/interface/LHAPDFCache.h"
+
 //
 // class declaration
 //
@@ -77,6 +79,10 @@ private:
   double pdfweightsum = 0;
   std::string basePDFname = "NNPDF31_nnlo_as_0118_nf_4";
   std::string newPDFname = "NNPDF31_nnlo_as_0118_nf_4_mc_hessian";
+
+  // PDF sets are loaded once in beginJob, shared through the LHAPDFCache service if configured
+  LHAPDFCache * pdfCache = 0;
+  LHAPDFCache localPdfCache;
   
   // ----------member data ---------------------------
   edm::EDGetTokenT<GenEventInfoProduct> GEIPtoken;
@@ -170,23 +176,11 @@ WeightAnalyzer::analyze(const edm::Event& iEvent, const edm::EventSetup& iSetup)
     int id1 = genEvtInfo->pdf()->id.first;
     int id2 = genEvtInfo->pdf()->id.second;
 
-    //Initialize PDF sets
-    LHAPDF::PDF* basepdf = LHAPDF::mkPDF(basePDFname,0);
-    const LHAPDF::GridPDF& pdf1 = * dynamic_cast<const LHAPDF::GridPDF*>(basepdf);
-    LHAPDF::PDF* newpdf = LHAPDF::mkPDF(newPDFname,0);
-    const LHAPDF::GridPDF& pdf2 = * dynamic_cast<const LHAPDF::GridPDF*>(newpdf);
-    
-    // calculate central PDFs for generator set,
-    double pdf1_gen = pdf1.xfxQ(id1, x1, Q);
-    double pdf2_gen = pdf1.xfxQ(id2, x2, Q);
-    delete basepdf;
-    
-    // calculate central PDFs for new set,
-    double pdf1_new = pdf2.xfxQ(id1, x1, Q);
-    double pdf2_new = pdf2.xfxQ(id2, x2, Q);
-    delete newpdf;
+    // central members of the generator and new sets, from the cached grids
+    double pdf_gen = pdfCache->Product(basePDFname, 0, id1, x1, id2, x2, Q);
+    double pdf_new = pdfCache->Product(newPDFname, 0, id1, x1, id2, x2, Q);
 
-    double newweight = (pdf1_new*pdf2_new)/(pdf1_gen*pdf2_gen); // new/old
+    double newweight = pdf_new/pdf_gen; // new/old
     newweight *= genEvtInfo->weight(); // (new/old)*old = new, for consistency with singleLepCalc
     
     pdfweightsum += newweight;
@@ -201,6 +195,11 @@ WeightAnalyzer::analyze(const edm::Event& iEvent, const edm::EventSetup& iSetup)
 void
 WeightAnalyzer::beginJob()
 {
+  if (!orlhew) return;
+
+  pdfCache = LHAPDFCache::Get(localPdfCache);
+  pdfCache->Load(basePDFname);
+  pdfCache->Load(newPDFname);
 }
 
 // ------------ method called once each job just after ending the event loop  ------------